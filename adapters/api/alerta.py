@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlmodel import Session
 from datetime import datetime
+import logging
 
 from core.models.alerta import Alerta
 from core.models.datomonitoreo import DatoMonitoreo
-from adapters.db.sqlmodel_database import get_session
+from core.models.recalculoalertas_read import RecalculoAlertasRead
+from core.models.usuario import UserRead
+from adapters.db.sqlmodel_database import engine, get_session
 from core.repositories import alerta_repository
+from dependencies import get_current_admin
+from services.recalculo_alertas_service import (
+    RecalculoEnCurso,
+    a_recalculo_read,
+    ejecutar_recalculo,
+    obtener_recalculo,
+    preparar_recalculo
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -13,7 +26,7 @@ router = APIRouter()
 def listar_alertas(session=Depends(get_session)):
     return alerta_repository.get_alertas(session)
 
-@router.post("/alertas/", response_model=Alerta)
+@router.post("/alertas/", response_model=list[Alerta])
 def crear_alerta(
     dato_monitoreo_id: int,  # ID del DatoMonitoreo que dispara la alerta
     session: Session = Depends(get_session)
@@ -24,8 +37,54 @@ def crear_alerta(
         if not dato:
             raise HTTPException(status_code=404, detail="Dato de monitoreo no encontrado")
         
-        # Lógica central en el repositorio
+        # Lógica central en el repositorio (alertas nuevas; vacía si la lectura está en rango)
         return alerta_repository.crear_alerta(session, dato)
-    
+
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/alertas/recalculos/{id_producto_monitoreado}", response_model=RecalculoAlertasRead, status_code=202)
+def recalcular_alertas(
+    id_producto_monitoreado: int,
+    background_tasks: BackgroundTasks,
+    reiniciar: bool = False,
+    session: Session = Depends(get_session),
+    current_user: UserRead = Depends(get_current_admin)
+):
+    """
+    Recalcula en segundo plano el historial de alertas de una sesión con la
+    condición actual de su producto (por ejemplo, después de ajustar sus
+    límites). Si un recálculo anterior quedó interrumpido, lo reanuda salvo
+    con reiniciar=true. El avance se consulta con GET.
+    """
+    try:
+        recalculo = preparar_recalculo(session, id_producto_monitoreado, reiniciar)
+    except RecalculoEnCurso as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if recalculo is None:
+        raise HTTPException(status_code=404, detail="Producto monitoreado no encontrado")
+
+    background_tasks.add_task(_recalcular_en_segundo_plano, id_producto_monitoreado, recalculo.ejecutor)
+    return a_recalculo_read(recalculo)
+
+@router.get("/alertas/recalculos/{id_producto_monitoreado}", response_model=RecalculoAlertasRead)
+def estado_recalculo_alertas(
+    id_producto_monitoreado: int,
+    session: Session = Depends(get_session),
+    current_user: UserRead = Depends(get_current_admin)
+):
+    recalculo = obtener_recalculo(session, id_producto_monitoreado)
+    if not recalculo:
+        raise HTTPException(status_code=404, detail="No hay recálculo para este producto monitoreado")
+    return recalculo
+
+def _recalcular_en_segundo_plano(id_producto_monitoreado: int, ejecutor: str) -> None:
+    try:
+        ejecutar_recalculo(engine, id_producto_monitoreado, ejecutor)
+    except RecalculoEnCurso as e:
+        # Otro proceso retomó la reserva (se consideró abandonada)
+        logger.warning("⚠️ Recálculo en segundo plano interrumpido: %s", e)
+    except Exception:
+        pass  # Ya quedó en el log y en el estado del recálculo ("error")
@@ -1,21 +1,27 @@
 # core/routers/dashboard_router.py
 from fastapi import APIRouter, Depends, HTTPException
-from adapters.db.sqlmodel_database import get_session
-from core.repositories.dashboard_repository import get_dashboard_metrics, get_usuarios_test, get_ultimos_productos, get_ultimos_registros, get_ultimos_usuarios
+from adapters.db.sqlmodel_database import get_async_session
+from core.repositories.dashboard_repository import (
+    get_dashboard_metrics_async,
+    get_usuarios_test_async,
+    get_ultimos_productos_async,
+    get_ultimos_registros_async,
+    get_ultimos_usuarios_async
+)
 from typing import Dict
 from core.models.DashboardMetricsRead import DashboardMetricsRead
 from core.models.usuario import Usuario
 from core.models.registro import Registro
 from typing import List
 from core.models.productofarmaceutico import ProductoFarmaceutico
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 router = APIRouter()
 
 @router.get("/dashboard/metrics", response_model=DashboardMetricsRead)
-def obtener_metricas_dashboard(session=Depends(get_session)):
+async def obtener_metricas_dashboard(session: AsyncSession = Depends(get_async_session)):
     try:
-        metrics = get_dashboard_metrics(session)
+        metrics = await get_dashboard_metrics_async(session)
         return metrics
     except Exception as e:
         raise HTTPException(
@@ -24,12 +30,12 @@ def obtener_metricas_dashboard(session=Depends(get_session)):
         )
     
 @router.get("/dashboard/metrics/user-count", tags=["dashboard"])
-def obtener_conteo_usuarios(session=Depends(get_session)):
+async def obtener_conteo_usuarios(session: AsyncSession = Depends(get_async_session)):
     """
     Devuelve el número total de usuarios registrados
     """
     try:
-        count = get_usuarios_test(session)
+        count = await get_usuarios_test_async(session)
         return {"usuarios_registrados": count}
     except Exception as e:
         raise HTTPException(
@@ -39,9 +45,9 @@ def obtener_conteo_usuarios(session=Depends(get_session)):
     
 
 @router.get("/dashboard/metrics/last-product", tags=["dashboard"], response_model=List[ProductoFarmaceutico])
-async def obtener_ultimos_productos(session: Session = Depends(get_session)):
+async def obtener_ultimos_productos(session: AsyncSession = Depends(get_async_session)):
     try:
-        return get_ultimos_productos(session)
+        return await get_ultimos_productos_async(session)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -49,9 +55,9 @@ async def obtener_ultimos_productos(session: Session = Depends(get_session)):
         )
     
 @router.get("/dashboard/metrics/last-registros", tags=["dashboard"], response_model=List[Registro])
-async def obtener_ultimos_registros(session: Session = Depends(get_session)):
+async def obtener_ultimos_registros(session: AsyncSession = Depends(get_async_session)):
     try:
-        return get_ultimos_registros(session)
+        return await get_ultimos_registros_async(session)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -59,9 +65,9 @@ async def obtener_ultimos_registros(session: Session = Depends(get_session)):
         )
     
 @router.get("/dashboard/metrics/last-users", tags=["dashboard"], response_model=List[Registro])
-async def obtener_ultimos_usuarios(session: Session = Depends(get_session)):
+async def obtener_ultimos_usuarios(session: AsyncSession = Depends(get_async_session)):
     try:
-        return get_ultimos_usuarios(session)
+        return await get_ultimos_usuarios_async(session)
     except Exception as e:
         raise HTTPException(
             status_code=500,
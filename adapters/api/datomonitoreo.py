@@ -1,18 +1,238 @@
-from fastapi import APIRouter, Depends, HTTPException
-from adapters.db.sqlmodel_database import get_session
+import asyncio
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from config import Config
+from sqlmodel.ext.asyncio.session import AsyncSession
+from adapters.db.sqlmodel_database import get_async_engine, get_async_session
 from core.models.datomonitoreo import DatoMonitoreo
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.models.agregadomonitoreo_read import AgregadoMonitoreoRead
+from core.models.serie_read import SerieRead
+from core.models.lecturas_recientes_read import LecturasRecientesRead
+from core.repositories.agregado_monitoreo_repository import get_agregados_async
+from core.repositories.contexto_monitoreo_repository import PARAMETROS
+from core.repositories.lecturas_recientes import lecturas_recientes
+from core.repositories.condicion_almacenamiento_repository import get_condicion_de_producto_monitoreado_async
 from core.repositories.dato_monitoreo_repository import (
-    get_datosmonitoreo,
-    get_datosmonitoreo_by_id
+    COLUMNAS_EXPORTACION,
+    get_datosmonitoreo_async,
+    get_datosmonitoreo_by_id_async,
+    iterar_datos_sesion_async,
+    rango_de_producto_async
 )
+from core.utils.exportacion_utils import SERIALIZADORES, TIPOS_CONTENIDO
+from core.utils.datetime_utils import to_caracas_naive
+from core.utils.series_utils import leer_serie, submuestrear
+from core.utils.paginacion_utils import Cursor, decodificar_cursor, dividir_pagina
 
 
 router = APIRouter()
 
+# Header con el cursor de la página siguiente (ausente en la última página)
+HEADER_CURSOR = "X-Next-Cursor"
+
+
+def _cursor(cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior")) -> Optional[Cursor]:
+    try:
+        return decodificar_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _rango(
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None
+) -> tuple[Optional[datetime], Optional[datetime]]:
+    """desde / hasta en hora de Caracas sin zona, como las fechas de la BD (un `...Z` de toISOString() se convierte)"""
+    return (
+        None if desde is None else to_caracas_naive(desde),
+        None if hasta is None else to_caracas_naive(hasta)
+    )
+
+
+def _limite(
+    limite: int = Query(Config.DATOS_PAGINA_DEFECTO, ge=1, le=Config.DATOS_PAGINA_MAXIMO, description="Lecturas por página")
+) -> int:
+    return limite
+
+
 @router.get("/datosmonitoreo/", response_model=list[DatoMonitoreo])
-def listar_datosmonitoreo(session=Depends(get_session)):
-    return get_datosmonitoreo(session)
+async def listar_datosmonitoreo(
+    response: Response,
+    rango: tuple[Optional[datetime], Optional[datetime]] = Depends(_rango),
+    cursor: Optional[Cursor] = Depends(_cursor),
+    limite: int = Depends(_limite),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Lecturas entre desde y hasta (por defecto, los últimos DATOS_VENTANA_DIAS
+    días), de la más reciente a la más antigua, paginadas: si hay más, el
+    header X-Next-Cursor trae el cursor para pedir la página siguiente
+    (con los mismos desde/hasta).
+    """
+    desde, hasta = rango
+    filas = await get_datosmonitoreo_async(session, desde, hasta, cursor, limite + 1)
+    pagina, siguiente = dividir_pagina(filas, limite)
+    if siguiente:
+        response.headers[HEADER_CURSOR] = siguiente
+    return pagina
 
 @router.get("/datosmonitoreo/{id}", response_model=list[DatoMonitoreo])
-def obtener_datosmonitoreo(id: int, session=Depends(get_session)):
-   return get_datosmonitoreo_by_id(session, id)
+async def obtener_datosmonitoreo(
+    id: int,
+    response: Response,
+    rango: tuple[Optional[datetime], Optional[datetime]] = Depends(_rango),
+    cursor: Optional[Cursor] = Depends(_cursor),
+    limite: int = Depends(_limite),
+    session: AsyncSession = Depends(get_async_session)
+):
+   """Lecturas de un producto monitoreado (por defecto, todas desde la primera), paginadas igual que /datosmonitoreo/"""
+   desde, hasta = rango
+   filas = await get_datosmonitoreo_by_id_async(session, id, desde, hasta, cursor, limite + 1)
+   pagina, siguiente = dividir_pagina(filas, limite)
+   if siguiente:
+       response.headers[HEADER_CURSOR] = siguiente
+   return pagina
+
+@router.get("/datosmonitoreo/{id}/agregados", response_model=list[AgregadoMonitoreoRead])
+async def obtener_agregados_datosmonitoreo(
+    id: int,
+    bucket: Literal["1m", "1h", "1d"] = "1h",
+    rango: tuple[Optional[datetime], Optional[datetime]] = Depends(_rango),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Min/max/promedio/cantidad por parámetro en intervalos de 1 minuto, 1 hora
+    o 1 día (por defecto, desde la primera lectura). Para gráficos
+    de semanas o meses sin traer las lecturas crudas.
+    """
+    desde, hasta = rango
+    return await get_agregados_async(session, id, bucket, desde, hasta)
+
+@router.get("/datosmonitoreo/{id}/export")
+async def exportar_datosmonitoreo(
+    id: int,
+    formato: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    rango: tuple[Optional[datetime], Optional[datetime]] = Depends(_rango),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Todas las lecturas de un producto monitoreado (por defecto, de la primera
+    a la última al momento de la petición) en orden cronológico, como CSV o
+    NDJSON en streaming: memoria constante y los primeros bytes salen con el
+    primer lote.
+
+    La sesión de la dependencia solo resuelve el producto y el rango; el
+    cuerpo se lee con una conexión propia (cursor del servidor) que vuelve
+    al pool al terminar la transferencia o si el cliente corta.
+    """
+    if await session.get(ProductoMonitoreado, id) is None:
+        raise HTTPException(status_code=404, detail="Producto monitoreado no encontrado")
+
+    desde, hasta = rango
+    if desde is None or hasta is None:
+        primera, ultima = await rango_de_producto_async(session, id)
+        desde, hasta = desde or primera, hasta or ultima
+
+    if desde is None or hasta is None:
+        lotes = _sin_lotes()
+    else:
+        lotes = iterar_datos_sesion_async(get_async_engine(), id, desde, hasta)
+
+    return StreamingResponse(
+        SERIALIZADORES[formato](COLUMNAS_EXPORTACION, lotes),
+        media_type=TIPOS_CONTENIDO[formato],
+        headers={"Content-Disposition": f'attachment; filename="datosmonitoreo_{id}.{formato}"'}
+    )
+
+
+@router.get("/datosmonitoreo/{id}/serie", response_model=SerieRead)
+async def obtener_serie_datosmonitoreo(
+    id: int,
+    parametro: Literal["temperatura", "humedad", "lux", "presion"],
+    puntos: int = Query(500, ge=3, le=Config.SERIE_PUNTOS_MAXIMO, description="Puntos de la serie submuestreada"),
+    rango: tuple[Optional[datetime], Optional[datetime]] = Depends(_rango),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Serie de un parámetro para graficar (por defecto, toda la sesión)
+    reducida a `puntos` puntos con LTTB, más todas las lecturas fuera de
+    los límites de la condición. El tamaño de la respuesta no depende de
+    la duración de la sesión.
+    """
+    if await session.get(ProductoMonitoreado, id) is None:
+        raise HTTPException(status_code=404, detail="Producto monitoreado no encontrado")
+
+    condicion = await get_condicion_de_producto_monitoreado_async(session, id)
+    limite_min = getattr(condicion, f"{parametro}_min", None)
+    limite_max = getattr(condicion, f"{parametro}_max", None)
+
+    desde, hasta = rango
+    if desde is None or hasta is None:
+        primera, ultima = await rango_de_producto_async(session, id)
+        desde, hasta = desde or primera, hasta or ultima
+
+    if desde is None or hasta is None:
+        lotes = _sin_lotes()
+    else:
+        lotes = iterar_datos_sesion_async(get_async_engine(), id, desde, hasta)
+    fechas, valores = await leer_serie(lotes, COLUMNAS_EXPORTACION.index(parametro))
+
+    # NumPy fuera del event loop: con series largas son algunos milisegundos de CPU
+    indices = await asyncio.to_thread(submuestrear, fechas, valores, puntos, limite_min, limite_max)
+    return SerieRead(
+        parametro=parametro,
+        limite_min=limite_min,
+        limite_max=limite_max,
+        total=len(valores),
+        fechas=fechas[indices].tolist(),
+        valores=valores[indices].tolist(),
+    )
+
+
+@router.get("/datosmonitoreo/{id}/recientes", response_model=LecturasRecientesRead)
+async def obtener_recientes_datosmonitoreo(
+    id: int,
+    despues: Optional[datetime] = Query(None, description="Solo lecturas posteriores (la última fecha ya recibida)"),
+    limite: Optional[int] = Query(None, ge=1, le=Config.RECIENTES_CAPACIDAD, description="Lecturas más recientes a devolver"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Últimas lecturas (hasta RECIENTES_CAPACIDAD) de un monitoreo activo para
+    las vistas en vivo, en orden cronológico. Salen del buffer en memoria
+    que alimenta la ingesta, sin consultar la BD; con `despues` el cliente
+    pide solo lo nuevo desde su último refresco.
+
+    Un producto sin buffer (finalizado o sin lecturas desde el arranque) se
+    sirve desde la BD con las mismas reglas.
+    """
+    if despues is not None:
+        despues = to_caracas_naive(despues)
+
+    recientes = lecturas_recientes.ultimas(id, despues, limite)
+    if recientes is None:
+        datos = await get_datosmonitoreo_by_id_async(
+            session, id, despues, None, None, limite or Config.RECIENTES_CAPACIDAD
+        )
+        datos = [dato for dato in reversed(datos) if despues is None or dato.fecha > despues]
+        ids = [dato.id for dato in datos]
+        fechas = [dato.fecha for dato in datos]
+        valores = [[getattr(dato, parametro) for dato in datos] for parametro in PARAMETROS]
+    else:
+        ids, fechas, matriz = recientes
+        ids, fechas, valores = ids.tolist(), fechas.tolist(), matriz.T.tolist()
+
+    return LecturasRecientesRead(
+        id_producto_monitoreado=id,
+        ids=ids,
+        fechas=fechas,
+        **dict(zip(PARAMETROS, valores))
+    )
+
+
+async def _sin_lotes():
+    """Producto sin lecturas: solo el encabezado (CSV) o un cuerpo vacío (NDJSON)"""
+    return
+    yield
@@ -0,0 +1,134 @@
+"""
+Eventos en vivo para dashboards: lecturas, transiciones de alertas y fin de
+sesiones (ver services/eventos_hub.py), por WebSocket o Server-Sent Events.
+
+Temas:
+- "sesion:{id_producto_monitoreado}": lecturas, alertas y fin de esa sesión
+- "dispositivo:{device_id}": lecturas de un NodeMCU
+- "alertas": alertas abiertas / resueltas y sesiones finalizadas de todos
+
+Cada evento es {"tipo": ..., "datos": {...}}. Reemplaza el sondeo de
+/datosmonitoreo/{id}, /alertas/ y /dashboard/metrics: el servidor empuja
+solo lo que cambió, sin consultar la BD.
+"""
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from config import Config
+from services.eventos_hub import Suscripcion, hub_eventos, tema_valido
+
+router = APIRouter(prefix="/eventos", tags=["Eventos"])
+
+DESCRIPCION_TEMAS = 'Temas separados por coma: "alertas", "sesion:{id}", "dispositivo:{device_id}"'
+
+
+def _parsear_temas(temas: str) -> list[str]:
+    """Lista de temas válidos; ValueError si alguno no lo es o no hay ninguno"""
+    lista = [tema.strip() for tema in temas.split(",") if tema.strip()]
+    invalidos = [tema for tema in lista if not tema_valido(tema)]
+    if not lista or invalidos:
+        raise ValueError(f"Temas inválidos: {', '.join(invalidos) or '(ninguno)'}")
+    return lista
+
+
+def _temas(temas: str = Query(..., description=DESCRIPCION_TEMAS)) -> list[str]:
+    try:
+        return _parsear_temas(temas)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.websocket("/ws")
+async def eventos_websocket(websocket: WebSocket, temas: str = ""):
+    """
+    WebSocket de eventos. Al conectar envía {"tipo": "suscrito"} con los
+    temas activos; después, un mensaje JSON por evento.
+
+    El cliente puede cambiar sus temas enviando
+    {"suscribir": ["sesion:3"]} o {"cancelar": ["alertas"]}.
+    """
+    await websocket.accept()
+    try:
+        iniciales = _parsear_temas(temas) if temas else []
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    suscripcion = hub_eventos.suscribir(iniciales)
+    try:
+        await websocket.send_json({"tipo": "suscrito", "datos": {"temas": sorted(suscripcion.temas)}})
+        tareas = [
+            asyncio.create_task(_enviar_eventos(websocket, suscripcion)),
+            asyncio.create_task(_recibir_cambios(websocket, suscripcion)),
+        ]
+        _, pendientes = await asyncio.wait(tareas, return_when=asyncio.FIRST_COMPLETED)
+        for tarea in pendientes:
+            tarea.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub_eventos.cancelar(suscripcion)
+
+
+async def _enviar_eventos(websocket: WebSocket, suscripcion: Suscripcion) -> None:
+    while True:
+        evento = await suscripcion.siguiente()
+        await websocket.send_json(jsonable_encoder(evento))
+
+
+async def _recibir_cambios(websocket: WebSocket, suscripcion: Suscripcion) -> None:
+    """Mensajes del cliente: altas / bajas de temas. Termina cuando se desconecta"""
+    try:
+        while True:
+            mensaje = await websocket.receive_json()
+            try:
+                if not isinstance(mensaje, dict):
+                    raise ValueError("Se esperaba un objeto JSON")
+                suscribir = _parsear_temas(",".join(mensaje.get("suscribir", []))) if mensaje.get("suscribir") else []
+                cancelar = set(mensaje.get("cancelar", []))
+            except (ValueError, TypeError) as e:
+                await websocket.send_json({"tipo": "error", "datos": {"detalle": str(e)}})
+                continue
+            suscripcion.temas = (suscripcion.temas | set(suscribir)) - cancelar
+            await websocket.send_json({"tipo": "suscrito", "datos": {"temas": sorted(suscripcion.temas)}})
+    except (WebSocketDisconnect, json.JSONDecodeError):
+        return
+
+
+@router.get("/sse")
+async def eventos_sse(temas: list[str] = Depends(_temas)):
+    """
+    Server-Sent Events (EventSource del navegador): cada evento sale con
+    `event: <tipo>` y `data: <JSON>`. Sin eventos durante
+    EVENTOS_HEARTBEAT_SEGUNDOS se envía un comentario para mantener viva
+    la conexión a través de proxies.
+    """
+    return StreamingResponse(
+        _flujo_sse(temas),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _flujo_sse(temas: list[str]):
+    # La suscripción vive lo mismo que el generador: cuando el cliente corta,
+    # StreamingResponse cancela la iteración y se ejecuta el finally
+    suscripcion = hub_eventos.suscribir(temas)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            evento = await suscripcion.siguiente(Config.EVENTOS_HEARTBEAT_SEGUNDOS)
+            if evento is None:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {evento['tipo']}\ndata: {json.dumps(jsonable_encoder(evento['datos']))}\n\n"
+    finally:
+        hub_eventos.cancelar(suscripcion)
+
+
+@router.get("/metrics")
+async def metricas_eventos():
+    """Suscriptores conectados y eventos publicados / entregados / descartados por colas llenas"""
+    return hub_eventos.metricas()
@@ -4,26 +4,61 @@ API Endpoints para comunicación bidireccional con NodeMCU.
 Nueva arquitectura:
 - NodeMCU → Backend (POST /nodemcu/data con sensores)
 - Backend → NodeMCU (RESPONSE: {"led_color": "verde|amarillo|rojo"})
+- Variante binaria: POST /nodemcu/data.bin (trama fija → 1 byte de LED)
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from schemas.nodemcu import NodeMCUDataSchema, LEDResponseSchema
-from adapters.db.sqlmodel_database import get_session
-from services.data_service import procesar_datos_entrantes
-from services.led_service import determinar_color_led_solo
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from schemas.nodemcu import (
+    NodeMCUDataSchema,
+    NodeMCUBatchSchema,
+    LEDResponseSchema,
+    DispositivoSchema,
+    AsignacionDispositivoSchema,
+    UltimaLecturaSchema,
+    MAX_LONGITUD_DEVICE_ID
+)
+from schemas.nodemcu_binario import decodificar_trama, CODIGOS_LED
+from adapters.db.sqlmodel_database import get_async_session
+from adapters.arduino_adapter import DISPOSITIVO_POR_DEFECTO, SensorDataManager, device_registry
+from adapters.estado.estado_compartido import estado_compartido
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.models.usuario import UserRead
+from dependencies import get_current_user
+from services.data_service import procesar_datos_entrantes_async, procesar_lote_entrante, actualizar_estado_sensores, SENSORES
+from services.ingest_pipeline import ingest_pipeline
+from core.utils.datetime_utils import to_caracas_naive, get_caracas_now
+from services.led_service import determinar_color_led_async
+from core.utils.logging_utils import campos
 import logging
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/nodemcu", tags=["NodeMCU"])
 
 
+def _resolver_dispositivo(device_id: Optional[str], x_device_id: Optional[str]) -> SensorDataManager:
+    """El device_id del payload tiene prioridad sobre el header X-Device-Id"""
+    device_id = device_id or x_device_id
+    if device_id and len(device_id) > MAX_LONGITUD_DEVICE_ID:
+        raise HTTPException(status_code=422, detail="X-Device-Id demasiado largo")
+    return device_registry.get(device_id)
+
+
+def _secuencia(dispositivo: SensorDataManager, secuencia: Optional[int]) -> Optional[int]:
+    """
+    Secuencia con la que se deduplica la lectura. Sin device_id todo el
+    firmware anterior comparte el dispositivo por defecto y sus contadores
+    chocarían entre sí: esas lecturas no se deduplican.
+    """
+    return None if dispositivo.device_id == DISPOSITIVO_POR_DEFECTO else secuencia
+
+
 @router.post("/data", response_model=LEDResponseSchema)
 async def recibir_datos_nodemcu(
     datos: NodeMCUDataSchema,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session),
+    x_device_id: Optional[str] = Header(None)
 ) -> LEDResponseSchema:
     """
     Recibe datos del NodeMCU, procesa, genera alertas, y retorna comando LED.
@@ -32,6 +67,8 @@ async def recibir_datos_nodemcu(
     - NodeMCU envía datos de sensores en POST
     - Backend procesa datos, guarda en BD, genera alertas
     - Backend retorna color LED en la misma respuesta
+    - Con INGEST_MODE=async la lectura se encola y se guarda por lotes
+      (group-commit) en segundo plano; la respuesta no espera a la BD
 
     **Prioridad de LED:**
     1. 🔴 ROJO - Alertas PENDIENTES (bloqueo total hasta resolución manual)
@@ -39,43 +76,167 @@ async def recibir_datos_nodemcu(
     3. 🟡 AMARILLO - Sensores en umbral de advertencia (90% del rango)
     4. 🟢 VERDE - Todo normal
 
+    **Varios dispositivos:**
+    - Cada NodeMCU se identifica con device_id (payload) o el header X-Device-Id
+    - Estado de sensores, último dato e histéresis del LED son por dispositivo
+    - Sin identificador se usa el dispositivo "default"
+
     **Ejemplo de uso:**
     ```bash
     curl -X POST http://localhost:8000/nodemcu/data \\
       -H "Content-Type: application/json" \\
+      -H "X-Device-Id: nevera-01" \\
       -d '{"temperatura": 5.2, "humedad": 65, "lux": 150, "presion": 1013}'
     ```
 
     **Args:**
-    - datos: Objeto con temperatura, humedad, lux, presion (todos opcionales)
+    - datos: Objeto con device_id, secuencia, timestamp, temperatura, humedad, lux, presion (todos opcionales)
 
     **Returns:**
     - LEDResponseSchema con led_color y status message
     """
+    dispositivo = _resolver_dispositivo(datos.device_id, x_device_id)
+
+    lectura = {
+        'fecha': to_caracas_naive(datos.timestamp) if datos.timestamp else get_caracas_now(),
+        'secuencia': _secuencia(dispositivo, datos.secuencia),
+        'temperatura': datos.temperatura,
+        'humedad': datos.humedad,
+        'lux': datos.lux,
+        'presion': datos.presion
+    }
+    # Un registro por lectura: muestreado (LOG_MUESTREO) salvo en LOG_DEBUG
+    logger.info(
+        "📥 Datos recibidos del NodeMCU '%s'", dispositivo.device_id,
+        extra=campos(muestreo=True, dispositivo=dispositivo.device_id, **lectura)
+    )
+    color_led, sensores_fallados, procesados, encolada = await _procesar_lectura(lectura, dispositivo, session)
+
+    # Mensaje de estado para debugging (solo en la respuesta JSON)
+    status_msg = f"LED: {color_led.upper()}"
+    if sensores_fallados:
+        status_msg += f" | Sensores fallados: {', '.join(sensores_fallados)}"
+    if encolada:
+        status_msg += " | 1 dato(s) encolado(s)"
+    elif procesados:
+        status_msg += f" | {procesados} dato(s) procesado(s)"
+
+    logger.debug("📤 Respuesta al NodeMCU '%s': %s", dispositivo.device_id, status_msg)
+
+    return LEDResponseSchema(
+        led_color=color_led,
+        status=status_msg
+    )
+
+
+@router.post(
+    "/data.bin",
+    response_class=Response,
+    responses={200: {"content": {"application/octet-stream": {}}, "description": "1 byte: código del LED"}}
+)
+async def recibir_datos_nodemcu_binario(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session)
+) -> Response:
+    """
+    Variante binaria de POST /nodemcu/data para ESP8266.
+
+    El cuerpo es una trama fija de 26 bytes (ver schemas/nodemcu_binario.py)
+    con device_id, número de secuencia, timestamp y los cuatro sensores
+    escalados más una máscara de validez. La respuesta es 1 byte con el
+    código del LED: 0 = verde, 1 = amarillo, 2 = rojo.
+
+    Usa el mismo procesamiento que la ruta JSON (alertas, histéresis del LED,
+    INGEST_MODE=async).
+    """
     try:
-        logger.info(f"📥 Datos recibidos del NodeMCU: {datos.model_dump()}")
+        trama = decodificar_trama(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    dispositivo = device_registry.get(str(trama.device_id))
+    fecha = to_caracas_naive(trama.timestamp) if trama.timestamp else get_caracas_now()
+
+    lectura = {'fecha': fecha, 'secuencia': trama.secuencia, **trama.valores()}
+    color_led, _, _, _ = await _procesar_lectura(lectura, dispositivo, session)
+
+    return Response(content=bytes([CODIGOS_LED[color_led]]), media_type="application/octet-stream")
+
+
+async def _procesar_lectura(
+    lectura: dict,
+    dispositivo: SensorDataManager,
+    session: AsyncSession
+) -> tuple[str, list[str], int, bool]:
+    """
+    Procesamiento común de una lectura individual (JSON o binaria).
+
+    Con secuencia, un reintento (misma secuencia y mismos valores) que sigue
+    en la ventana de deduplicación del dispositivo devuelve la respuesta ya
+    enviada sin tocar la BD.
+
+    Con varios workers, el estado del dispositivo (sensores, histéresis del
+    LED) se toma en exclusiva del estado compartido antes de procesar y se
+    publica después: otro worker no procesa a la vez el mismo dispositivo.
 
+    Returns:
+        Tuple con color del LED, sensores fallados, datos guardados y si la
+        lectura quedó encolada (INGEST_MODE=async) en lugar de guardada
+    """
+    secuencia = lectura.get('secuencia')
+    huella = tuple(lectura[sensor] for sensor in SENSORES)
+    if secuencia is not None:
+        respuesta = dispositivo.respuesta_duplicada(secuencia, huella)
+        if respuesta is not None:
+            logger.info(
+                "🔁 Reintento de '%s' (secuencia %s) - Respuesta cacheada", dispositivo.device_id, secuencia,
+                extra=campos(f"reintento:{dispositivo.device_id}", dispositivo=dispositivo.device_id, secuencia=secuencia)
+            )
+            return respuesta
+
+    async with estado_compartido.dispositivo_exclusivo_async(dispositivo):
+        respuesta = await _procesar_lectura_nueva(lectura, dispositivo, session)
+    if secuencia is not None:
+        dispositivo.recordar_respuesta(secuencia, huella, respuesta)
+    return respuesta
+
+
+async def _procesar_lectura_nueva(
+    lectura: dict,
+    dispositivo: SensorDataManager,
+    session: AsyncSession
+) -> tuple[str, list[str], int, bool]:
+    if ingest_pipeline.activo:
+        # INGEST_MODE=async: encolar y responder con el estado en memoria
+        color_led, sensores_fallados = _encolar_lectura(lectura, dispositivo)
+        return color_led, sensores_fallados, 0, True
+
+    try:
         # ============================================================
         # PASO 1: Procesar datos entrantes
         # - Guardar en BD
         # - Generar alertas si corresponde
         # - Actualizar estado de sensores
         # ============================================================
-        datos_guardados, sensores_fallados = procesar_datos_entrantes(
-            temperatura=datos.temperatura,
-            humedad=datos.humedad,
-            lux=datos.lux,
-            presion=datos.presion,
-            session=session
+        datos_guardados, sensores_fallados = await procesar_datos_entrantes_async(
+            temperatura=lectura['temperatura'],
+            humedad=lectura['humedad'],
+            lux=lectura['lux'],
+            presion=lectura['presion'],
+            session=session,
+            dispositivo=dispositivo,
+            fecha=lectura['fecha'],
+            secuencia=lectura.get('secuencia')
         )
 
-        if sensores_fallados:
-            logger.warning(f"⚠️ Sensores fallados: {sensores_fallados}")
-
+        # Los sensores fallados ya los reporta procesar_datos_entrantes_async
         if datos_guardados:
-            logger.info(f"✅ {len(datos_guardados)} dato(s) guardado(s) en BD")
+            logger.debug("✅ %s dato(s) guardado(s) en BD", len(datos_guardados))
         else:
-            logger.warning("⚠️ No se guardaron datos (posible fallo total de NodeMCU)")
+            logger.warning(
+                "⚠️ No se guardaron datos (posible fallo total de NodeMCU)",
+                extra=campos(f"sin_datos_guardados:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+            )
 
         # ============================================================
         # PASO 2: Determinar color del LED
@@ -83,25 +244,110 @@ async def recibir_datos_nodemcu(
         # - Evaluar sensores fallados
         # - Evaluar umbrales de advertencia
         # ============================================================
-        sensor_data = {
-            'temperatura': datos.temperatura,
-            'humedad': datos.humedad,
-            'lux': datos.lux,
-            'presion': datos.presion
-        }
+        sensor_data = {sensor: lectura[sensor] for sensor in SENSORES}
 
-        color_led = determinar_color_led_solo(session, sensor_data)
+        color_led = await determinar_color_led_async(session, sensor_data, dispositivo)
+
+        return color_led, sensores_fallados, len(datos_guardados), False
+
+    except Exception as e:
+        logger.error("❌ Error procesando datos del NodeMCU '%s': %s", dispositivo.device_id, e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error interno procesando datos: {str(e)}"
+        )
+
+
+def _encolar_lectura(lectura: dict, dispositivo: SensorDataManager) -> tuple[str, list[str]]:
+    """
+    Camino de INGEST_MODE=async: actualiza el estado de sensores, encola la
+    lectura para el group-commit y responde sin esperar a la BD.
+    """
+    sensores_fallados = actualizar_estado_sensores(
+        lectura['temperatura'], lectura['humedad'], lectura['lux'], lectura['presion'], lectura['fecha'], dispositivo
+    )
+
+    lectura = {**lectura, 'id_dispositivo': dispositivo.device_id}
+    if not ingest_pipeline.enqueue(lectura, sensores_fallados, dispositivo):
+        logger.warning("⚠️ Cola de ingesta llena - Rechazando lectura", extra=campos("cola_llena"))
+        raise HTTPException(
+            status_code=503,
+            detail="Cola de ingesta llena, reintentar más tarde",
+            headers={"Retry-After": "1"}
+        )
+
+    return ingest_pipeline.color_led(lectura, dispositivo), sensores_fallados
+
+
+@router.post("/data/batch", response_model=LEDResponseSchema)
+async def recibir_lote_nodemcu(
+    lote: NodeMCUBatchSchema,
+    session: AsyncSession = Depends(get_async_session),
+    x_device_id: Optional[str] = Header(None)
+) -> LEDResponseSchema:
+    """
+    Recibe un lote de lecturas acumuladas por el NodeMCU y retorna el comando LED.
+
+    Pensado para que el dispositivo vacíe su buffer (ej: 60 lecturas) en un
+    solo POST. Todas las lecturas se guardan con un único INSERT, las alertas
+    se evalúan en orden temporal usando el timestamp de cada lectura y se hace
+    un solo commit. El color del LED se calcula con la lectura más reciente.
+
+    **Ejemplo de uso:**
+    ```bash
+    curl -X POST http://localhost:8000/nodemcu/data/batch \\
+      -H "Content-Type: application/json" \\
+      -d '{"lecturas": [{"timestamp": 1738451640, "temperatura": 5.2, "humedad": 65, "lux": 150, "presion": 1013}]}'
+    ```
+
+    **Returns:**
+    - LEDResponseSchema con led_color y status message
+    """
+    dispositivo = _resolver_dispositivo(lote.device_id, x_device_id)
+
+    try:
+        logger.info(
+            "📥 Lote recibido del NodeMCU '%s': %s lectura(s)", dispositivo.device_id, len(lote.lecturas),
+            extra=campos(muestreo=True, dispositivo=dispositivo.device_id, lecturas=len(lote.lecturas))
+        )
+
+        lecturas = [
+            {
+                'fecha': to_caracas_naive(lectura.timestamp),
+                'secuencia': _secuencia(dispositivo, lectura.secuencia),
+                'temperatura': lectura.temperatura,
+                'humedad': lectura.humedad,
+                'lux': lectura.lux,
+                'presion': lectura.presion
+            }
+            for lectura in lote.lecturas
+        ]
+
+        async with estado_compartido.dispositivo_exclusivo_async(dispositivo):
+            # El lote reutiliza la lógica síncrona (INSERT multi-fila + alertas en
+            # memoria) sobre la sesión async, sin bloquear el event loop
+            ids_guardados, sensores_fallados = await session.run_sync(
+                lambda sync_session: procesar_lote_entrante(lecturas, session=sync_session, dispositivo=dispositivo)
+            )
+
+            if sensores_fallados:
+                logger.warning(
+                    "⚠️ Sensores fallados en '%s': %s", dispositivo.device_id, sensores_fallados,
+                    extra=campos(f"sensores_fallados:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+                )
+
+            # El LED refleja la lectura más reciente del lote
+            ultima = max(lecturas, key=lambda lectura: lectura['fecha'])
+            sensor_data = {sensor: ultima[sensor] for sensor in SENSORES}
+
+            color_led = await determinar_color_led_async(session, sensor_data, dispositivo)
 
-        # ============================================================
-        # PASO 3: Retornar respuesta al NodeMCU
-        # ============================================================
         status_msg = f"LED: {color_led.upper()}"
         if sensores_fallados:
             status_msg += f" | Sensores fallados: {', '.join(sensores_fallados)}"
-        if datos_guardados:
-            status_msg += f" | {len(datos_guardados)} dato(s) procesado(s)"
+        status_msg += f" | {len(ids_guardados)}/{len(lecturas)} dato(s) procesado(s)"
 
-        logger.info(f"📤 Respuesta al NodeMCU: {status_msg}")
+        logger.debug("📤 Respuesta al NodeMCU '%s': %s", dispositivo.device_id, status_msg)
 
         return LEDResponseSchema(
             led_color=color_led,
@@ -109,13 +355,129 @@ async def recibir_datos_nodemcu(
         )
 
     except Exception as e:
-        logger.error(f"❌ Error procesando datos del NodeMCU: {str(e)}")
+        logger.error("❌ Error procesando lote del NodeMCU '%s': %s", dispositivo.device_id, e)
         raise HTTPException(
             status_code=500,
-            detail=f"Error interno procesando datos: {str(e)}"
+            detail=f"Error interno procesando lote: {str(e)}"
         )
 
 
+@router.get("/dispositivos", response_model=List[DispositivoSchema])
+async def listar_dispositivos() -> List[DispositivoSchema]:
+    """
+    Lista los NodeMCU conocidos con su estado en memoria: producto asociado,
+    último color de LED, sensores fallados y última lectura.
+    """
+    return [_dispositivo_a_schema(dispositivo) for dispositivo in device_registry.listar()]
+
+
+@router.put("/dispositivos/{device_id}/producto", response_model=DispositivoSchema)
+async def asignar_producto_dispositivo(
+    device_id: str,
+    asignacion: AsignacionDispositivoSchema,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user)
+) -> DispositivoSchema:
+    """
+    Asocia un NodeMCU a un ProductoMonitoreado.
+
+    Con id_producto_monitoreado = null el dispositivo reporta al monitoreo
+    activo (comportamiento por defecto). Si se asocia a un producto que no es
+    el activo, sus lecturas no se guardan ni generan alertas.
+    """
+    if len(device_id) > MAX_LONGITUD_DEVICE_ID:
+        raise HTTPException(status_code=422, detail="device_id demasiado largo")
+    if asignacion.id_producto_monitoreado is not None:
+        if not await session.get(ProductoMonitoreado, asignacion.id_producto_monitoreado):
+            raise HTTPException(status_code=404, detail="Producto monitoreado no encontrado")
+
+    async with estado_compartido.dispositivo_exclusivo_async(device_registry.get(device_id)):
+        dispositivo = device_registry.asignar_producto(device_id, asignacion.id_producto_monitoreado)
+    logger.info(f"🔗 NodeMCU '{device_id}' asociado a producto monitoreado {asignacion.id_producto_monitoreado}")
+    return _dispositivo_a_schema(dispositivo)
+
+
+def _dispositivo_a_schema(dispositivo: SensorDataManager) -> DispositivoSchema:
+    with dispositivo.lock:
+        return DispositivoSchema(
+            device_id=dispositivo.device_id,
+            id_producto_monitoreado=dispositivo.id_producto_monitoreado,
+            led_color=dispositivo.ultimo_color_led,
+            sensores_fallados=dispositivo.sensor_status.get_failed_sensors(),
+            ultima_lectura=dispositivo.last_sensor_data
+        )
+
+
+@router.get(
+    "/latest",
+    response_model=UltimaLecturaSchema,
+    responses={304: {"description": "La última lectura no cambió desde el ETag enviado en If-None-Match"}}
+)
+async def ultima_lectura(
+    device_id: Optional[str] = None,
+    x_device_id: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Última lectura de un NodeMCU para mostrar el valor "actual" sin pedir
+    series: valores, si está fresca, estado de cada sensor y color del LED.
+    Sale del estado en memoria del dispositivo, sin consultar la BD.
+
+    La respuesta trae un ETag que cambia con cada lectura recibida, con el
+    color del LED, con el producto asociado y cuando la lectura deja de
+    estar fresca. Enviándolo en
+    If-None-Match, un sondeo sin cambios recibe 304 sin cuerpo.
+    """
+    device_id = device_id or x_device_id
+    dispositivo = device_registry.buscar(device_id)
+    if dispositivo is None:
+        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+
+    with dispositivo.lock:
+        lectura = dispositivo.last_sensor_data or {}
+        version = dispositivo.version_lectura
+        epoca = dispositivo.epoca
+        fresca = dispositivo.is_sensor_data_fresh()
+        led_color = dispositivo.ultimo_color_led
+        estado = dispositivo.sensor_status
+        sensores = {sensor: getattr(estado, f"{sensor}_ok") for sensor in SENSORES}
+        id_producto_monitoreado = dispositivo.id_producto_monitoreado
+
+    etag = f'"{epoca}-{version}-{id_producto_monitoreado or 0}-{led_color}-{int(fresca)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _coincide_etag(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    cuerpo = UltimaLecturaSchema(
+        device_id=dispositivo.device_id,
+        id_producto_monitoreado=id_producto_monitoreado,
+        version=version,
+        fecha=lectura.get('timestamp'),
+        fresca=fresca,
+        sensores=sensores,
+        led_color=led_color,
+        **{sensor: lectura.get(sensor) for sensor in SENSORES}
+    )
+    return Response(content=cuerpo.model_dump_json(), media_type="application/json", headers=headers)
+
+
+def _coincide_etag(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match: "*" o una lista de ETags (comparación débil, ignora W/)"""
+    if not if_none_match:
+        return False
+    candidatos = {candidato.strip().removeprefix("W/") for candidato in if_none_match.split(",")}
+    return "*" in candidatos or etag in candidatos
+
+
+@router.get("/ingest/metrics")
+async def metricas_ingesta():
+    """
+    Métricas del pipeline de ingesta (profundidad de cola, lecturas escritas,
+    rechazadas por cola llena, duración del último group-commit, etc.).
+    """
+    return ingest_pipeline.metrics()
+
+
 @router.get("/health")
 async def health_check():
     """
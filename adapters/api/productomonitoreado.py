@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
-from adapters.db.sqlmodel_database import get_session
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from adapters.db.sqlmodel_database import engine, get_session
 from core.models.productomonitoreado import ProductoMonitoreado
 from core.models.productomonitoreadodetallado import ProductoMonitoreadoDetallado
+from core.models.kpimonitoreo_read import KpiMonitoreoRead
 from datetime import datetime 
 from dependencies import get_registro, get_current_user
 from sqlmodel import Session
@@ -15,6 +18,9 @@ from core.repositories.producto_monitoreado_repository import (
     stop_producto_monitoreado,
     get_producto_monitoreado_detalle
 )
+from core.repositories.kpi_monitoreo_repository import get_kpis
+from services.eventos_hub import TEMA_ALERTAS, hub_eventos, tema_sesion
+from services.exportacion_service import ExportacionNoDisponible, EXTENSIONES, TIPOS_CONTENIDO, exportar_sesion
 
 router = APIRouter()
 
@@ -99,6 +105,12 @@ def detener_monitoreo(
     
     if not db_producto:
         raise HTTPException(status_code=404, detail="Producto monitoreado no encontrado")
+
+    # Las alertas que cerró la detención ya se publicaron al confirmarse (índice de pendientes)
+    hub_eventos.publicar((tema_sesion(producto_id), TEMA_ALERTAS), "sesion_finalizada", {
+        "id_producto_monitoreado": producto_id,
+        "fecha_finalizacion_monitoreo": db_producto.fecha_finalizacion_monitoreo,
+    })
     
     # Obtener detalles actualizados
     db_productos = get_productos_monitoreados(session)
@@ -107,4 +119,44 @@ def detener_monitoreo(
     if not producto_detallado:
         raise HTTPException(status_code=500, detail="Error al obtener detalles actualizados")
     
-    return producto_detallado
\ No newline at end of file
+    return producto_detallado
+
+@router.get("/productosmonitoreados/{id}/kpis", response_model=KpiMonitoreoRead)
+def obtener_kpis_producto_monitoreado(id: int, session: Session = Depends(get_session)):
+    """
+    Indicadores de cumplimiento de la sesión: Mean Kinetic Temperature,
+    mínimo / máximo / promedio ponderado por tiempo y minutos fuera de rango
+    de cada parámetro. Los acumula la ingesta, así que se leen de una fila
+    sin importar el largo de la sesión. 409 mientras se reconstruyen.
+    """
+    if session.get(ProductoMonitoreado, id) is None:
+        raise HTTPException(status_code=404, detail="Producto monitoreado no encontrado")
+    kpis = get_kpis(session, id)
+    if kpis is None:
+        raise HTTPException(status_code=409, detail="Indicadores en cálculo, intente nuevamente en unos minutos")
+    return kpis
+
+@router.get("/productosmonitoreados/{id}/export")
+def exportar_producto_monitoreado(
+    id: int,
+    formato: Literal["parquet", "arrow"] = Query("parquet", alias="format"),
+    tabla: Literal["lecturas", "alertas"] = "lecturas"
+):
+    """
+    Lecturas o alertas de la sesión como Parquet o Arrow IPC stream
+    (columnas tipadas) para pandas/polars. Se genera una vez por cada
+    última lectura y se sirve desde la caché en disco.
+    """
+    try:
+        ruta = exportar_sesion(engine, id, tabla, formato)
+    except ExportacionNoDisponible as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Producto monitoreado no encontrado")
+
+    return FileResponse(
+        ruta,
+        media_type=TIPOS_CONTENIDO[formato],
+        filename=f"productomonitoreado_{id}_{tabla}.{EXTENSIONES[formato]}"
+    )
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from adapters.db.sqlmodel_database import get_session
 from core.models.registro import Registro
 from core.repositories.registro_repository import (
@@ -8,5 +9,9 @@ from core.repositories.registro_repository import (
 router = APIRouter()
 
 @router.get("/registros/", response_model=list[Registro])
-def listar_registros(session=Depends(get_session)):
-    return get_registros(session)
+def listar_registros(
+    entidad: Optional[str] = None,
+    limite: Optional[int] = Query(None, ge=1),
+    session=Depends(get_session)
+):
+    return get_registros(session, entidad, limite)
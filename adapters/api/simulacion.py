@@ -13,6 +13,10 @@ from core.models.productofarmaceutico import ProductoFarmaceutico
 from core.models.productomonitoreado import ProductoMonitoreado
 from core.models.datomonitoreo import DatoMonitoreo
 from core.models.alerta import Alerta, EstadoAlerta
+from core.repositories.contexto_monitoreo_repository import invalidar_contexto
+from core.repositories.indice_alertas_pendientes import indice_alertas
+from core.repositories.lecturas_recientes import lecturas_recientes
+from core.repositories import agregado_monitoreo_repository, archivo_monitoreo_repository, kpi_monitoreo_repository
 
 router = APIRouter(prefix="/simulacion", tags=["Simulacion - TEMPORAL - v4"])
 
@@ -58,6 +62,9 @@ async def ejecutar_simulacion_insulina(session: Session = Depends(get_session)):
 
                 # Borrar datos de monitoreo (DELETE directo)
                 session.exec(delete(DatoMonitoreo).where(DatoMonitoreo.id_producto_monitoreado.in_(pm_ids)))
+                agregado_monitoreo_repository.eliminar_agregados(session, pm_ids)
+                kpi_monitoreo_repository.eliminar_kpis(session, pm_ids)
+                archivo_monitoreo_repository.eliminar_archivos(session, pm_ids)
 
                 # Borrar productos monitoreados
                 session.exec(delete(ProductoMonitoreado).where(ProductoMonitoreado.id.in_(pm_ids)))
@@ -131,6 +138,7 @@ async def ejecutar_simulacion_insulina(session: Session = Depends(get_session)):
         )
         session.add(producto_monitoreado)
         session.commit()
+        invalidar_contexto()
         session.refresh(producto_monitoreado)
 
         # =====================================================================
@@ -143,6 +151,7 @@ async def ejecutar_simulacion_insulina(session: Session = Depends(get_session)):
         fecha_actual = fecha_inicio
         registros_creados = 0
         dato_alerta_id = None
+        datos_creados = []
 
         # Fechas del evento de alerta
         fecha_alerta_inicio = datetime(2026, 2, 3, 14, 23, 32, tzinfo=VENEZUELA_TZ)
@@ -215,9 +224,12 @@ async def ejecutar_simulacion_insulina(session: Session = Depends(get_session)):
             if fecha_actual == fecha_alerta_inicio:
                 dato_alerta_id = dato.id
 
+            datos_creados.append(dato)
             registros_creados += 1
             fecha_actual += intervalo
 
+        # Agregados por minuto/hora/día para los gráficos
+        agregado_monitoreo_repository.actualizar_agregados(session, datos_creados)
         session.commit()
 
         # =====================================================================
@@ -248,6 +260,11 @@ async def ejecutar_simulacion_insulina(session: Session = Depends(get_session)):
         alerta.duracion_minutos = round(duracion_segundos / 60, 2)
         session.commit()
 
+        # Se borraron alertas con DELETE directo: reconstruir el índice de pendientes
+        indice_alertas.cargar(session)
+        # Y las lecturas recientes (se borraron monitoreos y hay uno nuevo con datos)
+        lecturas_recientes.cargar(session)
+
         return {
             "status": "success",
             "message": f"✅ Simulación completada con éxito. Se generaron {registros_creados} registros de monitoreo para 'Insulina Humana'."
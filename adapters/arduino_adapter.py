@@ -5,11 +5,17 @@ Arquitectura actual:
 - NodeMCU envía datos al backend vía POST /nodemcu/data
 - Backend recibe datos y actualiza estado de sensores
 - No se hacen peticiones HTTP salientes desde el backend
+- Cada dispositivo (device_id en el payload o header X-Device-Id) tiene su
+  propio estado en device_registry; sensor_manager es el dispositivo por defecto
 """
 import random
+import secrets
+import time
 import asyncio
 import aiohttp
 from datetime import datetime
+from collections import OrderedDict
+from threading import Lock
 from typing import Optional
 from sqlmodel import select
 from core.models.condicionalmacenamiento import CondicionAlmacenamiento
@@ -17,6 +23,13 @@ from core.models.productomonitoreado import ProductoMonitoreado
 from core.models.datomonitoreo import DatoMonitoreo
 from core.models.productofarmaceutico import ProductoFarmaceutico
 from core.utils.datetime_utils import get_caracas_now
+from config import Config
+
+
+# Dispositivo usado cuando el NodeMCU no envía device_id (firmware anterior)
+DISPOSITIVO_POR_DEFECTO = "default"
+
+SENSORES_ESTADO = ('temperatura', 'humedad', 'lux', 'presion')
 
 
 class SensorStatus:
@@ -42,13 +55,90 @@ class SensorStatus:
 
 
 class SensorDataManager:
-    def __init__(self, nodemcu_ip: str = None, use_real_data: bool = True):
+    def __init__(self, nodemcu_ip: str = None, use_real_data: bool = True, device_id: str = None):
+        self.device_id = device_id or DISPOSITIVO_POR_DEFECTO
         self.nodemcu_ip = nodemcu_ip
         self.use_real_data = use_real_data
         self.last_sensor_data = None
+        self.version_lectura = 0  # Lecturas recibidas (ETag de GET /nodemcu/latest)
+        # Identifica la "vida" de version_lectura: cambia si el contador
+        # vuelve a empezar (reinicio, estado compartido perdido)
+        self.epoca = secrets.token_hex(4)
         self.sensor_timeout = 30  # segundos
         self.sensor_status = SensorStatus()  # Rastrear estado individual
 
+        # Histéresis del LED de este dispositivo
+        self.ultimo_color_led = "verde"
+        self.modo_alerta_activo = False  # Bloquea cambios si hay alerta activa
+
+        # ProductoMonitoreado al que reporta (None = el monitoreo activo)
+        self.id_producto_monitoreado: Optional[int] = None
+
+        # Serializa actualizaciones de estado de este dispositivo sin
+        # bloquear a los demás
+        self.lock = Lock()
+
+        # Ventana de deduplicación: secuencia → (huella, respuesta ya enviada, instante) (LRU)
+        self.tamano_ventana_dedup = Config.DEDUP_VENTANA
+        self.segundos_ventana_dedup = Config.DEDUP_VENTANA_SEGUNDOS
+        self._respuestas_por_secuencia: OrderedDict = OrderedDict()
+
+    def respuesta_duplicada(self, secuencia: int, huella: tuple):
+        """
+        Respuesta ya enviada para esta secuencia (reintento del NodeMCU), o None.
+
+        Un reintento repite la lectura: solo cuenta si la huella (valores de
+        la lectura) coincide y llegó dentro de DEDUP_VENTANA_SEGUNDOS. Tras un
+        reinicio el contador vuelve a empezar con lecturas distintas, que no
+        se descartan.
+        """
+        with self.lock:
+            recordada = self._respuestas_por_secuencia.get(secuencia)
+            if recordada is None:
+                return None
+            huella_recordada, respuesta, instante = recordada
+            if huella_recordada != huella or time.monotonic() - instante > self.segundos_ventana_dedup:
+                return None
+            self._respuestas_por_secuencia.move_to_end(secuencia)
+            return respuesta
+
+    def recordar_respuesta(self, secuencia: int, huella: tuple, respuesta) -> None:
+        """Guarda la respuesta de una secuencia, descartando las más antiguas"""
+        with self.lock:
+            self._respuestas_por_secuencia[secuencia] = (huella, respuesta, time.monotonic())
+            self._respuestas_por_secuencia.move_to_end(secuencia)
+            while len(self._respuestas_por_secuencia) > self.tamano_ventana_dedup:
+                self._respuestas_por_secuencia.popitem(last=False)
+
+    def exportar_estado(self) -> dict:
+        """
+        Estado compartible entre workers (JSON): sensores, última lectura,
+        histéresis del LED y producto asociado. Llamar con self.lock tomado.
+        """
+        ultima = self.last_sensor_data
+        return {
+            'device_id': self.device_id,
+            'sensores': {sensor: getattr(self.sensor_status, f"{sensor}_ok") for sensor in SENSORES_ESTADO},
+            'ultima_lectura': {**ultima, 'timestamp': ultima['timestamp'].isoformat()} if ultima else None,
+            'ultimo_color_led': self.ultimo_color_led,
+            'modo_alerta_activo': self.modo_alerta_activo,
+            'id_producto_monitoreado': self.id_producto_monitoreado,
+            'version_lectura': self.version_lectura,
+            'epoca': self.epoca,
+        }
+
+    def importar_estado(self, estado: dict) -> None:
+        """Reemplaza el estado local por uno exportado (por otro worker). Llamar con self.lock tomado"""
+        for sensor, ok in estado['sensores'].items():
+            setattr(self.sensor_status, f"{sensor}_ok", ok)
+        ultima = estado['ultima_lectura']
+        self.last_sensor_data = {**ultima, 'timestamp': datetime.fromisoformat(ultima['timestamp'])} if ultima else None
+        self.ultimo_color_led = estado['ultimo_color_led']
+        self.modo_alerta_activo = estado['modo_alerta_activo']
+        self.id_producto_monitoreado = estado['id_producto_monitoreado']
+        self.version_lectura = estado['version_lectura']
+        self.epoca = estado['epoca']
+
     async def get_sensor_data(self) -> Optional[dict]:
         """
         Obtiene datos del sensor NodeMCU via HTTP.
@@ -127,6 +217,66 @@ class SensorDataManager:
         }
 
 
+class DeviceRegistry:
+    """
+    Registro de dispositivos NodeMCU: un SensorDataManager por device_id.
+
+    El lock del registro solo protege el alta y el orden de uso; el estado
+    de cada dispositivo se protege con su propio lock, así los POST de
+    dispositivos distintos no compiten entre sí.
+
+    Cualquier POST puede dar de alta un device_id, así que el registro
+    guarda como máximo `capacidad` dispositivos: al superarla se olvida el
+    usado hace más tiempo, salvo el dispositivo por defecto y los asociados
+    a un producto (asignar_producto, que requiere usuario autenticado).
+    """
+    def __init__(self, dispositivo_por_defecto: SensorDataManager, capacidad: int = Config.DISPOSITIVOS_MAXIMO):
+        self.capacidad = capacidad
+        self._dispositivos: OrderedDict[str, SensorDataManager] = OrderedDict(
+            {dispositivo_por_defecto.device_id: dispositivo_por_defecto}
+        )
+        self._lock = Lock()
+
+    def get(self, device_id: Optional[str] = None) -> SensorDataManager:
+        """Retorna el estado del dispositivo, creándolo en su primer POST"""
+        device_id = device_id or DISPOSITIVO_POR_DEFECTO
+        with self._lock:
+            dispositivo = self._dispositivos.get(device_id)
+            if dispositivo is None:
+                dispositivo = self._dispositivos[device_id] = SensorDataManager(device_id=device_id)
+                self._desalojar()
+            else:
+                self._dispositivos.move_to_end(device_id)
+        return dispositivo
+
+    def _desalojar(self) -> None:
+        """Olvida los dispositivos menos usados que excedan la capacidad (con el lock tomado)"""
+        exceso = len(self._dispositivos) - self.capacidad
+        if exceso <= 0:
+            return
+        candidatos = [
+            device_id for device_id, dispositivo in self._dispositivos.items()
+            if device_id != DISPOSITIVO_POR_DEFECTO and dispositivo.id_producto_monitoreado is None
+        ]
+        for device_id in candidatos[:exceso]:
+            del self._dispositivos[device_id]
+
+    def buscar(self, device_id: Optional[str] = None) -> Optional[SensorDataManager]:
+        """Como get, pero sin dar de alta dispositivos desconocidos (consultas)"""
+        return self._dispositivos.get(device_id or DISPOSITIVO_POR_DEFECTO)
+
+    def listar(self) -> list[SensorDataManager]:
+        with self._lock:
+            return list(self._dispositivos.values())
+
+    def asignar_producto(self, device_id: str, id_producto_monitoreado: Optional[int]) -> SensorDataManager:
+        """Asocia el dispositivo a un ProductoMonitoreado (None = el monitoreo activo)"""
+        dispositivo = self.get(device_id)
+        with dispositivo.lock:
+            dispositivo.id_producto_monitoreado = id_producto_monitoreado
+        return dispositivo
+
+
 # Instancia global del gestor de sensores
 import os
 from dotenv import load_dotenv
@@ -137,3 +287,6 @@ sensor_manager = SensorDataManager(
     nodemcu_ip=os.getenv("NODEMCU_IP", "192.168.0.117"),
     use_real_data=os.getenv("USE_REAL_SENSORS", "true").lower() == "true"
 )
+
+# Registro de todos los dispositivos (sensor_manager es el dispositivo por defecto)
+device_registry = DeviceRegistry(sensor_manager)
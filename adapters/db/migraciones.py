@@ -0,0 +1,138 @@
+"""
+Migraciones versionadas del esquema.
+
+create_all solo crea las tablas que faltan: los cambios sobre tablas ya
+desplegadas (columnas, índices) van aquí como migraciones numeradas.
+
+- Cada migración corre en su propia transacción y se registra en
+  schema_version; migrar() aplica las pendientes en orden. Se llama desde
+  init_db al arrancar y con `python manage.py migrar`.
+- En PostgreSQL se toma un advisory lock: si arrancan varias instancias a
+  la vez, solo una migra y las demás esperan y encuentran todo aplicado.
+- Las migraciones son idempotentes (IF NOT EXISTS / checkfirst): en una BD
+  nueva create_all ya creó lo que declaran los modelos y solo se registra
+  la versión.
+
+Para agregar una: una función (conn) -> None y una entrada al final de
+MIGRACIONES con el número siguiente. Nunca se renumeran ni se editan las
+ya publicadas.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+logger = logging.getLogger(__name__)
+
+# Evita que dos instancias apliquen la misma migración a la vez
+CLAVE_LOCK_MIGRACIONES = 727002
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("descripcion", String(255), nullable=False),
+    Column("fecha_aplicada", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migracion:
+    version: int
+    descripcion: str
+    aplicar: Callable[[Connection], None]
+
+
+def _columnas_secuencia(conn: Connection) -> None:
+    """Columnas id_dispositivo / secuencia de datomonitoreo y su índice único (reintentos del NodeMCU)"""
+    inspector = inspect(conn)
+    columnas = {columna["name"] for columna in inspector.get_columns("datomonitoreo")}
+    unicos = {restriccion["name"] for restriccion in inspector.get_unique_constraints("datomonitoreo")}
+    indices = {indice["name"] for indice in inspector.get_indexes("datomonitoreo")}
+
+    if "id_dispositivo" not in columnas:
+        conn.execute(text("ALTER TABLE datomonitoreo ADD COLUMN id_dispositivo VARCHAR(64)"))
+    if "secuencia" not in columnas:
+        conn.execute(text("ALTER TABLE datomonitoreo ADD COLUMN secuencia BIGINT"))
+    if not {"uq_datomonitoreo_dispositivo_secuencia"} & (unicos | indices):
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_datomonitoreo_dispositivo_secuencia "
+            "ON datomonitoreo (id_dispositivo, secuencia, fecha)"
+        ))
+
+
+def _columna_pendiente_kpis(conn: Connection) -> None:
+    """Columna pendiente de kpimonitoreo (indicadores a reconstruir)"""
+    columnas = {columna["name"] for columna in inspect(conn).get_columns("kpimonitoreo")}
+    if "pendiente" not in columnas:
+        conn.execute(text("ALTER TABLE kpimonitoreo ADD COLUMN pendiente BOOLEAN NOT NULL DEFAULT FALSE"))
+
+
+def _indice_del_modelo(tabla: str, nombre: str) -> Callable[[Connection], None]:
+    """Crea (si falta) un índice declarado en __table_args__ del modelo"""
+    def aplicar(conn: Connection) -> None:
+        indice = next(indice for indice in SQLModel.metadata.tables[tabla].indexes if indice.name == nombre)
+        indice.create(conn, checkfirst=True)
+    return aplicar
+
+
+MIGRACIONES = (
+    Migracion(1, "datomonitoreo: id_dispositivo, secuencia y uq_datomonitoreo_dispositivo_secuencia",
+              _columnas_secuencia),
+    # Keyset (fecha, id) por producto; sirve también el orden fecha DESC (recorrido inverso)
+    Migracion(2, "datomonitoreo: ix_datomonitoreo_producto_fecha (id_producto_monitoreado, fecha, id)",
+              _indice_del_modelo("datomonitoreo", "ix_datomonitoreo_producto_fecha")),
+    Migracion(3, "alerta: ix_alerta_pendientes parcial (estado = 'PENDIENTE')",
+              _indice_del_modelo("alerta", "ix_alerta_pendientes")),
+    Migracion(4, "productomonitoreado: ix_productomonitoreado_activos parcial (sin fecha de finalización)",
+              _indice_del_modelo("productomonitoreado", "ix_productomonitoreado_activos")),
+    Migracion(5, "registro: ix_registro_entidad_fecha (entidad_afectada, fecha)",
+              _indice_del_modelo("registro", "ix_registro_entidad_fecha")),
+    Migracion(6, "kpimonitoreo: pendiente", _columna_pendiente_kpis),
+)
+
+
+def versiones_aplicadas(conn: Connection) -> set[int]:
+    if not inspect(conn).has_table(schema_version.name):
+        return set()
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def pendientes(engine: Engine) -> list[Migracion]:
+    with engine.connect() as conn:
+        aplicadas = versiones_aplicadas(conn)
+    return [migracion for migracion in MIGRACIONES if migracion.version not in aplicadas]
+
+
+def migrar(engine: Engine, hasta: Optional[int] = None) -> list[int]:
+    """
+    Aplica las migraciones pendientes (hasta la versión `hasta`, inclusive).
+    Las tablas deben existir (create_all / preparar_datomonitoreo antes).
+
+    Returns:
+        Versiones aplicadas en esta llamada
+    """
+    schema_version.create(engine, checkfirst=True)
+    es_postgres = engine.dialect.name == "postgresql"
+
+    aplicadas = []
+    for migracion in MIGRACIONES:
+        if hasta is not None and migracion.version > hasta:
+            break
+        with engine.begin() as conn:
+            if es_postgres:
+                conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": CLAVE_LOCK_MIGRACIONES})
+            if migracion.version in versiones_aplicadas(conn):
+                continue
+            migracion.aplicar(conn)
+            conn.execute(schema_version.insert().values(
+                version=migracion.version,
+                descripcion=migracion.descripcion,
+                fecha_aplicada=datetime.utcnow(),
+            ))
+        aplicadas.append(migracion.version)
+        logger.info("🧱 Migración %s aplicada: %s", migracion.version, migracion.descripcion)
+    return aplicadas
@@ -0,0 +1,256 @@
+"""
+Particionado mensual de datomonitoreo por fecha (solo PostgreSQL).
+
+- datomonitoreo es una tabla particionada por RANGE (fecha) con una
+  partición por mes (datomonitoreo_pAAAAMM) y una partición DEFAULT para
+  lecturas fuera de rango (ej: timestamps erróneos del NodeMCU).
+- La PK es (id, fecha) y la unicidad de reintentos es (id_dispositivo,
+  secuencia, fecha): PostgreSQL exige que toda clave única incluya la
+  columna de partición. Por lo mismo alerta.id_dato_monitoreo no tiene FK
+  en PostgreSQL (ver core/models/alerta.py).
+- mantener_particiones() crea las particiones de los próximos
+  PARTICIONES_MESES_ADELANTE meses y separa (DETACH) o elimina (DROP) las
+  más antiguas que PARTICIONES_RETENCION_MESES. Se ejecuta al arrancar y
+  cada PARTICIONES_INTERVALO_HORAS.
+
+Las consultas de dato_monitoreo_repository siempre llevan un predicado de
+fecha para que el planificador descarte particiones (partition pruning).
+
+En SQLite todo esto es un no-op: la tabla se crea sin particionar con
+create_all.
+"""
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from config import Config
+from core.utils.datetime_utils import get_caracas_now
+
+logger = logging.getLogger(__name__)
+
+TABLA = "datomonitoreo"
+TABLA_SIN_PARTICIONAR = "datomonitoreo_sin_particionar"
+PARTICION_DEFAULT = "datomonitoreo_default"
+PATRON_PARTICION = re.compile(r"^datomonitoreo_p(\d{4})(\d{2})$")
+
+# Evita que dos workers creen/eliminen particiones a la vez
+CLAVE_LOCK_MANTENIMIENTO = 727001
+
+COLUMNAS = (
+    "id", "id_producto_monitoreado", "fecha", "temperatura", "humedad",
+    "lux", "presion", "id_dispositivo", "secuencia",
+)
+
+DDL_TABLA_PARTICIONADA = f"""
+CREATE TABLE {TABLA} (
+    id INTEGER NOT NULL DEFAULT nextval('datomonitoreo_id_seq'),
+    id_producto_monitoreado INTEGER NOT NULL REFERENCES productomonitoreado (id),
+    fecha TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    temperatura DOUBLE PRECISION NOT NULL,
+    humedad DOUBLE PRECISION NOT NULL,
+    lux DOUBLE PRECISION NOT NULL,
+    presion DOUBLE PRECISION NOT NULL,
+    id_dispositivo VARCHAR(64),
+    secuencia BIGINT,
+    CONSTRAINT datomonitoreo_pkey PRIMARY KEY (id, fecha),
+    CONSTRAINT uq_datomonitoreo_dispositivo_secuencia UNIQUE (id_dispositivo, secuencia, fecha)
+) PARTITION BY RANGE (fecha)
+"""
+
+
+def es_postgres(engine: Engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def inicio_mes(fecha: date) -> date:
+    return date(fecha.year, fecha.month, 1)
+
+
+def sumar_meses(mes: date, meses: int) -> date:
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def nombre_particion(mes: date) -> str:
+    return f"{TABLA}_p{mes.year:04d}{mes.month:02d}"
+
+
+def esta_particionada(conn: Connection) -> bool:
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:tabla))"),
+        {"tabla": TABLA}
+    ).scalar()
+
+
+def preparar_datomonitoreo(engine: Engine) -> None:
+    """
+    Deja datomonitoreo particionada (init_db, después de crear el resto de
+    tablas): la crea si no existe o convierte la tabla anterior sin
+    particionar, y luego crea las particiones próximas.
+    """
+    if not es_postgres(engine):
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": CLAVE_LOCK_MANTENIMIENTO})
+        if not inspect(conn).has_table(TABLA):
+            _crear_tabla_particionada(conn)
+            logger.info("🗂️ Tabla datomonitoreo creada con particiones mensuales")
+        elif not esta_particionada(conn):
+            _convertir_a_particionada(conn)
+
+    mantener_particiones(engine)
+
+
+def _crear_tabla_particionada(conn: Connection) -> None:
+    conn.execute(text("CREATE SEQUENCE IF NOT EXISTS datomonitoreo_id_seq"))
+    conn.execute(text(DDL_TABLA_PARTICIONADA))
+    conn.execute(text(f"ALTER SEQUENCE datomonitoreo_id_seq OWNED BY {TABLA}.id"))
+    # Los índices en la tabla padre se crean en cada partición
+    # (fecha, id): orden y cursor de la paginación por keyset
+    conn.execute(text(f"CREATE INDEX ix_datomonitoreo_fecha ON {TABLA} (fecha, id)"))
+    conn.execute(text(f"CREATE INDEX ix_datomonitoreo_producto_fecha ON {TABLA} (id_producto_monitoreado, fecha, id)"))
+    conn.execute(text(f"CREATE TABLE {PARTICION_DEFAULT} PARTITION OF {TABLA} DEFAULT"))
+
+
+def _convertir_a_particionada(conn: Connection) -> None:
+    """
+    Migra una datomonitoreo existente sin particionar (una sola vez, dentro
+    de la transacción de arranque): renombra la tabla, crea la particionada,
+    copia las filas conservando id y secuencia, y borra la anterior.
+    """
+    columnas_existentes = {columna["name"] for columna in inspect(conn).get_columns(TABLA)}
+    columnas = ", ".join(columna for columna in COLUMNAS if columna in columnas_existentes)
+
+    # La FK de alerta apunta a datomonitoreo.id, que deja de ser única por sí sola
+    conn.execute(text("ALTER TABLE alerta DROP CONSTRAINT IF EXISTS alerta_id_dato_monitoreo_fkey"))
+    # La secuencia del id se conserva para la tabla nueva
+    conn.execute(text("ALTER SEQUENCE IF EXISTS datomonitoreo_id_seq OWNED BY NONE"))
+    conn.execute(text(f"ALTER TABLE {TABLA} RENAME TO {TABLA_SIN_PARTICIONAR}"))
+    # Los nombres de índices son únicos por esquema: liberar los de la tabla anterior
+    conn.execute(text(f"ALTER TABLE {TABLA_SIN_PARTICIONAR} RENAME CONSTRAINT datomonitoreo_pkey TO {TABLA_SIN_PARTICIONAR}_pkey"))
+    conn.execute(text(f"ALTER TABLE {TABLA_SIN_PARTICIONAR} DROP CONSTRAINT IF EXISTS uq_datomonitoreo_dispositivo_secuencia"))
+    for indice in (
+        "uq_datomonitoreo_dispositivo_secuencia", "ix_datomonitoreo_fecha",
+        "ix_datomonitoreo_id_producto_monitoreado", "ix_datomonitoreo_producto_fecha",
+    ):
+        conn.execute(text(f"DROP INDEX IF EXISTS {indice}"))
+
+    _crear_tabla_particionada(conn)
+
+    primera, ultima = conn.execute(text(f"SELECT MIN(fecha), MAX(fecha) FROM {TABLA_SIN_PARTICIONAR}")).one()
+    if primera is not None:
+        mes = inicio_mes(primera)
+        while mes <= inicio_mes(ultima):
+            crear_particion(conn, mes)
+            mes = sumar_meses(mes, 1)
+
+    copiadas = conn.execute(text(
+        f"INSERT INTO {TABLA} ({columnas}) SELECT {columnas} FROM {TABLA_SIN_PARTICIONAR}"
+    )).rowcount
+    conn.execute(text(f"DROP TABLE {TABLA_SIN_PARTICIONAR}"))
+    logger.info(f"🗂️ datomonitoreo convertida a tabla particionada - {copiadas} lectura(s) copiadas")
+
+
+def crear_particion(conn: Connection, mes: date) -> bool:
+    """
+    Crea la partición del mes si no existe. Las filas de ese mes que hayan
+    caído en la partición DEFAULT se mueven a la nueva.
+
+    Returns:
+        True si se creó
+    """
+    nombre = nombre_particion(mes)
+    if conn.execute(text("SELECT to_regclass(:nombre) IS NOT NULL"), {"nombre": nombre}).scalar():
+        return False
+
+    desde, hasta = mes.isoformat(), sumar_meses(mes, 1).isoformat()
+    rango = f"FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+    en_default = conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {PARTICION_DEFAULT} WHERE fecha >= :desde AND fecha < :hasta)"),
+        {"desde": desde, "hasta": hasta}
+    ).scalar()
+
+    if not en_default:
+        conn.execute(text(f"CREATE TABLE {nombre} PARTITION OF {TABLA} {rango}"))
+    else:
+        # ATTACH falla si la DEFAULT tiene filas del rango: moverlas antes
+        conn.execute(text(f"CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        conn.execute(
+            text(
+                f"WITH movidas AS (DELETE FROM {PARTICION_DEFAULT} WHERE fecha >= :desde AND fecha < :hasta RETURNING *) "
+                f"INSERT INTO {nombre} SELECT * FROM movidas"
+            ),
+            {"desde": desde, "hasta": hasta}
+        )
+        conn.execute(text(f"ALTER TABLE {TABLA} ATTACH PARTITION {nombre} {rango}"))
+    return True
+
+
+def listar_particiones(conn: Connection) -> list[tuple[date, str]]:
+    """Particiones mensuales de datomonitoreo, ordenadas por mes"""
+    nombres = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:tabla)"
+        ),
+        {"tabla": TABLA}
+    ).scalars()
+
+    particiones = []
+    for nombre in nombres:
+        coincidencia = PATRON_PARTICION.match(nombre)
+        if coincidencia:
+            particiones.append((date(int(coincidencia[1]), int(coincidencia[2]), 1), nombre))
+    return sorted(particiones)
+
+
+def mantener_particiones(engine: Engine, hoy: datetime = None) -> dict:
+    """
+    Crea las particiones de los próximos meses y aplica la retención.
+
+    Returns:
+        Dict con las particiones creadas y las separadas/eliminadas
+    """
+    resultado = {"creadas": [], "vencidas": []}
+    if not es_postgres(engine):
+        return resultado
+
+    mes_actual = inicio_mes(hoy or get_caracas_now())
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": CLAVE_LOCK_MANTENIMIENTO})
+
+        for meses in range(Config.PARTICIONES_MESES_ADELANTE + 1):
+            mes = sumar_meses(mes_actual, meses)
+            if crear_particion(conn, mes):
+                resultado["creadas"].append(nombre_particion(mes))
+
+        if Config.PARTICIONES_RETENCION_MESES > 0:
+            limite = sumar_meses(mes_actual, -Config.PARTICIONES_RETENCION_MESES)
+            for mes, nombre in listar_particiones(conn):
+                if mes >= limite:
+                    break
+                conn.execute(text(f"ALTER TABLE {TABLA} DETACH PARTITION {nombre}"))
+                if Config.PARTICIONES_RETENCION_MODO == "drop":
+                    conn.execute(text(f"DROP TABLE {nombre}"))
+                resultado["vencidas"].append(nombre)
+
+    if resultado["creadas"] or resultado["vencidas"]:
+        accion = "eliminadas" if Config.PARTICIONES_RETENCION_MODO == "drop" else "separadas"
+        logger.info(
+            f"🗂️ Particiones creadas: {resultado['creadas'] or '-'} | "
+            f"{accion} por retención: {resultado['vencidas'] or '-'}"
+        )
+    return resultado
+
+
+async def ciclo_mantenimiento(engine: Engine) -> None:
+    """Tarea de fondo: mantener_particiones cada PARTICIONES_INTERVALO_HORAS"""
+    while True:
+        await asyncio.sleep(Config.PARTICIONES_INTERVALO_HORAS * 3600)
+        try:
+            await asyncio.to_thread(mantener_particiones, engine)
+        except Exception as e:
+            logger.error(f"❌ Error en el mantenimiento de particiones: {str(e)}")
@@ -1,4 +1,10 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from typing import Optional
+from adapters.db import migraciones, particiones
+from core.repositories.agregado_monitoreo_repository import upsert_del_dialecto
 import os
 from dotenv import load_dotenv
 
@@ -26,8 +32,74 @@ engine = create_engine(
     pool_timeout=30,       # ⭐ Timeout para obtener conexión del pool
 )
 
+# Drivers async equivalentes a los síncronos de DATABASE_URL
+DRIVERS_ASYNC = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# El engine async se crea en el primer uso: así la app arranca aunque el
+# driver async (asyncpg / aiosqlite) no esté instalado y solo se usen
+# endpoints síncronos
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_database_url(url: str = DATABASE_URL) -> str:
+    """Convierte DATABASE_URL al driver async (postgresql → asyncpg, sqlite → aiosqlite)"""
+    url = make_url(url.replace("postgres://", "postgresql://", 1))
+    drivername = DRIVERS_ASYNC.get(url.drivername, url.drivername)
+    query = dict(url.query)
+    # asyncpg no entiende sslmode (formato libpq); su equivalente es ssl
+    if drivername == "postgresql+asyncpg" and "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername=drivername, query=query).render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        url = get_async_database_url()
+        # aiosqlite usa NullPool: no acepta opciones de tamaño del pool
+        opciones_pool = {} if url.startswith("sqlite") else {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_timeout": 30,
+        }
+        _async_engine = create_async_engine(
+            url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            **opciones_pool,
+        )
+    return _async_engine
+
+
+async def cerrar_async_engine():
+    """Cierra las conexiones del engine async (shutdown de la app)"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    # Agregados e indicadores se acumulan con INSERT ... ON CONFLICT: un
+    # dialecto sin soporte falla al iniciar y no en cada lectura
+    upsert_del_dialecto(engine.dialect.name)
+
+    if particiones.es_postgres(engine):
+        # datomonitoreo se crea particionada por fecha (no con create_all)
+        tablas = [tabla for tabla in SQLModel.metadata.sorted_tables if tabla.name != particiones.TABLA]
+        SQLModel.metadata.create_all(engine, tables=tablas)
+        particiones.preparar_datomonitoreo(engine)
+    else:
+        SQLModel.metadata.create_all(engine)
+    # Cambios sobre tablas ya existentes (columnas, índices): adapters/db/migraciones.py
+    migraciones.migrar(engine)
+
 
 # ✅ Asegúrate que cada request tiene su propia sesión
 def get_session():
@@ -38,4 +110,17 @@ def get_session():
         except Exception:
             session.rollback()  # Rollback en caso de error
             raise
-        # El 'with' se encarga del close automáticamente
\ No newline at end of file
+        # El 'with' se encarga del close automáticamente
+
+
+# ✅ Equivalente async de get_session: la E/S de BD no bloquea el event loop.
+# expire_on_commit=False porque en async no se pueden recargar atributos
+# de forma implícita al serializar la respuesta.
+async def get_async_session():
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
@@ -0,0 +1,30 @@
+# adapters/estado/estado_compartido.py
+"""
+Backend del estado compartido entre workers, según ESTADO_BACKEND:
+
+- "memoria" (por defecto): un solo worker, nada que sincronizar
+- "postgres": tabla UNLOGGED + LISTEN/NOTIFY sobre la misma BD, para
+  correr uvicorn con --workers > 1 (ver estado_postgres_adapter.py)
+
+Siguen siendo por proceso el buffer de lecturas recientes, los eventos en
+vivo (hub_eventos), la ventana de deduplicación por secuencia y los bucles
+de fondo: hasta compartirlos, producción corre con un solo worker.
+"""
+from adapters.arduino_adapter import device_registry
+from adapters.estado.estado_memoria_adapter import EstadoMemoriaAdapter
+from config import Config
+from core.ports.estado_compartido_port import EstadoCompartidoPort
+
+
+def crear_estado_compartido(backend: str = Config.ESTADO_BACKEND) -> EstadoCompartidoPort:
+    if backend == "postgres":
+        from adapters.db.sqlmodel_database import engine
+        from adapters.estado.estado_postgres_adapter import EstadoPostgresAdapter
+        return EstadoPostgresAdapter(engine, device_registry)
+    if backend != "memoria":
+        raise ValueError(f"❌ ESTADO_BACKEND inválido: {backend} (usar 'memoria' o 'postgres')")
+    return EstadoMemoriaAdapter()
+
+
+# Instancia global del estado compartido
+estado_compartido = crear_estado_compartido()
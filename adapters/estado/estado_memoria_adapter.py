@@ -0,0 +1,28 @@
+# adapters/estado/estado_memoria_adapter.py
+from core.ports.estado_compartido_port import EstadoCompartidoPort
+
+
+class EstadoMemoriaAdapter(EstadoCompartidoPort):
+    """
+    Un solo proceso (ESTADO_BACKEND=memoria, por defecto): la copia local
+    es el estado, no hay nada que sincronizar.
+    """
+
+    def iniciar(self) -> None:
+        pass
+
+    def detener(self) -> None:
+        pass
+
+    def refrescar_dispositivo(self, dispositivo) -> None:
+        pass
+
+    def guardar_dispositivo(self, dispositivo) -> None:
+        pass
+
+    # Sin saltar a un hilo: en el camino de cada lectura
+    async def refrescar_dispositivo_async(self, dispositivo) -> None:
+        pass
+
+    async def guardar_dispositivo_async(self, dispositivo) -> None:
+        pass
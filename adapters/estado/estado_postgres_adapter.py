@@ -0,0 +1,273 @@
+# adapters/estado/estado_postgres_adapter.py
+"""
+Estado compartido entre workers sobre PostgreSQL (ESTADO_BACKEND=postgres).
+
+- Dispositivos: una fila JSON por NodeMCU en la tabla UNLOGGED
+  estadodispositivo (sin WAL: es estado efímero que se reconstruye con las
+  próximas lecturas). dispositivo_exclusivo_async la lee con FOR UPDATE
+  antes de cada lectura y al terminar la escribe y avisa por NOTIFY en esa
+  misma transacción: las lecturas de un dispositivo se procesan de a una
+  entre todos los workers (histéresis del LED y version_lectura sin
+  pisarse). Cada lectura en curso ocupa una conexión más del pool.
+- Alertas pendientes: en before_commit de cada Session se envía por NOTIFY
+  lo que el índice aplicará en ese commit. NOTIFY es transaccional: los
+  demás workers solo reciben cambios confirmados.
+- Contexto de monitoreo: cada invalidar_contexto() local se reenvía.
+
+Un hilo por worker escucha el canal (LISTEN) con una conexión propia y
+aplica los avisos de los demás a su copia local, así GET /nodemcu/latest y
+el LED responden desde memoria. Si la conexión se corta, al reconectar se
+recarga todo (los avisos de ese intervalo se perdieron).
+"""
+import asyncio
+import json
+import logging
+import secrets
+import select
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from sqlalchemy import JSON, Column, Connection, DateTime, Engine, MetaData, String, Table, event, text, update
+from sqlalchemy import select as sql_select
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+from adapters.arduino_adapter import DeviceRegistry, SensorDataManager
+from core.ports.estado_compartido_port import EstadoCompartidoPort
+from core.repositories.contexto_monitoreo_repository import al_invalidar_contexto, invalidar_contexto
+from core.repositories.indice_alertas_pendientes import AlertaPendiente, indice_alertas
+from core.utils.datetime_utils import get_caracas_now
+
+logger = logging.getLogger(__name__)
+
+CANAL = "pharmamonitor_estado"
+
+# Límite de NOTIFY: 8000 bytes. Un lote con muchas transiciones se avisa
+# como "alertas_recargar" y cada worker relee las pendientes de la BD.
+MAX_BYTES_AVISO = 7900
+
+estadodispositivo = Table(
+    "estadodispositivo",
+    MetaData(),
+    Column("device_id", String(64), primary_key=True),
+    Column("estado", JSON, nullable=False),
+    Column("actualizado", DateTime, nullable=False),
+    prefixes=["UNLOGGED"],
+)
+
+
+def _serializar_cambio(cambio: tuple) -> list:
+    operacion, dato = cambio
+    if operacion == "alta":
+        return [operacion, {
+            "id": dato.id,
+            "id_producto_monitoreado": dato.id_producto_monitoreado,
+            "parametro_afectado": dato.parametro_afectado,
+            "fecha_generacion": dato.fecha_generacion.isoformat(),
+        }]
+    return [operacion, list(dato)]
+
+
+def _deserializar_cambio(cambio: list) -> tuple:
+    operacion, dato = cambio
+    if operacion == "alta":
+        return operacion, AlertaPendiente(**{**dato, "fecha_generacion": datetime.fromisoformat(dato["fecha_generacion"])})
+    return operacion, tuple(dato)
+
+
+class EstadoPostgresAdapter(EstadoCompartidoPort):
+    def __init__(self, engine: Engine, registro: DeviceRegistry):
+        self.engine = engine
+        self.registro = registro
+        self.instancia = secrets.token_hex(8)  # Para ignorar los avisos propios
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self) -> None:
+        if self.engine.dialect.name != "postgresql":
+            raise ValueError("❌ ESTADO_BACKEND=postgres requiere una DATABASE_URL de PostgreSQL")
+        estadodispositivo.create(self.engine, checkfirst=True)
+        self._cargar_dispositivos()
+
+        event.listen(Session, "before_commit", self._avisar_alertas)
+        al_invalidar_contexto(self._avisar_contexto)
+
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._escuchar, name="estado-compartido", daemon=True)
+        self._hilo.start()
+        logger.info(f"🔗 Estado compartido en PostgreSQL (canal {CANAL}, instancia {self.instancia})")
+
+    def detener(self) -> None:
+        self._parar.set()
+        if event.contains(Session, "before_commit", self._avisar_alertas):
+            event.remove(Session, "before_commit", self._avisar_alertas)
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+
+    # ============================================================
+    # Dispositivos
+    # ============================================================
+
+    def refrescar_dispositivo(self, dispositivo: SensorDataManager) -> None:
+        with self.engine.connect() as conn:
+            estado = conn.execute(
+                sql_select(estadodispositivo.c.estado).where(estadodispositivo.c.device_id == dispositivo.device_id)
+            ).scalar()
+        if estado is not None:
+            with dispositivo.lock:
+                dispositivo.importar_estado(estado)
+
+    def guardar_dispositivo(self, dispositivo: SensorDataManager) -> None:
+        with dispositivo.lock:
+            estado = dispositivo.exportar_estado()
+        ahora = get_caracas_now()
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(estadodispositivo)
+                .values(device_id=dispositivo.device_id, estado=estado, actualizado=ahora)
+                .on_conflict_do_update(
+                    index_elements=[estadodispositivo.c.device_id],
+                    set_={"estado": estado, "actualizado": ahora}
+                )
+            )
+            self._notificar(conn, {"tipo": "dispositivo", "estado": estado})
+
+    @asynccontextmanager
+    async def dispositivo_exclusivo_async(self, dispositivo: SensorDataManager) -> AsyncIterator[None]:
+        conn = await asyncio.to_thread(self._tomar_dispositivo, dispositivo)
+        try:
+            yield
+        except BaseException:
+            await asyncio.to_thread(conn.close)  # Rollback: libera la fila sin publicar
+            raise
+        await asyncio.to_thread(self._publicar_y_soltar, conn, dispositivo)
+
+    def _tomar_dispositivo(self, dispositivo: SensorDataManager) -> Connection:
+        """Bloquea la fila del dispositivo (la crea si falta) y la importa; la transacción queda abierta"""
+        with dispositivo.lock:
+            estado = dispositivo.exportar_estado()
+        conn = self.engine.connect()
+        try:
+            conn.execute(
+                insert(estadodispositivo)
+                .values(device_id=dispositivo.device_id, estado=estado, actualizado=get_caracas_now())
+                .on_conflict_do_nothing(index_elements=[estadodispositivo.c.device_id])
+            )
+            estado = conn.execute(
+                sql_select(estadodispositivo.c.estado)
+                .where(estadodispositivo.c.device_id == dispositivo.device_id)
+                .with_for_update()
+            ).scalar_one()
+        except BaseException:
+            conn.close()
+            raise
+        with dispositivo.lock:
+            dispositivo.importar_estado(estado)
+        return conn
+
+    def _publicar_y_soltar(self, conn: Connection, dispositivo: SensorDataManager) -> None:
+        try:
+            with dispositivo.lock:
+                estado = dispositivo.exportar_estado()
+            conn.execute(
+                update(estadodispositivo)
+                .where(estadodispositivo.c.device_id == dispositivo.device_id)
+                .values(estado=estado, actualizado=get_caracas_now())
+            )
+            self._notificar(conn, {"tipo": "dispositivo", "estado": estado})
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _cargar_dispositivos(self) -> None:
+        with self.engine.connect() as conn:
+            estados = conn.execute(sql_select(estadodispositivo.c.estado)).scalars().all()
+        for estado in estados:
+            dispositivo = self.registro.get(estado["device_id"])
+            with dispositivo.lock:
+                dispositivo.importar_estado(estado)
+
+    # ============================================================
+    # Avisos (NOTIFY)
+    # ============================================================
+
+    def _notificar(self, conn, aviso: dict) -> None:
+        conn.execute(
+            text("SELECT pg_notify(:canal, :mensaje)"),
+            {"canal": CANAL, "mensaje": json.dumps({"origen": self.instancia, **aviso})}
+        )
+
+    def _avisar_alertas(self, session: Session) -> None:
+        """before_commit: los cambios del índice viajan en la misma transacción"""
+        cambios = indice_alertas.cambios_programados(session)
+        if not cambios:
+            return
+        aviso = {"tipo": "alertas", "cambios": [_serializar_cambio(cambio) for cambio in cambios]}
+        if len(json.dumps(aviso)) > MAX_BYTES_AVISO:
+            aviso = {"tipo": "alertas_recargar"}
+        self._notificar(session, aviso)
+
+    def _avisar_contexto(self) -> None:
+        with self.engine.begin() as conn:
+            self._notificar(conn, {"tipo": "contexto"})
+
+    # ============================================================
+    # Escucha (LISTEN)
+    # ============================================================
+
+    def _escuchar(self) -> None:
+        primera = True
+        while not self._parar.is_set():
+            conexion = None
+            try:
+                # Conexión fuera del pool, en autocommit, solo para LISTEN
+                conexion = self.engine.raw_connection()
+                conexion.detach()
+                dbapi = conexion.driver_connection
+                dbapi.autocommit = True
+                with dbapi.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL}")
+                if not primera:
+                    self._resincronizar()
+                primera = False
+
+                while not self._parar.is_set():
+                    if select.select([dbapi], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi.poll()
+                    while dbapi.notifies:
+                        self._recibir(dbapi.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"❌ Escucha del estado compartido interrumpida: {str(e)} - Reintentando en 5 s")
+                self._parar.wait(5)
+            finally:
+                if conexion is not None:
+                    conexion.close()
+
+    def _recibir(self, mensaje: str) -> None:
+        try:
+            aviso = json.loads(mensaje)
+            if aviso.get("origen") == self.instancia:
+                return
+            tipo = aviso["tipo"]
+            if tipo == "dispositivo":
+                dispositivo = self.registro.get(aviso["estado"]["device_id"])
+                with dispositivo.lock:
+                    dispositivo.importar_estado(aviso["estado"])
+            elif tipo == "alertas":
+                indice_alertas.aplicar_externos([_deserializar_cambio(cambio) for cambio in aviso["cambios"]])
+            elif tipo == "alertas_recargar":
+                with Session(self.engine) as session:
+                    indice_alertas.cargar(session)
+            elif tipo == "contexto":
+                invalidar_contexto(propagar=False)
+        except Exception as e:
+            logger.error(f"❌ Aviso de estado compartido inválido: {str(e)}")
+
+    def _resincronizar(self) -> None:
+        """Tras reconectar: recarga dispositivos, alertas pendientes y contexto"""
+        self._cargar_dispositivos()
+        with Session(self.engine) as session:
+            indice_alertas.cargar(session)
+        invalidar_contexto(propagar=False)
+        logger.info("🔄 Estado compartido resincronizado")
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga de la ingesta NodeMCU con N dispositivos virtuales.
+
+Cada dispositivo es una tarea asyncio que envía lecturas realistas (paseo
+aleatorio dentro de la condición de almacenamiento, con excursiones
+ocasionales) a POST /nodemcu/data o /nodemcu/data.bin, con su propio
+device_id y número de secuencia.
+
+Modos:
+- En proceso (por defecto): la app se monta con httpx.ASGITransport sobre
+  la DATABASE_URL del entorno (Postgres o SQLite local). Además de la
+  latencia mide consultas SQL por petición y espera del pool de conexiones.
+- Servidor local (--url http://localhost:8000): solo mide latencia y
+  throughput; las métricas de BD no están disponibles.
+
+Reporta throughput, p50/p95/p99, consultas por petición y espera del pool,
+y puede guardar el resultado como baseline JSON para comparar corridas
+futuras.
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.carga_nodemcu --dispositivos 1000 --lecturas 5
+    python -m benchmarks.carga_nodemcu --guardar-baseline benchmarks/baseline.json
+    python -m benchmarks.carga_nodemcu --baseline benchmarks/baseline.json
+    python -m benchmarks.carga_nodemcu --url http://localhost:8000 --formato bin
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+import httpx
+
+# Métricas donde un valor más alto es peor (para la comparación con baseline)
+METRICAS_COMPARADAS = {
+    "throughput_rps": "mayor_mejor",
+    "latencia_p50_ms": "menor_mejor",
+    "latencia_p95_ms": "menor_mejor",
+    "latencia_p99_ms": "menor_mejor",
+    "consultas_por_peticion": "menor_mejor",
+    "espera_pool_p95_ms": "menor_mejor",
+}
+
+# Rangos de la condición de referencia (refrigeración 2-8 °C)
+CONDICION_BENCHMARK = {
+    "nombre": "Benchmark refrigeración",
+    "temperatura_min": 2.0, "temperatura_max": 8.0,
+    "humedad_min": 30.0, "humedad_max": 60.0,
+    "lux_min": 0.0, "lux_max": 300.0,
+    "presion_min": 865.0, "presion_max": 875.0,
+}
+
+
+def percentil(valores: list[float], p: float) -> Optional[float]:
+    """Percentil por rango más cercano (valores ya ordenados)"""
+    if not valores:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores)) - 1)
+    return valores[indice]
+
+
+class MedidorBD:
+    """
+    Cuenta consultas SQL y mide la espera del pool de conexiones de los
+    engines de la app (solo en modo en proceso).
+    """
+    def __init__(self):
+        self.consultas = 0
+        self.esperas_pool_ms: list[float] = []
+        self._restaurar = []
+
+    def instalar(self, engines) -> None:
+        from sqlalchemy import event
+
+        for engine in engines:
+            def contar(*args, **kwargs):
+                self.consultas += 1
+            event.listen(engine, "before_cursor_execute", contar)
+            self._restaurar.append(lambda engine=engine, contar=contar: event.remove(engine, "before_cursor_execute", contar))
+
+            pool = engine.pool
+            connect_original = pool.connect
+
+            def connect_medido(connect_original=connect_original):
+                inicio = time.perf_counter()
+                try:
+                    return connect_original()
+                finally:
+                    self.esperas_pool_ms.append((time.perf_counter() - inicio) * 1000)
+            pool.connect = connect_medido
+            self._restaurar.append(lambda pool=pool: pool.__dict__.pop("connect", None))
+
+    def desinstalar(self) -> None:
+        for restaurar in self._restaurar:
+            restaurar()
+        self._restaurar.clear()
+
+
+class DispositivoVirtual:
+    """NodeMCU simulado: paseo aleatorio dentro de la condición"""
+    def __init__(self, numero: int, prob_excursion: float, rng: random.Random):
+        self.numero = numero
+        self.device_id = f"bench-{numero:05d}"
+        self.secuencia = 0
+        self.prob_excursion = prob_excursion
+        self.rng = rng
+        self.valores = {
+            p: (CONDICION_BENCHMARK[f"{p}_min"] + CONDICION_BENCHMARK[f"{p}_max"]) / 2
+            for p in ("temperatura", "humedad", "lux", "presion")
+        }
+
+    def siguiente_lectura(self) -> dict:
+        self.secuencia += 1
+        lectura = {}
+        for parametro, valor in self.valores.items():
+            minimo = CONDICION_BENCHMARK[f"{parametro}_min"]
+            maximo = CONDICION_BENCHMARK[f"{parametro}_max"]
+            rango = maximo - minimo
+            valor += self.rng.gauss(0, rango * 0.02)
+            valor = min(max(valor, minimo + rango * 0.05), maximo - rango * 0.05)
+            self.valores[parametro] = valor
+            lectura[parametro] = round(valor, 2)
+
+        if self.rng.random() < self.prob_excursion:
+            lectura["temperatura"] = round(CONDICION_BENCHMARK["temperatura_max"] + self.rng.uniform(0.5, 2), 2)
+        return lectura
+
+    def peticion(self, formato: str) -> tuple[str, dict]:
+        """Ruta y kwargs de httpx para la próxima lectura"""
+        lectura = self.siguiente_lectura()
+        if formato == "bin":
+            from schemas.nodemcu_binario import codificar_trama
+            trama = codificar_trama(self.numero, self.secuencia, **lectura)
+            return "/nodemcu/data.bin", {
+                "content": trama,
+                "headers": {"Content-Type": "application/octet-stream"},
+            }
+        return "/nodemcu/data", {
+            "json": {"device_id": self.device_id, "secuencia": self.secuencia, **lectura},
+        }
+
+
+async def simular_dispositivo(
+    cliente: httpx.AsyncClient,
+    dispositivo: DispositivoVirtual,
+    lecturas: int,
+    intervalo: float,
+    formato: str,
+    latencias_ms: list[float],
+    estados: Counter
+) -> None:
+    # Desfase inicial para que los dispositivos no lleguen todos a la vez
+    if intervalo:
+        await asyncio.sleep(dispositivo.rng.uniform(0, intervalo))
+
+    for _ in range(lecturas):
+        ruta, kwargs = dispositivo.peticion(formato)
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.post(ruta, **kwargs)
+            estados[respuesta.status_code] += 1
+        except httpx.HTTPError as e:
+            estados[type(e).__name__] += 1
+        latencias_ms.append((time.perf_counter() - inicio) * 1000)
+        if intervalo:
+            await asyncio.sleep(intervalo)
+
+
+def preparar_monitoreo_activo() -> None:
+    """Crea condición, producto y monitoreo activo si no hay uno (modo en proceso)"""
+    from sqlmodel import Session, select
+    from adapters.db.sqlmodel_database import engine
+    from core.models.condicionalmacenamiento import CondicionAlmacenamiento
+    from core.models.formafarmaceutica import FormaFarmaceutica
+    from core.models.productofarmaceutico import ProductoFarmaceutico
+    from core.models.productomonitoreado import ProductoMonitoreado
+    from core.repositories.contexto_monitoreo_repository import invalidar_contexto
+
+    with Session(engine) as session:
+        activo = session.exec(
+            select(ProductoMonitoreado).where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None)
+        ).first()
+        if activo:
+            print(f"   - Usando monitoreo activo existente (ID {activo.id})")
+            return
+
+        condicion = CondicionAlmacenamiento(**CONDICION_BENCHMARK)
+        session.add(condicion)
+        session.flush()
+        forma = session.exec(select(FormaFarmaceutica)).first()
+        producto = ProductoFarmaceutico(
+            id_forma_farmaceutica=forma.id,
+            id_condicion=condicion.id,
+            nombre="Producto benchmark",
+            formula="N/A",
+            concentracion="N/A",
+            indicaciones="N/A",
+            contraindicaciones="N/A",
+            efectos_secundarios="N/A",
+        )
+        session.add(producto)
+        session.flush()
+        monitoreo = ProductoMonitoreado(id_producto=producto.id, localizacion="Benchmark", cantidad=1)
+        session.add(monitoreo)
+        session.commit()
+        print(f"   - Monitoreo activo creado (ID {monitoreo.id})")
+
+    invalidar_contexto()
+
+
+async def ejecutar(args) -> dict:
+    medidor: Optional[MedidorBD] = None
+    app = None
+
+    if args.url:
+        cliente = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        from config import Config
+        if Config.IS_PRODUCTION:
+            sys.exit("❌ El modo en proceso escribe en DATABASE_URL: no se ejecuta con ENVIRONMENT=production")
+
+        import main
+        from adapters.db.sqlmodel_database import engine, get_async_engine
+
+        app = main.app
+        await main.on_startup()
+        await asyncio.to_thread(preparar_monitoreo_activo)
+
+        medidor = MedidorBD()
+        medidor.instalar([engine, get_async_engine().sync_engine])
+        cliente = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://benchmark",
+            timeout=args.timeout,
+        )
+
+    rng = random.Random(args.semilla)
+    dispositivos = [
+        DispositivoVirtual(n, args.prob_excursion, random.Random(rng.random()))
+        for n in range(1, args.dispositivos + 1)
+    ]
+    latencias_ms: list[float] = []
+    estados: Counter = Counter()
+
+    print(f"🚀 {args.dispositivos} dispositivo(s) × {args.lecturas} lectura(s) "
+          f"→ {args.url or 'app en proceso'} ({args.formato})")
+
+    inicio = time.perf_counter()
+    try:
+        async with cliente:
+            await asyncio.gather(*(
+                simular_dispositivo(cliente, d, args.lecturas, args.intervalo, args.formato, latencias_ms, estados)
+                for d in dispositivos
+            ))
+    finally:
+        duracion = time.perf_counter() - inicio
+        if medidor:
+            medidor.desinstalar()
+        if app is not None:
+            import main
+            await main.on_shutdown()
+
+    latencias_ms.sort()
+    peticiones = len(latencias_ms)
+    esperas = sorted(medidor.esperas_pool_ms) if medidor else []
+
+    def redondear(valor):
+        return round(valor, 3) if valor is not None else None
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "configuracion": {
+            "destino": args.url or "en_proceso",
+            "base_de_datos": _motor_bd() if not args.url else None,
+            "formato": args.formato,
+            "dispositivos": args.dispositivos,
+            "lecturas_por_dispositivo": args.lecturas,
+            "intervalo_s": args.intervalo,
+            "prob_excursion": args.prob_excursion,
+            "ingest_mode": os.getenv("INGEST_MODE", "sync"),
+        },
+        "metricas": {
+            "peticiones": peticiones,
+            "estados": {str(estado): total for estado, total in sorted(estados.items(), key=str)},
+            "duracion_s": redondear(duracion),
+            "throughput_rps": redondear(peticiones / duracion if duracion else 0),
+            "latencia_p50_ms": redondear(percentil(latencias_ms, 50)),
+            "latencia_p95_ms": redondear(percentil(latencias_ms, 95)),
+            "latencia_p99_ms": redondear(percentil(latencias_ms, 99)),
+            "latencia_max_ms": redondear(latencias_ms[-1] if latencias_ms else None),
+            "consultas_por_peticion": redondear(medidor.consultas / peticiones) if medidor and peticiones else None,
+            "esperas_pool": len(esperas) if medidor else None,
+            "espera_pool_p50_ms": redondear(percentil(esperas, 50)),
+            "espera_pool_p95_ms": redondear(percentil(esperas, 95)),
+            "espera_pool_max_ms": redondear(esperas[-1] if esperas else None),
+        },
+    }
+
+
+def _motor_bd() -> str:
+    from adapters.db.sqlmodel_database import engine
+    return engine.dialect.name
+
+
+def imprimir_resultado(resultado: dict) -> None:
+    m = resultado["metricas"]
+    print("\n📊 Resultado")
+    print("-" * 50)
+    print(f"Peticiones:            {m['peticiones']} en {m['duracion_s']} s")
+    print(f"Estados HTTP:          {m['estados']}")
+    print(f"Throughput:            {m['throughput_rps']} req/s")
+    print(f"Latencia p50/p95/p99:  {m['latencia_p50_ms']} / {m['latencia_p95_ms']} / {m['latencia_p99_ms']} ms "
+          f"(máx {m['latencia_max_ms']} ms)")
+    if m["consultas_por_peticion"] is not None:
+        print(f"Consultas/petición:    {m['consultas_por_peticion']}")
+        print(f"Espera pool p50/p95:   {m['espera_pool_p50_ms']} / {m['espera_pool_p95_ms']} ms "
+              f"(máx {m['espera_pool_max_ms']} ms, {m['esperas_pool']} checkouts)")
+    else:
+        print("Consultas/petición:    N/D (servidor externo)")
+    print("-" * 50)
+
+
+def comparar_con_baseline(resultado: dict, baseline: dict, tolerancia: float) -> list[str]:
+    """
+    Compara las métricas con el baseline. Retorna las regresiones que
+    superan la tolerancia (ej: 0.2 = 20 % peor).
+    """
+    regresiones = []
+    print(f"\n📐 Comparación con baseline del {baseline.get('fecha', '?')}")
+    if baseline.get("configuracion") != resultado["configuracion"]:
+        print("   ⚠️ La configuración difiere del baseline: la comparación es orientativa")
+
+    for metrica, sentido in METRICAS_COMPARADAS.items():
+        actual = resultado["metricas"].get(metrica)
+        referencia = baseline.get("metricas", {}).get(metrica)
+        if actual is None or not referencia:
+            continue
+
+        cambio = (actual - referencia) / referencia
+        empeora = cambio < -tolerancia if sentido == "mayor_mejor" else cambio > tolerancia
+        marca = "❌" if empeora else "✅"
+        print(f"   {marca} {metrica:<24} {referencia:>10} → {actual:>10} ({cambio:+.1%})")
+        if empeora:
+            regresiones.append(metrica)
+    return regresiones
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de POST /nodemcu/data con dispositivos virtuales")
+    parser.add_argument("--dispositivos", type=int, default=100, help="Dispositivos virtuales concurrentes")
+    parser.add_argument("--lecturas", type=int, default=10, help="Lecturas por dispositivo")
+    parser.add_argument("--intervalo", type=float, default=0.0, help="Segundos entre lecturas de un dispositivo (0 = sin pausa)")
+    parser.add_argument("--formato", choices=("json", "bin"), default="json")
+    parser.add_argument("--url", help="Servidor a probar (ej: http://localhost:8000). Sin --url la app corre en proceso")
+    parser.add_argument("--prob-excursion", type=float, default=0.01, help="Probabilidad de lectura fuera de rango")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--guardar-baseline", metavar="RUTA", help="Guardar el resultado como baseline JSON")
+    parser.add_argument("--baseline", metavar="RUTA", help="Comparar con un baseline JSON guardado")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento tolerado frente al baseline (0.2 = 20 %%)")
+    parser.add_argument("--salida", metavar="RUTA", help="Guardar el resultado completo en JSON")
+    args = parser.parse_args(argv)
+
+    resultado = asyncio.run(ejecutar(args))
+    imprimir_resultado(resultado)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    if args.guardar_baseline:
+        with open(args.guardar_baseline, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Baseline guardado en {args.guardar_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regresiones = comparar_con_baseline(resultado, baseline, args.tolerancia)
+        if regresiones:
+            print(f"\n❌ Regresión en: {', '.join(regresiones)}")
+            return 1
+        print("\n✅ Sin regresiones frente al baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
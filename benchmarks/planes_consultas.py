@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verifica que las consultas calientes usen índices.
+
+Siembra un volumen grande de datos (sesiones, lecturas, agregados, alertas y
+registros) en la DATABASE_URL del entorno, ejecuta ANALYZE y pide el plan
+de cada consulta caliente (EXPLAIN (FORMAT JSON) en PostgreSQL, EXPLAIN
+QUERY PLAN en SQLite). Falla (código de salida 1) si algún plan recorre
+secuencialmente una de las tablas grandes: en ese caso falta un índice o
+una migración (adapters/db/migraciones.py).
+
+Las consultas se arman con los mismos constructores que usan los
+repositorios, así que el chequeo sigue al código.
+
+Uso (sobre una BD descartable: escribe datos de prueba):
+    DATABASE_URL=sqlite:////tmp/planes.db python -m benchmarks.planes_consultas
+    DATABASE_URL=postgresql://... python -m benchmarks.planes_consultas --sesiones 5000 --lecturas 200
+    python -m benchmarks.planes_consultas --sin-sembrar --verbose
+"""
+import argparse
+import json
+import random
+import re
+import sys
+from datetime import timedelta
+from typing import Iterator
+
+# Tablas que no deben recorrerse enteras en una consulta caliente
+TABLAS_GRANDES = ("datomonitoreo", "agregadomonitoreo", "alerta", "productomonitoreado", "registro")
+
+ENTIDADES_REGISTRO = (
+    "ProductoFarmaceutico", "ProductoMonitoreado", "CondicionAlmacenamiento",
+    "FormaFarmaceutica", "Usuario", "Rol", "Alerta", "Perfil",
+)
+
+_SCAN_SQLITE = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def sembrar(engine, sesiones: int, lecturas: int, registros: int, rng: random.Random) -> None:
+    """Inserta sesiones finalizadas (más una activa) con lecturas cada 10 minutos"""
+    from sqlalchemy import insert
+    from sqlmodel import Session, select
+    from core.models.agregadomonitoreo import AgregadoMonitoreo
+    from core.models.alerta import Alerta, EstadoAlerta
+    from core.models.condicionalmacenamiento import CondicionAlmacenamiento
+    from core.models.datomonitoreo import DatoMonitoreo
+    from core.models.formafarmaceutica import FormaFarmaceutica
+    from core.models.productofarmaceutico import ProductoFarmaceutico
+    from core.models.productomonitoreado import ProductoMonitoreado
+    from core.models.registro import Registro
+    from core.models.usuario import Usuario
+    from core.repositories.agregado_monitoreo_repository import acumular
+    from core.utils.datetime_utils import get_caracas_now
+
+    ahora = get_caracas_now().replace(tzinfo=None, microsecond=0)
+    with Session(engine) as session:
+        forma = session.exec(select(FormaFarmaceutica)).first()
+        if forma is None:
+            forma = FormaFarmaceutica(descripcion="Plan benchmark")
+            session.add(forma)
+            session.flush()
+        condicion = CondicionAlmacenamiento(
+            nombre="Plan benchmark", temperatura_min=2, temperatura_max=8, humedad_min=30, humedad_max=60,
+            lux_min=0, lux_max=300, presion_min=865, presion_max=875,
+        )
+        session.add(condicion)
+        session.flush()
+        producto = ProductoFarmaceutico(
+            id_forma_farmaceutica=forma.id, id_condicion=condicion.id, nombre="Plan benchmark",
+            formula="N/A", concentracion="N/A", indicaciones="N/A", contraindicaciones="N/A",
+            efectos_secundarios="N/A",
+        )
+        session.add(producto)
+        session.flush()
+
+        # Una sola sesión activa (la primera): la aplicación no admite más de una
+        ids = list(session.execute(
+            insert(ProductoMonitoreado).returning(ProductoMonitoreado.id, sort_by_parameter_order=True),
+            [
+                {
+                    "id_producto": producto.id, "localizacion": "Plan benchmark", "cantidad": 1,
+                    "fecha_inicio_monitoreo": ahora - timedelta(days=n % 90 + 1),
+                    "fecha_finalizacion_monitoreo": None if n == 0 else ahora - timedelta(days=n % 90),
+                }
+                for n in range(sesiones)
+            ]
+        ).scalars())
+
+        for n, id_pm in enumerate(ids):
+            inicio = ahora - timedelta(days=n % 90 + 1)
+            filas = [
+                {
+                    "id_producto_monitoreado": id_pm,
+                    "fecha": inicio + timedelta(minutes=10 * i),
+                    "temperatura": round(rng.uniform(1, 9), 1), "humedad": round(rng.uniform(30, 60), 1),
+                    "lux": round(rng.uniform(0, 300), 1), "presion": round(rng.uniform(865, 875), 1),
+                }
+                for i in range(lecturas)
+            ]
+            session.execute(insert(DatoMonitoreo), filas)
+            session.execute(insert(AgregadoMonitoreo), list(acumular(filas).values()))
+            session.execute(insert(Alerta), [
+                {
+                    "id_producto_monitoreado": id_pm, "id_condicion": condicion.id,
+                    "parametro_afectado": parametro, "valor_medido": 9.5, "limite_min": 2, "limite_max": 8,
+                    "mensaje": "Plan benchmark", "fecha_generacion": inicio,
+                    "estado": EstadoAlerta.PENDIENTE if n == 0 else EstadoAlerta.RESUELTA,
+                }
+                for parametro in ("temperatura", "humedad", "lux", "presion")
+            ])
+            if n % 200 == 0:
+                session.commit()
+                print(f"   - {n + 1}/{len(ids)} sesiones")
+
+        usuario = session.exec(select(Usuario)).first()
+        if usuario is not None and registros:
+            session.execute(insert(Registro), [
+                {
+                    "id_usuario": usuario.idusuario, "nombre_usuario": "benchmark", "rol_usuario": "benchmark",
+                    "fecha": ahora - timedelta(minutes=n), "tipo_operacion": "crear",
+                    "entidad_afectada": rng.choice(ENTIDADES_REGISTRO), "detalles": {},
+                }
+                for n in range(registros)
+            ])
+        session.commit()
+
+
+def consultas_calientes(engine) -> dict:
+    """Nombre → sentencia, armadas como en los repositorios"""
+    from sqlmodel import Session, func, select
+    from config import Config
+    from core.models.alerta import Alerta, EstadoAlerta
+    from core.models.condicionalmacenamiento import CondicionAlmacenamiento
+    from core.models.productofarmaceutico import ProductoFarmaceutico
+    from core.models.productomonitoreado import ProductoMonitoreado
+    from core.models.datomonitoreo import DatoMonitoreo
+    from core.models.registro import Registro
+    from core.repositories import agregado_monitoreo_repository as agregados
+    from core.repositories import dato_monitoreo_repository as datos
+    from core.utils.datetime_utils import get_caracas_now
+
+    with Session(engine) as session:
+        id_pm, primera, ultima = session.exec(
+            select(DatoMonitoreo.id_producto_monitoreado, func.min(DatoMonitoreo.fecha), func.max(DatoMonitoreo.fecha))
+            .group_by(DatoMonitoreo.id_producto_monitoreado)
+            .order_by(DatoMonitoreo.id_producto_monitoreado.desc())
+            .limit(1)
+        ).one()
+
+    ahora = get_caracas_now().replace(tzinfo=None)
+    pagina = Config.DATOS_PAGINA_DEFECTO + 1
+    return {
+        "lecturas: página por producto": datos._consulta_pagina(primera, None, None, pagina)
+            .where(DatoMonitoreo.id_producto_monitoreado == id_pm),
+        "lecturas: página por producto con cursor": datos._consulta_pagina(primera, None, (ultima, 2 ** 31), pagina)
+            .where(DatoMonitoreo.id_producto_monitoreado == id_pm),
+        "lecturas: listado general": datos._consulta_pagina(
+            ahora - timedelta(days=Config.DATOS_VENTANA_DIAS), None, None, pagina
+        ),
+        "lecturas: rango del producto": datos._consulta_rango_producto(id_pm),
+        "lecturas: última del producto": datos._consulta_ultima_lectura(id_pm, ultima),
+        "lecturas: exportación": datos._consulta_sesion(id_pm, primera, ultima),
+        "agregados: serie por hora": agregados._consulta_agregados(id_pm, "1h", primera, None),
+        "alertas: pendiente por producto y parámetro": select(Alerta)
+            .where(Alerta.id_producto_monitoreado == id_pm)
+            .where(Alerta.parametro_afectado == "SENSOR_NO_DISPONIBLE")
+            .where(Alerta.estado == EstadoAlerta.PENDIENTE),
+        "alertas: carga del índice de pendientes": select(
+            Alerta.id, Alerta.id_producto_monitoreado, Alerta.parametro_afectado, Alerta.fecha_generacion
+        ).where(Alerta.estado == EstadoAlerta.PENDIENTE),
+        "dashboard: alertas activas": select(func.count()).where(Alerta.estado == EstadoAlerta.PENDIENTE)
+            .select_from(Alerta),
+        "dashboard: monitoreos activos": select(func.count())
+            .where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None),
+        "contexto: sesión activa": select(ProductoMonitoreado, CondicionAlmacenamiento)
+            .join(ProductoFarmaceutico, ProductoMonitoreado.id_producto == ProductoFarmaceutico.id)
+            .join(CondicionAlmacenamiento, ProductoFarmaceutico.id_condicion == CondicionAlmacenamiento.id)
+            .where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None),
+        "registros: por entidad": select(Registro)
+            .where(Registro.entidad_afectada == "ProductoMonitoreado")
+            .order_by(Registro.fecha.desc())
+            .limit(50),
+    }
+
+
+def _nodos_postgres(nodo: dict) -> Iterator[dict]:
+    yield nodo
+    for hijo in nodo.get("Plans", []):
+        yield from _nodos_postgres(hijo)
+
+
+def recorridos_secuenciales(conn, sql: str) -> tuple[list[str], str]:
+    """
+    Returns:
+        Tuple con las tablas grandes recorridas secuencialmente y el plan en texto
+    """
+    from sqlalchemy import text
+
+    if conn.dialect.name == "postgresql":
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        tablas = [
+            nodo.get("Relation Name", "")
+            for nodo in _nodos_postgres(plan[0]["Plan"])
+            if nodo["Node Type"] == "Seq Scan"
+        ]
+        texto = "\n".join(fila[0] for fila in conn.execute(text(f"EXPLAIN {sql}")))
+    else:
+        detalles = [fila[3] for fila in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        tablas = [coincidencia.group(1) for coincidencia in map(_SCAN_SQLITE.match, detalles) if coincidencia]
+        texto = "\n".join(detalles)
+
+    # Las particiones (datomonitoreo_p202601) cuentan como su tabla
+    grandes = [tabla for tabla in tablas if tabla.startswith(TABLAS_GRANDES)]
+    return grandes, texto
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica que las consultas calientes usen índices")
+    parser.add_argument("--sesiones", type=int, default=2000, help="Sesiones de monitoreo a sembrar")
+    parser.add_argument("--lecturas", type=int, default=100, help="Lecturas por sesión")
+    parser.add_argument("--registros", type=int, default=20000, help="Registros de auditoría a sembrar")
+    parser.add_argument("--sin-sembrar", action="store_true", help="Usar los datos que ya tiene la BD")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Imprimir el plan de cada consulta")
+    args = parser.parse_args(argv)
+
+    from config import Config
+    if Config.IS_PRODUCTION:
+        sys.exit("❌ Siembra datos de prueba en DATABASE_URL: no se ejecuta con ENVIRONMENT=production")
+
+    from sqlalchemy import text
+    from adapters.db.sqlmodel_database import engine
+    from manage import preparar_bd
+
+    preparar_bd()
+    if not args.sin_sembrar:
+        print(f"🌱 Sembrando {args.sesiones} sesiones × {args.lecturas} lecturas")
+        sembrar(engine, args.sesiones, args.lecturas, args.registros, random.Random(args.semilla))
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    fallidas = []
+    with engine.connect() as conn:
+        for nombre, consulta in consultas_calientes(engine).items():
+            sql = str(consulta.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            tablas, plan = recorridos_secuenciales(conn, sql)
+            print(f"{'❌' if tablas else '✅'} {nombre}" + (f" (recorrido secuencial: {', '.join(tablas)})" if tablas else ""))
+            if args.verbose or tablas:
+                print("   " + plan.replace("\n", "\n   "))
+            if tablas:
+                fallidas.append(nombre)
+
+    if fallidas:
+        print(f"\n❌ {len(fallidas)} consulta(s) sin índice adecuado")
+        return 1
+    print("\n✅ Todas las consultas calientes usan índices")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from zoneinfo import ZoneInfo
 
@@ -40,6 +41,55 @@ class Config:
     USE_REAL_SENSORS = os.getenv("USE_REAL_SENSORS", "true").lower() == "true"
     SENSOR_STRICT_MODE = os.getenv("SENSOR_STRICT_MODE", "true").lower() == "true"
 
+    # Ingesta NodeMCU
+    # "sync": cada POST /nodemcu/data escribe en BD antes de responder
+    # "async": el POST encola la lectura y un escritor en segundo plano hace group-commit
+    INGEST_MODE = os.getenv("INGEST_MODE", "sync").lower()
+    INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "10000"))  # Lecturas en cola antes de responder 503
+    INGEST_FLUSH_MS = int(os.getenv("INGEST_FLUSH_MS", "200"))      # Espera máxima antes de escribir un lote
+    INGEST_FLUSH_ROWS = int(os.getenv("INGEST_FLUSH_ROWS", "500"))  # Tamaño máximo de cada lote
+    DEDUP_VENTANA = int(os.getenv("DEDUP_VENTANA", "64"))           # Secuencias recientes recordadas por dispositivo
+    DEDUP_VENTANA_SEGUNDOS = float(os.getenv("DEDUP_VENTANA_SEGUNDOS", "60"))  # Antigüedad máxima de un reintento
+    DISPOSITIVOS_MAXIMO = int(os.getenv("DISPOSITIVOS_MAXIMO", "1000"))  # NodeMCU en memoria; se olvidan los menos usados sin producto asociado
+
+    # Particionado mensual de datomonitoreo (solo PostgreSQL, ver adapters/db/particiones.py)
+    PARTICIONES_MESES_ADELANTE = int(os.getenv("PARTICIONES_MESES_ADELANTE", "3"))    # Meses futuros con partición creada
+    PARTICIONES_RETENCION_MESES = int(os.getenv("PARTICIONES_RETENCION_MESES", "0"))  # 0 = conservar todo
+    PARTICIONES_RETENCION_MODO = os.getenv("PARTICIONES_RETENCION_MODO", "detach").lower()  # "detach" o "drop"
+    PARTICIONES_INTERVALO_HORAS = float(os.getenv("PARTICIONES_INTERVALO_HORAS", "12"))
+    DATOS_VENTANA_DIAS = int(os.getenv("DATOS_VENTANA_DIAS", "31"))  # Rango por defecto de GET /datosmonitoreo/
+    DATOS_PAGINA_DEFECTO = int(os.getenv("DATOS_PAGINA_DEFECTO", "100"))  # Lecturas por página en GET /datosmonitoreo
+    DATOS_PAGINA_MAXIMO = int(os.getenv("DATOS_PAGINA_MAXIMO", "1000"))   # Tope de ?limite=
+    SERIE_PUNTOS_MAXIMO = int(os.getenv("SERIE_PUNTOS_MAXIMO", "5000"))   # Tope de ?puntos= en /datosmonitoreo/{id}/serie
+    RECIENTES_CAPACIDAD = int(os.getenv("RECIENTES_CAPACIDAD", "720"))    # Lecturas en memoria por monitoreo activo (/recientes)
+    # Archivo comprimido de sesiones finalizadas (ver services/archivo_service.py)
+    ARCHIVO_ESPERA_DIAS = float(os.getenv("ARCHIVO_ESPERA_DIAS", "7"))        # Días tras detener la sesión antes de archivarla
+    ARCHIVO_INTERVALO_HORAS = float(os.getenv("ARCHIVO_INTERVALO_HORAS", "6"))
+    ARCHIVO_CACHE_LECTURAS = int(os.getenv("ARCHIVO_CACHE_LECTURAS", "500000"))  # Lecturas archivadas decodificadas en memoria (todas las sesiones)
+    # Caché en disco de las exportaciones Parquet/Arrow (ver services/exportacion_service.py)
+    EXPORTACION_CACHE_DIR = os.getenv(
+        "EXPORTACION_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pharmamonitor_exportaciones")
+    )
+    # Eventos en vivo por WebSocket / SSE (ver services/eventos_hub.py)
+    EVENTOS_COLA_MAX = int(os.getenv("EVENTOS_COLA_MAX", "256"))                   # Eventos pendientes por suscriptor (descarta los más antiguos)
+    EVENTOS_HEARTBEAT_SEGUNDOS = float(os.getenv("EVENTOS_HEARTBEAT_SEGUNDOS", "15"))  # Comentario SSE / ping sin eventos
+
+    # Estado en memoria compartido entre workers de uvicorn (dispositivos, LED, alertas pendientes)
+    ESTADO_BACKEND = os.getenv("ESTADO_BACKEND", "memoria").lower()  # "memoria" (un worker) o "postgres" (LISTEN/NOTIFY)
+    # Recálculo del historial de alertas (ver services/recalculo_alertas_service.py)
+    RECALCULO_LOTE = int(os.getenv("RECALCULO_LOTE", "5000"))                          # Lecturas por lote (una transacción por lote)
+    RECALCULO_ABANDONO_MINUTOS = float(os.getenv("RECALCULO_ABANDONO_MINUTOS", "10"))  # Sin avance durante este tiempo, otro proceso puede retomarlo
+    # Indicadores de cumplimiento por sesión (ver core/utils/kpi_utils.py)
+    KPI_ENERGIA_ACTIVACION = float(os.getenv("KPI_ENERGIA_ACTIVACION", "83.144"))  # ΔH de la MKT en kJ/mol (USP <1160>); al cambiarla se reconstruyen
+    KPI_HUECO_MAXIMO_MINUTOS = float(os.getenv("KPI_HUECO_MAXIMO_MINUTOS", "15"))  # Intervalos más largos entre lecturas cuentan como minutos sin datos
+
+    # Logging (ver core/utils/logging_utils.py)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_DEBUG = os.getenv("LOG_DEBUG", "false").lower() == "true"              # DEBUG sin límite ni muestreo
+    LOG_FORMATO = os.getenv("LOG_FORMATO", "json").lower()                     # "json" o "texto"
+    LOG_LIMITE_SEGUNDOS = float(os.getenv("LOG_LIMITE_SEGUNDOS", "10"))        # Intervalo mínimo entre mensajes con la misma clave
+    LOG_MUESTREO = float(os.getenv("LOG_MUESTREO", "1.0"))                     # Fracción de logs por lectura que se emiten
+
     @classmethod
     def get_nodemcu_url(cls, endpoint: str) -> str:
         """Construye la URL completa para el NodeMCU"""
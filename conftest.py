@@ -0,0 +1,77 @@
+"""
+Configuración de pytest: las pruebas corren sobre una SQLite temporal.
+
+DATABASE_URL se fija antes de importar la aplicación (sqlmodel_database la
+lee al importarse), así las pruebas nunca tocan la BD del .env.
+"""
+import os
+import tempfile
+
+_DIRECTORIO = tempfile.mkdtemp(prefix="pharmamonitor-pruebas-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIRECTORIO, 'pruebas.db')}"
+os.environ["EXPORTACION_CACHE_DIR"] = os.path.join(_DIRECTORIO, "exportaciones")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, select
+
+import main
+from adapters.db.sqlmodel_database import engine, init_db
+from core.jwt_handler import create_access_token
+from core.models.condicionalmacenamiento import CondicionAlmacenamiento
+from core.models.formafarmaceutica import FormaFarmaceutica
+from core.models.productofarmaceutico import ProductoFarmaceutico
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.repositories.contexto_monitoreo_repository import invalidar_contexto
+
+
+@pytest.fixture(scope="session", autouse=True)
+def base_de_datos():
+    """Esquema completo antes de cualquier prueba (también las que no levantan la app)"""
+    init_db()
+    yield engine
+
+
+@pytest.fixture
+def cliente(base_de_datos):
+    """
+    Aplicación levantada (startup/shutdown) sobre tablas vacías. Los
+    singletons en memoria (dispositivos, ventana de deduplicación) siguen
+    vivos entre pruebas: cada prueba usa sus propios device_id.
+    """
+    SQLModel.metadata.drop_all(engine)
+    with TestClient(main.app) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def cliente_autenticado(cliente):
+    """cliente con la cookie de sesión de un administrador"""
+    token = create_access_token({"id": 1, "sub": "admin@pharmamonitor.test", "nombre": "Admin", "apellido": "Pruebas", "foto": "", "rol": 1})
+    cliente.cookies.set("access_token", f"Bearer {token}")
+    yield cliente
+    cliente.cookies.clear()
+
+
+@pytest.fixture
+def producto_monitoreado(cliente) -> int:
+    """Sesión de monitoreo activa de un producto refrigerado (2-8 °C); devuelve su id"""
+    with Session(engine) as session:
+        condicion = CondicionAlmacenamiento(
+            nombre="Refrigerado", temperatura_min=2, temperatura_max=8, humedad_min=30, humedad_max=60,
+            lux_min=0, lux_max=300, presion_min=865, presion_max=875
+        )
+        session.add(condicion)
+        session.commit()
+        forma = session.exec(select(FormaFarmaceutica)).first()
+        producto = ProductoFarmaceutico(
+            id_forma_farmaceutica=forma.id, id_condicion=condicion.id, nombre="Insulina", formula="-",
+            concentracion="100 UI/ml", indicaciones="-", contraindicaciones="-", efectos_secundarios="-"
+        )
+        session.add(producto)
+        session.commit()
+        monitoreado = ProductoMonitoreado(id_producto=producto.id, localizacion="Refrigerador 1", cantidad=10)
+        session.add(monitoreado)
+        session.commit()
+        invalidar_contexto()
+        return monitoreado.id
@@ -0,0 +1,28 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class AgregadoMonitoreo(SQLModel, table=True):
+    """
+    Resumen de las lecturas de un producto monitoreado en un intervalo
+    (bucket "1m", "1h" o "1d" que empieza en `inicio`).
+
+    Se guarda la suma en lugar del promedio para poder sumar lecturas nuevas
+    de forma incremental (ver agregado_monitoreo_repository).
+    """
+    id_producto_monitoreado: int = Field(..., foreign_key="productomonitoreado.id", primary_key=True)
+    bucket: str = Field(..., max_length=3, primary_key=True)
+    inicio: datetime = Field(..., primary_key=True)
+    cantidad: int = Field(...)
+    temperatura_min: float = Field(...)
+    temperatura_max: float = Field(...)
+    temperatura_suma: float = Field(...)
+    humedad_min: float = Field(...)
+    humedad_max: float = Field(...)
+    humedad_suma: float = Field(...)
+    lux_min: float = Field(...)
+    lux_max: float = Field(...)
+    lux_suma: float = Field(...)
+    presion_min: float = Field(...)
+    presion_max: float = Field(...)
+    presion_suma: float = Field(...)
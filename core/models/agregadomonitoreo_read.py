@@ -0,0 +1,18 @@
+from sqlmodel import SQLModel
+from datetime import datetime
+
+class AgregadoMonitoreoRead(SQLModel):
+    inicio: datetime
+    cantidad: int
+    temperatura_min: float
+    temperatura_max: float
+    temperatura_promedio: float
+    humedad_min: float
+    humedad_max: float
+    humedad_promedio: float
+    lux_min: float
+    lux_max: float
+    lux_promedio: float
+    presion_min: float
+    presion_max: float
+    presion_promedio: float
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 from enum import Enum
@@ -14,6 +15,15 @@ if TYPE_CHECKING:
     from core.models.datomonitoreo import DatoMonitoreo
 
 class Alerta(SQLModel, table=True):
+    # Índice parcial: solo las alertas abiertas (pocas) de cada producto y parámetro
+    __table_args__ = (
+        Index(
+            "ix_alerta_pendientes", "id_producto_monitoreado", "parametro_afectado",
+            postgresql_where=text("estado = 'PENDIENTE'"),
+            sqlite_where=text("estado = 'PENDIENTE'"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     
     # Foreign Keys
@@ -35,4 +45,11 @@ class Alerta(SQLModel, table=True):
     # Relaciones
     producto_monitoreado: Optional["ProductoMonitoreado"] = Relationship(back_populates="alertas")
     dato_monitoreo: Optional["DatoMonitoreo"] = Relationship(back_populates="alertas")
-    condicion: Optional["CondicionAlmacenamiento"] = Relationship(back_populates="alertas") 
\ No newline at end of file
+    condicion: Optional["CondicionAlmacenamiento"] = Relationship(back_populates="alertas")
+
+
+# En PostgreSQL datomonitoreo está particionada con PK (id, fecha) y no admite
+# una FK solo a id: la referencia a la lectura se mantiene sin restricción
+for _fk in Alerta.__table__.foreign_key_constraints:
+    if _fk.elements[0].target_fullname == "datomonitoreo.id":
+        _fk.ddl_if(callable_=lambda ddl, target, bind, dialect, **kw: dialect.name != "postgresql")
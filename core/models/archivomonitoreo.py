@@ -0,0 +1,24 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import LargeBinary
+from datetime import datetime
+from core.utils.datetime_utils import get_caracas_now
+
+
+class ArchivoMonitoreo(SQLModel, table=True):
+    """
+    Lecturas de una sesión de monitoreo finalizada, empaquetadas en un blob
+    (core/utils/archivo_utils.py) y borradas de datomonitoreo.
+
+    fecha_inicio / fecha_fin / id_ultima_lectura permiten resolver rangos y
+    claves de caché sin descomprimir el blob.
+    """
+    id_producto_monitoreado: int = Field(..., foreign_key="productomonitoreado.id", primary_key=True)
+    cantidad: int = Field(...)
+    fecha_inicio: datetime = Field(...)
+    fecha_fin: datetime = Field(...)
+    id_ultima_lectura: int = Field(...)
+    codec: str = Field(..., max_length=16)
+    version: int = Field(...)
+    tamano_bytes: int = Field(...)
+    datos: bytes = Field(..., sa_type=LargeBinary)
+    fecha_archivado: datetime = Field(default_factory=get_caracas_now)
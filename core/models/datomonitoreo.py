@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import BigInteger, Index, UniqueConstraint
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 from core.utils.datetime_utils import get_caracas_now
@@ -8,6 +9,16 @@ if TYPE_CHECKING:
     from core.models.alerta import Alerta
 
 class DatoMonitoreo(SQLModel, table=True):
+    # Un reintento del NodeMCU (mismo dispositivo, secuencia y fecha) no duplica la lectura.
+    # Incluye fecha porque en PostgreSQL la tabla está particionada por fecha
+    # (adapters/db/particiones.py) y toda clave única debe contenerla: solo
+    # aplica a lecturas con timestamp del dispositivo (lotes, trama binaria y
+    # /data con timestamp); con la hora del servidor, solo la ventana en memoria.
+    __table_args__ = (
+        UniqueConstraint("id_dispositivo", "secuencia", "fecha", name="uq_datomonitoreo_dispositivo_secuencia"),
+        # Paginación por keyset (fecha, id) de las lecturas de un producto
+        Index("ix_datomonitoreo_producto_fecha", "id_producto_monitoreado", "fecha", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     id_producto_monitoreado: int = Field(..., foreign_key="productomonitoreado.id", index=True)
     fecha: datetime = Field(default_factory=get_caracas_now, index=True)
@@ -15,6 +26,8 @@ class DatoMonitoreo(SQLModel, table=True):
     humedad: float = Field(...)
     lux: float = Field(...)
     presion: float = Field(...)
+    id_dispositivo: Optional[str] = Field(default=None, max_length=64)
+    secuencia: Optional[int] = Field(default=None, sa_type=BigInteger)  # Contador uint32 del NodeMCU
 
     productomonitoreado: Optional["ProductoMonitoreado"] = Relationship(back_populates="datos_monitoreo")
     alertas: List["Alerta"] = Relationship(back_populates="dato_monitoreo") 
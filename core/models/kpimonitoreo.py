@@ -0,0 +1,51 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+from core.utils.datetime_utils import get_caracas_now
+
+
+class KpiMonitoreo(SQLModel, table=True):
+    """
+    Acumuladores de los indicadores de cumplimiento de una sesión (MKT,
+    estadísticas ponderadas por tiempo y minutos fuera de rango, ver
+    core/utils/kpi_utils.py).
+
+    La ingesta los actualiza en la misma transacción que las lecturas (ver
+    kpi_monitoreo_repository). Se guardan sumas en lugar de promedios para
+    poder seguir acumulando; los campos ultima_* / *_ultimo / *_en_excursion
+    son la última lectura acumulada, que abre el intervalo siguiente.
+    """
+    id_producto_monitoreado: int = Field(..., foreign_key="productomonitoreado.id", primary_key=True)
+    energia_activacion: float = Field(...)  # ΔH (kJ/mol) con que se acumuló suma_arrhenius
+    pendiente: bool = Field(default=False)  # Falta reconstruir: la ingesta no suma
+    cantidad: int = Field(default=0)
+    primera_fecha: Optional[datetime] = None
+    ultima_fecha: Optional[datetime] = None
+    minutos_con_datos: float = Field(default=0.0)
+    minutos_sin_datos: float = Field(default=0.0)
+    suma_arrhenius: float = Field(default=0.0)
+    temperatura_min: Optional[float] = None
+    temperatura_max: Optional[float] = None
+    temperatura_integral: float = Field(default=0.0)
+    temperatura_minutos_excursion: float = Field(default=0.0)
+    temperatura_ultimo: Optional[float] = None
+    temperatura_en_excursion: bool = Field(default=False)
+    humedad_min: Optional[float] = None
+    humedad_max: Optional[float] = None
+    humedad_integral: float = Field(default=0.0)
+    humedad_minutos_excursion: float = Field(default=0.0)
+    humedad_ultimo: Optional[float] = None
+    humedad_en_excursion: bool = Field(default=False)
+    lux_min: Optional[float] = None
+    lux_max: Optional[float] = None
+    lux_integral: float = Field(default=0.0)
+    lux_minutos_excursion: float = Field(default=0.0)
+    lux_ultimo: Optional[float] = None
+    lux_en_excursion: bool = Field(default=False)
+    presion_min: Optional[float] = None
+    presion_max: Optional[float] = None
+    presion_integral: float = Field(default=0.0)
+    presion_minutos_excursion: float = Field(default=0.0)
+    presion_ultimo: Optional[float] = None
+    presion_en_excursion: bool = Field(default=False)
+    actualizado: datetime = Field(default_factory=get_caracas_now)
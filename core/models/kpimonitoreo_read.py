@@ -0,0 +1,30 @@
+from sqlmodel import SQLModel
+from typing import Optional
+from datetime import datetime
+
+class KpiMonitoreoRead(SQLModel):
+    id_producto_monitoreado: int
+    cantidad: int
+    primera_fecha: Optional[datetime]
+    ultima_fecha: Optional[datetime]
+    minutos_con_datos: float
+    minutos_sin_datos: float
+    temperatura_cinetica_media: Optional[float]  # MKT en °C
+    energia_activacion: float  # kJ/mol
+    temperatura_min: Optional[float]
+    temperatura_max: Optional[float]
+    temperatura_promedio: Optional[float]
+    temperatura_minutos_fuera_rango: float
+    humedad_min: Optional[float]
+    humedad_max: Optional[float]
+    humedad_promedio: Optional[float]
+    humedad_minutos_fuera_rango: float
+    lux_min: Optional[float]
+    lux_max: Optional[float]
+    lux_promedio: Optional[float]
+    lux_minutos_fuera_rango: float
+    presion_min: Optional[float]
+    presion_max: Optional[float]
+    presion_promedio: Optional[float]
+    presion_minutos_fuera_rango: float
+    actualizado: datetime
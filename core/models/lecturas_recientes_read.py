@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel
+from datetime import datetime
+
+
+class LecturasRecientesRead(SQLModel):
+    """
+    Últimas lecturas de un producto monitoreado en orden cronológico, en
+    columnas: ids[i], fechas[i], temperatura[i], ... son la misma lectura.
+    """
+    id_producto_monitoreado: int
+    ids: list[int]
+    fechas: list[datetime]
+    temperatura: list[float]
+    humedad: list[float]
+    lux: list[float]
+    presion: list[float]
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 
@@ -8,6 +9,15 @@ if TYPE_CHECKING:
     from core.models.alerta import Alerta
 
 class ProductoMonitoreado(SQLModel, table=True):
+    # Índice parcial de la sesión activa (fecha_finalizacion_monitoreo IS NULL)
+    __table_args__ = (
+        Index(
+            "ix_productomonitoreado_activos", "id_producto", "id",
+            postgresql_where=text("fecha_finalizacion_monitoreo IS NULL"),
+            sqlite_where=text("fecha_finalizacion_monitoreo IS NULL"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     id_producto: int = Field(..., foreign_key="productofarmaceutico.id", index=True)
     localizacion: str = Field(..., max_length=255, index=True)
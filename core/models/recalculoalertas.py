@@ -0,0 +1,38 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import JSON
+from typing import Optional
+from datetime import datetime
+from enum import Enum
+from core.utils.datetime_utils import get_caracas_now
+
+
+class EstadoRecalculo(str, Enum):
+    EN_CURSO = "en_curso"
+    COMPLETADO = "completado"
+    ERROR = "error"
+
+
+class RecalculoAlertas(SQLModel, table=True):
+    """
+    Avance del recálculo del historial de alertas de una sesión
+    (services/recalculo_alertas_service.py).
+
+    Se actualiza en la misma transacción que cada lote de alertas: si el
+    proceso se interrumpe, se reanuda desde el último lote confirmado con el
+    cursor (fecha_cursor, id_cursor) y las excursiones que seguían abiertas.
+    """
+    id_producto_monitoreado: int = Field(..., foreign_key="productomonitoreado.id", primary_key=True)
+    estado: EstadoRecalculo = Field(default=EstadoRecalculo.EN_CURSO)
+    id_condicion: int = Field(..., foreign_key="condicionalmacenamiento.id")
+    hasta: Optional[datetime] = None  # Última lectura al iniciar: lo posterior lo evalúa la ingesta en vivo
+    fecha_cursor: Optional[datetime] = None
+    id_cursor: Optional[int] = None
+    # {parametro: [id_dato_monitoreo, valor_medido, fecha_generacion ISO]}
+    abiertas: dict = Field(default_factory=dict, sa_type=JSON)
+    lecturas_procesadas: int = Field(default=0)
+    lecturas_totales: int = Field(default=0)
+    alertas_creadas: int = Field(default=0)
+    ejecutor: Optional[str] = Field(default=None, max_length=32)  # Proceso que lo está ejecutando (None = libre)
+    error: Optional[str] = None
+    fecha_inicio: datetime = Field(default_factory=get_caracas_now)
+    actualizado: datetime = Field(default_factory=get_caracas_now)
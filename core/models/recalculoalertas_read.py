@@ -0,0 +1,19 @@
+from sqlmodel import SQLModel
+from typing import Optional
+from datetime import datetime
+from core.models.recalculoalertas import EstadoRecalculo
+
+class RecalculoAlertasRead(SQLModel):
+    id_producto_monitoreado: int
+    estado: EstadoRecalculo
+    id_condicion: int
+    hasta: Optional[datetime]
+    fecha_cursor: Optional[datetime]
+    lecturas_procesadas: int
+    lecturas_totales: int
+    porcentaje: float
+    alertas_creadas: int
+    en_ejecucion: bool
+    error: Optional[str]
+    fecha_inicio: datetime
+    actualizado: datetime
@@ -3,11 +3,15 @@ from typing import Optional, TYPE_CHECKING
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import JSON  # Si usas PostgreSQL, o usa Column(JSON) para otros DB
 from sqlmodel import Column, JSON
+from sqlalchemy import Index
 
 if TYPE_CHECKING:
     from core.models.usuario import Usuario
 
 class Registro(SQLModel, table=True):
+    # Auditoría de una entidad, de lo más reciente a lo más antiguo
+    __table_args__ = (Index("ix_registro_entidad_fecha", "entidad_afectada", "fecha"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     id_usuario: int = Field(foreign_key="usuario.idusuario", index=True)
     nombre_usuario: str = Field(max_length=255)  # Nuevo campo
@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel
+from datetime import datetime
+from typing import Optional
+
+
+class SerieRead(SQLModel):
+    """
+    Serie de un parámetro submuestreada para gráficos (LTTB + excursiones),
+    en columnas: fechas[i] corresponde a valores[i].
+    """
+    parametro: str
+    limite_min: Optional[float] = None
+    limite_max: Optional[float] = None
+    total: int                     # Lecturas de la serie original
+    fechas: list[datetime]
+    valores: list[float]
@@ -0,0 +1,58 @@
+# core/ports/estado_compartido_port.py
+"""
+Estado en memoria que deben ver igual todos los workers de uvicorn.
+
+Cada worker trabaja sobre su copia local (SensorDataManager de cada
+dispositivo, índice de alertas pendientes, contexto de monitoreo cacheado);
+el backend la mantiene coherente con la de los demás:
+
+- dispositivo_exclusivo_async rodea cada lectura: el estado de sensores
+  y la histéresis del LED se leen del almacén compartido antes de decidir
+  y se publican después, sin que otro worker procese a la vez una lectura
+  del mismo dispositivo (refrescar_dispositivo / guardar_dispositivo por
+  separado no lo garantizan).
+- Los cambios del índice de alertas y las invalidaciones del contexto los
+  propaga el backend por su cuenta desde iniciar().
+"""
+import asyncio
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+
+if TYPE_CHECKING:
+    from adapters.arduino_adapter import SensorDataManager
+
+
+class EstadoCompartidoPort(ABC):
+    @abstractmethod
+    def iniciar(self) -> None:
+        """Carga el estado compartido en la copia local y empieza a recibir cambios (startup)"""
+
+    @abstractmethod
+    def detener(self) -> None:
+        pass
+
+    @abstractmethod
+    def refrescar_dispositivo(self, dispositivo: "SensorDataManager") -> None:
+        """Trae a la copia local el último estado publicado del dispositivo"""
+
+    @abstractmethod
+    def guardar_dispositivo(self, dispositivo: "SensorDataManager") -> None:
+        """Publica el estado local del dispositivo para los demás workers"""
+
+    async def refrescar_dispositivo_async(self, dispositivo: "SensorDataManager") -> None:
+        await asyncio.to_thread(self.refrescar_dispositivo, dispositivo)
+
+    async def guardar_dispositivo_async(self, dispositivo: "SensorDataManager") -> None:
+        await asyncio.to_thread(self.guardar_dispositivo, dispositivo)
+
+    @asynccontextmanager
+    async def dispositivo_exclusivo_async(self, dispositivo: "SensorDataManager") -> AsyncIterator[None]:
+        """
+        Refresca el dispositivo, lo cede en exclusiva al bloque y lo publica
+        al salir (si el bloque falla no se publica nada). Un backend con
+        varios workers debe serializar aquí las lecturas del dispositivo.
+        """
+        await self.refrescar_dispositivo_async(dispositivo)
+        yield
+        await self.guardar_dispositivo_async(dispositivo)
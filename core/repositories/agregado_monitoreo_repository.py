@@ -0,0 +1,238 @@
+"""
+Agregados (min/max/promedio/cantidad) de las lecturas por producto monitoreado
+e intervalo de 1 minuto, 1 hora y 1 día.
+
+- actualizar_agregados() suma lecturas nuevas a sus intervalos con un UPSERT
+  (INSERT ... ON CONFLICT DO UPDATE); no hace commit, va en la misma
+  transacción que el INSERT de las lecturas.
+- reconstruir_agregados() recalcula desde datomonitoreo los intervalos de un
+  rango (reparación: lecturas borradas, cargas hechas por fuera, etc.).
+- get_agregados() sirve gráficos de semanas o meses con unos cientos de filas.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Union
+from sqlalchemy import delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.models.agregadomonitoreo import AgregadoMonitoreo
+from core.models.agregadomonitoreo_read import AgregadoMonitoreoRead
+from core.models.datomonitoreo import DatoMonitoreo
+from core.repositories.archivo_monitoreo_repository import a_datos_monitoreo, get_archivo, lecturas_de_archivo
+from core.repositories.contexto_monitoreo_repository import PARAMETROS
+from core.repositories.dato_monitoreo_repository import rango_de_producto, rango_de_producto_async
+
+BUCKETS = {
+    '1m': timedelta(minutes=1),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+
+# Filas leídas por iteración al reconstruir
+TAMANO_LECTURA_REPARACION = 5000
+
+
+def inicio_bucket(fecha: datetime, bucket: str) -> datetime:
+    """Comienzo del intervalo que contiene a `fecha` (hora local sin zona, como datomonitoreo)"""
+    fecha = fecha.replace(tzinfo=None, second=0, microsecond=0)
+    if bucket == '1h':
+        return fecha.replace(minute=0)
+    if bucket == '1d':
+        return fecha.replace(hour=0, minute=0)
+    return fecha
+
+
+def acumular(lecturas: Iterable[Union[DatoMonitoreo, dict]]) -> dict[tuple, dict]:
+    """
+    Agrupa lecturas en sus intervalos de cada bucket.
+
+    Returns:
+        Dict (id_producto_monitoreado, bucket, inicio) → fila de AgregadoMonitoreo
+    """
+    agregados = {}
+    for lectura in lecturas:
+        valor = lectura.get if isinstance(lectura, dict) else lambda campo: getattr(lectura, campo)
+        for bucket in BUCKETS:
+            clave = (valor('id_producto_monitoreado'), bucket, inicio_bucket(valor('fecha'), bucket))
+            fila = agregados.get(clave)
+            if fila is None:
+                fila = agregados[clave] = {
+                    'id_producto_monitoreado': clave[0], 'bucket': bucket, 'inicio': clave[2], 'cantidad': 0
+                }
+                for parametro in PARAMETROS:
+                    fila[f'{parametro}_min'] = fila[f'{parametro}_max'] = valor(parametro)
+                    fila[f'{parametro}_suma'] = 0.0
+            fila['cantidad'] += 1
+            for parametro in PARAMETROS:
+                medido = valor(parametro)
+                fila[f'{parametro}_min'] = min(fila[f'{parametro}_min'], medido)
+                fila[f'{parametro}_max'] = max(fila[f'{parametro}_max'], medido)
+                fila[f'{parametro}_suma'] += medido
+    return agregados
+
+
+def upsert_del_dialecto(dialecto: str):
+    """INSERT ... ON CONFLICT del dialecto y sus funciones escalares de mínimo/máximo"""
+    if dialecto == "postgresql":
+        return postgresql.insert, func.least, func.greatest
+    if dialecto == "sqlite":
+        return sqlite.insert, func.min, func.max
+    raise RuntimeError(
+        f"❌ Base de datos '{dialecto}' no soportada: los agregados e indicadores "
+        "incrementales requieren PostgreSQL o SQLite"
+    )
+
+
+def actualizar_agregados(session: Session, lecturas: Iterable[Union[DatoMonitoreo, dict]]) -> int:
+    """
+    Suma lecturas recién guardadas a sus intervalos (no hace commit).
+
+    Args:
+        lecturas: DatoMonitoreo o dicts con id_producto_monitoreado, fecha y
+                  los cuatro parámetros
+
+    Returns:
+        Cantidad de filas de agregados insertadas/actualizadas
+    """
+    # Orden fijo: dos transacciones concurrentes bloquean las filas en el mismo orden
+    filas = [fila for _, fila in sorted(acumular(lecturas).items())]
+    if not filas:
+        return 0
+
+    insertar, minimo, maximo = upsert_del_dialecto(session.get_bind().dialect.name)
+    stmt = insertar(AgregadoMonitoreo)
+    actualizar = {'cantidad': AgregadoMonitoreo.cantidad + stmt.excluded.cantidad}
+    for parametro in PARAMETROS:
+        columna = lambda sufijo: getattr(AgregadoMonitoreo, f'{parametro}_{sufijo}')
+        excluido = lambda sufijo: getattr(stmt.excluded, f'{parametro}_{sufijo}')
+        actualizar[f'{parametro}_min'] = minimo(columna('min'), excluido('min'))
+        actualizar[f'{parametro}_max'] = maximo(columna('max'), excluido('max'))
+        actualizar[f'{parametro}_suma'] = columna('suma') + excluido('suma')
+
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['id_producto_monitoreado', 'bucket', 'inicio'],
+            set_=actualizar
+        ),
+        filas
+    )
+    return len(filas)
+
+
+async def actualizar_agregados_async(session: AsyncSession, lecturas: list[DatoMonitoreo]) -> int:
+    return await session.run_sync(lambda sync_session: actualizar_agregados(sync_session, lecturas))
+
+
+def reconstruir_agregados(
+    session: Session,
+    id_producto_monitoreado: int,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None
+) -> int:
+    """
+    Recalcula desde datomonitoreo todos los agregados del producto entre
+    desde y hasta (ampliado a días completos para que los tres buckets
+    queden coherentes) y hace commit.
+
+    Sin desde/hasta se usa el rango de lecturas del producto. Las lecturas
+    que lleguen mientras se reconstruye un rango abierto pueden quedar
+    fuera: conviene reparar rangos ya cerrados. Las sesiones archivadas se
+    recalculan desde su archivo.
+
+    Returns:
+        Cantidad de filas de agregados escritas
+    """
+    if desde is None or hasta is None:
+        primera, ultima = rango_de_producto(session, id_producto_monitoreado)
+        if primera is None:
+            return 0
+        desde, hasta = desde or primera, hasta or ultima
+
+    desde = inicio_bucket(desde, '1d')
+    hasta = inicio_bucket(hasta, '1d') + BUCKETS['1d'] if hasta is not None else None
+
+    borrar = delete(AgregadoMonitoreo).where(
+        AgregadoMonitoreo.id_producto_monitoreado == id_producto_monitoreado,
+        AgregadoMonitoreo.inicio >= desde
+    )
+    lecturas = select(DatoMonitoreo).where(
+        DatoMonitoreo.id_producto_monitoreado == id_producto_monitoreado,
+        DatoMonitoreo.fecha >= desde
+    )
+    if hasta is not None:
+        borrar = borrar.where(AgregadoMonitoreo.inicio < hasta)
+        lecturas = lecturas.where(DatoMonitoreo.fecha < hasta)
+
+    archivo = get_archivo(session, id_producto_monitoreado)
+    if archivo is not None:
+        fin = hasta - timedelta(microseconds=1) if hasta is not None else None
+        fuente = a_datos_monitoreo(archivo, lecturas_de_archivo(archivo, desde, fin, descendente=False))
+    else:
+        fuente = session.exec(lecturas.execution_options(yield_per=TAMANO_LECTURA_REPARACION))
+
+    session.execute(borrar)
+    filas = list(acumular(fuente).values())
+    if filas:
+        session.execute(insert(AgregadoMonitoreo), filas)
+    session.commit()
+    return len(filas)
+
+
+def eliminar_agregados(session: Session, ids_productos_monitoreados: list[int]) -> None:
+    """Borra los agregados de productos monitoreados (no hace commit)"""
+    session.exec(delete(AgregadoMonitoreo).where(
+        AgregadoMonitoreo.id_producto_monitoreado.in_(ids_productos_monitoreados)
+    ))
+
+
+def _consulta_agregados(id_producto_monitoreado: int, bucket: str, desde: datetime, hasta: Optional[datetime]):
+    consulta = (
+        select(AgregadoMonitoreo)
+        .where(AgregadoMonitoreo.id_producto_monitoreado == id_producto_monitoreado)
+        .where(AgregadoMonitoreo.bucket == bucket)
+        .where(AgregadoMonitoreo.inicio >= inicio_bucket(desde, bucket))
+        .order_by(AgregadoMonitoreo.inicio)
+    )
+    if hasta is not None:
+        consulta = consulta.where(AgregadoMonitoreo.inicio <= hasta)
+    return consulta
+
+
+def _a_lectura(agregado: AgregadoMonitoreo) -> AgregadoMonitoreoRead:
+    valores = {'inicio': agregado.inicio, 'cantidad': agregado.cantidad}
+    for parametro in PARAMETROS:
+        valores[f'{parametro}_min'] = getattr(agregado, f'{parametro}_min')
+        valores[f'{parametro}_max'] = getattr(agregado, f'{parametro}_max')
+        valores[f'{parametro}_promedio'] = getattr(agregado, f'{parametro}_suma') / agregado.cantidad
+    return AgregadoMonitoreoRead(**valores)
+
+
+def get_agregados(
+    session: Session,
+    id_producto_monitoreado: int,
+    bucket: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None
+) -> list[AgregadoMonitoreoRead]:
+    """Agregados de un producto ordenados por inicio; sin desde, desde su primera lectura"""
+    if desde is None:
+        desde, _ = rango_de_producto(session, id_producto_monitoreado)
+        if desde is None:
+            return []
+    agregados = session.exec(_consulta_agregados(id_producto_monitoreado, bucket, desde, hasta)).all()
+    return [_a_lectura(agregado) for agregado in agregados]
+
+
+async def get_agregados_async(
+    session: AsyncSession,
+    id_producto_monitoreado: int,
+    bucket: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None
+) -> list[AgregadoMonitoreoRead]:
+    if desde is None:
+        desde, _ = await rango_de_producto_async(session, id_producto_monitoreado)
+        if desde is None:
+            return []
+    resultado = await session.exec(_consulta_agregados(id_producto_monitoreado, bucket, desde, hasta))
+    return [_a_lectura(agregado) for agregado in resultado.all()]
@@ -1,63 +1,111 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import Engine, Row, delete, func, update
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterator, List, Optional, Union
+import numpy as np
 from core.models.alerta import Alerta, EstadoAlerta
 from core.models.datomonitoreo import DatoMonitoreo
 from core.models.condicionalmacenamiento import CondicionAlmacenamiento
 from core.models.productomonitoreado import ProductoMonitoreado
 from core.utils.datetime_utils import get_caracas_now
+from core.repositories.contexto_monitoreo_repository import ContextoMonitoreo, obtener_contexto_activo
+from core.repositories.indice_alertas_pendientes import AlertaPendiente, indice_alertas
+from core.utils.reglas_utils import PARAMETROS, ReglasCondicion, compilar_reglas, matriz_lecturas, valores_lectura
+
+# Columnas de las exportaciones (iterar_alertas_sesion)
+COLUMNAS_EXPORTACION_ALERTAS = (
+    'id', 'id_dato_monitoreo', 'parametro_afectado', 'valor_medido', 'limite_min', 'limite_max',
+    'estado', 'fecha_generacion', 'fecha_resolucion', 'duracion_minutos',
+)
+
+# Filas por lote al recorrer las alertas de una sesión
+TAMANO_LOTE_EXPORTACION_ALERTAS = 2000
 
 def get_alertas(session: Session):
     return session.exec(select(Alerta)).all()
 
-def crear_alerta(session: Session, dato: DatoMonitoreo) -> List[Alerta]:
+def get_version_alertas(session: Session, id_producto_monitoreado: int) -> tuple:
+    """
+    (cantidad, máximo id, última resolución) de las alertas de un producto
+    monitoreado: cambia cuando se abre, resuelve o borra una alerta.
+    """
+    return tuple(session.exec(
+        select(func.count(), func.max(Alerta.id), func.max(Alerta.fecha_resolucion))
+        .where(Alerta.id_producto_monitoreado == id_producto_monitoreado)
+    ).one())
+
+def iterar_alertas_sesion(engine: Engine, id_producto_monitoreado: int) -> Iterator[list[Row]]:
+    """
+    Alertas de un producto monitoreado en orden de generación, en lotes de
+    tuplas con COLUMNAS_EXPORTACION_ALERTAS (como iterar_datos_sesion).
+    """
+    consulta = (
+        select(*(getattr(Alerta, columna) for columna in COLUMNAS_EXPORTACION_ALERTAS))
+        .where(Alerta.id_producto_monitoreado == id_producto_monitoreado)
+        .order_by(Alerta.id)
+        .execution_options(yield_per=TAMANO_LOTE_EXPORTACION_ALERTAS)
+    )
+    with engine.connect() as conn:
+        for lote in conn.execute(consulta).partitions():
+            yield lote
+
+def crear_alerta(session: Session, dato: DatoMonitoreo, contexto: Optional[ContextoMonitoreo] = None) -> List[Alerta]:
+    """
+    Abre / cierra alertas del producto según una lectura y hace commit
+    (ver evaluar_alerta).
+
+    Returns:
+        Lista de alertas nuevas
+    """
+    alertas_generadas = evaluar_alerta(session, dato, contexto)
+    session.commit()
+    for alerta in alertas_generadas:
+        session.refresh(alerta)
+    return alertas_generadas
+
+def evaluar_alerta(session: Session, dato: DatoMonitoreo, contexto: Optional[ContextoMonitoreo] = None) -> List[Alerta]:
+    """
+    Abre / cierra alertas del producto según una lectura, sin commit: la
+    ingesta confirma la lectura, sus agregados y sus alertas juntos.
+
+    Las alertas PENDIENTES se consultan en el índice en memoria, así que solo
+    se escribe en BD cuando hay una transición real (alerta nueva o alerta
+    resuelta). Una alerta que sigue abierta no se toca: su duración se
+    calcula al resolverse.
+
+    Returns:
+        Lista de alertas nuevas
+    """
     # 1. Obtener relaciones necesarias
-    producto_monitoreado = dato.productomonitoreado
-    condicion = producto_monitoreado.producto.condicion
+    # (la ingesta pasa el contexto cacheado, con las reglas ya compiladas,
+    # para evitar lazy-loads por lectura)
+    id_producto_monitoreado = dato.id_producto_monitoreado
+    if contexto and contexto.id_producto_monitoreado == id_producto_monitoreado:
+        reglas = contexto.reglas
+    else:
+        reglas = compilar_reglas(dato.productomonitoreado.producto.condicion)
 
     # 2. Verificar TODOS los parámetros fuera de rango
-    parametros_problematicos = verificar_parametros(dato, condicion)
+    parametros_problematicos = verificar_parametros(dato, reglas)
 
     # 3. Cerrar alertas de parámetros que volvieron a la normalidad
-    cerrar_alertas_resueltas(session, producto_monitoreado.id, parametros_problematicos)
+    ahora = get_caracas_now()
+    cerradas = _cerrar_pendientes(session, id_producto_monitoreado, parametros_problematicos, ahora)
 
     alertas_generadas = []
     
-    # 4. Procesar cada parámetro problemático
+    # 4. Crear alerta para cada parámetro problemático que no tenga una abierta
     for parametro in parametros_problematicos:
-        # Buscar alerta existente para este parámetro
-        alerta_existente = session.exec(
-            select(Alerta)
-            .where(Alerta.id_producto_monitoreado == producto_monitoreado.id)
-            .where(Alerta.parametro_afectado == parametro)
-            .where(Alerta.estado == EstadoAlerta.PENDIENTE)
-        ).first()
-        
-        if alerta_existente:
-            # Actualizar duración de alerta existente
-            alerta_existente.duracion_minutos = (
-                get_caracas_now() - alerta_existente.fecha_generacion
-            ).total_seconds() / 60
-            session.commit()
-            alertas_generadas.append(alerta_existente)
-        else:
-            # Crear nueva alerta
-            nueva_alerta = Alerta(
-                id_producto_monitoreado=producto_monitoreado.id,
-                id_dato_monitoreo=dato.id,
-                id_condicion=condicion.id,
-                parametro_afectado=parametro,
-                valor_medido=getattr(dato, parametro),
-                limite_min=getattr(condicion, f"{parametro}_min"),
-                limite_max=getattr(condicion, f"{parametro}_max"),
-                mensaje=f"¡Alerta! {parametro.capitalize()} fuera de rango",
-                fecha_generacion=get_caracas_now(),
-                estado=EstadoAlerta.PENDIENTE
-            )
-            session.add(nueva_alerta)
-            session.commit()
-            session.refresh(nueva_alerta)
-            alertas_generadas.append(nueva_alerta)
+        if indice_alertas.obtener(id_producto_monitoreado, parametro):
+            continue
+
+        nueva_alerta = _nueva_alerta(id_producto_monitoreado, dato.id, getattr(dato, parametro), reglas, parametro, ahora)
+        session.add(nueva_alerta)
+        alertas_generadas.append(nueva_alerta)
+
+    if alertas_generadas or cerradas:
+        _programar_altas(session, alertas_generadas)
     
     return alertas_generadas
 
@@ -67,37 +115,209 @@ def cerrar_alertas_resueltas(
     parametros_activos: List[str]
 ):
     # Cerrar alertas de parámetros que no están en la lista de activos
-    alertas_a_cerrar = session.exec(
-        select(Alerta)
-        .where(Alerta.id_producto_monitoreado == producto_id)
-        .where(Alerta.estado == EstadoAlerta.PENDIENTE)
-        .where(Alerta.parametro_afectado.not_in(parametros_activos))
-    ).all()
-    
-    for alerta in alertas_a_cerrar:
-        alerta.estado = EstadoAlerta.RESUELTA
-        alerta.fecha_resolucion = get_caracas_now()
-        alerta.duracion_minutos = (
-            get_caracas_now() - alerta.fecha_generacion
-        ).total_seconds() / 60
-    
-    session.commit()
+    if _cerrar_pendientes(session, producto_id, parametros_activos, get_caracas_now()):
+        session.commit()
+
+def _cerrar_pendientes(
+    session: Session,
+    producto_id: int,
+    parametros_activos: List[str],
+    fecha_resolucion: datetime
+) -> int:
+    """
+    Marca como RESUELTAS (sin commit) las alertas pendientes del producto
+    cuyo parámetro ya no está fuera de rango. Usa el índice en memoria y un
+    UPDATE por clave primaria, sin SELECT previo.
+    """
+    a_cerrar = {
+        parametro: alerta
+        for parametro, alerta in indice_alertas.pendientes_de(producto_id).items()
+        if parametro not in parametros_activos
+    }
+    if a_cerrar:
+        session.execute(update(Alerta), [
+            {
+                "id": alerta.id,
+                "estado": EstadoAlerta.RESUELTA,
+                "fecha_resolucion": fecha_resolucion,
+                "duracion_minutos": (fecha_resolucion - alerta.fecha_generacion).total_seconds() / 60
+            }
+            for alerta in a_cerrar.values()
+        ])
+        for parametro in a_cerrar:
+            indice_alertas.programar_baja(session, producto_id, parametro)
+    return len(a_cerrar)
+
+def _programar_altas(session: Session, alertas: List[Alerta]) -> None:
+    """Asigna IDs (flush) y programa el alta en el índice para el próximo commit"""
+    if not alertas:
+        return
+    session.flush()
+    for alerta in alertas:
+        indice_alertas.programar_alta(session, AlertaPendiente(
+            id=alerta.id,
+            id_producto_monitoreado=alerta.id_producto_monitoreado,
+            parametro_afectado=alerta.parametro_afectado,
+            fecha_generacion=alerta.fecha_generacion
+        ))
 
 def verificar_parametros(
     dato: DatoMonitoreo,
-    condicion: CondicionAlmacenamiento
+    condicion: Union[CondicionAlmacenamiento, ReglasCondicion]
 ) -> List[str]:
-    parametros_fuera_rango = []
+    """Parámetros de la lectura fuera de los límites (los valores None no cuentan)"""
+    return _reglas(condicion).parametros_fuera_rango(valores_lectura(dato))
+
+def _reglas(condicion: Union[CondicionAlmacenamiento, ReglasCondicion]) -> ReglasCondicion:
+    """Las reglas ya compiladas (contexto cacheado) o las de una condición / LimitesCondicion"""
+    return condicion if isinstance(condicion, ReglasCondicion) else compilar_reglas(condicion)
+
+def _nueva_alerta(
+    id_producto_monitoreado: int,
+    id_dato_monitoreo: int,
+    valor_medido: float,
+    reglas: ReglasCondicion,
+    parametro: str,
+    fecha_generacion: datetime
+) -> Alerta:
+    limite_min, limite_max = reglas.limites(parametro)
+    return Alerta(
+        id_producto_monitoreado=id_producto_monitoreado,
+        id_dato_monitoreo=id_dato_monitoreo,
+        id_condicion=reglas.id,
+        parametro_afectado=parametro,
+        valor_medido=valor_medido,
+        limite_min=limite_min,
+        limite_max=limite_max,
+        mensaje=f"¡Alerta! {parametro.capitalize()} fuera de rango",
+        fecha_generacion=fecha_generacion,
+        estado=EstadoAlerta.PENDIENTE
+    )
+
+def evaluar_alertas_lote(
+    session: Session,
+    id_producto_monitoreado: int,
+    condicion: Union[CondicionAlmacenamiento, ReglasCondicion],
+    datos: List[DatoMonitoreo]
+) -> List[Alerta]:
+    """
+    Evalúa alertas para un lote de lecturas en memoria y en orden temporal.
+
+    Equivale a llamar crear_alerta por cada dato, pero parte del índice de
+    alertas PENDIENTES y no hace commit: el llamador confirma lecturas y
+    alertas en una sola transacción (el índice se actualiza en ese commit).
+
+    Las fechas de generación, resolución y duración se toman de la fecha
+    de cada lectura (timestamp del dispositivo), no de la hora del servidor.
+    Las excursiones de todo el lote se calculan de una vez (matriz
+    lecturas × parámetros) y solo se recorren en Python las lecturas en las
+    que cambia el conjunto de parámetros fuera de rango: en las demás no
+    se abre ni se cierra nada.
+
+    Args:
+        session: Sesión de base de datos
+        id_producto_monitoreado: Producto con monitoreo activo
+        condicion: Condición de almacenamiento del producto (o sus reglas compiladas)
+        datos: Lecturas ya insertadas (con id), ordenadas por fecha
+
+    Returns:
+        Lista de alertas nuevas del lote (abiertas o ya resueltas)
+    """
+    # parametro → AlertaPendiente (ya en BD) o Alerta (nueva en este lote)
+    pendientes = indice_alertas.pendientes_de(id_producto_monitoreado)
+    nuevas = []
+    cierres = []
 
-    for param in ["temperatura", "humedad", "lux", "presion"]:
-        valor = getattr(dato, param)
-        min_val = getattr(condicion, f"{param}_min")
-        max_val = getattr(condicion, f"{param}_max")
+    reglas = _reglas(condicion)
+    excursiones = reglas.excursiones(matriz_lecturas(datos))
+    # Primera lectura y cada cambio respecto de la anterior
+    transiciones = np.flatnonzero(
+        np.concatenate(([True], (excursiones[1:] != excursiones[:-1]).any(axis=1)))
+    ) if datos else []
 
-        if valor < min_val or valor > max_val:
-            parametros_fuera_rango.append(param)
+    for i in transiciones:
+        dato = datos[i]
+        parametros_problematicos = [PARAMETROS[j] for j in np.flatnonzero(excursiones[i])]
+
+        # Cerrar alertas de parámetros que volvieron a la normalidad
+        for parametro in [p for p in pendientes if p not in parametros_problematicos]:
+            alerta = pendientes.pop(parametro)
+            duracion = (dato.fecha - alerta.fecha_generacion).total_seconds() / 60
+            if isinstance(alerta, Alerta):
+                alerta.estado = EstadoAlerta.RESUELTA
+                alerta.fecha_resolucion = dato.fecha
+                alerta.duracion_minutos = duracion
+            else:
+                cierres.append({
+                    "id": alerta.id,
+                    "estado": EstadoAlerta.RESUELTA,
+                    "fecha_resolucion": dato.fecha,
+                    "duracion_minutos": duracion
+                })
+                indice_alertas.programar_baja(session, id_producto_monitoreado, parametro)
+
+        for parametro in parametros_problematicos:
+            if parametro in pendientes:
+                continue
+            alerta = _nueva_alerta(
+                id_producto_monitoreado, dato.id, getattr(dato, parametro), reglas, parametro, dato.fecha
+            )
+            session.add(alerta)
+            nuevas.append(alerta)
+            pendientes[parametro] = alerta
+
+    if cierres:
+        session.execute(update(Alerta), cierres)
+
+    if nuevas:
+        session.flush()
+
+    # Solo las alertas nuevas que siguen abiertas al final del lote entran al índice
+    _programar_altas(session, [a for a in nuevas if a.estado == EstadoAlerta.PENDIENTE])
+
+    return nuevas
+
+def eliminar_alertas_resueltas(session: Session, id_producto_monitoreado: int, hasta: datetime) -> int:
+    """
+    Borra (sin commit) las alertas RESUELTAS de parámetros del producto
+    generadas hasta `hasta`, antes de recalcularlas. Las PENDIENTES (las
+    lleva la ingesta en vivo) y las de sensores no disponibles se conservan.
+    """
+    resultado = session.execute(
+        delete(Alerta)
+        .where(Alerta.id_producto_monitoreado == id_producto_monitoreado)
+        .where(Alerta.parametro_afectado.in_(PARAMETROS))
+        .where(Alerta.estado == EstadoAlerta.RESUELTA)
+        .where(Alerta.fecha_generacion <= hasta)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount
 
-    return parametros_fuera_rango
+def registrar_excursiones(
+    session: Session,
+    id_producto_monitoreado: int,
+    reglas: ReglasCondicion,
+    excursiones: List[tuple[str, int, float, datetime, Optional[datetime]]]
+) -> List[Alerta]:
+    """
+    Registra (sin commit) alertas de excursiones ya calculadas sobre lecturas
+    guardadas: (parametro, id_dato_monitoreo, valor_medido, fecha_generacion,
+    fecha_resolucion). Con fecha_resolucion la alerta se guarda RESUELTA; sin
+    ella queda PENDIENTE y entra al índice en el commit.
+    """
+    alertas = []
+    for parametro, id_dato_monitoreo, valor_medido, fecha_generacion, fecha_resolucion in excursiones:
+        alerta = _nueva_alerta(
+            id_producto_monitoreado, id_dato_monitoreo, valor_medido, reglas, parametro, fecha_generacion
+        )
+        if fecha_resolucion is not None:
+            alerta.estado = EstadoAlerta.RESUELTA
+            alerta.fecha_resolucion = fecha_resolucion
+            alerta.duracion_minutos = (fecha_resolucion - fecha_generacion).total_seconds() / 60
+        alertas.append(alerta)
+    session.add_all(alertas)
+    _programar_altas(session, [a for a in alertas if a.estado == EstadoAlerta.PENDIENTE])
+    return alertas
 
 def crear_alerta_sensor_no_disponible(session: Session, sensores_fallidos: list[str] = None, mensaje_error: str = None) -> List[Alerta]:
     """
@@ -112,25 +332,16 @@ def crear_alerta_sensor_no_disponible(session: Session, sensores_fallidos: list[
         Si falla solo el sensor de humedad → Alerta "Sensor de humedad no disponible"
         Si fallan todos → Alerta "NodeMCU no disponible"
     """
-    from core.models.productomonitoreado import ProductoMonitoreado
-    from core.models.productofarmaceutico import ProductoFarmaceutico
-
     # Si todos los sensores críticos fallaron (NodeMCU completo caído)
     sensores_criticos = ['temperatura', 'humedad']
     nodemcu_completo_fallado = sensores_fallidos is None or all(s in sensores_fallidos for s in sensores_criticos)
 
-    # Obtener todos los productos con monitoreo activo
-    stmt = (
-        select(ProductoMonitoreado, ProductoFarmaceutico, CondicionAlmacenamiento)
-        .join(ProductoFarmaceutico, ProductoMonitoreado.id_producto == ProductoFarmaceutico.id)
-        .join(CondicionAlmacenamiento, ProductoFarmaceutico.id_condicion == CondicionAlmacenamiento.id)
-        .where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None)
-    )
-
-    resultados = session.exec(stmt).all()
+    # Producto con monitoreo activo (contexto cacheado, sin JOIN por lectura)
+    contexto = obtener_contexto_activo(session)
+    resultados = [(contexto.id_producto_monitoreado, contexto.condicion)] if contexto else []
     alertas_creadas = []
 
-    for pm, pf, cond in resultados:
+    for pm_id, cond in resultados:
         # Determinar qué alertas crear según los sensores fallidos
         if nodemcu_completo_fallado:
             # NodeMCU completo caído
@@ -138,16 +349,11 @@ def crear_alerta_sensor_no_disponible(session: Session, sensores_fallidos: list[
             mensaje = f"🚨 NodeMCU no disponible - Verificar hardware" + (f": {mensaje_error}" if mensaje_error else "")
 
             # Verificar si ya existe esta alerta
-            alerta_existente = session.exec(
-                select(Alerta)
-                .where(Alerta.id_producto_monitoreado == pm.id)
-                .where(Alerta.parametro_afectado == parametro)
-                .where(Alerta.estado == EstadoAlerta.PENDIENTE)
-            ).first()
+            alerta_existente = indice_alertas.obtener(pm_id, parametro)
 
             if not alerta_existente:
                 nueva_alerta = Alerta(
-                    id_producto_monitoreado=pm.id,
+                    id_producto_monitoreado=pm_id,
                     id_dato_monitoreo=None,
                     id_condicion=cond.id,
                     parametro_afectado=parametro,
@@ -159,8 +365,8 @@ def crear_alerta_sensor_no_disponible(session: Session, sensores_fallidos: list[
                     estado=EstadoAlerta.PENDIENTE
                 )
                 session.add(nueva_alerta)
+                _programar_altas(session, [nueva_alerta])
                 session.commit()
-                session.refresh(nueva_alerta)
                 alertas_creadas.append(nueva_alerta)
         else:
             # Sensores específicos fallados
@@ -169,29 +375,24 @@ def crear_alerta_sensor_no_disponible(session: Session, sensores_fallidos: list[
                 mensaje = f"⚠️ Sensor de {sensor} no disponible - Revisar hardware"
 
                 # Verificar si ya existe esta alerta para este sensor específico
-                alerta_existente = session.exec(
-                    select(Alerta)
-                    .where(Alerta.id_producto_monitoreado == pm.id)
-                    .where(Alerta.parametro_afectado == parametro)
-                    .where(Alerta.estado == EstadoAlerta.PENDIENTE)
-                ).first()
+                alerta_existente = indice_alertas.obtener(pm_id, parametro)
 
                 if not alerta_existente:
                     nueva_alerta = Alerta(
-                        id_producto_monitoreado=pm.id,
+                        id_producto_monitoreado=pm_id,
                         id_dato_monitoreo=None,
                         id_condicion=cond.id,
                         parametro_afectado=parametro,
                         valor_medido=0.0,
-                        limite_min=getattr(condicion, f"{sensor}_min") if hasattr(condicion, f"{sensor}_min") else 0.0,
-                        limite_max=getattr(condicion, f"{sensor}_max") if hasattr(condicion, f"{sensor}_max") else 0.0,
+                        limite_min=getattr(cond, f"{sensor}_min") if hasattr(cond, f"{sensor}_min") else 0.0,
+                        limite_max=getattr(cond, f"{sensor}_max") if hasattr(cond, f"{sensor}_max") else 0.0,
                         mensaje=mensaje,
                         fecha_generacion=get_caracas_now(),
                         estado=EstadoAlerta.PENDIENTE
                     )
                     session.add(nueva_alerta)
+                    _programar_altas(session, [nueva_alerta])
                     session.commit()
-                    session.refresh(nueva_alerta)
                     alertas_creadas.append(nueva_alerta)
 
     return alertas_creadas
@@ -269,7 +470,41 @@ def cerrar_alerta_sensor_no_disponible(session: Session) -> int:
             get_caracas_now() - alerta.fecha_generacion
         ).total_seconds() / 60
         alerta.mensaje = "✅ Sensor NodeMCU restaurado - Monitoreo normal"
+        indice_alertas.programar_baja(session, alerta.id_producto_monitoreado, alerta.parametro_afectado)
         count += 1
 
     session.commit()
-    return count
\ No newline at end of file
+    return count
+
+
+# ============================================================
+# Variantes async (AsyncSession)
+# La lógica de apertura / cierre se comparte con las versiones síncronas
+# vía run_sync: se ejecuta sobre la sesión síncrona interna, cediendo el
+# event loop en cada E/S, y los hooks de commit del índice de pendientes
+# siguen funcionando igual.
+# ============================================================
+
+async def get_alertas_async(session: AsyncSession):
+    return (await session.exec(select(Alerta))).all()
+
+async def crear_alerta_async(
+    session: AsyncSession,
+    dato: DatoMonitoreo,
+    contexto: Optional[ContextoMonitoreo] = None
+) -> List[Alerta]:
+    return await session.run_sync(crear_alerta, dato, contexto)
+
+async def evaluar_alerta_async(
+    session: AsyncSession,
+    dato: DatoMonitoreo,
+    contexto: Optional[ContextoMonitoreo] = None
+) -> List[Alerta]:
+    return await session.run_sync(evaluar_alerta, dato, contexto)
+
+async def crear_alerta_sensor_no_disponible_async(
+    session: AsyncSession,
+    sensores_fallidos: list[str] = None,
+    mensaje_error: str = None
+) -> List[Alerta]:
+    return await session.run_sync(crear_alerta_sensor_no_disponible, sensores_fallidos, mensaje_error)
@@ -0,0 +1,177 @@
+"""
+Sesiones de monitoreo archivadas (tabla archivomonitoreo).
+
+Una sesión archivada no tiene filas en datomonitoreo: sus lecturas viven en
+un blob comprimido (core/utils/archivo_utils.py). dato_monitoreo_repository
+consulta aquí cuando la tabla caliente no devuelve nada, así que los
+endpoints de lecturas, agregados y exportaciones las siguen sirviendo.
+
+Los blobs decodificados se guardan en un LRU acotado a
+ARCHIVO_CACHE_LECTURAS lecturas entre todas las sesiones: paginar una
+sesión archivada no la descomprime en cada página.
+"""
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from typing import Optional, Sequence
+from sqlmodel import Session, delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config import Config
+from core.models.archivomonitoreo import ArchivoMonitoreo
+from core.models.datomonitoreo import DatoMonitoreo
+from core.utils.datetime_utils import to_caracas_naive
+from core.utils.archivo_utils import CODEC, COLUMNAS_ARCHIVO, VERSION, Empaquetador, desempaquetar
+from core.utils.paginacion_utils import Cursor
+
+
+def get_archivo(session: Session, id_producto_monitoreado: int) -> Optional[ArchivoMonitoreo]:
+    return session.get(ArchivoMonitoreo, id_producto_monitoreado)
+
+
+def _consulta_archivos_en_rango(desde: datetime, hasta: Optional[datetime]):
+    consulta = select(ArchivoMonitoreo).where(ArchivoMonitoreo.fecha_fin >= desde)
+    if hasta is not None:
+        consulta = consulta.where(ArchivoMonitoreo.fecha_inicio <= hasta)
+    return consulta
+
+
+def get_archivos_en_rango(session: Session, desde: datetime, hasta: Optional[datetime]) -> list[ArchivoMonitoreo]:
+    """Sesiones archivadas con alguna lectura entre desde y hasta"""
+    return list(session.exec(_consulta_archivos_en_rango(desde, hasta)).all())
+
+
+def crear_archivo(session: Session, id_producto_monitoreado: int, empaquetador: Empaquetador) -> ArchivoMonitoreo:
+    """
+    Guarda las lecturas empaquetadas de una sesión (no hace commit ni borra
+    las filas).
+
+    Args:
+        empaquetador: Con las lecturas de la sesión agregadas; al menos una
+    """
+    datos = empaquetador.empaquetar()
+    archivo = ArchivoMonitoreo(
+        id_producto_monitoreado=id_producto_monitoreado,
+        cantidad=len(empaquetador),
+        fecha_inicio=empaquetador.primera_fecha,
+        fecha_fin=empaquetador.ultima_fecha,
+        id_ultima_lectura=empaquetador.ids[-1],
+        codec=CODEC,
+        version=VERSION,
+        tamano_bytes=len(datos),
+        datos=datos,
+    )
+    session.add(archivo)
+    return archivo
+
+
+def eliminar_archivos(session: Session, ids_productos_monitoreados: list[int]) -> None:
+    """Borra los archivos de productos monitoreados (no hace commit)"""
+    session.exec(delete(ArchivoMonitoreo).where(
+        ArchivoMonitoreo.id_producto_monitoreado.in_(ids_productos_monitoreados)
+    ))
+
+
+class _CacheArchivos:
+    """
+    LRU de archivos decodificados acotado por cantidad de lecturas, no de
+    sesiones. Un archivo más grande que la capacidad se decodifica sin
+    guardarse. Los archivos no cambian: la clave no incluye el blob.
+    """
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self._archivos: OrderedDict[tuple, tuple[tuple, ...]] = OrderedDict()
+        self._lecturas = 0
+        self._lock = Lock()
+
+    def filas(self, archivo: ArchivoMonitoreo) -> tuple[tuple, ...]:
+        clave = (archivo.id_producto_monitoreado, archivo.id_ultima_lectura, archivo.cantidad, archivo.tamano_bytes)
+        with self._lock:
+            filas = self._archivos.get(clave)
+            if filas is not None:
+                self._archivos.move_to_end(clave)
+                return filas
+
+        filas = tuple(desempaquetar(archivo.datos))
+        if len(filas) > self.capacidad:
+            return filas
+        with self._lock:
+            if clave not in self._archivos:
+                self._archivos[clave] = filas
+                self._lecturas += len(filas)
+            while self._lecturas > self.capacidad:
+                _, desalojadas = self._archivos.popitem(last=False)
+                self._lecturas -= len(desalojadas)
+        return filas
+
+
+_cache = _CacheArchivos(Config.ARCHIVO_CACHE_LECTURAS)
+
+
+def _clave(fila: tuple) -> Cursor:
+    return fila[1], fila[0]
+
+
+def lecturas_de_archivo(
+    archivo: ArchivoMonitoreo,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[Cursor] = None,
+    limite: Optional[int] = None,
+    descendente: bool = True
+) -> list[tuple]:
+    """
+    Lecturas archivadas (tuplas con COLUMNAS_ARCHIVO) entre desde y hasta,
+    con las mismas reglas que la paginación por keyset de datomonitoreo:
+    orden (fecha DESC, id DESC) y solo las anteriores al cursor. Las filas
+    ya están ordenadas, así que los límites salen por búsqueda binaria.
+
+    Con descendente=False: orden cronológico y, con cursor, solo las
+    posteriores (exportaciones, recálculo de alertas).
+
+    Las fechas archivadas no tienen zona: un límite con zona se convierte
+    a hora de Caracas antes de compararlo.
+    """
+    desde = to_caracas_naive(desde) if desde is not None else None
+    hasta = to_caracas_naive(hasta) if hasta is not None else None
+    filas = _cache.filas(archivo)
+    inicio = bisect_left(filas, desde, key=lambda fila: fila[1]) if desde is not None else 0
+    fin = bisect_right(filas, hasta, key=lambda fila: fila[1]) if hasta is not None else len(filas)
+    if not descendente:
+        if cursor is not None:
+            inicio = max(inicio, bisect_right(filas, cursor, key=_clave))
+        if limite is not None:
+            fin = min(fin, inicio + limite)
+        return list(filas[inicio:fin])
+
+    if cursor is not None:
+        fin = min(fin, bisect_left(filas, cursor, key=_clave))
+    if limite is not None:
+        inicio = max(inicio, fin - limite)
+    return list(reversed(filas[inicio:fin]))
+
+
+def a_datos_monitoreo(archivo: ArchivoMonitoreo, filas: Sequence[tuple]) -> list[DatoMonitoreo]:
+    """Tuplas archivadas → DatoMonitoreo (sin sesión) para las respuestas de la API"""
+    return [
+        DatoMonitoreo(id_producto_monitoreado=archivo.id_producto_monitoreado, **dict(zip(COLUMNAS_ARCHIVO, fila)))
+        for fila in filas
+    ]
+
+
+# ============================================================
+# Variantes async (AsyncSession)
+# ============================================================
+
+async def get_archivo_async(session: AsyncSession, id_producto_monitoreado: int) -> Optional[ArchivoMonitoreo]:
+    return await session.get(ArchivoMonitoreo, id_producto_monitoreado)
+
+
+async def get_archivos_en_rango_async(
+    session: AsyncSession,
+    desde: datetime,
+    hasta: Optional[datetime]
+) -> list[ArchivoMonitoreo]:
+    resultado = await session.exec(_consulta_archivos_en_rango(desde, hasta))
+    return list(resultado.all())
@@ -1,11 +1,14 @@
 from fastapi import Depends
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy import select, exists
 
 from core.models.condicionalmacenamiento import CondicionAlmacenamiento
 from core.models.productofarmaceutico import ProductoFarmaceutico
+from core.models.productomonitoreado import ProductoMonitoreado
 from core.models.usuario import UserRead
 from core.ports.registro_port import RegistroPort
+from core.repositories.contexto_monitoreo_repository import invalidar_contexto
 
 
 def get_condiciones(session: Session):
@@ -88,6 +91,7 @@ def update_condicion(
     )
     
     session.commit()
+    invalidar_contexto()
     session.refresh(condicion)
     
     return condicion
@@ -120,3 +124,23 @@ def delete_condicion(
     )
     
     session.commit()
+    invalidar_contexto()
+
+
+def _consulta_condicion_de_producto_monitoreado(id_producto_monitoreado: int):
+    return (
+        select(CondicionAlmacenamiento)
+        .join(ProductoFarmaceutico, ProductoFarmaceutico.id_condicion == CondicionAlmacenamiento.id)
+        .join(ProductoMonitoreado, ProductoMonitoreado.id_producto == ProductoFarmaceutico.id)
+        .where(ProductoMonitoreado.id == id_producto_monitoreado)
+    )
+
+
+def get_condicion_de_producto_monitoreado(session: Session, id_producto_monitoreado: int):
+    """Condición de almacenamiento de un producto monitoreado (activo o finalizado), o None"""
+    return session.exec(_consulta_condicion_de_producto_monitoreado(id_producto_monitoreado)).scalars().first()
+
+
+async def get_condicion_de_producto_monitoreado_async(session: AsyncSession, id_producto_monitoreado: int):
+    resultado = await session.exec(_consulta_condicion_de_producto_monitoreado(id_producto_monitoreado))
+    return resultado.scalars().first()
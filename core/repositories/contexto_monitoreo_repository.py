@@ -0,0 +1,160 @@
+"""
+Caché en proceso del "contexto de monitoreo activo".
+
+El contexto es el ProductoMonitoreado activo junto con los límites de su
+CondicionAlmacenamiento y sus reglas (límites y bandas de advertencia del
+LED) ya compiladas.
+Antes se obtenía con el mismo JOIN varias veces por lectura (ingesta, alertas
+de sensores y LED); ahora se carga una vez y se reutiliza hasta que algo
+que lo afecta lo invalida explícitamente:
+
+- create_producto_monitoreado / stop_producto_monitoreado
+- update_condicion / delete_condicion
+- update_producto (puede cambiar la condición del producto)
+"""
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Optional
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.models.condicionalmacenamiento import CondicionAlmacenamiento
+from core.models.productofarmaceutico import ProductoFarmaceutico
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.utils.reglas_utils import PARAMETROS, ReglasCondicion, compilar_reglas
+
+# HISTÉRESIS del LED: umbrales diferentes para evitar parpadeo
+WARNING_THRESHOLD_ON = 0.90   # 90% - Para encender amarillo
+WARNING_THRESHOLD_OFF = 0.85  # 85% - Para apagar amarillo
+
+
+@dataclass(frozen=True)
+class LimitesCondicion:
+    """
+    Copia inmutable de una CondicionAlmacenamiento.
+
+    Mantiene los mismos nombres de atributo (temperatura_min, ...) para que
+    funciones como verificar_parametros la acepten igual que al modelo ORM,
+    sin riesgo de lazy-loads sobre una sesión cerrada.
+    """
+    id: int
+    nombre: str
+    temperatura_min: float
+    temperatura_max: float
+    humedad_min: float
+    humedad_max: float
+    lux_min: float
+    lux_max: float
+    presion_min: float
+    presion_max: float
+
+
+@dataclass(frozen=True)
+class ContextoMonitoreo:
+    id_producto_monitoreado: int
+    id_producto: int
+    condicion: LimitesCondicion
+    # Límites y bandas de advertencia (ambos umbrales del LED) ya compilados
+    reglas: ReglasCondicion
+
+
+_SIN_CARGAR = object()
+_contexto = _SIN_CARGAR
+_version = 0  # Se incrementa en cada invalidación
+_lock = Lock()
+_observadores: list[Callable[[], None]] = []
+
+
+def obtener_contexto_activo(session: Session) -> Optional[ContextoMonitoreo]:
+    """
+    Retorna el contexto del monitoreo activo, consultando la BD solo si
+    la caché está vacía. Retorna None si no hay producto activo (y también
+    cachea ese resultado).
+    """
+    global _contexto
+    contexto = _contexto
+    if contexto is not _SIN_CARGAR:
+        return contexto
+
+    # La consulta se hace sin tomar el lock: desde AsyncSession.run_sync la
+    # E/S cede el event loop y otra petición del mismo hilo se bloquearía
+    # esperando un lock que nunca se libera. Si hubo una invalidación
+    # mientras tanto, el resultado se usa pero no se cachea.
+    version = _version
+    contexto = _cargar_contexto(session)
+    with _lock:
+        if _version == version and _contexto is _SIN_CARGAR:
+            _contexto = contexto
+    return contexto
+
+
+def obtener_contexto_de_producto(
+    session: Session,
+    id_producto_monitoreado: Optional[int] = None
+) -> Optional[ContextoMonitoreo]:
+    """
+    Contexto para un dispositivo asociado a un ProductoMonitoreado.
+
+    Sin asociación (None) el dispositivo reporta al monitoreo activo. Si está
+    asociado a otro producto (ya finalizado o aún no activo) retorna None y
+    sus lecturas no se guardan ni generan alertas.
+    """
+    contexto = obtener_contexto_activo(session)
+    if contexto is None or id_producto_monitoreado in (None, contexto.id_producto_monitoreado):
+        return contexto
+    return None
+
+
+async def obtener_contexto_de_producto_async(
+    session: AsyncSession,
+    id_producto_monitoreado: Optional[int] = None
+) -> Optional[ContextoMonitoreo]:
+    """Versión async (vía run_sync): con la caché cargada no hace E/S"""
+    return await session.run_sync(obtener_contexto_de_producto, id_producto_monitoreado)
+
+
+def invalidar_contexto(propagar: bool = True) -> None:
+    """
+    Descarta el contexto cacheado; la próxima lectura lo recarga de la BD.
+
+    Con propagar=True avisa a los observadores (el estado compartido lo
+    reenvía a los demás workers); quien recibe ese aviso invalida con
+    propagar=False.
+    """
+    global _contexto, _version
+    with _lock:
+        _contexto = _SIN_CARGAR
+        _version += 1
+    if propagar:
+        for observador in _observadores:
+            observador()
+
+
+def al_invalidar_contexto(observador: Callable[[], None]) -> None:
+    """Registra un callback que se llama en cada invalidar_contexto() local"""
+    _observadores.append(observador)
+
+
+def _cargar_contexto(session: Session) -> Optional[ContextoMonitoreo]:
+    stmt = (
+        select(ProductoMonitoreado, CondicionAlmacenamiento)
+        .join(ProductoFarmaceutico, ProductoMonitoreado.id_producto == ProductoFarmaceutico.id)
+        .join(CondicionAlmacenamiento, ProductoFarmaceutico.id_condicion == CondicionAlmacenamiento.id)
+        .where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None)
+    )
+    resultado = session.exec(stmt).first()
+    if not resultado:
+        return None
+
+    pm, condicion = resultado
+    limites = LimitesCondicion(
+        id=condicion.id,
+        nombre=condicion.nombre,
+        **{f"{p}_{lado}": getattr(condicion, f"{p}_{lado}") for p in PARAMETROS for lado in ('min', 'max')}
+    )
+
+    return ContextoMonitoreo(
+        id_producto_monitoreado=pm.id,
+        id_producto=pm.id_producto,
+        condicion=limites,
+        reglas=compilar_reglas(limites, (WARNING_THRESHOLD_ON, WARNING_THRESHOLD_OFF))
+    )
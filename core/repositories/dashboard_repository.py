@@ -1,4 +1,5 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.sql import func
 from core.models.usuario import Usuario
 from core.models.productofarmaceutico import ProductoFarmaceutico
@@ -58,4 +59,65 @@ def get_ultimos_usuarios(session: Session, limit: int = 10):
         select(Usuario)
         .order_by(Usuario.fecha.desc())
         .limit(limit)
-    ).all()
\ No newline at end of file
+    ).all()
+
+
+# ============================================================
+# Variantes async (AsyncSession) para los endpoints del dashboard
+# ============================================================
+
+async def get_dashboard_metrics_async(session: AsyncSession):
+    """Mismas consultas que get_dashboard_metrics, sin bloquear el event loop"""
+    usuarios_registrados = (await session.exec(
+        select(func.count()).select_from(Usuario)
+    )).one()
+
+    productos_inventario = (await session.exec(
+        select(func.count()).select_from(ProductoFarmaceutico)
+    )).one()
+
+    alertas_activas = (await session.exec(
+        select(func.count())
+        .where(Alerta.estado == EstadoAlerta.PENDIENTE)
+        .select_from(Alerta)
+    )).one()
+
+    monitoreos_activos = (await session.exec(
+        select(func.count())
+        .where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None)
+    )).one()
+
+    return {
+        "usuarios_registrados": usuarios_registrados or 0,
+        "productos_inventario": productos_inventario or 0,
+        "alertas_activas": alertas_activas or 0,
+        "monitoreos_activos": monitoreos_activos or 0
+    }
+
+
+async def get_usuarios_test_async(session: AsyncSession):
+    return (await session.exec(select(func.count()).select_from(Usuario))).one()
+
+async def get_ultimos_productos_async(session: AsyncSession):
+    resultado = await session.exec(
+        select(ProductoFarmaceutico)
+        .order_by(ProductoFarmaceutico.id.desc())
+        .limit(3)
+    )
+    return resultado.all()
+
+async def get_ultimos_registros_async(session: AsyncSession, limit: int = 10):
+    resultado = await session.exec(
+        select(Registro)
+        .order_by(Registro.fecha.desc())
+        .limit(limit)
+    )
+    return resultado.all()
+
+async def get_ultimos_usuarios_async(session: AsyncSession, limit: int = 10):
+    resultado = await session.exec(
+        select(Usuario)
+        .order_by(Usuario.fecha.desc())
+        .limit(limit)
+    )
+    return resultado.all()
@@ -1,26 +1,458 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import Engine, Row, func, insert, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine
+from datetime import datetime, timedelta
+from heapq import merge
+from itertools import islice
+from typing import AsyncIterator, Iterator, Optional
+from config import Config
+from core.models.archivomonitoreo import ArchivoMonitoreo
 from core.models.datomonitoreo import DatoMonitoreo
+from core.models.kpimonitoreo import KpiMonitoreo
+from core.repositories.archivo_monitoreo_repository import (
+    a_datos_monitoreo,
+    get_archivo,
+    get_archivo_async,
+    get_archivos_en_rango,
+    get_archivos_en_rango_async,
+    lecturas_de_archivo
+)
+from core.repositories.contexto_monitoreo_repository import PARAMETROS
+from core.utils.datetime_utils import get_caracas_now
+from core.utils.paginacion_utils import Cursor
 from passlib.context import CryptContext  # Asegúrate de tener esta librería para encriptar contraseñas
 
+# Todas las consultas llevan un rango de fecha: en PostgreSQL datomonitoreo
+# está particionada por mes (adapters/db/particiones.py) y el predicado deja
+# que el planificador lea solo las particiones del rango.
+#
+# Las sesiones archivadas (archivo_monitoreo_repository) ya no tienen filas
+# en datomonitoreo: cuando la tabla no devuelve nada para un producto se
+# lee su archivo, y el listado general combina los archivos del rango.
+
+# Columnas de las exportaciones (iterar_datos_sesion)
+COLUMNAS_EXPORTACION = ('id', 'fecha') + PARAMETROS
+
+# Filas por lote al recorrer una sesión con cursor del servidor
+TAMANO_LOTE_EXPORTACION = 2000
+
+
+def rango_por_defecto(desde: Optional[datetime], hasta: Optional[datetime]) -> tuple[datetime, Optional[datetime]]:
+    """Sin desde: los últimos DATOS_VENTANA_DIAS días"""
+    if desde is None:
+        desde = (hasta or get_caracas_now()) - timedelta(days=Config.DATOS_VENTANA_DIAS)
+    return desde, hasta
+
+
+def _consulta_rango_producto(id: int):
+    return select(func.min(DatoMonitoreo.fecha), func.max(DatoMonitoreo.fecha)).where(
+        DatoMonitoreo.id_producto_monitoreado == id
+    )
+
+
+def rango_de_producto(session: Session, id: int) -> tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Primera y última lectura de un producto monitoreado ((None, None) si no
+    tiene). Se usa como rango por defecto: no se puede deducir de
+    fecha_inicio_monitoreo (se guarda en UTC, las lecturas en hora de
+    Caracas, y las cargas simuladas o por lotes pueden ser anteriores).
+    Cuesta una búsqueda en el índice (id_producto_monitoreado, fecha) por partición.
+    """
+    primera, ultima = session.exec(_consulta_rango_producto(id)).one()
+    if primera is None:
+        return _rango_de_archivo(get_archivo(session, id))
+    return primera, ultima
 
-def get_datosmonitoreo(session: Session):
-    return session.exec(
-        select(DatoMonitoreo)
-        .order_by(DatoMonitoreo.fecha.desc())
-        # .limit(30)
-    ).all()
 
+async def rango_de_producto_async(session: AsyncSession, id: int) -> tuple[Optional[datetime], Optional[datetime]]:
+    resultado = await session.exec(_consulta_rango_producto(id))
+    primera, ultima = resultado.one()
+    if primera is None:
+        return _rango_de_archivo(await get_archivo_async(session, id))
+    return primera, ultima
 
-def get_datosmonitoreo_by_id(session: Session, id: int):
-    return session.exec(
-        select(DatoMonitoreo)
+
+def _rango_de_archivo(archivo: Optional[ArchivoMonitoreo]) -> tuple[Optional[datetime], Optional[datetime]]:
+    return (archivo.fecha_inicio, archivo.fecha_fin) if archivo else (None, None)
+
+
+def _consulta_ultima_lectura(id: int, fecha: datetime):
+    return (
+        select(DatoMonitoreo.id)
+        .where(DatoMonitoreo.id_producto_monitoreado == id)
+        .where(DatoMonitoreo.fecha == fecha)
+        .order_by(DatoMonitoreo.id.desc())
+        .limit(1)
+    )
+
+
+def get_version_lecturas(session: Session, id: int, ultima: Optional[datetime]) -> tuple[int, Optional[int]]:
+    """
+    Versión de las lecturas de un producto monitoreado para claves de caché
+    sin recorrer la sesión: (id de la lectura más reciente, lecturas
+    acumuladas en sus indicadores). Con el rango (rango_de_producto) cambia
+    con cada lectura insertada, también las atrasadas (suman a
+    kpimonitoreo.cantidad), y con las borradas por retención.
+
+    Mientras los indicadores esperan reconstrucción la cantidad es None: una
+    lectura atrasada se refleja al terminar la reconstrucción.
+
+    Args:
+        ultima: Fecha de la lectura más reciente (rango_de_producto)
+    """
+    if ultima is None:
+        return 0, 0
+    id_ultima = session.exec(_consulta_ultima_lectura(id, ultima)).first()
+    if id_ultima is None:
+        archivo = get_archivo(session, id)
+        return (archivo.id_ultima_lectura, archivo.cantidad) if archivo else (0, 0)
+    kpi = session.get(KpiMonitoreo, id)
+    return id_ultima, (kpi.cantidad if kpi is not None and not kpi.pendiente else None)
+
+
+def _consulta_pagina(
+    desde: datetime,
+    hasta: Optional[datetime],
+    cursor: Optional[Cursor],
+    limite: Optional[int]
+):
+    """
+    Lecturas en orden (fecha DESC, id DESC) dentro del rango, a partir del
+    cursor (keyset). Con los índices (fecha, id) y (id_producto_monitoreado,
+    fecha, id) cada página es un recorrido de rango del índice.
+    """
+    consulta = select(DatoMonitoreo).where(DatoMonitoreo.fecha >= desde)
+    if hasta is not None:
+        consulta = consulta.where(DatoMonitoreo.fecha <= hasta)
+    if cursor is not None:
+        fecha_cursor, id_cursor = cursor
+        consulta = (
+            consulta
+            .where(DatoMonitoreo.fecha <= fecha_cursor)  # Redundante, permite descartar particiones
+            .where(tuple_(DatoMonitoreo.fecha, DatoMonitoreo.id) < tuple_(fecha_cursor, id_cursor))
+        )
+    consulta = consulta.order_by(DatoMonitoreo.fecha.desc(), DatoMonitoreo.id.desc())
+    if limite is not None:
+        consulta = consulta.limit(limite)
+    return consulta
+
+
+def _combinar_archivados(
+    filas: list[DatoMonitoreo],
+    archivos: list[ArchivoMonitoreo],
+    desde: datetime,
+    hasta: Optional[datetime],
+    cursor: Optional[Cursor],
+    limite: Optional[int]
+) -> list[DatoMonitoreo]:
+    """Mezcla la página de datomonitoreo con las de los archivos, en el mismo orden (fecha DESC, id DESC)"""
+    if not archivos:
+        return filas
+    paginas = [
+        a_datos_monitoreo(archivo, lecturas_de_archivo(archivo, desde, hasta, cursor, limite))
+        for archivo in archivos
+    ]
+    combinadas = merge(filas, *paginas, key=lambda dato: (dato.fecha, dato.id), reverse=True)
+    return list(islice(combinadas, limite))
+
+
+def _pagina_de_archivo(
+    archivo: Optional[ArchivoMonitoreo],
+    desde: Optional[datetime],
+    hasta: Optional[datetime],
+    cursor: Optional[Cursor],
+    limite: Optional[int]
+) -> list[DatoMonitoreo]:
+    if archivo is None:
+        return []
+    return a_datos_monitoreo(archivo, lecturas_de_archivo(archivo, desde, hasta, cursor, limite))
+
+
+def get_datosmonitoreo(
+    session: Session,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[Cursor] = None,
+    limite: Optional[int] = None
+):
+    desde, hasta = rango_por_defecto(desde, hasta)
+    filas = list(session.exec(_consulta_pagina(desde, hasta, cursor, limite)).all())
+    return _combinar_archivados(filas, get_archivos_en_rango(session, desde, hasta), desde, hasta, cursor, limite)
+
+
+def get_datosmonitoreo_by_id(
+    session: Session,
+    id: int,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[Cursor] = None,
+    limite: Optional[int] = None
+):
+    """
+    Lecturas de un producto monitoreado; sin desde, desde su primera lectura.
+    Si la tabla no tiene ninguna, se leen de su archivo (sesión archivada).
+    """
+    if desde is None:
+        desde, _ = rango_de_producto(session, id)
+        if desde is None:
+            return []
+    filas = session.exec(
+        _consulta_pagina(desde, hasta, cursor, limite)
         .where(DatoMonitoreo.id_producto_monitoreado == id)
-        .order_by(DatoMonitoreo.fecha.desc())
-        # .limit(30)
     ).all()
+    return filas or _pagina_de_archivo(get_archivo(session, id), desde, hasta, cursor, limite)
+
+def _consulta_sesion(id: int, desde: datetime, hasta: datetime):
+    """Columnas de exportación de un producto en orden cronológico (fecha, id)"""
+    return (
+        select(*(getattr(DatoMonitoreo, columna) for columna in COLUMNAS_EXPORTACION))
+        .where(DatoMonitoreo.id_producto_monitoreado == id)
+        .where(DatoMonitoreo.fecha >= desde)
+        .where(DatoMonitoreo.fecha <= hasta)
+        .order_by(DatoMonitoreo.fecha, DatoMonitoreo.id)
+        .execution_options(yield_per=TAMANO_LOTE_EXPORTACION)
+    )
+
+
+def iterar_datos_sesion(engine: Engine, id: int, desde: datetime, hasta: datetime) -> Iterator[list[Row]]:
+    """
+    Recorre las lecturas de un producto monitoreado en lotes de
+    TAMANO_LOTE_EXPORTACION filas (tuplas con COLUMNAS_EXPORTACION, sin
+    objetos ORM), con un cursor del servidor (yield_per → stream_results):
+    la memoria no depende del tamaño de la sesión.
+
+    Abre su propia conexión y la devuelve al pool al terminar o al cerrarse
+    el generador; desde/hasta se resuelven antes (rango_de_producto) para
+    que la exportación sea una foto fija aunque sigan llegando lecturas.
+    """
+    with engine.connect() as conn:
+        resultado = conn.execute(_consulta_sesion(id, desde, hasta))
+        vacia = True
+        for lote in resultado.partitions():
+            vacia = False
+            yield lote
+        if vacia:
+            archivo = conn.execute(select(ArchivoMonitoreo).where(ArchivoMonitoreo.id_producto_monitoreado == id)).first()
+            yield from _lotes_de_archivo(archivo, desde, hasta)
+
+
+def _lotes_de_archivo(archivo: Optional[Row], desde: datetime, hasta: datetime) -> Iterator[list[tuple]]:
+    """Lecturas archivadas en lotes de TAMANO_LOTE_EXPORTACION, con COLUMNAS_EXPORTACION"""
+    if archivo is None:
+        return
+    filas = lecturas_de_archivo(archivo, desde, hasta, descendente=False)
+    for inicio in range(0, len(filas), TAMANO_LOTE_EXPORTACION):
+        yield [fila[:len(COLUMNAS_EXPORTACION)] for fila in filas[inicio:inicio + TAMANO_LOTE_EXPORTACION]]
+
+
+def iterar_lotes_sesion(
+    session: Session,
+    id: int,
+    cursor: Optional[Cursor],
+    hasta: datetime,
+    limite: int
+) -> Iterator[list[tuple]]:
+    """
+    Lecturas de un producto monitoreado posteriores al cursor y hasta
+    `hasta`, en orden cronológico (fecha, id), en lotes de hasta `limite`
+    tuplas con COLUMNAS_EXPORTACION. Keyset ascendente: cada lote es un
+    recorrido de rango del índice (id_producto_monitoreado, fecha, id) y una
+    consulta corta, así que quien recorre la sesión puede confirmar entre
+    lotes (el siguiente se consulta al pedirlo).
+
+    Si la tabla no tiene más lecturas se sigue por el archivo de la sesión
+    (también si se archivó a mitad del recorrido), decodificado una vez.
+    """
+    columnas = [getattr(DatoMonitoreo, columna) for columna in COLUMNAS_EXPORTACION]
+    while True:
+        consulta = (
+            select(*columnas)
+            .where(DatoMonitoreo.id_producto_monitoreado == id)
+            .where(DatoMonitoreo.fecha <= hasta)
+        )
+        if cursor is not None:
+            fecha_cursor, id_cursor = cursor
+            consulta = (
+                consulta
+                .where(DatoMonitoreo.fecha >= fecha_cursor)  # Redundante, permite descartar particiones
+                .where(tuple_(DatoMonitoreo.fecha, DatoMonitoreo.id) > tuple_(fecha_cursor, id_cursor))
+            )
+        filas = session.exec(consulta.order_by(DatoMonitoreo.fecha, DatoMonitoreo.id).limit(limite)).all()
+        if not filas:
+            break
+        yield [tuple(fila) for fila in filas]
+        cursor = (filas[-1][1], filas[-1][0])
+
+    archivo = get_archivo(session, id)
+    if archivo is None:
+        return
+    filas = lecturas_de_archivo(archivo, hasta=hasta, cursor=cursor, descendente=False)
+    for inicio in range(0, len(filas), limite):
+        yield [fila[:len(COLUMNAS_EXPORTACION)] for fila in filas[inicio:inicio + limite]]
+
+
+def contar_lecturas(session: Session, id: int, hasta: datetime) -> int:
+    """Lecturas de un producto monitoreado hasta `hasta` (en datomonitoreo o en su archivo)"""
+    cantidad = session.exec(
+        select(func.count()).select_from(DatoMonitoreo)
+        .where(DatoMonitoreo.id_producto_monitoreado == id)
+        .where(DatoMonitoreo.fecha <= hasta)
+    ).one()
+    if cantidad:
+        return cantidad
+    archivo = get_archivo(session, id)
+    if archivo is None:
+        return 0
+    if hasta >= archivo.fecha_fin:
+        return archivo.cantidad  # Sin decodificar el archivo
+    return len(lecturas_de_archivo(archivo, hasta=hasta, descendente=False))
+
 
 def create_dato_monitoreo(session: Session, dato: DatoMonitoreo) -> DatoMonitoreo:
+    """
+    Inserta una lectura y le asigna su ID (flush). No hace commit: el
+    llamador confirma la lectura junto con sus agregados y alertas.
+    """
+    session.add(dato)
+    session.flush()
+    return dato
+
+def create_datos_monitoreo_bulk(session: Session, filas: list[dict]) -> list[int]:
+    """
+    Inserta varias lecturas con un único INSERT multi-fila y retorna sus IDs
+    en el mismo orden de `filas`.
+
+    No hace commit: el llamador agrupa la inserción y las alertas en una
+    sola transacción.
+    """
+    if not filas:
+        return []
+
+    stmt = insert(DatoMonitoreo).returning(DatoMonitoreo.id, sort_by_parameter_order=True)
+    return list(session.execute(stmt, filas).scalars())
+
+def _deduplicable(fila: dict) -> bool:
+    return fila.get('secuencia') is not None and fila.get('id_dispositivo') is not None
+
+def descartar_secuencias_existentes(session: Session, filas: list[dict]) -> list[dict]:
+    """
+    Quita de `filas` las lecturas cuyo (id_dispositivo, secuencia, fecha) ya
+    está guardado o se repite dentro del mismo lote (reintentos del NodeMCU).
+    La fecha (timestamp del dispositivo) acota la clave: tras un reinicio
+    las secuencias se repiten con fechas nuevas y no se descartan. Las filas
+    sin dispositivo o sin secuencia se conservan siempre.
+    """
+    claves = {
+        (fila['id_dispositivo'], fila['secuencia'], fila['fecha'])
+        for fila in filas if _deduplicable(fila)
+    }
+    if not claves:
+        return filas
+
+    fechas = [clave[2] for clave in claves]
+    existentes = set(session.execute(
+        select(DatoMonitoreo.id_dispositivo, DatoMonitoreo.secuencia, DatoMonitoreo.fecha)
+        .where(DatoMonitoreo.fecha.between(min(fechas), max(fechas)))
+        .where(tuple_(DatoMonitoreo.id_dispositivo, DatoMonitoreo.secuencia, DatoMonitoreo.fecha).in_(claves))
+    ).all())
+
+    nuevas = []
+    for fila in filas:
+        if _deduplicable(fila):
+            clave = (fila['id_dispositivo'], fila['secuencia'], fila['fecha'])
+            if clave in existentes:
+                continue
+            existentes.add(clave)
+        nuevas.append(fila)
+    return nuevas
+
+
+# ============================================================
+# Variantes async (AsyncSession): misma lógica, sin bloquear el event loop
+# ============================================================
+
+async def get_datosmonitoreo_async(
+    session: AsyncSession,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[Cursor] = None,
+    limite: Optional[int] = None
+):
+    desde, hasta = rango_por_defecto(desde, hasta)
+    resultado = await session.exec(_consulta_pagina(desde, hasta, cursor, limite))
+    archivos = await get_archivos_en_rango_async(session, desde, hasta)
+    return _combinar_archivados(list(resultado.all()), archivos, desde, hasta, cursor, limite)
+
+
+async def get_datosmonitoreo_by_id_async(
+    session: AsyncSession,
+    id: int,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[Cursor] = None,
+    limite: Optional[int] = None
+):
+    if desde is None:
+        desde, _ = await rango_de_producto_async(session, id)
+        if desde is None:
+            return []
+    resultado = await session.exec(
+        _consulta_pagina(desde, hasta, cursor, limite)
+        .where(DatoMonitoreo.id_producto_monitoreado == id)
+    )
+    filas = resultado.all()
+    return filas or _pagina_de_archivo(await get_archivo_async(session, id), desde, hasta, cursor, limite)
+
+
+async def iterar_datos_sesion_async(
+    engine: AsyncEngine,
+    id: int,
+    desde: datetime,
+    hasta: datetime
+) -> AsyncIterator[list[Row]]:
+    """Versión async de iterar_datos_sesion (AsyncConnection.stream)"""
+    async with engine.connect() as conn:
+        resultado = await conn.stream(_consulta_sesion(id, desde, hasta))
+        vacia = True
+        async for lote in resultado.partitions():
+            vacia = False
+            yield lote
+        if vacia:
+            archivo = (await conn.execute(
+                select(ArchivoMonitoreo).where(ArchivoMonitoreo.id_producto_monitoreado == id)
+            )).first()
+            for lote in _lotes_de_archivo(archivo, desde, hasta):
+                yield lote
+
+
+async def create_dato_monitoreo_async(session: AsyncSession, dato: DatoMonitoreo) -> DatoMonitoreo:
+    """Versión async de create_dato_monitoreo (tampoco hace commit)"""
     session.add(dato)
-    session.commit()
-    session.refresh(dato)
-    return dato
\ No newline at end of file
+    await session.flush()
+    return dato
+
+
+async def create_datos_monitoreo_bulk_async(session: AsyncSession, filas: list[dict]) -> list[int]:
+    """Versión async de create_datos_monitoreo_bulk (tampoco hace commit)"""
+    if not filas:
+        return []
+
+    stmt = insert(DatoMonitoreo).returning(DatoMonitoreo.id, sort_by_parameter_order=True)
+    resultado = await session.execute(stmt, filas)
+    return list(resultado.scalars())
+
+
+async def existe_secuencia_async(
+    session: AsyncSession,
+    id_dispositivo: str,
+    secuencia: int,
+    fecha: datetime
+) -> bool:
+    resultado = await session.exec(
+        select(DatoMonitoreo.id)
+        .where(DatoMonitoreo.fecha == fecha)
+        .where(DatoMonitoreo.id_dispositivo == id_dispositivo)
+        .where(DatoMonitoreo.secuencia == secuencia)
+    )
+    return resultado.first() is not None
@@ -0,0 +1,132 @@
+"""
+Índice en memoria de alertas PENDIENTES.
+
+Clave: (id_producto_monitoreado, parametro_afectado) → AlertaPendiente.
+
+Se carga una vez al iniciar la aplicación y lo mantienen sincronizado las
+escrituras del propio alerta_repository (y de stop_producto_monitoreado),
+de modo que las decisiones abrir / mantener / cerrar y el "¿hay alertas
+pendientes?" del LED son operaciones O(1) sobre diccionarios.
+
+Los cambios no se aplican de inmediato: se programan sobre la sesión y se
+aplican en el after_commit de esa sesión (y se descartan si hace rollback),
+así el índice nunca refleja una transacción que no llegó a la BD.
+
+Cada alta / baja aplicada es una transición confirmada de una alerta: los
+observadores registrados con observar() (el hub de eventos) la reciben.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Optional
+from sqlalchemy import event
+from sqlmodel import Session, select
+from core.models.alerta import Alerta, EstadoAlerta
+
+_CLAVE_CAMBIOS = "cambios_indice_alertas"
+
+
+@dataclass(frozen=True)
+class AlertaPendiente:
+    id: int
+    id_producto_monitoreado: int
+    parametro_afectado: str
+    fecha_generacion: datetime
+
+
+class IndiceAlertasPendientes:
+    def __init__(self):
+        self._por_producto: dict[int, dict[str, AlertaPendiente]] = {}
+        self._total = 0
+        self._lock = Lock()
+        self._observadores: list[Callable[[str, AlertaPendiente], None]] = []
+
+    def cargar(self, session: Session) -> int:
+        """Reconstruye el índice desde la BD. Retorna el número de alertas pendientes"""
+        filas = session.exec(
+            select(Alerta.id, Alerta.id_producto_monitoreado, Alerta.parametro_afectado, Alerta.fecha_generacion)
+            .where(Alerta.estado == EstadoAlerta.PENDIENTE)
+        ).all()
+
+        por_producto: dict[int, dict[str, AlertaPendiente]] = {}
+        for fila in filas:
+            alerta = AlertaPendiente(*fila)
+            por_producto.setdefault(alerta.id_producto_monitoreado, {})[alerta.parametro_afectado] = alerta
+
+        with self._lock:
+            self._por_producto = por_producto
+            self._total = len(filas)
+        return self._total
+
+    def obtener(self, id_producto_monitoreado: int, parametro: str) -> Optional[AlertaPendiente]:
+        return self._por_producto.get(id_producto_monitoreado, {}).get(parametro)
+
+    def pendientes_de(self, id_producto_monitoreado: int) -> dict[str, AlertaPendiente]:
+        """Copia de las alertas pendientes de un producto, por parámetro"""
+        return dict(self._por_producto.get(id_producto_monitoreado, {}))
+
+    def hay_pendientes(self) -> bool:
+        return self._total > 0
+
+    def total(self) -> int:
+        return self._total
+
+    def observar(self, observador: Callable[[str, AlertaPendiente], None]) -> None:
+        """Registra un callback (operacion "alta" | "baja", alerta) para cada cambio aplicado"""
+        self._observadores.append(observador)
+
+    def programar_alta(self, session: Session, alerta: AlertaPendiente) -> None:
+        """Registra una alerta nueva cuando la sesión haga commit"""
+        session.info.setdefault(_CLAVE_CAMBIOS, []).append(("alta", alerta))
+
+    def programar_baja(self, session: Session, id_producto_monitoreado: int, parametro: str) -> None:
+        """Quita una alerta resuelta cuando la sesión haga commit"""
+        session.info.setdefault(_CLAVE_CAMBIOS, []).append(("baja", (id_producto_monitoreado, parametro)))
+
+    def cambios_programados(self, session: Session) -> list:
+        """Cambios que la sesión aplicará al hacer commit: [("alta", AlertaPendiente) | ("baja", (id, parametro))]"""
+        return list(session.info.get(_CLAVE_CAMBIOS, ()))
+
+    def aplicar_externos(self, cambios: list) -> None:
+        """Aplica cambios ya confirmados por otro worker (ver cambios_programados)"""
+        self._aplicar(cambios)
+
+    def _aplicar(self, cambios: list) -> None:
+        aplicados = []
+        with self._lock:
+            for operacion, dato in cambios:
+                if operacion == "alta":
+                    alertas = self._por_producto.setdefault(dato.id_producto_monitoreado, {})
+                    if dato.parametro_afectado not in alertas:
+                        self._total += 1
+                    alertas[dato.parametro_afectado] = dato
+                    aplicados.append((operacion, dato))
+                else:
+                    id_producto_monitoreado, parametro = dato
+                    alertas = self._por_producto.get(id_producto_monitoreado, {})
+                    alerta = alertas.pop(parametro, None)
+                    if alerta is not None:
+                        self._total -= 1
+                        aplicados.append((operacion, alerta))
+                    if not alertas:
+                        self._por_producto.pop(id_producto_monitoreado, None)
+
+        for observador in self._observadores:
+            for operacion, alerta in aplicados:
+                observador(operacion, alerta)
+
+
+# Instancia global del índice
+indice_alertas = IndiceAlertasPendientes()
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_cambios_indice(session):
+    cambios = session.info.pop(_CLAVE_CAMBIOS, None)
+    if cambios:
+        indice_alertas._aplicar(cambios)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_cambios_indice(session, previous_transaction):
+    session.info.pop(_CLAVE_CAMBIOS, None)
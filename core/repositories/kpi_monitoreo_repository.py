@@ -0,0 +1,299 @@
+"""
+Indicadores de cumplimiento por sesión (Mean Kinetic Temperature, mínimo /
+máximo / promedio ponderado por tiempo y minutos fuera de rango de cada
+parámetro) mantenidos de forma incremental en kpimonitoreo.
+
+- actualizar_kpis() suma las lecturas nuevas al acumulador de la sesión
+  (core/utils/kpi_utils.py) en la misma transacción que su INSERT, con la
+  fila bloqueada (FOR UPDATE): cada lectura cuesta O(1) sin importar el
+  largo de la sesión y todos los workers acumulan sobre la misma fila.
+- La ingesta nunca recorre la sesión. Si la fila falta y la sesión ya tenía
+  lecturas (sesión previa a estos indicadores), la crea "pendiente"; con la
+  fila pendiente o con otra KPI_ENERGIA_ACTIVACION solo toma el bloqueo.
+- reconstruir_kpis() recalcula una sesión desde sus lecturas (o su archivo)
+  sin bloquear la ingesta mientras recorre; solo al final bloquea la fila
+  para sumar las lecturas llegadas entretanto. Lo corren la tarea de inicio
+  (services/kpi_service.py), `python manage.py reconstruir-kpis` y el
+  recálculo de alertas.
+- get_kpis() sirve GET /productosmonitoreados/{id}/kpis leyendo una fila,
+  sin escribir.
+
+Los minutos fuera de rango usan la condición vigente en cada lectura;
+reconstruir_kpis() los recalcula con la condición actual.
+"""
+from typing import Optional, Sequence
+import numpy as np
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import delete, or_, update
+from config import Config
+from core.models.datomonitoreo import DatoMonitoreo
+from core.models.kpimonitoreo import KpiMonitoreo
+from core.models.kpimonitoreo_read import KpiMonitoreoRead
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.repositories.agregado_monitoreo_repository import upsert_del_dialecto
+from core.repositories.dato_monitoreo_repository import iterar_lotes_sesion, rango_de_producto
+from core.utils.datetime_utils import get_caracas_now
+from core.utils.kpi_utils import AcumuladorKpis
+from core.utils.reglas_utils import PARAMETROS, ReglasCondicion, compilar_reglas
+
+# Lecturas leídas por consulta al reconstruir
+TAMANO_LOTE_RECONSTRUCCION = 5000
+
+
+def _a_acumulador(kpi: KpiMonitoreo) -> AcumuladorKpis:
+    columna = lambda sufijo: np.array(
+        [np.nan if (valor := getattr(kpi, f'{p}_{sufijo}')) is None else valor for p in PARAMETROS],
+        dtype=np.float64
+    )
+    return AcumuladorKpis(
+        energia_activacion=kpi.energia_activacion,
+        cantidad=kpi.cantidad,
+        primera_fecha=kpi.primera_fecha,
+        ultima_fecha=kpi.ultima_fecha,
+        minutos_con_datos=kpi.minutos_con_datos,
+        minutos_sin_datos=kpi.minutos_sin_datos,
+        suma_arrhenius=kpi.suma_arrhenius,
+        minimos=columna('min'),
+        maximos=columna('max'),
+        integrales=columna('integral'),
+        minutos_excursion=columna('minutos_excursion'),
+        ultimos=columna('ultimo'),
+        en_excursion=np.array([getattr(kpi, f'{p}_en_excursion') for p in PARAMETROS], dtype=bool),
+    )
+
+
+def _valores(acumulador: AcumuladorKpis) -> dict:
+    """Acumulador → columnas de kpimonitoreo (NaN → NULL)"""
+    opcional = lambda valor: None if np.isnan(valor) else float(valor)
+    valores = {
+        'energia_activacion': acumulador.energia_activacion,
+        'cantidad': acumulador.cantidad,
+        'primera_fecha': acumulador.primera_fecha,
+        'ultima_fecha': acumulador.ultima_fecha,
+        'minutos_con_datos': acumulador.minutos_con_datos,
+        'minutos_sin_datos': acumulador.minutos_sin_datos,
+        'suma_arrhenius': acumulador.suma_arrhenius,
+        'actualizado': get_caracas_now(),
+    }
+    for i, parametro in enumerate(PARAMETROS):
+        valores[f'{parametro}_min'] = opcional(acumulador.minimos[i])
+        valores[f'{parametro}_max'] = opcional(acumulador.maximos[i])
+        valores[f'{parametro}_integral'] = float(acumulador.integrales[i])
+        valores[f'{parametro}_minutos_excursion'] = float(acumulador.minutos_excursion[i])
+        valores[f'{parametro}_ultimo'] = opcional(acumulador.ultimos[i])
+        valores[f'{parametro}_en_excursion'] = bool(acumulador.en_excursion[i])
+    return valores
+
+
+def _agregar_filas(acumulador: AcumuladorKpis, reglas: ReglasCondicion, filas: Sequence[tuple]) -> None:
+    """Acumula filas (id, fecha, *PARAMETROS)"""
+    fechas = np.array([fila[1] for fila in filas], dtype="datetime64[us]")
+    valores = np.array([fila[2:] for fila in filas], dtype=object).astype(np.float64)  # None → NaN
+    acumulador.agregar(fechas, valores, reglas.excursiones(valores), Config.KPI_HUECO_MAXIMO_MINUTOS)
+
+
+def _bloquear(session: Session, id_producto_monitoreado: int) -> Optional[KpiMonitoreo]:
+    """La fila de la sesión bloqueada hasta el fin de la transacción (None si no existe)"""
+    return session.exec(
+        select(KpiMonitoreo)
+        .where(KpiMonitoreo.id_producto_monitoreado == id_producto_monitoreado)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).first()
+
+
+def _crear(session: Session, id_producto_monitoreado: int, pendiente: bool) -> tuple[KpiMonitoreo, bool]:
+    """
+    Crea la fila vacía (si no existe) y la bloquea. True si la creó esta
+    transacción: si dos la crean a la vez, la segunda espera el commit de la
+    primera, no inserta nada y sigue con esa fila.
+    """
+    insertar, _, _ = upsert_del_dialecto(session.get_bind().dialect.name)
+    creada = session.execute(
+        insertar(KpiMonitoreo)
+        .values(
+            id_producto_monitoreado=id_producto_monitoreado,
+            pendiente=pendiente,
+            **_valores(AcumuladorKpis(energia_activacion=Config.KPI_ENERGIA_ACTIVACION))
+        )
+        .on_conflict_do_nothing(index_elements=['id_producto_monitoreado'])
+    ).rowcount == 1
+    return _bloquear(session, id_producto_monitoreado), creada
+
+
+def _hay_lecturas_previas(session: Session, id_producto_monitoreado: int, filas: Sequence[tuple]) -> bool:
+    """¿La sesión tiene lecturas confirmadas además de `filas`?"""
+    return session.exec(
+        select(DatoMonitoreo.id)
+        .where(DatoMonitoreo.id_producto_monitoreado == id_producto_monitoreado)
+        .where(DatoMonitoreo.id.not_in([fila[0] for fila in filas]))
+        .limit(1)
+    ).first() is not None
+
+
+def _guardar(session: Session, kpi: KpiMonitoreo, acumulador: AcumuladorKpis) -> None:
+    for columna, valor in _valores(acumulador).items():
+        setattr(kpi, columna, valor)
+    session.add(kpi)
+
+
+def actualizar_kpis(
+    session: Session,
+    id_producto_monitoreado: int,
+    reglas: ReglasCondicion,
+    filas: Sequence[tuple]
+) -> None:
+    """
+    Suma lecturas recién guardadas a los indicadores de la sesión (no hace
+    commit). Llamar después del INSERT de las lecturas, en su transacción.
+
+    Con la fila pendiente de reconstrucción no suma nada: el bloqueo hace
+    que reconstruir_kpis() espere este commit y encuentre las lecturas.
+
+    Args:
+        reglas: Condición vigente (contexto de la ingesta)
+        filas: Tuplas (id, fecha, *PARAMETROS) ordenadas por fecha
+    """
+    if not filas:
+        return
+    kpi = _bloquear(session, id_producto_monitoreado)
+    if kpi is None:
+        previas = _hay_lecturas_previas(session, id_producto_monitoreado, filas)
+        kpi, _ = _crear(session, id_producto_monitoreado, pendiente=previas)
+    if kpi.pendiente or kpi.energia_activacion != Config.KPI_ENERGIA_ACTIVACION:
+        return
+
+    acumulador = _a_acumulador(kpi)
+    _agregar_filas(acumulador, reglas, filas)
+    _guardar(session, kpi, acumulador)
+
+
+async def actualizar_kpis_async(
+    session: AsyncSession,
+    id_producto_monitoreado: int,
+    reglas: ReglasCondicion,
+    filas: Sequence[tuple]
+) -> None:
+    await session.run_sync(lambda sync_session: actualizar_kpis(sync_session, id_producto_monitoreado, reglas, filas))
+
+
+def reconstruir_kpis(session: Session, id_producto_monitoreado: int) -> Optional[KpiMonitoreo]:
+    """
+    Recalcula los indicadores de la sesión desde sus lecturas (o su
+    archivo) con la condición actual del producto. Hace varios commits:
+
+    1. Marca la fila pendiente: desde ahí la ingesta no suma, solo bloquea.
+    2. Recorre las lecturas por keyset sin bloquear nada.
+    3. Bloquea la fila, suma las lecturas posteriores al cursor (las que
+       llegaron durante el recorrido) y la marca al día.
+
+    Una lectura atrasada que llegue durante el paso 2 con fecha anterior al
+    cursor no se cuenta hasta la próxima reconstrucción.
+
+    Returns:
+        La fila recalculada, o None si el producto monitoreado no existe
+    """
+    producto = session.get(ProductoMonitoreado, id_producto_monitoreado)
+    if producto is None:
+        return None
+    reglas = compilar_reglas(producto.producto.condicion)
+
+    kpi, creada = _crear(session, id_producto_monitoreado, pendiente=True)
+    if not creada:
+        kpi.pendiente = True
+        session.add(kpi)
+    session.commit()
+
+    acumulador = AcumuladorKpis(energia_activacion=Config.KPI_ENERGIA_ACTIVACION)
+    cursor = None
+    _, hasta = rango_de_producto(session, id_producto_monitoreado)
+    if hasta is not None:
+        for lote in iterar_lotes_sesion(session, id_producto_monitoreado, None, hasta, TAMANO_LOTE_RECONSTRUCCION):
+            _agregar_filas(acumulador, reglas, lote)
+            cursor = (lote[-1][1], lote[-1][0])
+    session.rollback()  # Fin de la transacción de lectura
+
+    # Escritura primero: en SQLite toma el bloqueo de escritura antes de leer la cola
+    session.execute(
+        update(KpiMonitoreo)
+        .where(KpiMonitoreo.id_producto_monitoreado == id_producto_monitoreado)
+        .values(actualizado=get_caracas_now())
+    )
+    kpi = _bloquear(session, id_producto_monitoreado)
+    _, hasta = rango_de_producto(session, id_producto_monitoreado)
+    if hasta is not None:
+        for lote in iterar_lotes_sesion(session, id_producto_monitoreado, cursor, hasta, TAMANO_LOTE_RECONSTRUCCION):
+            _agregar_filas(acumulador, reglas, lote)
+    kpi.pendiente = False
+    _guardar(session, kpi, acumulador)
+    session.commit()
+    session.refresh(kpi)
+    return kpi
+
+
+def kpis_por_reconstruir(session: Session) -> list[int]:
+    """Productos monitoreados sin indicadores, pendientes o acumulados con otra KPI_ENERGIA_ACTIVACION"""
+    return list(session.exec(
+        select(ProductoMonitoreado.id)
+        .outerjoin(KpiMonitoreo, KpiMonitoreo.id_producto_monitoreado == ProductoMonitoreado.id)
+        .where(or_(
+            KpiMonitoreo.id_producto_monitoreado == None,
+            KpiMonitoreo.pendiente == True,
+            KpiMonitoreo.energia_activacion != Config.KPI_ENERGIA_ACTIVACION
+        ))
+        .order_by(ProductoMonitoreado.id)
+    ).all())
+
+
+def eliminar_kpis(session: Session, ids_productos_monitoreados: list[int]) -> None:
+    """Borra los indicadores de productos monitoreados (no hace commit)"""
+    session.exec(delete(KpiMonitoreo).where(
+        KpiMonitoreo.id_producto_monitoreado.in_(ids_productos_monitoreados)
+    ))
+
+
+def get_kpis(session: Session, id_producto_monitoreado: int) -> Optional[KpiMonitoreoRead]:
+    """
+    Indicadores de la sesión (solo lectura). Una sesión sin lecturas tiene
+    indicadores vacíos.
+
+    Returns:
+        None si todavía no se calcularon o se están reconstruyendo
+    """
+    kpi = session.get(KpiMonitoreo, id_producto_monitoreado)
+    if kpi is None:
+        if rango_de_producto(session, id_producto_monitoreado) != (None, None):
+            return None
+        kpi = KpiMonitoreo(
+            id_producto_monitoreado=id_producto_monitoreado,
+            **_valores(AcumuladorKpis(energia_activacion=Config.KPI_ENERGIA_ACTIVACION))
+        )
+    if kpi.pendiente or kpi.energia_activacion != Config.KPI_ENERGIA_ACTIVACION:
+        return None
+    return a_kpi_read(kpi)
+
+
+def a_kpi_read(kpi: KpiMonitoreo) -> KpiMonitoreoRead:
+    acumulador = _a_acumulador(kpi)
+    promedios = acumulador.promedios()
+    opcional = lambda valor: None if np.isnan(valor) else round(float(valor), 4)
+    valores = {}
+    for i, parametro in enumerate(PARAMETROS):
+        valores[f'{parametro}_min'] = getattr(kpi, f'{parametro}_min')
+        valores[f'{parametro}_max'] = getattr(kpi, f'{parametro}_max')
+        valores[f'{parametro}_promedio'] = opcional(promedios[i])
+        valores[f'{parametro}_minutos_fuera_rango'] = round(float(acumulador.minutos_excursion[i]), 2)
+    mkt = acumulador.temperatura_cinetica_media()
+    return KpiMonitoreoRead(
+        id_producto_monitoreado=kpi.id_producto_monitoreado,
+        cantidad=kpi.cantidad,
+        primera_fecha=kpi.primera_fecha,
+        ultima_fecha=kpi.ultima_fecha,
+        minutos_con_datos=round(kpi.minutos_con_datos, 2),
+        minutos_sin_datos=round(kpi.minutos_sin_datos, 2),
+        temperatura_cinetica_media=None if mkt is None else round(mkt, 4),
+        energia_activacion=kpi.energia_activacion,
+        actualizado=kpi.actualizado,
+        **valores
+    )
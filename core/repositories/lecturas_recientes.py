@@ -0,0 +1,162 @@
+"""
+Lecturas recientes en memoria de cada monitoreo activo.
+
+Por ProductoMonitoreado activo se guarda un buffer circular de tamaño fijo
+(RECIENTES_CAPACIDAD) con las últimas lecturas como arrays tipados de NumPy
+(ids, fechas y una matriz lecturas × PARAMETROS), no como diccionarios ni
+objetos ORM: agregar una lectura es escribir una fila en una posición y
+leerlas es una copia por índices.
+
+Se carga una vez al iniciar la aplicación y lo alimenta la ingesta
+(data_service) después de cada commit; stop_producto_monitoreado y la
+limpieza de la simulación descartan el buffer del producto. Así
+GET /datosmonitoreo/{id}/recientes sirve las vistas en vivo sin ir a la BD.
+
+Como el índice de alertas pendientes, es por proceso: con varios workers
+cada uno ve solo las lecturas que él mismo ingirió después de arrancar.
+"""
+from datetime import datetime
+from threading import Lock
+from typing import Optional, Sequence
+import numpy as np
+from sqlmodel import Session, select
+from config import Config
+from core.models.datomonitoreo import DatoMonitoreo
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.repositories.contexto_monitoreo_repository import PARAMETROS
+from core.utils.datetime_utils import to_caracas_naive
+
+# Columnas de cada lectura en agregar(): id, fecha y los PARAMETROS en orden
+COLUMNAS_RECIENTES = ('id', 'fecha') + PARAMETROS
+
+
+class BufferLecturas:
+    """Buffer circular de las últimas `capacidad` lecturas de un producto"""
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self.ids = np.zeros(capacidad, dtype=np.int64)
+        self.fechas = np.zeros(capacidad, dtype="datetime64[us]")
+        self.valores = np.zeros((capacidad, len(PARAMETROS)), dtype=np.float64)
+        self._siguiente = 0  # Posición donde se escribe la próxima lectura
+        self.cantidad = 0
+
+    def agregar(self, ids: np.ndarray, fechas: np.ndarray, valores: np.ndarray) -> None:
+        """Agrega lecturas en orden; si no caben, solo quedan las últimas"""
+        ids, fechas, valores = ids[-self.capacidad:], fechas[-self.capacidad:], valores[-self.capacidad:]
+        posiciones = (self._siguiente + np.arange(len(ids))) % self.capacidad
+        self.ids[posiciones] = ids
+        self.fechas[posiciones] = fechas
+        self.valores[posiciones] = valores
+        self._siguiente = (self._siguiente + len(ids)) % self.capacidad
+        self.cantidad = min(self.capacidad, self.cantidad + len(ids))
+
+    def copia(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ids, fechas, valores) en orden cronológico (fecha, id)"""
+        posiciones = (self._siguiente - self.cantidad + np.arange(self.cantidad)) % self.capacidad
+        ids, fechas, valores = self.ids[posiciones], self.fechas[posiciones], self.valores[posiciones]
+        # Casi siempre ya vienen en orden; una lectura atrasada (reintento del
+        # NodeMCU con su hora de dispositivo) se ubica en su lugar
+        orden = np.lexsort((ids, fechas))
+        return ids[orden], fechas[orden], valores[orden]
+
+
+def _arrays(filas: Sequence[tuple]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Tuplas con COLUMNAS_RECIENTES → (ids, fechas, valores)"""
+    return (
+        np.array([fila[0] for fila in filas], dtype=np.int64),
+        np.array([fila[1] for fila in filas], dtype="datetime64[us]"),
+        np.array([fila[2:] for fila in filas], dtype=np.float64).reshape(len(filas), len(PARAMETROS)),
+    )
+
+
+class LecturasRecientes:
+    def __init__(self, capacidad: int = Config.RECIENTES_CAPACIDAD):
+        self.capacidad = capacidad
+        self._buffers: dict[int, BufferLecturas] = {}
+        self._lock = Lock()
+
+    def cargar(self, session: Session) -> int:
+        """
+        Reconstruye los buffers de los monitoreos activos con sus últimas
+        lecturas en la BD. Retorna el número de lecturas cargadas.
+        """
+        activos = session.exec(
+            select(ProductoMonitoreado.id).where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None)
+        ).all()
+
+        buffers: dict[int, BufferLecturas] = {}
+        for id_producto_monitoreado in activos:
+            # Recorrido inverso del índice (id_producto_monitoreado, fecha, id)
+            filas = session.exec(
+                select(*(getattr(DatoMonitoreo, columna) for columna in COLUMNAS_RECIENTES))
+                .where(DatoMonitoreo.id_producto_monitoreado == id_producto_monitoreado)
+                .order_by(DatoMonitoreo.fecha.desc(), DatoMonitoreo.id.desc())
+                .limit(self.capacidad)
+            ).all()
+            if not filas:
+                continue
+            buffer = BufferLecturas(self.capacidad)
+            buffer.agregar(*_arrays([tuple(fila) for fila in reversed(filas)]))
+            buffers[id_producto_monitoreado] = buffer
+
+        with self._lock:
+            self._buffers = buffers
+        return sum(buffer.cantidad for buffer in buffers.values())
+
+    def agregar(self, id_producto_monitoreado: int, filas: Sequence[tuple]) -> None:
+        """
+        Agrega lecturas ya confirmadas en la BD (llamar después del commit).
+
+        Args:
+            filas: Tuplas con COLUMNAS_RECIENTES, ordenadas por fecha
+        """
+        if not filas:
+            return
+        ids, fechas, valores = _arrays(filas)
+        with self._lock:
+            buffer = self._buffers.get(id_producto_monitoreado)
+            if buffer is None:
+                buffer = self._buffers[id_producto_monitoreado] = BufferLecturas(self.capacidad)
+            buffer.agregar(ids, fechas, valores)
+
+    def descartar(self, ids_productos_monitoreados: Sequence[int]) -> None:
+        """Olvida los buffers de monitoreos detenidos o eliminados"""
+        with self._lock:
+            for id_producto_monitoreado in ids_productos_monitoreados:
+                self._buffers.pop(id_producto_monitoreado, None)
+
+    def ultimas(
+        self,
+        id_producto_monitoreado: int,
+        despues: Optional[datetime] = None,
+        limite: Optional[int] = None
+    ) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Copia de las últimas lecturas en orden cronológico: las `limite` más
+        recientes y, con `despues`, solo las posteriores a esa fecha (para
+        que una vista en vivo pida solo lo nuevo).
+
+        Returns:
+            (ids, fechas, valores) o None si el producto no tiene buffer
+            (no está activo o no recibió lecturas)
+        """
+        with self._lock:
+            buffer = self._buffers.get(id_producto_monitoreado)
+            if buffer is None:
+                return None
+            ids, fechas, valores = buffer.copia()
+
+        if despues is not None:
+            desde = np.searchsorted(fechas, np.datetime64(to_caracas_naive(despues), "us"), side="right")
+            ids, fechas, valores = ids[desde:], fechas[desde:], valores[desde:]
+        if limite is not None:
+            ids, fechas, valores = ids[-limite:], fechas[-limite:], valores[-limite:]
+        return ids, fechas, valores
+
+    def total(self) -> int:
+        return sum(buffer.cantidad for buffer in self._buffers.values())
+
+
+# Instancia global de las lecturas recientes
+lecturas_recientes = LecturasRecientes()
@@ -9,6 +9,7 @@ from core.models.condicionalmacenamiento import CondicionAlmacenamiento
 
 from core.models.usuario import UserRead
 from core.ports.registro_port import RegistroPort
+from core.repositories.contexto_monitoreo_repository import invalidar_contexto
 
 
 def get_productos(session: Session):
@@ -97,6 +98,7 @@ def update_producto(
     usuario_actual: UserRead
 ):
     session.commit()
+    invalidar_contexto()  # El producto pudo cambiar de condición
     session.refresh(producto)
     
     # Obtener detalles del producto
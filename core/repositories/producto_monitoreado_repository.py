@@ -10,6 +10,9 @@ from datetime import datetime
 from core.models.usuario import UserRead
 from core.ports.registro_port import RegistroPort
 from core.utils.datetime_utils import get_caracas_now
+from core.repositories.contexto_monitoreo_repository import invalidar_contexto
+from core.repositories.lecturas_recientes import lecturas_recientes
+from core.repositories.indice_alertas_pendientes import indice_alertas
 import json
 
 def get_productos_monitoreados(session: Session):
@@ -71,6 +74,7 @@ def create_producto_monitoreado(
 
     session.add(producto_monitoreado)
     session.commit()
+    invalidar_contexto()
     session.refresh(producto_monitoreado)
     
     # Obtener el nombre del producto farmacéutico
@@ -127,9 +131,12 @@ def stop_producto_monitoreado(
                 if alerta.fecha_generacion:
                     duracion = (fecha_fin - alerta.fecha_generacion).total_seconds() / 60
                     alerta.duracion_minutos = round(duracion, 2)
+                indice_alertas.programar_baja(session, alerta.id_producto_monitoreado, alerta.parametro_afectado)
             
             # 3. Commit de cambios
             session.commit()
+            invalidar_contexto()
+            lecturas_recientes.descartar([producto_id])
             session.refresh(producto)
             
             # 4. Registrar la operación
@@ -1,5 +1,15 @@
+from typing import Optional
 from sqlmodel import Session, select
 from core.models.registro import Registro
 
-def get_registros(session: Session):
-    return session.exec(select(Registro)).all()
\ No newline at end of file
+def get_registros(session: Session, entidad: Optional[str] = None, limite: Optional[int] = None):
+    """
+    Registros de auditoría. Con entidad, solo los de esa entidad del más
+    reciente al más antiguo (índice (entidad_afectada, fecha)).
+    """
+    consulta = select(Registro)
+    if entidad is not None:
+        consulta = consulta.where(Registro.entidad_afectada == entidad).order_by(Registro.fecha.desc())
+    if limite is not None:
+        consulta = consulta.limit(limite)
+    return session.exec(consulta).all()
@@ -0,0 +1,207 @@
+"""
+Codificación compacta de las lecturas de una sesión archivada.
+
+Formato (versión 1), por columnas y luego comprimido con zlib:
+- id y fecha (microsegundos): diferencia con la fila anterior en varint
+  zigzag. En una sesión las lecturas llegan cada pocos segundos/minutos,
+  así que cada delta ocupa 1-4 bytes.
+- Parámetros: si todos los valores de la columna tienen a lo sumo N
+  decimales (N ≤ 6, se comprueba que la ida y vuelta sea exacta), se
+  guardan como enteros escalados por 10^N en delta zigzag varint; si no,
+  float64 crudos. La decodificación devuelve exactamente los mismos floats.
+- id_dispositivo: diccionario de strings + índice por fila (0 = None).
+- secuencia: secuencia + 1 (0 = None) en delta zigzag varint.
+"""
+import struct
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+
+VERSION = 1
+CODEC = "zlib"
+
+# Orden de las columnas de cada fila (empaquetar / desempaquetar)
+COLUMNAS_ARCHIVO = ('id', 'fecha', 'temperatura', 'humedad', 'lux', 'presion', 'id_dispositivo', 'secuencia')
+
+_EPOCA = datetime(1970, 1, 1)
+_MICROSEGUNDO = timedelta(microseconds=1)
+_MAX_DECIMALES = 6
+_MODO_FLOAT, _MODO_ESCALADO = 0, 1
+
+
+def _zigzag(valor: int) -> int:
+    return valor * 2 if valor >= 0 else -valor * 2 - 1
+
+
+def _unzigzag(valor: int) -> int:
+    return valor >> 1 if not valor & 1 else -((valor + 1) >> 1)
+
+
+def _escribir_varint(buffer: bytearray, valor: int) -> None:
+    while valor >= 0x80:
+        buffer.append((valor & 0x7F) | 0x80)
+        valor >>= 7
+    buffer.append(valor)
+
+
+def _escribir_deltas(buffer: bytearray, valores: Sequence[int]) -> None:
+    anterior = 0
+    for valor in valores:
+        _escribir_varint(buffer, _zigzag(valor - anterior))
+        anterior = valor
+
+
+class _Lector:
+    def __init__(self, datos: bytes):
+        self.datos = datos
+        self.posicion = 0
+
+    def varint(self) -> int:
+        resultado, desplazamiento = 0, 0
+        while True:
+            byte = self.datos[self.posicion]
+            self.posicion += 1
+            resultado |= (byte & 0x7F) << desplazamiento
+            if byte < 0x80:
+                return resultado
+            desplazamiento += 7
+
+    def deltas(self, cantidad: int) -> list[int]:
+        valores, anterior = [], 0
+        for _ in range(cantidad):
+            anterior += _unzigzag(self.varint())
+            valores.append(anterior)
+        return valores
+
+    def bytes(self, cantidad: int) -> bytes:
+        inicio = self.posicion
+        self.posicion += cantidad
+        return self.datos[inicio:self.posicion]
+
+
+def _decimales(valores: Sequence[float]) -> Optional[int]:
+    """Menor cantidad de decimales que representa exactamente todos los valores"""
+    for decimales in range(_MAX_DECIMALES + 1):
+        escala = 10 ** decimales
+        if all(round(valor * escala) / escala == valor for valor in valores):
+            return decimales
+    return None
+
+
+class Empaquetador:
+    """
+    Arma el blob de una sesión lote a lote: las filas se guardan en columnas
+    compactas (array) en vez de tuplas, así archivar una sesión larga no
+    mantiene en memoria todas sus filas como objetos Python.
+
+    Uso:
+        empaquetador = Empaquetador()
+        for lote in lotes:  # Tuplas con COLUMNAS_ARCHIVO, en orden (fecha, id)
+            empaquetador.agregar(lote)
+        blob = empaquetador.empaquetar()
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.micros = array('q')
+        self.parametros = [array('d') for _ in range(4)]
+        self.diccionario: dict[str, int] = {}
+        self.dispositivos = array('q')
+        self.secuencias = array('q')  # secuencia + 1 (0 = None)
+        self.primera_fecha: Optional[datetime] = None
+        self.ultima_fecha: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def agregar(self, filas: Sequence[tuple]) -> None:
+        for id_dato, fecha, *valores, dispositivo, secuencia in filas:
+            self.ids.append(id_dato)
+            self.micros.append((fecha - _EPOCA) // _MICROSEGUNDO)
+            for columna, valor in zip(self.parametros, valores):
+                columna.append(valor)
+            if dispositivo is not None and dispositivo not in self.diccionario:
+                self.diccionario[dispositivo] = len(self.diccionario) + 1
+            self.dispositivos.append(self.diccionario.get(dispositivo, 0))
+            self.secuencias.append(0 if secuencia is None else secuencia + 1)
+            if self.primera_fecha is None:
+                self.primera_fecha = fecha
+            self.ultima_fecha = fecha
+
+    def empaquetar(self) -> bytes:
+        """Blob comprimido con las filas agregadas"""
+        buffer = bytearray()
+        _escribir_varint(buffer, VERSION)
+        _escribir_varint(buffer, len(self.ids))
+        _escribir_deltas(buffer, self.ids)
+        _escribir_deltas(buffer, self.micros)
+
+        for valores in self.parametros:
+            decimales = _decimales(valores)
+            if decimales is None:
+                buffer.append(_MODO_FLOAT)
+                buffer += struct.pack(f"<{len(valores)}d", *valores)
+            else:
+                buffer.append(_MODO_ESCALADO)
+                _escribir_varint(buffer, decimales)
+                escala = 10 ** decimales
+                _escribir_deltas(buffer, [round(valor * escala) for valor in valores])
+
+        _escribir_varint(buffer, len(self.diccionario))
+        for dispositivo in self.diccionario:
+            codificado = dispositivo.encode()
+            _escribir_varint(buffer, len(codificado))
+            buffer += codificado
+        for indice in self.dispositivos:
+            _escribir_varint(buffer, indice)
+
+        _escribir_deltas(buffer, self.secuencias)
+        return zlib.compress(bytes(buffer), 9)
+
+
+def empaquetar(filas: Sequence[tuple]) -> bytes:
+    """
+    Args:
+        filas: Tuplas con COLUMNAS_ARCHIVO, en orden (fecha, id)
+
+    Returns:
+        Blob comprimido
+    """
+    empaquetador = Empaquetador()
+    empaquetador.agregar(filas)
+    return empaquetador.empaquetar()
+
+
+def desempaquetar(blob: bytes) -> list[tuple]:
+    """
+    Inversa de empaquetar.
+
+    Raises:
+        ValueError: Si el blob es de una versión desconocida
+    """
+    lector = _Lector(zlib.decompress(blob))
+    version = lector.varint()
+    if version != VERSION:
+        raise ValueError(f"Versión de archivo desconocida: {version}")
+
+    cantidad = lector.varint()
+    ids = lector.deltas(cantidad)
+    fechas = [_EPOCA + _MICROSEGUNDO * micros for micros in lector.deltas(cantidad)]
+
+    parametros = []
+    for _ in range(4):
+        modo = lector.bytes(1)[0]
+        if modo == _MODO_FLOAT:
+            parametros.append(struct.unpack(f"<{cantidad}d", lector.bytes(8 * cantidad)))
+        else:
+            escala = 10 ** lector.varint()
+            parametros.append([entero / escala for entero in lector.deltas(cantidad)])
+
+    diccionario: list[Optional[str]] = [None]
+    for _ in range(lector.varint()):
+        diccionario.append(lector.bytes(lector.varint()).decode())
+    dispositivos = [diccionario[lector.varint()] for _ in range(cantidad)]
+
+    secuencias = [None if valor == 0 else valor - 1 for valor in lector.deltas(cantidad)]
+    return list(zip(ids, fechas, *parametros, dispositivos, secuencias))
@@ -61,3 +61,25 @@ def ensure_caracas_timezone(dt: datetime) -> datetime:
     else:
         # Si ya tiene timezone, convertir a Venezuela
         return dt.astimezone(VENEZUELA_TZ)
+
+
+def to_caracas_naive(dt: datetime) -> datetime:
+    """
+    Convierte un datetime a hora local de Venezuela sin tzinfo.
+
+    Las columnas de fecha de la BD guardan la hora de Caracas sin zona
+    horaria (igual que get_caracas_now), por lo que los timestamps que
+    envían los dispositivos deben normalizarse antes de insertarse.
+
+    Args:
+        dt: datetime con o sin zona horaria (sin zona se asume hora de Caracas)
+
+    Returns:
+        datetime: Hora de Caracas sin tzinfo
+
+    Example:
+        >>> from datetime import datetime, timezone
+        >>> to_caracas_naive(datetime(2025, 2, 1, 23, 14, tzinfo=timezone.utc))
+        datetime.datetime(2025, 2, 1, 19, 14)
+    """
+    return ensure_caracas_timezone(dt).replace(tzinfo=None)
@@ -0,0 +1,50 @@
+"""
+Serialización en streaming de lecturas exportadas (CSV / NDJSON).
+
+Reciben los lotes de iterar_datos_sesion_async y emiten un bloque de bytes
+por lote: la respuesta empieza a enviarse con el primer lote y nunca se
+arma el cuerpo completo en memoria.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+from sqlalchemy import Row
+
+TIPOS_CONTENIDO = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _valor(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+async def a_csv(columnas: Sequence[str], lotes: AsyncIterator[list[Row]]) -> AsyncIterator[bytes]:
+    """Encabezado y luego un bloque CSV por lote"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(columnas)
+    yield buffer.getvalue().encode()
+    async for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([_valor(valor) for valor in fila] for fila in lote)
+        yield buffer.getvalue().encode()
+
+
+async def a_ndjson(columnas: Sequence[str], lotes: AsyncIterator[list[Row]]) -> AsyncIterator[bytes]:
+    """Un objeto JSON por línea, un bloque por lote"""
+    async for lote in lotes:
+        yield "".join(
+            json.dumps(dict(zip(columnas, map(_valor, fila))), ensure_ascii=False) + "\n"
+            for fila in lote
+        ).encode()
+
+
+SERIALIZADORES = {
+    "csv": a_csv,
+    "ndjson": a_ndjson,
+}
@@ -0,0 +1,130 @@
+"""
+Indicadores de cumplimiento de una sesión de monitoreo, acumulados de forma
+incremental con NumPy (ver kpi_monitoreo_repository).
+
+Cada lectura representa el intervalo hasta la lectura siguiente (mismo
+criterio que la duración de las alertas: una excursión dura desde la
+primera lectura fuera de rango hasta la primera de nuevo en rango). Por
+intervalo se suman, ponderados por sus minutos:
+
+- el valor de cada parámetro (promedio ponderado por tiempo)
+- exp(-ΔH / (R·T)) de la temperatura (Mean Kinetic Temperature, USP <1160>)
+- los minutos en excursión de cada parámetro
+
+Un intervalo más largo que el hueco máximo (dispositivo sin reportar) no
+se pondera: cuenta como minutos sin datos. Agregar lecturas solo necesita
+el estado acumulado y la última lectura, no el historial.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+import numpy as np
+from core.utils.reglas_utils import PARAMETROS
+
+R_KJ_MOL_K = 8.314462618e-3  # Constante de los gases, kJ/(mol·K)
+CERO_ABSOLUTO = 273.15
+
+TEMPERATURA = PARAMETROS.index('temperatura')
+
+
+def _vector(valor: float) -> np.ndarray:
+    return np.full(len(PARAMETROS), valor, dtype=np.float64)
+
+
+def factor_arrhenius(temperaturas: np.ndarray, energia_activacion: float) -> np.ndarray:
+    """exp(-ΔH / (R·T)) de temperaturas en °C (ΔH en kJ/mol)"""
+    return np.exp(-energia_activacion / (R_KJ_MOL_K * (temperaturas + CERO_ABSOLUTO)))
+
+
+@dataclass
+class AcumuladorKpis:
+    energia_activacion: float  # ΔH de la MKT en kJ/mol
+    cantidad: int = 0
+    primera_fecha: Optional[datetime] = None
+    ultima_fecha: Optional[datetime] = None
+    minutos_con_datos: float = 0.0
+    minutos_sin_datos: float = 0.0
+    suma_arrhenius: float = 0.0  # Σ exp(-ΔH/RT)·minutos
+    # Arrays alineados con PARAMETROS
+    minimos: np.ndarray = field(default_factory=lambda: _vector(np.nan))
+    maximos: np.ndarray = field(default_factory=lambda: _vector(np.nan))
+    integrales: np.ndarray = field(default_factory=lambda: _vector(0.0))  # Σ valor·minutos
+    minutos_excursion: np.ndarray = field(default_factory=lambda: _vector(0.0))
+    # Última lectura acumulada: abre el intervalo que cierra la próxima
+    ultimos: np.ndarray = field(default_factory=lambda: _vector(np.nan))
+    en_excursion: np.ndarray = field(default_factory=lambda: np.zeros(len(PARAMETROS), dtype=bool))
+
+    def agregar(
+        self,
+        fechas: np.ndarray,
+        valores: np.ndarray,
+        excursiones: np.ndarray,
+        hueco_maximo_minutos: float
+    ) -> None:
+        """
+        Acumula lecturas nuevas.
+
+        Una lectura anterior a la última acumulada (reintento atrasado del
+        NodeMCU) solo cuenta para cantidad, mínimo y máximo: su intervalo ya
+        quedó ponderado con la lectura previa.
+
+        Args:
+            fechas: datetime64 de cada lectura
+            valores: Matriz lecturas × PARAMETROS (NaN = sin valor)
+            excursiones: Máscara lecturas × PARAMETROS fuera de rango
+                (ReglasCondicion.excursiones)
+        """
+        if not len(fechas):
+            return
+        orden = np.argsort(fechas, kind="stable")
+        fechas = fechas[orden].astype("datetime64[us]")
+        valores, excursiones = valores[orden], excursiones[orden]
+
+        self.cantidad += len(fechas)
+        self.minimos = np.fmin(self.minimos, np.fmin.reduce(valores, axis=0))
+        self.maximos = np.fmax(self.maximos, np.fmax.reduce(valores, axis=0))
+        primera = fechas[0].astype(datetime)
+        self.primera_fecha = primera if self.primera_fecha is None else min(self.primera_fecha, primera)
+
+        if self.ultima_fecha is not None:
+            en_orden = fechas >= np.datetime64(self.ultima_fecha, "us")
+            fechas, valores, excursiones = fechas[en_orden], valores[en_orden], excursiones[en_orden]
+            if not len(fechas):
+                return
+            anterior = np.datetime64(self.ultima_fecha, "us")
+        else:
+            anterior = fechas[0]  # La primera lectura no cierra ningún intervalo
+
+        # Intervalo i: de la lectura anterior (la acumulada o la i-1 del lote) a la lectura i
+        minutos = np.diff(np.concatenate([[anterior], fechas])) / np.timedelta64(1, "m")
+        ponderados = np.where(minutos <= hueco_maximo_minutos, minutos, 0.0)
+        previos = np.vstack([self.ultimos, valores[:-1]])
+        previas = np.vstack([self.en_excursion, excursiones[:-1]])
+
+        self.minutos_con_datos += float(ponderados.sum())
+        self.minutos_sin_datos += float((minutos - ponderados).sum())
+        self.integrales = self.integrales + np.nansum(previos * ponderados[:, None], axis=0)
+        self.minutos_excursion = self.minutos_excursion + (previas * ponderados[:, None]).sum(axis=0)
+        self.suma_arrhenius += float(np.nansum(
+            factor_arrhenius(previos[:, TEMPERATURA], self.energia_activacion) * ponderados
+        ))
+
+        self.ultima_fecha = fechas[-1].astype(datetime)
+        self.ultimos = valores[-1].copy()
+        self.en_excursion = excursiones[-1].copy()
+
+    def promedios(self) -> np.ndarray:
+        """Promedio ponderado por tiempo de cada parámetro (con un solo instante, el último valor)"""
+        if self.minutos_con_datos <= 0:
+            return self.ultimos.copy()
+        return self.integrales / self.minutos_con_datos
+
+    def temperatura_cinetica_media(self) -> Optional[float]:
+        """Mean Kinetic Temperature en °C (None sin lecturas de temperatura)"""
+        if self.minutos_con_datos > 0 and self.suma_arrhenius > 0:
+            media = self.suma_arrhenius / self.minutos_con_datos
+        elif not np.isnan(self.ultimos[TEMPERATURA]):
+            media = float(factor_arrhenius(self.ultimos[TEMPERATURA], self.energia_activacion))
+        else:
+            return None
+        return self.energia_activacion / (R_KJ_MOL_K * -np.log(media)) - CERO_ABSOLUTO
@@ -0,0 +1,162 @@
+"""
+Logging del camino caliente de ingesta.
+
+- Los registros se encolan (QueueHandler) y un hilo aparte (QueueListener)
+  los formatea y escribe en stdout: la petición no espera la E/S de logs.
+- Formato estructurado: una línea JSON por registro (LOG_FORMATO=json) o
+  texto plano con los campos al final (LOG_FORMATO=texto).
+- Límite por clave: los registros con extra=campos("clave", ...) se emiten
+  como máximo una vez cada LOG_LIMITE_SEGUNDOS por clave; el siguiente que
+  pasa informa cuántos se suprimieron.
+- Muestreo: los registros con campos(..., muestreo=True) (uno por lectura)
+  solo pasan con probabilidad LOG_MUESTREO (1.0 por defecto: todos).
+- LOG_DEBUG=true (o activar_debug(True)) baja el nivel a DEBUG y desactiva
+  límite y muestreo.
+
+Uso:
+    logger.warning("⚠️ Sensores fallados en '%s': %s", device_id, fallados,
+                   extra=campos(f"sensores_fallados:{device_id}", dispositivo=device_id))
+"""
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+from typing import Optional
+from config import Config
+
+# Atributos estándar de LogRecord (el resto son extras del llamador)
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Máximo de claves recordadas por el limitador
+MAX_CLAVES_LIMITE = 10000
+
+_listener: Optional[QueueListener] = None
+_filtro: Optional["FiltroLimiteTasa"] = None
+
+
+def campos(clave: Optional[str] = None, muestreo: bool = False, **datos) -> dict:
+    """Arma el extra= de un registro: clave de límite, muestreo y campos estructurados"""
+    extra = {"datos": datos} if datos else {}
+    if clave:
+        extra["clave"] = clave
+    if muestreo:
+        extra["muestreo"] = True
+    return extra
+
+
+class FiltroLimiteTasa(logging.Filter):
+    """Aplica muestreo y límite por clave antes de encolar el registro"""
+    def __init__(self, intervalo_s: float, muestreo: float, debug: bool = False):
+        super().__init__()
+        self.intervalo_s = intervalo_s
+        self.muestreo = muestreo
+        self.debug = debug
+        self._claves: OrderedDict[str, list] = OrderedDict()  # clave → [último emitido, suprimidos]
+        self._lock = Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.debug or record.levelno >= logging.ERROR:
+            return True
+
+        if getattr(record, "muestreo", False) and random.random() >= self.muestreo:
+            return False
+
+        clave = getattr(record, "clave", None)
+        if clave is None:
+            return True
+
+        ahora = time.monotonic()
+        with self._lock:
+            estado = self._claves.get(clave)
+            if estado is not None and ahora - estado[0] < self.intervalo_s:
+                estado[1] += 1
+                return False
+
+            record.suprimidos = estado[1] if estado else 0
+            self._claves[clave] = [ahora, 0]
+            self._claves.move_to_end(clave)
+            if len(self._claves) > MAX_CLAVES_LIMITE:
+                self._claves.popitem(last=False)
+        return True
+
+
+class FormatoEstructurado(logging.Formatter):
+    """Una línea por registro, JSON o texto, con los campos estructurados"""
+    def __init__(self, formato: str = "json"):
+        super().__init__()
+        self.formato = formato
+
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for atributo in ("clave", "suprimidos"):
+            valor = getattr(record, atributo, None)
+            if valor:
+                registro[atributo] = valor
+        registro.update(getattr(record, "datos", None) or {})
+        # Extras pasados directamente en extra= (sin campos())
+        for atributo, valor in vars(record).items():
+            if atributo not in _ATRIBUTOS_RECORD and atributo not in ("clave", "suprimidos", "datos", "muestreo"):
+                registro.setdefault(atributo, valor)
+
+        if self.formato == "json":
+            return json.dumps(registro, ensure_ascii=False, default=str)
+
+        extras = " ".join(
+            f"{k}={v}" for k, v in registro.items() if k not in ("ts", "nivel", "logger", "mensaje")
+        )
+        linea = f"{registro['ts']} {registro['nivel']} {registro['logger']}: {registro['mensaje']}"
+        return f"{linea} [{extras}]" if extras else linea
+
+
+def configurar_logging() -> None:
+    """
+    Instala el handler en cola en el logger raíz (idempotente).
+    Reemplaza a logging.basicConfig.
+    """
+    global _listener, _filtro
+    if _listener is not None:
+        return
+
+    cola: queue.SimpleQueue = queue.SimpleQueue()
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormatoEstructurado(Config.LOG_FORMATO))
+
+    _filtro = FiltroLimiteTasa(Config.LOG_LIMITE_SEGUNDOS, Config.LOG_MUESTREO, Config.LOG_DEBUG)
+    handler = QueueHandler(cola)
+    handler.addFilter(_filtro)
+
+    raiz = logging.getLogger()
+    for anterior in list(raiz.handlers):
+        raiz.removeHandler(anterior)
+    raiz.addHandler(handler)
+    raiz.setLevel(logging.DEBUG if Config.LOG_DEBUG else Config.LOG_LEVEL)
+
+    _listener = QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+
+
+def activar_debug(activo: bool) -> None:
+    """Activa/desactiva el modo debug en caliente (nivel DEBUG, sin límite ni muestreo)"""
+    logging.getLogger().setLevel(logging.DEBUG if activo else Config.LOG_LEVEL)
+    if _filtro is not None:
+        _filtro.debug = activo
+
+
+def detener_logging() -> None:
+    """Vacía la cola de logs y detiene el hilo escritor (shutdown de la app)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,47 @@
+"""
+Paginación por keyset (fecha, id) con cursor opaco.
+
+El cursor codifica la (fecha, id) de la última fila de la página; la página
+siguiente pide las filas estrictamente anteriores en el orden
+(fecha DESC, id DESC). Así cada página es un recorrido de rango sobre el
+índice, sin OFFSET, y su costo no crece con el historial.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+Cursor = tuple[datetime, int]
+
+
+def codificar_cursor(fecha: datetime, id: int) -> str:
+    contenido = json.dumps({"f": fecha.isoformat(), "i": id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(contenido.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    """
+    Raises:
+        ValueError: Si el cursor no fue generado por codificar_cursor
+    """
+    if not cursor:
+        return None
+    try:
+        contenido = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(contenido["f"]), int(contenido["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def dividir_pagina(filas: Sequence, limite: int) -> tuple[list, Optional[str]]:
+    """
+    Recibe hasta limite + 1 filas (la extra indica que hay más páginas).
+
+    Returns:
+        Tuple con las filas de la página y el cursor de la siguiente (o None)
+    """
+    pagina = list(filas[:limite])
+    if len(filas) <= limite:
+        return pagina, None
+    ultima = pagina[-1]
+    return pagina, codificar_cursor(ultima.fecha, ultima.id)
@@ -0,0 +1,97 @@
+"""
+Motor de reglas de una CondicionAlmacenamiento, vectorizado con NumPy.
+
+compilar_reglas() convierte la condición en arrays alineados con PARAMETROS
+(límites mínimos / máximos y, por umbral de advertencia, las bandas a partir
+de las cuales el LED pasa a amarillo). Con eso una sola expresión evalúa una
+lectura (vector de len(PARAMETROS)) o una matriz lecturas × PARAMETROS:
+
+- excursión: valor < mínimo o valor > máximo (abre una alerta)
+- advertencia: valor <= advertencia_min o valor >= advertencia_max
+
+Los valores ausentes van como NaN y nunca cuentan como excursión ni como
+advertencia. Lo usan la ingesta (lectura a lectura y por lotes), el LED y
+el recálculo de alertas sobre lecturas ya guardadas (tramos_excursion).
+"""
+from dataclasses import dataclass
+from typing import Any, Iterable, Sequence
+import numpy as np
+
+PARAMETROS = ('temperatura', 'humedad', 'lux', 'presion')
+
+
+@dataclass(frozen=True, eq=False)
+class ReglasCondicion:
+    id: int  # id de la CondicionAlmacenamiento
+    minimos: np.ndarray
+    maximos: np.ndarray
+    # {umbral: (advertencia_min, advertencia_max)}, arrays alineados con PARAMETROS
+    bandas: dict[float, tuple[np.ndarray, np.ndarray]]
+
+    def excursiones(self, valores: np.ndarray) -> np.ndarray:
+        """Máscara (misma forma que `valores`) de los valores fuera de [mínimo, máximo]"""
+        return (valores < self.minimos) | (valores > self.maximos)
+
+    def advertencias(self, valores: np.ndarray, umbral: float) -> np.ndarray:
+        """Máscara de los valores en la banda de advertencia del umbral (incluye las excursiones)"""
+        advertencia_min, advertencia_max = self.bandas[umbral]
+        return (valores <= advertencia_min) | (valores >= advertencia_max)
+
+    def evaluar(self, valores: np.ndarray, umbral: float) -> tuple[np.ndarray, np.ndarray]:
+        """(excursiones, advertencias) de una lectura o de una matriz de lecturas"""
+        return self.excursiones(valores), self.advertencias(valores, umbral)
+
+    def parametros_fuera_rango(self, valores: np.ndarray) -> list[str]:
+        """Nombres de los parámetros en excursión de una sola lectura"""
+        return [PARAMETROS[i] for i in np.flatnonzero(self.excursiones(valores))]
+
+    def limites(self, parametro: str) -> tuple[float, float]:
+        i = PARAMETROS.index(parametro)
+        return float(self.minimos[i]), float(self.maximos[i])
+
+
+def tramos_excursion(excursiones: np.ndarray, previas: np.ndarray) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Por parámetro, los índices de las filas de `excursiones` (lecturas ×
+    PARAMETROS, en orden cronológico) donde empieza una excursión y donde
+    termina (primera lectura de nuevo en rango), continuando el estado
+    `previas` (parámetros que ya venían en excursión antes de la primera
+    fila). Inicios y fines se alternan: con previas[j], el primer fin cierra
+    la excursión que venía abierta; un inicio sin fin sigue abierto.
+    """
+    cambios = np.diff(np.vstack([previas, excursiones]).astype(np.int8), axis=0)
+    return [(np.flatnonzero(cambios[:, j] == 1), np.flatnonzero(cambios[:, j] == -1)) for j in range(len(PARAMETROS))]
+
+
+def compilar_reglas(condicion: Any, umbrales: Iterable[float] = ()) -> ReglasCondicion:
+    """
+    Compila una condición (CondicionAlmacenamiento, LimitesCondicion o
+    cualquier objeto con {parametro}_min / {parametro}_max).
+
+    Args:
+        umbrales: Fracciones del rango para las bandas de advertencia: con
+            umbral u, advertencia_min = máximo - rango·u y
+            advertencia_max = mínimo + rango·u
+    """
+    minimos = np.array([getattr(condicion, f"{p}_min") for p in PARAMETROS], dtype=np.float64)
+    maximos = np.array([getattr(condicion, f"{p}_max") for p in PARAMETROS], dtype=np.float64)
+    rango = maximos - minimos
+    return ReglasCondicion(
+        id=condicion.id,
+        minimos=minimos,
+        maximos=maximos,
+        bandas={umbral: (maximos - rango * umbral, minimos + rango * umbral) for umbral in umbrales}
+    )
+
+
+def valores_lectura(lectura: Any) -> np.ndarray:
+    """Vector de una lectura (DatoMonitoreo o dict) en el orden de PARAMETROS; None → NaN"""
+    obtener = lectura.get if isinstance(lectura, dict) else lambda p: getattr(lectura, p)
+    return np.array([np.nan if (valor := obtener(p)) is None else valor for p in PARAMETROS], dtype=np.float64)
+
+
+def matriz_lecturas(lecturas: Sequence[Any]) -> np.ndarray:
+    """Matriz lecturas × PARAMETROS de varias lecturas (ver valores_lectura)"""
+    if not lecturas:
+        return np.empty((0, len(PARAMETROS)), dtype=np.float64)
+    return np.stack([valores_lectura(lectura) for lectura in lecturas])
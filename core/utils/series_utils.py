@@ -0,0 +1,96 @@
+"""
+Submuestreo de series para gráficos (Largest-Triangle-Three-Buckets).
+
+LTTB conserva la forma visual de la serie con `puntos` puntos: divide la
+serie en buckets y de cada uno se queda con el punto que forma el triángulo
+de mayor área con el punto elegido en el bucket anterior y el promedio del
+siguiente. La dependencia con el bucket anterior obliga a recorrer los
+buckets en orden, pero dentro de cada bucket todo es NumPy (y los promedios
+de los buckets se calculan de una vez con reduceat): el costo en Python es
+O(puntos), no O(lecturas).
+
+Los puntos fuera de los límites de la condición (excursiones) se conservan
+siempre, además de los elegidos por LTTB.
+"""
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import numpy as np
+from sqlalchemy import Row
+
+
+async def leer_serie(lotes: AsyncIterator[list[Row]], columna: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Arma la serie (fechas, valores) de una columna a partir de los lotes de
+    iterar_datos_sesion_async (columna 1 = fecha).
+
+    Returns:
+        Tuple con fechas (datetime64[us]) y valores (float64)
+    """
+    fechas: list[datetime] = []
+    valores: list[float] = []
+    async for lote in lotes:
+        fechas.extend(fila[1] for fila in lote)
+        valores.extend(fila[columna] for fila in lote)
+    return np.array(fechas, dtype="datetime64[us]"), np.array(valores, dtype=np.float64)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, puntos: int) -> np.ndarray:
+    """
+    Índices (ordenados) de los `puntos` puntos elegidos por LTTB; la serie
+    completa si ya tiene `puntos` o menos. Siempre incluye el primero y el último.
+
+    Args:
+        x: Abscisas crecientes (float64)
+        y: Valores (float64)
+    """
+    total = len(x)
+    if puntos >= total or puntos < 3:
+        return np.arange(total)
+
+    # puntos - 2 buckets entre el primer y el último punto
+    bordes = np.linspace(1, total - 1, puntos - 1).astype(np.int64)
+    tamanos = np.diff(bordes)
+    promedios_x = np.add.reduceat(x[:-1], bordes[:-1]) / tamanos
+    promedios_y = np.add.reduceat(y[:-1], bordes[:-1]) / tamanos
+    # El "siguiente" del último bucket es el último punto
+    siguientes_x = np.append(promedios_x[1:], x[-1])
+    siguientes_y = np.append(promedios_y[1:], y[-1])
+
+    elegidos = np.empty(puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, total - 1
+    anterior = 0
+    for bucket in range(puntos - 2):
+        inicio, fin = bordes[bucket], bordes[bucket + 1]
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs(
+            (ax - siguientes_x[bucket]) * (y[inicio:fin] - ay)
+            - (ax - x[inicio:fin]) * (siguientes_y[bucket] - ay)
+        )
+        anterior = inicio + int(np.argmax(areas))
+        elegidos[bucket + 1] = anterior
+    return elegidos
+
+
+def submuestrear(
+    fechas: np.ndarray,
+    valores: np.ndarray,
+    puntos: int,
+    limite_min: Optional[float] = None,
+    limite_max: Optional[float] = None
+) -> np.ndarray:
+    """
+    Índices de la serie a graficar: LTTB más todos los puntos fuera de
+    [limite_min, limite_max]. El resultado puede superar `puntos` en la
+    cantidad de puntos en excursión.
+    """
+    x = fechas.astype("datetime64[us]").astype(np.int64).astype(np.float64)
+    indices = lttb(x, valores, puntos)
+
+    excursion = np.zeros(len(valores), dtype=bool)
+    if limite_min is not None:
+        excursion |= valores < limite_min
+    if limite_max is not None:
+        excursion |= valores > limite_max
+    if excursion.any():
+        indices = np.union1d(indices, np.flatnonzero(excursion))
+    return indices
@@ -36,4 +36,10 @@ def get_current_user(request: Request) -> UserRead:
             rol="Administrador" if payload["rol"] == 1 else "Usuario"
         )
     except (JWTError, KeyError, ValueError) as e:
-        raise HTTPException(status_code=401, detail=f"Error de autenticación: {str(e)}") from e
\ No newline at end of file
+        raise HTTPException(status_code=401, detail=f"Error de autenticación: {str(e)}") from e
+
+
+def get_current_admin(current_user: UserRead = Depends(get_current_user)) -> UserRead:
+    if current_user.rol != "Administrador":
+        raise HTTPException(status_code=403, detail="Se requiere rol Administrador")
+    return current_user
@@ -1,10 +1,20 @@
+import asyncio
 from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select, create_engine
-from adapters.api import usuario, auth, condicionalmacenamiento, productofarmaceutico, formafarmaceutica, productomonitoreado, datomonitoreo, alerta, registro, dashboard, perfil, nodemcu, uploadimage, simulacion  # TEMPORAL
-from adapters.db.sqlmodel_database import init_db, get_session
+from adapters.api import usuario, auth, condicionalmacenamiento, productofarmaceutico, formafarmaceutica, productomonitoreado, datomonitoreo, alerta, registro, dashboard, perfil, nodemcu, uploadimage, eventos, simulacion  # TEMPORAL
+from adapters.db.sqlmodel_database import init_db, get_session, cerrar_async_engine
+from adapters.db import particiones
 from core.models.rol import Rol
 from core.models.formafarmaceutica import FormaFarmaceutica
+from config import Config
+from core.utils.logging_utils import configurar_logging, detener_logging
+from services.ingest_pipeline import ingest_pipeline
+from services import archivo_service, kpi_service
+from services.eventos_hub import hub_eventos
+from core.repositories.indice_alertas_pendientes import indice_alertas
+from core.repositories.lecturas_recientes import lecturas_recientes
+from adapters.estado.estado_compartido import estado_compartido
 
 app = FastAPI()
 
@@ -36,6 +46,11 @@ def create_default_formas(session: Session):
 
 @app.on_event("startup")
 async def on_startup():
+    # Logs en cola (hilo aparte), estructurados y con límite por clave. Al
+    # iniciar y no al importar: importar main (tests, scripts) no toca los
+    # handlers del logger raíz
+    configurar_logging()
+
     init_db()
 
     # Crear datos iniciales con sesión dedicada
@@ -43,8 +58,46 @@ async def on_startup():
     with Session(engine) as session:
         create_default_roles(session)
         create_default_formas(session)
+        # Índice en memoria de alertas pendientes (lo mantiene alerta_repository)
+        indice_alertas.cargar(session)
+        # Últimas lecturas de los monitoreos activos para /recientes (las alimenta la ingesta)
+        lecturas_recientes.cargar(session)
+
+    # Con varios workers (ESTADO_BACKEND=postgres): dispositivos, LED, alertas
+    # pendientes y contexto de monitoreo coherentes entre procesos
+    estado_compartido.iniciar()
+
+    # Eventos en vivo (WebSocket / SSE): entregas en el event loop de la aplicación
+    hub_eventos.iniciar()
+
+    if Config.INGEST_MODE == "async":
+        await ingest_pipeline.start()
+
+    # Particiones mensuales de datomonitoreo (PostgreSQL): crear las próximas y aplicar retención
+    if particiones.es_postgres(engine):
+        app.state.mantenimiento_particiones = asyncio.create_task(particiones.ciclo_mantenimiento(engine))
+
+    # Archivar las sesiones finalizadas hace más de ARCHIVO_ESPERA_DIAS
+    app.state.archivado_sesiones = asyncio.create_task(archivo_service.ciclo_archivado(engine))
+
+    # Indicadores de sesiones previas a kpimonitoreo o pendientes (la ingesta no los reconstruye)
+    app.state.reconstruccion_kpis = asyncio.create_task(asyncio.to_thread(kpi_service.reconstruir_pendientes, engine))
 
     print("✅ Backend iniciado - Esperando datos del NodeMCU en POST /nodemcu/data")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Guardar las lecturas que sigan en la cola de ingesta
+    await ingest_pipeline.stop()
+    hub_eventos.detener()
+    estado_compartido.detener()
+    for nombre in ("mantenimiento_particiones", "archivado_sesiones", "reconstruccion_kpis"):
+        tarea = getattr(app.state, nombre, None)
+        if tarea is not None:
+            tarea.cancel()
+    await cerrar_async_engine()
+    detener_logging()
+
 # Incluir routers
 app.include_router(nodemcu.router)
 app.include_router(usuario.router)
@@ -59,4 +112,5 @@ app.include_router(registro.router)
 app.include_router(uploadimage.router)  # Cloudinary configurado y habilitado
 app.include_router(auth.router)
 app.include_router(perfil.router)
+app.include_router(eventos.router)
 app.include_router(simulacion.router)  # TEMPORAL - Eliminar después de usar
\ No newline at end of file
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tareas de mantenimiento de PharmaMonitor.
+
+Uso:
+    python manage.py migrar [--estado]
+    python manage.py reconstruir-agregados --producto 3 [--desde 2026-01-01] [--hasta 2026-02-01]
+    python manage.py archivar [--producto 3]
+    python manage.py exportar --producto 3 [--formato parquet|arrow] [--tabla lecturas|alertas] [--salida sesion3.parquet]
+    python manage.py recalcular-alertas --producto 3 [--reiniciar]
+    python manage.py reconstruir-kpis [--producto 3]
+"""
+import argparse
+from datetime import datetime
+import importlib
+import shutil
+import sys
+from sqlmodel import Session, select
+
+# Módulos con tablas: se importan todos para que create_all y las relaciones los conozcan
+MODELOS = (
+    "rol", "usuario", "registro", "formafarmaceutica", "condicionalmacenamiento",
+    "productofarmaceutico", "productomonitoreado", "datomonitoreo", "alerta", "agregadomonitoreo",
+    "archivomonitoreo", "recalculoalertas", "kpimonitoreo",
+)
+
+
+def preparar_bd():
+    from adapters.db.sqlmodel_database import init_db
+    for modelo in MODELOS:
+        importlib.import_module(f"core.models.{modelo}")
+    init_db()
+
+
+def migrar(args):
+    from adapters.db import migraciones
+    from adapters.db.sqlmodel_database import engine
+
+    for modelo in MODELOS:
+        importlib.import_module(f"core.models.{modelo}")
+
+    if args.estado:
+        pendientes = {migracion.version for migracion in migraciones.pendientes(engine)}
+        for migracion in migraciones.MIGRACIONES:
+            marca = "⏳" if migracion.version in pendientes else "✅"
+            print(f"{marca} {migracion.version:>3} {migracion.descripcion}")
+        return
+
+    # init_db crea las tablas que falten (datomonitoreo particionada en
+    # PostgreSQL) y aplica las migraciones pendientes
+    antes = [migracion.version for migracion in migraciones.pendientes(engine)]
+    preparar_bd()
+    print(f"✅ {len(antes)} migración(es) aplicada(s): {antes}")
+
+
+def reconstruir_agregados(args):
+    from adapters.db.sqlmodel_database import engine
+    from core.models.productomonitoreado import ProductoMonitoreado
+    from core.repositories import agregado_monitoreo_repository
+
+    preparar_bd()
+    with Session(engine) as session:
+        if args.producto is not None:
+            ids = [args.producto]
+        else:
+            ids = session.exec(select(ProductoMonitoreado.id)).all()
+
+        for id_producto_monitoreado in ids:
+            filas = agregado_monitoreo_repository.reconstruir_agregados(
+                session, id_producto_monitoreado, args.desde, args.hasta
+            )
+            print(f"✅ Producto monitoreado {id_producto_monitoreado}: {filas} agregado(s) reconstruido(s)")
+
+
+def archivar(args):
+    from adapters.db.sqlmodel_database import engine
+    from services import archivo_service
+
+    preparar_bd()
+    if args.producto is None:
+        archivadas = archivo_service.archivar_pendientes(engine)
+        print(f"✅ {archivadas} sesión(es) archivada(s)")
+        return
+
+    with Session(engine) as session:
+        archivo = archivo_service.archivar_sesion(session, args.producto)
+    if archivo is None:
+        sys.exit(f"❌ Producto monitoreado {args.producto}: no existe, sigue activo, ya está archivado o no tiene lecturas")
+    print(f"✅ Producto monitoreado {args.producto}: {archivo.cantidad} lecturas en {archivo.tamano_bytes} bytes")
+
+
+def exportar(args):
+    from adapters.db.sqlmodel_database import engine
+    from services.exportacion_service import ExportacionNoDisponible, exportar_sesion
+
+    preparar_bd()
+    try:
+        ruta = exportar_sesion(engine, args.producto, args.tabla, args.formato)
+    except ExportacionNoDisponible as e:
+        sys.exit(f"❌ {e}")
+    if ruta is None:
+        sys.exit(f"❌ Producto monitoreado {args.producto} no encontrado")
+
+    if args.salida:
+        shutil.copyfile(ruta, args.salida)
+        ruta = args.salida
+    print(f"✅ {args.tabla} del producto monitoreado {args.producto}: {ruta}")
+
+
+def recalcular_alertas(args):
+    from adapters.db.sqlmodel_database import engine
+    from services.recalculo_alertas_service import RecalculoEnCurso, recalcular_alertas as recalcular
+
+    def progreso(recalculo):
+        print(
+            f"⏳ {recalculo.lecturas_procesadas}/{recalculo.lecturas_totales} lecturas "
+            f"({recalculo.porcentaje}%) - {recalculo.alertas_creadas} alerta(s)",
+            flush=True
+        )
+
+    preparar_bd()
+    try:
+        recalculo = recalcular(engine, args.producto, args.reiniciar, progreso)
+    except RecalculoEnCurso as e:
+        sys.exit(f"❌ {e}")
+    except KeyboardInterrupt:
+        sys.exit("⏸️ Recálculo interrumpido: se reanuda con el mismo comando")
+    if recalculo is None:
+        sys.exit(f"❌ Producto monitoreado {args.producto} no encontrado")
+    print(
+        f"✅ Producto monitoreado {args.producto}: {recalculo.lecturas_procesadas} lecturas evaluadas, "
+        f"{recalculo.alertas_creadas} alerta(s) recalculada(s)"
+    )
+
+
+def reconstruir_kpis(args):
+    from adapters.db.sqlmodel_database import engine
+    from core.repositories import kpi_monitoreo_repository
+    from services import kpi_service
+
+    preparar_bd()
+    if args.producto is None:
+        reconstruidas = kpi_service.reconstruir_pendientes(engine)
+        print(f"✅ Indicadores de {reconstruidas} sesión(es) reconstruidos")
+        return
+
+    with Session(engine) as session:
+        kpi = kpi_monitoreo_repository.reconstruir_kpis(session, args.producto)
+    if kpi is None:
+        sys.exit(f"❌ Producto monitoreado {args.producto} no encontrado")
+    print(f"✅ Producto monitoreado {args.producto}: indicadores de {kpi.cantidad} lecturas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tareas de mantenimiento de PharmaMonitor")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    migracion = comandos.add_parser("migrar", help="Aplica las migraciones de esquema pendientes")
+    migracion.add_argument("--estado", action="store_true", help="Solo lista las migraciones aplicadas y pendientes")
+    migracion.set_defaults(funcion=migrar)
+
+    reconstruir = comandos.add_parser(
+        "reconstruir-agregados",
+        help="Recalcula los agregados 1m/1h/1d desde datomonitoreo"
+    )
+    reconstruir.add_argument("--producto", type=int, help="ID del producto monitoreado (por defecto, todos)")
+    reconstruir.add_argument("--desde", type=datetime.fromisoformat, help="Fecha ISO (por defecto, primera lectura)")
+    reconstruir.add_argument("--hasta", type=datetime.fromisoformat, help="Fecha ISO (por defecto, última lectura)")
+    reconstruir.set_defaults(funcion=reconstruir_agregados)
+
+    archivado = comandos.add_parser(
+        "archivar",
+        help="Archiva sesiones finalizadas (comprime sus lecturas y las borra de datomonitoreo)"
+    )
+    archivado.add_argument(
+        "--producto", type=int,
+        help="ID del producto monitoreado, sin esperar ARCHIVO_ESPERA_DIAS (por defecto, todas las pendientes)"
+    )
+    archivado.set_defaults(funcion=archivar)
+
+    exportacion = comandos.add_parser(
+        "exportar",
+        help="Exporta las lecturas o alertas de un producto monitoreado como Parquet o Arrow"
+    )
+    exportacion.add_argument("--producto", type=int, required=True, help="ID del producto monitoreado")
+    exportacion.add_argument("--formato", choices=("parquet", "arrow"), default="parquet")
+    exportacion.add_argument("--tabla", choices=("lecturas", "alertas"), default="lecturas")
+    exportacion.add_argument("--salida", help="Ruta de destino (por defecto, se informa la ruta en la caché)")
+    exportacion.set_defaults(funcion=exportar)
+
+    recalculo = comandos.add_parser(
+        "recalcular-alertas",
+        help="Recalcula el historial de alertas de una sesión con la condición actual (reanudable)"
+    )
+    recalculo.add_argument("--producto", type=int, required=True, help="ID del producto monitoreado")
+    recalculo.add_argument(
+        "--reiniciar", action="store_true",
+        help="Empieza de cero aunque haya un recálculo interrumpido"
+    )
+    recalculo.set_defaults(funcion=recalcular_alertas)
+
+    kpis = comandos.add_parser(
+        "reconstruir-kpis",
+        help="Recalcula los indicadores de cumplimiento (MKT, promedios, minutos fuera de rango)"
+    )
+    kpis.add_argument(
+        "--producto", type=int,
+        help="ID del producto monitoreado (por defecto, las sesiones sin indicadores o pendientes)"
+    )
+    kpis.set_defaults(funcion=reconstruir_kpis)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
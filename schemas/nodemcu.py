@@ -5,8 +5,31 @@ Nueva arquitectura:
 - NodeMCU → Backend (POST /nodemcu/data con sensores)
 - Backend → NodeMCU (RESPONSE: {"led_color": "verde|amarillo|rojo"})
 """
-from typing import Optional
-from pydantic import BaseModel, Field, field_validator
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from core.utils.logging_utils import campos
+
+logger = logging.getLogger(__name__)
+
+
+# Rangos físicamente posibles por sensor. Valores fuera se descartan (None).
+RANGOS_VALIDOS = {
+    'temperatura': (-40, 80),
+    'humedad': (0, 100),
+    'lux': (0, 100000),
+    'presion': (300, 1100),
+}
+
+# Máximo de lecturas aceptadas en un solo POST /nodemcu/data/batch
+MAX_LECTURAS_LOTE = 500
+
+# Longitud máxima del identificador de dispositivo (payload o header X-Device-Id)
+MAX_LONGITUD_DEVICE_ID = 64
+
+# Número de secuencia: contador uint32 del NodeMCU
+MAX_SECUENCIA = 0xFFFFFFFF
 
 
 class NodeMCUDataSchema(BaseModel):
@@ -14,8 +37,21 @@ class NodeMCUDataSchema(BaseModel):
     Datos enviados desde el NodeMCU al backend.
 
     Todos los campos son opcionales porque los sensores pueden fallar
-    individualmente.
+    individualmente. device_id identifica al NodeMCU cuando hay varios; si
+    falta se usa el header X-Device-Id o el dispositivo por defecto.
+
+    secuencia es un contador monótono por dispositivo (opcional): un reintento
+    con la misma secuencia no se vuelve a guardar y recibe la misma respuesta.
+    El NodeMCU debe persistir el contador (EEPROM/flash) entre reinicios.
+
+    timestamp (opcional) es el momento de la lectura en el dispositivo y se
+    guarda como fecha; sin él se usa la hora del servidor. Solo con
+    timestamp el reintento repite (dispositivo, secuencia, fecha) y la BD lo
+    rechaza aunque haya salido de la ventana de deduplicación en memoria.
     """
+    device_id: Optional[str] = Field(None, max_length=MAX_LONGITUD_DEVICE_ID, description="Identificador del NodeMCU")
+    secuencia: Optional[int] = Field(None, ge=0, le=MAX_SECUENCIA, description="Contador monótono del dispositivo")
+    timestamp: Optional[datetime] = Field(None, description="Momento de la lectura en el dispositivo (ISO 8601 o epoch en segundos)")
     temperatura: Optional[float] = Field(None, description="Temperatura en °C")
     humedad: Optional[float] = Field(None, description="Humedad relativa en %")
     lux: Optional[float] = Field(None, description="Nivel de luz en lux")
@@ -27,7 +63,7 @@ class NodeMCUDataSchema(BaseModel):
         """Valida que la humedad esté en un rango razonable (0-100%)"""
         if v is not None:
             if v < 0 or v > 100:
-                print(f"⚠️  Humedad imposible recibida: {v}% - Rechazando")
+                logger.warning("⚠️ Humedad imposible recibida: %s%% - Rechazando", v, extra=campos("rango.humedad", valor=v))
                 return None
         return v
 
@@ -37,7 +73,7 @@ class NodeMCUDataSchema(BaseModel):
         """Valida que la temperatura esté en un rango razonable (-40 a 80°C)"""
         if v is not None:
             if v < -40 or v > 80:
-                print(f"⚠️  Temperatura imposible recibida: {v}°C - Rechazando")
+                logger.warning("⚠️ Temperatura imposible recibida: %s°C - Rechazando", v, extra=campos("rango.temperatura", valor=v))
                 return None
         return v
 
@@ -47,7 +83,7 @@ class NodeMCUDataSchema(BaseModel):
         """Valida que el lux esté en un rango razonable (0 a 100,000)"""
         if v is not None:
             if v < 0 or v > 100000:
-                print(f"⚠️  Lux imposible recibido: {v} - Rechazando")
+                logger.warning("⚠️ Lux imposible recibido: %s - Rechazando", v, extra=campos("rango.lux", valor=v))
                 return None
         return v
 
@@ -57,13 +93,16 @@ class NodeMCUDataSchema(BaseModel):
         """Valida que la presión esté en un rango razonable (300 a 1100 hPa)"""
         if v is not None:
             if v < 300 or v > 1100:
-                print(f"⚠️  Presión imposible recibida: {v} hPa - Rechazando")
+                logger.warning("⚠️ Presión imposible recibida: %s hPa - Rechazando", v, extra=campos("rango.presion", valor=v))
                 return None
         return v
 
     class Config:
         json_schema_extra = {
             "example": {
+                "device_id": "nevera-01",
+                "secuencia": 1024,
+                "timestamp": "2025-02-01T19:14:00-04:00",
                 "temperatura": 5.2,
                 "humedad": 65.0,
                 "lux": 150.0,
@@ -72,6 +111,100 @@ class NodeMCUDataSchema(BaseModel):
         }
 
 
+class NodeMCULecturaSchema(BaseModel):
+    """
+    Lectura individual dentro de un lote enviado por el NodeMCU.
+
+    A diferencia de NodeMCUDataSchema, cada lectura trae obligatoriamente el
+    timestamp del dispositivo (ISO 8601 o epoch en segundos). La validación de rangos se
+    hace por columna en NodeMCUBatchSchema, no campo a campo.
+    """
+    timestamp: datetime = Field(..., description="Momento de la lectura en el dispositivo")
+    secuencia: Optional[int] = Field(None, ge=0, le=MAX_SECUENCIA, description="Contador monótono del dispositivo")
+    temperatura: Optional[float] = Field(None, description="Temperatura en °C")
+    humedad: Optional[float] = Field(None, description="Humedad relativa en %")
+    lux: Optional[float] = Field(None, description="Nivel de luz en lux")
+    presion: Optional[float] = Field(None, description="Presión atmosférica en hPa")
+
+
+class NodeMCUBatchSchema(BaseModel):
+    """
+    Lote de lecturas acumuladas por el NodeMCU (POST /nodemcu/data/batch).
+
+    Permite que el dispositivo vacíe su buffer (ej: 60 lecturas) en un solo
+    POST en lugar de un POST por lectura.
+    """
+    device_id: Optional[str] = Field(None, max_length=MAX_LONGITUD_DEVICE_ID, description="Identificador del NodeMCU")
+    lecturas: List[NodeMCULecturaSchema] = Field(..., min_length=1, max_length=MAX_LECTURAS_LOTE)
+
+    @model_validator(mode='after')
+    def validar_rangos(self) -> 'NodeMCUBatchSchema':
+        """
+        Aplica RANGOS_VALIDOS a todo el lote recorriendo una columna a la vez.
+
+        Las lecturas imposibles se descartan igual que en NodeMCUDataSchema,
+        pero se reporta un solo mensaje por sensor en lugar de uno por lectura.
+        """
+        for campo, (minimo, maximo) in RANGOS_VALIDOS.items():
+            rechazadas = 0
+            for lectura in self.lecturas:
+                valor = getattr(lectura, campo)
+                if valor is not None and not (minimo <= valor <= maximo):
+                    setattr(lectura, campo, None)
+                    rechazadas += 1
+            if rechazadas:
+                logger.warning(
+                    "⚠️ %s lectura(s) de %s fuera de [%s, %s] - Rechazando", rechazadas, campo, minimo, maximo,
+                    extra=campos(f"rango.{campo}", rechazadas=rechazadas)
+                )
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "device_id": "nevera-01",
+                "lecturas": [
+                    {"timestamp": "2025-02-01T19:14:00-04:00", "temperatura": 5.2, "humedad": 65.0, "lux": 150.0, "presion": 1013.0},
+                    {"timestamp": "2025-02-01T19:14:10-04:00", "temperatura": 5.3, "humedad": 64.8, "lux": 151.0, "presion": 1013.0}
+                ]
+            }
+        }
+
+
+class DispositivoSchema(BaseModel):
+    """Estado en memoria de un NodeMCU (GET /nodemcu/dispositivos)"""
+    device_id: str
+    id_producto_monitoreado: Optional[int] = Field(None, description="None = reporta al monitoreo activo")
+    led_color: str
+    sensores_fallados: List[str]
+    ultima_lectura: Optional[dict] = None
+
+
+class UltimaLecturaSchema(BaseModel):
+    """
+    Última lectura de un NodeMCU desde su estado en memoria (GET /nodemcu/latest).
+
+    Los valores son None si el dispositivo aún no envió lecturas o si ese
+    sensor falló en la última.
+    """
+    device_id: str
+    id_producto_monitoreado: Optional[int] = Field(None, description="None = reporta al monitoreo activo")
+    version: int = Field(..., description="Lecturas recibidas por el dispositivo desde el arranque")
+    fecha: Optional[datetime] = Field(None, description="Momento de la última lectura (hora de Caracas)")
+    fresca: bool = Field(..., description="La última lectura tiene menos de sensor_timeout segundos")
+    temperatura: Optional[float] = None
+    humedad: Optional[float] = None
+    lux: Optional[float] = None
+    presion: Optional[float] = None
+    sensores: Dict[str, bool] = Field(..., description="Estado de cada sensor (True = OK)")
+    led_color: str
+
+
+class AsignacionDispositivoSchema(BaseModel):
+    """Asociación de un NodeMCU a un ProductoMonitoreado"""
+    id_producto_monitoreado: Optional[int] = Field(None, description="None = reportar al monitoreo activo")
+
+
 class LEDResponseSchema(BaseModel):
     """
     Respuesta del backend al NodeMCU con el comando LED.
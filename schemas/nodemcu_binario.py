@@ -0,0 +1,143 @@
+"""
+Formato binario compacto para POST /nodemcu/data.bin.
+
+Alternativa a NodeMCUDataSchema para ESP8266 en enlaces medidos: una trama
+de tamaño fijo (26 bytes, little-endian) en lugar de JSON, y una respuesta
+de 1 byte con el código del LED en lugar de LEDResponseSchema.
+
+Trama (struct "<BIIIhhffB"):
+
+    campo        tipo     descripción
+    -----------  -------  -----------------------------------------------
+    version      uint8    VERSION_TRAMA
+    device_id    uint32   Identificador del NodeMCU
+    secuencia    uint32   Contador monótono del dispositivo
+    timestamp    uint32   Epoch UTC en segundos (0 = usar la hora del servidor)
+    temperatura  int16    °C × 100
+    humedad      int16    % × 100
+    lux          float32  lux
+    presion      float32  hPa
+    validos      uint8    Bit 0 temperatura, 1 humedad, 2 lux, 3 presion
+
+Un sensor con su bit en 0 se trata igual que un null en JSON (sensor fallado).
+"""
+import logging
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+from schemas.nodemcu import RANGOS_VALIDOS
+from core.utils.logging_utils import campos
+
+logger = logging.getLogger(__name__)
+
+VERSION_TRAMA = 1
+FORMATO_TRAMA = struct.Struct("<BIIIhhffB")
+TAMANO_TRAMA = FORMATO_TRAMA.size
+
+# Factor de escala de los canales enteros
+ESCALA_TEMPERATURA = 100
+ESCALA_HUMEDAD = 100
+
+# Bit de validez de cada sensor en el campo "validos"
+BITS_SENSORES = {
+    'temperatura': 0b0001,
+    'humedad': 0b0010,
+    'lux': 0b0100,
+    'presion': 0b1000,
+}
+
+# Respuesta de 1 byte
+CODIGOS_LED = {
+    'verde': 0,
+    'amarillo': 1,
+    'rojo': 2,
+}
+
+
+@dataclass(frozen=True)
+class TramaNodeMCU:
+    device_id: int
+    secuencia: int
+    timestamp: Optional[datetime]
+    temperatura: Optional[float]
+    humedad: Optional[float]
+    lux: Optional[float]
+    presion: Optional[float]
+
+    def valores(self) -> dict:
+        return {sensor: getattr(self, sensor) for sensor in BITS_SENSORES}
+
+
+def decodificar_trama(cuerpo: bytes) -> TramaNodeMCU:
+    """
+    Decodifica una trama binaria del NodeMCU.
+
+    Aplica los mismos RANGOS_VALIDOS que NodeMCUDataSchema: un valor
+    imposible se descarta (None).
+
+    Raises:
+        ValueError: Si el tamaño o la versión de la trama no son válidos
+    """
+    if len(cuerpo) != TAMANO_TRAMA:
+        raise ValueError(f"Trama de {len(cuerpo)} bytes, se esperaban {TAMANO_TRAMA}")
+
+    version, device_id, secuencia, timestamp, temperatura, humedad, lux, presion, validos = (
+        FORMATO_TRAMA.unpack(cuerpo)
+    )
+    if version != VERSION_TRAMA:
+        raise ValueError(f"Versión de trama no soportada: {version}")
+
+    valores = {
+        'temperatura': temperatura / ESCALA_TEMPERATURA,
+        'humedad': humedad / ESCALA_HUMEDAD,
+        'lux': lux,
+        'presion': presion,
+    }
+    for sensor, bit in BITS_SENSORES.items():
+        valor = valores[sensor]
+        minimo, maximo = RANGOS_VALIDOS[sensor]
+        if not validos & bit:
+            valores[sensor] = None
+        elif not (minimo <= valor <= maximo):
+            logger.warning(
+                "⚠️ %s imposible recibido (binario): %s - Rechazando", sensor.capitalize(), valor,
+                extra=campos(f"rango.{sensor}", valor=valor)
+            )
+            valores[sensor] = None
+
+    return TramaNodeMCU(
+        device_id=device_id,
+        secuencia=secuencia,
+        timestamp=datetime.fromtimestamp(timestamp, tz=timezone.utc) if timestamp else None,
+        **valores
+    )
+
+
+def codificar_trama(
+    device_id: int,
+    secuencia: int,
+    temperatura: Optional[float] = None,
+    humedad: Optional[float] = None,
+    lux: Optional[float] = None,
+    presion: Optional[float] = None,
+    timestamp: int = 0
+) -> bytes:
+    """Arma una trama (referencia para el firmware y para pruebas manuales)"""
+    valores = {'temperatura': temperatura, 'humedad': humedad, 'lux': lux, 'presion': presion}
+    validos = 0
+    for sensor, bit in BITS_SENSORES.items():
+        if valores[sensor] is not None:
+            validos |= bit
+
+    return FORMATO_TRAMA.pack(
+        VERSION_TRAMA,
+        device_id,
+        secuencia,
+        timestamp,
+        round((temperatura or 0) * ESCALA_TEMPERATURA),
+        round((humedad or 0) * ESCALA_HUMEDAD),
+        lux or 0.0,
+        presion or 0.0,
+        validos
+    )
@@ -0,0 +1,144 @@
+"""
+Archivado de sesiones de monitoreo finalizadas.
+
+Una vez detenida (stop_producto_monitoreado), una sesión no recibe más
+lecturas. Pasados ARCHIVO_ESPERA_DIAS, sus filas de datomonitoreo se
+empaquetan en un blob comprimido (archivomonitoreo) y se borran en la misma
+transacción: la tabla caliente solo guarda sesiones activas o recientes.
+Las lecturas se siguen sirviendo desde el archivo (ver
+archivo_monitoreo_repository). Los agregados y las alertas no se tocan.
+
+Las filas se leen por keyset en lotes de TAMANO_LOTE_ARCHIVADO hacia
+columnas compactas (Empaquetador). Con varios workers en PostgreSQL, un
+advisory lock (CLAVE_LOCK_ARCHIVADO) deja que solo uno archive a la vez.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import Engine, delete, text, tuple_
+from sqlmodel import Session, select
+from config import Config
+from core.models.archivomonitoreo import ArchivoMonitoreo
+from core.models.datomonitoreo import DatoMonitoreo
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.repositories.archivo_monitoreo_repository import crear_archivo, get_archivo
+from core.utils.archivo_utils import COLUMNAS_ARCHIVO, Empaquetador
+from core.utils.datetime_utils import get_caracas_now
+
+logger = logging.getLogger(__name__)
+
+# Filas leídas por consulta al archivar
+TAMANO_LOTE_ARCHIVADO = 5000
+
+# Advisory lock del archivado (727001: particiones, 727002: migraciones)
+CLAVE_LOCK_ARCHIVADO = 727003
+
+
+def archivar_sesion(session: Session, id_producto_monitoreado: int) -> Optional[ArchivoMonitoreo]:
+    """
+    Archiva las lecturas de una sesión finalizada y las borra de
+    datomonitoreo (hace commit).
+
+    Returns:
+        El archivo creado, o None si la sesión no existe, sigue activa, ya
+        está archivada o no tiene lecturas
+    """
+    producto = session.get(ProductoMonitoreado, id_producto_monitoreado)
+    if producto is None or producto.fecha_finalizacion_monitoreo is None:
+        return None
+    if get_archivo(session, id_producto_monitoreado) is not None:
+        return None
+
+    empaquetador = Empaquetador()
+    consulta = (
+        select(*(getattr(DatoMonitoreo, columna) for columna in COLUMNAS_ARCHIVO))
+        .where(DatoMonitoreo.id_producto_monitoreado == id_producto_monitoreado)
+        .order_by(DatoMonitoreo.fecha, DatoMonitoreo.id)
+        .limit(TAMANO_LOTE_ARCHIVADO)
+    )
+    siguiente = consulta
+    while True:
+        lote = session.execute(siguiente).all()
+        empaquetador.agregar(lote)
+        if len(lote) < TAMANO_LOTE_ARCHIVADO:
+            break
+        id_dato, fecha = lote[-1][0], lote[-1][1]
+        siguiente = (
+            consulta
+            .where(DatoMonitoreo.fecha >= fecha)  # Redundante, permite descartar particiones
+            .where(tuple_(DatoMonitoreo.fecha, DatoMonitoreo.id) > tuple_(fecha, id_dato))
+        )
+    if not len(empaquetador):
+        return None
+
+    archivo = crear_archivo(session, id_producto_monitoreado, empaquetador)
+    session.execute(
+        delete(DatoMonitoreo)
+        .where(DatoMonitoreo.id_producto_monitoreado == id_producto_monitoreado)
+        .where(DatoMonitoreo.fecha.between(archivo.fecha_inicio, archivo.fecha_fin))
+        .execution_options(synchronize_session=False)  # Las lecturas no están cargadas en la sesión
+    )
+    session.commit()
+
+    logger.info(
+        "🗄️ Sesión %s archivada: %s lecturas en %s bytes",
+        id_producto_monitoreado, archivo.cantidad, archivo.tamano_bytes
+    )
+    return archivo
+
+
+def sesiones_por_archivar(session: Session) -> list[int]:
+    """Sesiones detenidas hace más de ARCHIVO_ESPERA_DIAS y sin archivar"""
+    limite = get_caracas_now() - timedelta(days=Config.ARCHIVO_ESPERA_DIAS)
+    archivadas = select(ArchivoMonitoreo.id_producto_monitoreado)
+    return list(session.exec(
+        select(ProductoMonitoreado.id)
+        .where(ProductoMonitoreado.fecha_finalizacion_monitoreo <= limite)
+        .where(ProductoMonitoreado.id.not_in(archivadas))
+    ).all())
+
+
+def archivar_pendientes(engine: Engine) -> int:
+    """
+    Archiva todas las sesiones pendientes, cada una en su transacción. En
+    PostgreSQL, si otro proceso ya está archivando, no hace nada.
+    """
+    if engine.dialect.name != "postgresql":
+        return _archivar_pendientes(engine)
+
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:clave)"), {"clave": CLAVE_LOCK_ARCHIVADO}).scalar():
+            logger.info("🗄️ Otro proceso está archivando sesiones - Se omite este ciclo")
+            return 0
+        try:
+            return _archivar_pendientes(engine)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": CLAVE_LOCK_ARCHIVADO})
+            conn.commit()
+
+
+def _archivar_pendientes(engine: Engine) -> int:
+    with Session(engine) as session:
+        pendientes = sesiones_por_archivar(session)
+
+    archivadas = 0
+    for id_producto_monitoreado in pendientes:
+        with Session(engine) as session:
+            try:
+                if archivar_sesion(session, id_producto_monitoreado) is not None:
+                    archivadas += 1
+            except Exception as e:
+                session.rollback()
+                logger.error(f"❌ Error archivando la sesión {id_producto_monitoreado}: {str(e)}")
+    return archivadas
+
+
+async def ciclo_archivado(engine: Engine) -> None:
+    """Tarea de fondo: archivar_pendientes cada ARCHIVO_INTERVALO_HORAS"""
+    while True:
+        await asyncio.sleep(Config.ARCHIVO_INTERVALO_HORAS * 3600)
+        try:
+            await asyncio.to_thread(archivar_pendientes, engine)
+        except Exception as e:
+            logger.error(f"❌ Error en el archivado de sesiones: {str(e)}")
@@ -1,13 +1,24 @@
 from sqlmodel import Session, select
-from core.repositories import dato_monitoreo_repository, alerta_repository
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from core.repositories import dato_monitoreo_repository, alerta_repository, agregado_monitoreo_repository, kpi_monitoreo_repository
+from core.repositories.lecturas_recientes import COLUMNAS_RECIENTES, lecturas_recientes
+from core.repositories.contexto_monitoreo_repository import (
+    obtener_contexto_de_producto,
+    obtener_contexto_de_producto_async
+)
 from typing import AsyncGenerator, Optional
 from core.models.datomonitoreo import DatoMonitoreo
-from adapters.arduino_adapter import sensor_manager
+from adapters.arduino_adapter import SensorDataManager, sensor_manager
 from datetime import datetime
-from core.models.productofarmaceutico import ProductoFarmaceutico
-from core.models.productomonitoreado import ProductoMonitoreado
-from core.models.condicionalmacenamiento import CondicionAlmacenamiento
 from core.utils.datetime_utils import get_caracas_now
+from core.utils.logging_utils import campos
+from services.eventos_hub import hub_eventos, tema_dispositivo, tema_sesion
+import logging
+
+logger = logging.getLogger(__name__)
+
+SENSORES = ('temperatura', 'humedad', 'lux', 'presion')
 
 
 def procesar_datos_entrantes(
@@ -15,7 +26,8 @@ def procesar_datos_entrantes(
     humedad: float = None,
     lux: float = None,
     presion: float = None,
-    session: Session = None
+    session: Session = None,
+    dispositivo: SensorDataManager = None
 ) -> tuple[list[DatoMonitoreo], list[str]]:
     """
     Procesa datos recibidos del NodeMCU y genera alertas.
@@ -29,83 +41,57 @@ def procesar_datos_entrantes(
         lux: Valor de lux del sensor
         presion: Valor de presión del sensor
         session: Sesión de base de datos
+        dispositivo: NodeMCU que envió los datos (por defecto sensor_manager)
 
     Returns:
         Tuple con:
         - Lista de DatoMonitoreo guardados en BD
-        - Lista de sensores fallados (para actualizar estado global)
+        - Lista de sensores fallados (para actualizar el estado del dispositivo)
     """
-    sensores_fallados = []
     datos_guardados = []
+    dispositivo = dispositivo or sensor_manager
 
-    # Actualizar estado de sensores individuales
-    if temperatura is not None:
-        sensor_manager.sensor_status.temperatura_ok = True
-    else:
-        sensor_manager.sensor_status.temperatura_ok = False
-        sensores_fallados.append("temperatura")
-
-    if humedad is not None:
-        sensor_manager.sensor_status.humedad_ok = True
-    else:
-        sensor_manager.sensor_status.humedad_ok = False
-        sensores_fallados.append("humedad")
-
-    if lux is not None:
-        sensor_manager.sensor_status.lux_ok = True
-    else:
-        sensor_manager.sensor_status.lux_ok = False
-        sensores_fallados.append("lux")
-
-    if presion is not None:
-        sensor_manager.sensor_status.presion_ok = True
-    else:
-        sensor_manager.sensor_status.presion_ok = False
-        sensores_fallados.append("presion")
+    sensores_fallados = actualizar_estado_sensores(
+        temperatura, humedad, lux, presion, get_caracas_now(), dispositivo
+    )
 
-    # Actualizar último dato de sensor en el manager
-    sensor_manager.last_sensor_data = {
-        'temperatura': temperatura,
-        'humedad': humedad,
-        'lux': lux,
-        'presion': presion,
-        'timestamp': get_caracas_now()
-    }
+    # Producto que monitorea este dispositivo (el activo salvo que esté
+    # asociado a otro; cacheado en memoria)
+    contexto = obtener_contexto_de_producto(session, dispositivo.id_producto_monitoreado)
 
     # Verificar si NodeMCU está completamente fallado
     nodemcu_fallado_completamente = len(sensores_fallados) == 4
 
     if nodemcu_fallado_completamente:
-        print("⚠️ NodeMCU no detectado - Creando alertas críticas...")
-        alerta_repository.crear_alerta_sensor_no_disponible(session, sensores_fallidos=['temperatura', 'humedad'])
+        logger.warning(
+            "⚠️ NodeMCU '%s' no detectado - Creando alertas críticas...", dispositivo.device_id,
+            extra=campos(f"nodemcu_no_detectado:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+        )
+        if contexto:
+            alerta_repository.crear_alerta_sensor_no_disponible(session, sensores_fallidos=['temperatura', 'humedad'])
         return [], sensores_fallados
 
     # Manejar alertas de sensores individuales
     if sensores_fallados:
-        print(f"⚠️ Sensores fallados detectados: {sensores_fallados}")
-        alerta_repository.crear_alerta_sensor_no_disponible(session, sensores_fallidos=sensores_fallados)
-
-    # Obtener el producto con monitoreo activo (solo puede existir uno)
-    stmt = (
-        select(ProductoMonitoreado, CondicionAlmacenamiento)
-        .join(ProductoFarmaceutico, ProductoMonitoreado.id_producto == ProductoFarmaceutico.id)
-        .join(CondicionAlmacenamiento, ProductoFarmaceutico.id_condicion == CondicionAlmacenamiento.id)
-        .where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None)
-    )
-
-    producto_activo = session.exec(stmt).first()
+        logger.warning(
+            "⚠️ Sensores fallados detectados en '%s': %s", dispositivo.device_id, sensores_fallados,
+            extra=campos(f"sensores_fallados:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+        )
+        if contexto:
+            alerta_repository.crear_alerta_sensor_no_disponible(session, sensores_fallidos=sensores_fallados)
 
     # Si no hay producto activo, no procesar los datos (pero no es un error)
-    if not producto_activo:
-        logger.warning("⚠️ No hay producto con monitoreo activo. Los datos del NodeMCU no serán guardados.")
+    if not contexto:
+        logger.warning(
+            "⚠️ No hay producto con monitoreo activo. Los datos del NodeMCU no serán guardados.",
+            extra=campos("sin_producto_activo")
+        )
         return [], sensores_fallados
 
-    pm, condicion = producto_activo
-
     # Solo guardar si hay al menos un sensor con datos
     if temperatura is not None or humedad is not None or lux is not None or presion is not None:
         dato = DatoMonitoreo(
-            id_producto_monitoreado=pm.id,
+            id_producto_monitoreado=contexto.id_producto_monitoreado,
             fecha=get_caracas_now(),
             temperatura=temperatura,
             humedad=humedad,
@@ -113,11 +99,300 @@ def procesar_datos_entrantes(
             presion=presion
         )
 
-        # Guardar en BD
+        # Lectura, agregados, indicadores y alertas en una sola transacción
         db_dato = dato_monitoreo_repository.create_dato_monitoreo(session, dato)
         datos_guardados.append(db_dato)
+        fila = _fila_reciente(db_dato)
+        agregado_monitoreo_repository.actualizar_agregados(session, [db_dato])
+        kpi_monitoreo_repository.actualizar_kpis(session, db_dato.id_producto_monitoreado, contexto.reglas, [fila])
 
         # Generar alertas si valores están fuera de rango
-        alerta_repository.crear_alerta(session, db_dato)
+        alerta_repository.evaluar_alerta(session, db_dato, contexto)
+        session.commit()
+
+        _lecturas_guardadas(db_dato.id_producto_monitoreado, [fila], [dispositivo.device_id])
 
     return datos_guardados, sensores_fallados
+
+
+async def procesar_datos_entrantes_async(
+    temperatura: float = None,
+    humedad: float = None,
+    lux: float = None,
+    presion: float = None,
+    session: AsyncSession = None,
+    dispositivo: SensorDataManager = None,
+    fecha: datetime = None,
+    secuencia: int = None
+) -> tuple[list[DatoMonitoreo], list[str]]:
+    """
+    Versión async de procesar_datos_entrantes para POST /nodemcu/data y
+    /nodemcu/data.bin.
+
+    Mismo flujo (estado de sensores → alertas de sensores → guardar dato →
+    alertas de rango), pero cada acceso a BD cede el event loop, así los
+    POST de varios dispositivos se solapan en un mismo worker.
+
+    fecha es la hora de la lectura (hora de Caracas sin tzinfo); por defecto
+    la hora de recepción. Si la secuencia del dispositivo ya está guardada
+    (reintento que no alcanzó a entrar en la ventana de deduplicación) la
+    lectura se ignora sin reevaluar alertas.
+    """
+    datos_guardados = []
+    dispositivo = dispositivo or sensor_manager
+    fecha = fecha or get_caracas_now()
+
+    sensores_fallados = actualizar_estado_sensores(
+        temperatura, humedad, lux, presion, fecha, dispositivo
+    )
+
+    contexto = await obtener_contexto_de_producto_async(session, dispositivo.id_producto_monitoreado)
+
+    if len(sensores_fallados) == len(SENSORES):
+        logger.warning(
+            "⚠️ NodeMCU '%s' no detectado - Creando alertas críticas...", dispositivo.device_id,
+            extra=campos(f"nodemcu_no_detectado:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+        )
+        if contexto:
+            await alerta_repository.crear_alerta_sensor_no_disponible_async(
+                session, sensores_fallidos=['temperatura', 'humedad']
+            )
+        return [], sensores_fallados
+
+    if sensores_fallados:
+        logger.warning(
+            "⚠️ Sensores fallados detectados en '%s': %s", dispositivo.device_id, sensores_fallados,
+            extra=campos(f"sensores_fallados:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+        )
+        if contexto:
+            await alerta_repository.crear_alerta_sensor_no_disponible_async(session, sensores_fallidos=sensores_fallados)
+
+    if not contexto:
+        logger.warning(
+            "⚠️ No hay producto con monitoreo activo. Los datos del NodeMCU no serán guardados.",
+            extra=campos("sin_producto_activo")
+        )
+        return [], sensores_fallados
+
+    dato = DatoMonitoreo(
+        id_producto_monitoreado=contexto.id_producto_monitoreado,
+        fecha=fecha,
+        temperatura=temperatura,
+        humedad=humedad,
+        lux=lux,
+        presion=presion,
+        id_dispositivo=dispositivo.device_id,
+        secuencia=secuencia
+    )
+
+    try:
+        db_dato = await dato_monitoreo_repository.create_dato_monitoreo_async(session, dato)
+    except IntegrityError:
+        await session.rollback()
+        if secuencia is None or not await dato_monitoreo_repository.existe_secuencia_async(
+            session, dispositivo.device_id, secuencia, fecha
+        ):
+            raise
+        logger.info(
+            "🔁 Lectura duplicada de '%s' (secuencia %s) - Ignorada", dispositivo.device_id, secuencia,
+            extra=campos(f"duplicada:{dispositivo.device_id}", dispositivo=dispositivo.device_id, secuencia=secuencia)
+        )
+        return [], sensores_fallados
+    datos_guardados.append(db_dato)
+    fila = _fila_reciente(db_dato)
+    await agregado_monitoreo_repository.actualizar_agregados_async(session, [db_dato])
+    await kpi_monitoreo_repository.actualizar_kpis_async(session, db_dato.id_producto_monitoreado, contexto.reglas, [fila])
+
+    await alerta_repository.evaluar_alerta_async(session, db_dato, contexto)
+    await session.commit()
+
+    _lecturas_guardadas(db_dato.id_producto_monitoreado, [fila], [dispositivo.device_id])
+
+    return datos_guardados, sensores_fallados
+
+
+def procesar_lote_entrante(
+    lecturas: list[dict],
+    session: Session = None,
+    dispositivo: SensorDataManager = None
+) -> tuple[list[int], list[str]]:
+    """
+    Procesa un lote de lecturas del NodeMCU en una sola transacción.
+
+    Versión por lotes de procesar_datos_entrantes: las lecturas se ordenan
+    por su timestamp de dispositivo, se insertan con un único INSERT
+    multi-fila, las alertas se evalúan en memoria en orden temporal y se
+    hace un solo commit al final.
+
+    Args:
+        lecturas: Diccionarios con fecha (hora de Caracas sin tzinfo),
+                  temperatura, humedad, lux y presion
+        session: Sesión de base de datos
+        dispositivo: NodeMCU que envió el lote (por defecto sensor_manager)
+
+    Returns:
+        Tuple con:
+        - IDs de los DatoMonitoreo insertados
+        - Sensores fallados en la lectura más reciente del lote
+    """
+    dispositivo = dispositivo or sensor_manager
+    lecturas = sorted(
+        ({**lectura, 'id_dispositivo': dispositivo.device_id} for lectura in lecturas),
+        key=lambda lectura: lectura['fecha']
+    )
+    ultima = lecturas[-1]
+
+    # El estado de sensores refleja la lectura más reciente del lote
+    sensores_fallados = actualizar_estado_sensores(
+        ultima['temperatura'], ultima['humedad'], ultima['lux'], ultima['presion'], ultima['fecha'], dispositivo
+    )
+
+    ids_guardados = guardar_lote(
+        lecturas, sensores_fallados, session=session,
+        id_producto_monitoreado=dispositivo.id_producto_monitoreado
+    )
+
+    return ids_guardados, sensores_fallados
+
+
+def guardar_lote(
+    lecturas: list[dict],
+    sensores_fallados: list[str],
+    session: Session = None,
+    id_producto_monitoreado: Optional[int] = None
+) -> list[int]:
+    """
+    Persiste un lote de lecturas y sus alertas con un solo commit.
+
+    No toca el estado de sensores en memoria: lo usan procesar_lote_entrante
+    y el escritor del pipeline asíncrono, que ya actualizó ese estado al
+    recibir cada lectura.
+
+    Args:
+        lecturas: Diccionarios con fecha, temperatura, humedad, lux y presion
+                  (y opcionalmente id_dispositivo / secuencia), ordenados por fecha
+        sensores_fallados: Sensores fallados en la lectura más reciente
+        session: Sesión de base de datos
+        id_producto_monitoreado: Producto asociado al dispositivo (None = el activo)
+
+    Returns:
+        IDs de los DatoMonitoreo insertados
+    """
+    ids_guardados = []
+    contexto = obtener_contexto_de_producto(session, id_producto_monitoreado)
+
+    if not contexto:
+        logger.warning(
+            "⚠️ No hay producto con monitoreo activo. El lote del NodeMCU no será guardado.",
+            extra=campos("sin_producto_activo")
+        )
+    else:
+        # Solo se guardan lecturas completas (las columnas de DatoMonitoreo son NOT NULL)
+        filas = [
+            {
+                'id_producto_monitoreado': contexto.id_producto_monitoreado,
+                'fecha': lectura['fecha'],
+                'temperatura': lectura['temperatura'],
+                'humedad': lectura['humedad'],
+                'lux': lectura['lux'],
+                'presion': lectura['presion'],
+                'id_dispositivo': lectura.get('id_dispositivo'),
+                'secuencia': lectura.get('secuencia')
+            }
+            for lectura in lecturas
+            if all(lectura[sensor] is not None for sensor in SENSORES)
+        ]
+        # Reintentos del NodeMCU: (dispositivo, secuencia, fecha) ya guardados
+        filas = dato_monitoreo_repository.descartar_secuencias_existentes(session, filas)
+
+        ids_guardados = dato_monitoreo_repository.create_datos_monitoreo_bulk(session, filas)
+        filas_recientes = [
+            (id_dato, fila['fecha'], *(fila[sensor] for sensor in SENSORES)) for id_dato, fila in zip(ids_guardados, filas)
+        ]
+        agregado_monitoreo_repository.actualizar_agregados(session, filas)
+        kpi_monitoreo_repository.actualizar_kpis(session, contexto.id_producto_monitoreado, contexto.reglas, filas_recientes)
+
+        datos = [DatoMonitoreo(id=id_dato, **fila) for id_dato, fila in zip(ids_guardados, filas)]
+        alerta_repository.evaluar_alertas_lote(
+            session, contexto.id_producto_monitoreado, contexto.reglas, datos
+        )
+
+    session.commit()
+
+    if not contexto:
+        return ids_guardados
+
+    _lecturas_guardadas(contexto.id_producto_monitoreado, filas_recientes, [fila['id_dispositivo'] for fila in filas])
+
+    if len(sensores_fallados) == len(SENSORES):
+        alerta_repository.crear_alerta_sensor_no_disponible(session, sensores_fallidos=['temperatura', 'humedad'])
+    elif sensores_fallados:
+        alerta_repository.crear_alerta_sensor_no_disponible(session, sensores_fallidos=sensores_fallados)
+
+    return ids_guardados
+
+
+def _lecturas_guardadas(
+    id_producto_monitoreado: int,
+    filas: list[tuple],
+    dispositivos: list[Optional[str]]
+) -> None:
+    """
+    Lecturas ya confirmadas (después del commit): al buffer de lecturas
+    recientes y al hub de eventos ("lectura" en su sesión y su dispositivo).
+
+    Args:
+        filas: Tuplas con COLUMNAS_RECIENTES, ordenadas por fecha
+        dispositivos: device_id de cada fila (None si no se conoce)
+    """
+    lecturas_recientes.agregar(id_producto_monitoreado, filas)
+    if not hub_eventos.activo:
+        return
+    for fila, id_dispositivo in zip(filas, dispositivos):
+        temas = [tema_sesion(id_producto_monitoreado)]
+        if id_dispositivo:
+            temas.append(tema_dispositivo(id_dispositivo))
+        hub_eventos.publicar(temas, "lectura", {
+            "id_producto_monitoreado": id_producto_monitoreado,
+            "id_dispositivo": id_dispositivo,
+            **dict(zip(COLUMNAS_RECIENTES, fila))
+        })
+
+
+def _fila_reciente(dato: DatoMonitoreo) -> tuple:
+    """DatoMonitoreo guardado → fila de lecturas_recientes (COLUMNAS_RECIENTES)"""
+    return (dato.id, dato.fecha, *(getattr(dato, sensor) for sensor in SENSORES))
+
+
+def actualizar_estado_sensores(
+    temperatura: Optional[float],
+    humedad: Optional[float],
+    lux: Optional[float],
+    presion: Optional[float],
+    timestamp: datetime,
+    dispositivo: SensorDataManager = None
+) -> list[str]:
+    """
+    Actualiza el estado individual de cada sensor y el último dato del
+    dispositivo (por defecto sensor_manager). Retorna la lista de sensores
+    fallados.
+    """
+    dispositivo = dispositivo or sensor_manager
+    valores = {
+        'temperatura': temperatura,
+        'humedad': humedad,
+        'lux': lux,
+        'presion': presion
+    }
+
+    sensores_fallados = [sensor for sensor, valor in valores.items() if valor is None]
+
+    with dispositivo.lock:
+        for sensor, valor in valores.items():
+            setattr(dispositivo.sensor_status, f"{sensor}_ok", valor is not None)
+
+        # Actualizar último dato de sensor del dispositivo
+        dispositivo.last_sensor_data = {**valores, 'timestamp': timestamp}
+        dispositivo.version_lectura += 1
+
+    return sensores_fallados
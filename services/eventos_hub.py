@@ -0,0 +1,150 @@
+"""
+Hub de eventos en proceso (pub/sub) para los dashboards en vivo.
+
+Publica:
+- "lectura": cada lectura guardada (data_service, después del commit), en
+  los temas "sesion:{id_producto_monitoreado}" y "dispositivo:{device_id}"
+- "alerta_abierta" / "alerta_resuelta": cada transición confirmada de una
+  alerta (observa el índice de alertas pendientes, que se aplica en el
+  after_commit), en "alertas" y "sesion:{id}"
+- "sesion_finalizada": stop_producto_monitoreado, en "sesion:{id}" y "alertas"
+
+Se expone por WebSocket y Server-Sent Events (adapters/api/eventos.py). Cada
+suscriptor tiene una cola acotada (EVENTOS_COLA_MAX): si no consume a tiempo
+se descartan sus eventos más antiguos, nunca se bloquea a quien publica.
+
+publicar() se puede llamar desde cualquier hilo (el escritor del pipeline de
+ingesta corre en uno aparte): fuera del hilo del event loop la entrega se
+agenda con call_soon_threadsafe. Sin iniciar() (scripts, manage.py) no hace
+nada. Como el resto del estado en memoria, es por proceso.
+"""
+import asyncio
+import logging
+import re
+import threading
+from typing import Any, Iterable, Optional
+from config import Config
+from core.repositories.indice_alertas_pendientes import AlertaPendiente, indice_alertas
+
+logger = logging.getLogger(__name__)
+
+TEMA_ALERTAS = "alertas"
+
+# "alertas", "sesion:{id}" o "dispositivo:{device_id}"
+_PATRON_TEMA = re.compile(r"^(alertas|sesion:\d+|dispositivo:[^,\s]{1,64})$")
+
+
+def tema_valido(tema: str) -> bool:
+    return bool(_PATRON_TEMA.match(tema))
+
+
+def tema_sesion(id_producto_monitoreado: int) -> str:
+    return f"sesion:{id_producto_monitoreado}"
+
+
+def tema_dispositivo(device_id: str) -> str:
+    return f"dispositivo:{device_id}"
+
+
+class Suscripcion:
+    """Temas de un cliente y su cola acotada de eventos pendientes"""
+
+    def __init__(self, temas: Iterable[str], max_cola: int):
+        self.temas = set(temas)
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=max_cola)
+        self.descartados = 0
+
+    def _entregar(self, evento: dict) -> bool:
+        """Encola el evento; con la cola llena descarta el más antiguo. Retorna si descartó"""
+        descarto = False
+        if self.cola.full():
+            self.cola.get_nowait()
+            self.descartados += 1
+            descarto = True
+        self.cola.put_nowait(evento)
+        return descarto
+
+    async def siguiente(self, espera: Optional[float] = None) -> Optional[dict]:
+        """Próximo evento, o None si pasan `espera` segundos sin eventos"""
+        try:
+            return await asyncio.wait_for(self.cola.get(), espera)
+        except asyncio.TimeoutError:
+            return None
+
+
+class HubEventos:
+    def __init__(self, max_cola: int):
+        self.max_cola = max_cola
+        self._suscripciones: set[Suscripcion] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo_loop: Optional[int] = None
+        self._metricas = {"publicados": 0, "entregados": 0, "descartados": 0}
+
+    @property
+    def activo(self) -> bool:
+        return self._loop is not None
+
+    def iniciar(self) -> None:
+        """Asocia el hub al event loop de la aplicación (startup)"""
+        self._loop = asyncio.get_running_loop()
+        self._hilo_loop = threading.get_ident()
+
+    def detener(self) -> None:
+        self._loop = None
+        self._hilo_loop = None
+        self._suscripciones.clear()
+
+    def suscribir(self, temas: Iterable[str]) -> Suscripcion:
+        """Nueva suscripción (desde el event loop)"""
+        suscripcion = Suscripcion(temas, self.max_cola)
+        self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion) -> None:
+        self._suscripciones.discard(suscripcion)
+
+    def publicar(self, temas: Iterable[str], tipo: str, datos: dict[str, Any]) -> None:
+        """Publica un evento en uno o varios temas; cada suscriptor lo recibe una vez"""
+        loop = self._loop
+        if loop is None:
+            return
+        evento = {"tipo": tipo, "datos": datos}
+        temas = set(temas)
+        if threading.get_ident() == self._hilo_loop:
+            self._entregar(temas, evento)
+        else:
+            try:
+                loop.call_soon_threadsafe(self._entregar, temas, evento)
+            except RuntimeError:
+                pass  # Loop cerrado durante el apagado
+
+    def _entregar(self, temas: set[str], evento: dict) -> None:
+        self._metricas["publicados"] += 1
+        for suscripcion in list(self._suscripciones):
+            if suscripcion.temas & temas:
+                if suscripcion._entregar(evento):
+                    self._metricas["descartados"] += 1
+                self._metricas["entregados"] += 1
+
+    def metricas(self) -> dict:
+        return {**self._metricas, "suscriptores": len(self._suscripciones)}
+
+
+# Instancia global del hub
+hub_eventos = HubEventos(max_cola=Config.EVENTOS_COLA_MAX)
+
+
+def _publicar_transicion_alerta(operacion: str, alerta: AlertaPendiente) -> None:
+    hub_eventos.publicar(
+        (TEMA_ALERTAS, tema_sesion(alerta.id_producto_monitoreado)),
+        "alerta_abierta" if operacion == "alta" else "alerta_resuelta",
+        {
+            "id": alerta.id,
+            "id_producto_monitoreado": alerta.id_producto_monitoreado,
+            "parametro_afectado": alerta.parametro_afectado,
+            "fecha_generacion": alerta.fecha_generacion,
+        }
+    )
+
+
+indice_alertas.observar(_publicar_transicion_alerta)
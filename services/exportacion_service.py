@@ -0,0 +1,202 @@
+"""
+Exportación columnar de una sesión de monitoreo (Parquet o Arrow IPC stream)
+para análisis en pandas / polars.
+
+- Las filas se leen como tuplas por lotes con cursor del servidor
+  (iterar_datos_sesion / iterar_alertas_sesion), sin objetos ORM, y cada lote
+  se transpone a columnas tipadas de un RecordBatch: la memoria depende del
+  tamaño del lote, no de la sesión.
+- Los nombres de parámetro y el estado de las alertas van como columnas
+  diccionario (índices int8 + un diccionario de strings).
+- El archivo se guarda en EXPORTACION_CACHE_DIR con clave (producto
+  monitoreado, versión de la tabla, sesión cerrada): mientras la tabla no
+  cambie se sirve el mismo archivo. La versión de las lecturas sale de
+  consultas por índice, sin recorrer la sesión: su rango de fechas, el id
+  de la más reciente y la cantidad que acumulan los indicadores
+  (kpimonitoreo, también cuenta las atrasadas); la de las alertas es su
+  cantidad, máximo id y última resolución (alertas que se cierran).
+- Al generar una versión nueva se conserva la anterior (puede estar
+  sirviéndose a otra petición) y se borran las más viejas.
+- pyarrow es opcional: se importa en el primer uso y, si falta, se lanza
+  ExportacionNoDisponible (la API responde 501).
+"""
+import glob
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Iterator, Optional
+from sqlalchemy import Engine, Row
+from sqlmodel import Session
+from config import Config
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.repositories.alerta_repository import COLUMNAS_EXPORTACION_ALERTAS, get_version_alertas, iterar_alertas_sesion
+from core.repositories.dato_monitoreo_repository import (
+    COLUMNAS_EXPORTACION,
+    get_version_lecturas,
+    iterar_datos_sesion,
+    rango_de_producto
+)
+
+logger = logging.getLogger(__name__)
+
+TABLAS = ("lecturas", "alertas")
+
+EXTENSIONES = {
+    "parquet": "parquet",
+    "arrow": "arrows",
+}
+
+TIPOS_CONTENIDO = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Filas por row group de Parquet (los lotes de la BD son más chicos)
+FILAS_POR_GRUPO = 100_000
+
+
+class ExportacionNoDisponible(Exception):
+    """pyarrow no está instalado"""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ExportacionNoDisponible("Exportación Parquet/Arrow no disponible: instale pyarrow") from e
+    return pyarrow
+
+
+def _esquema(pa, tabla: str):
+    parametro = pa.dictionary(pa.int8(), pa.string())
+    fecha = pa.timestamp("us")
+    if tabla == "lecturas":
+        return pa.schema(
+            [("id", pa.int64()), ("fecha", fecha)]
+            + [(columna, pa.float64()) for columna in COLUMNAS_EXPORTACION[2:]]
+        )
+    tipos = {
+        "id": pa.int64(),
+        "id_dato_monitoreo": pa.int64(),
+        "parametro_afectado": parametro,
+        "estado": parametro,
+        "fecha_generacion": fecha,
+        "fecha_resolucion": fecha,
+    }
+    return pa.schema([(columna, tipos.get(columna, pa.float64())) for columna in COLUMNAS_EXPORTACION_ALERTAS])
+
+
+def _record_batches(pa, esquema, lotes: Iterator[list[Row]]):
+    """Transpone cada lote de tuplas a un RecordBatch con las columnas del esquema"""
+    for lote in lotes:
+        columnas = zip(*lote)
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+            schema=esquema
+        )
+
+
+def _escribir_parquet(pa, ruta: str, esquema, batches) -> None:
+    pendientes, filas = [], 0
+    with pa.parquet.ParquetWriter(ruta, esquema, compression="zstd") as escritor:
+        for batch in batches:
+            pendientes.append(batch)
+            filas += batch.num_rows
+            if filas >= FILAS_POR_GRUPO:
+                escritor.write_table(pa.Table.from_batches(pendientes, schema=esquema))
+                pendientes, filas = [], 0
+        if pendientes:
+            escritor.write_table(pa.Table.from_batches(pendientes, schema=esquema))
+
+
+def _escribir_arrow(pa, ruta: str, esquema, batches) -> None:
+    with pa.OSFile(ruta, "wb") as archivo, pa.ipc.new_stream(archivo, esquema) as escritor:
+        for batch in batches:
+            escritor.write_batch(batch)
+
+
+def _clave(version: tuple) -> str:
+    """Versión de la tabla → parte del nombre de archivo"""
+    return "-".join(
+        "0" if valor is None else valor.strftime("%Y%m%d%H%M%S%f") if isinstance(valor, datetime) else str(valor)
+        for valor in version
+    )
+
+
+def exportar_sesion(engine: Engine, id_producto_monitoreado: int, tabla: str, formato: str) -> Optional[str]:
+    """
+    Genera (o reutiliza de la caché) la exportación de una tabla de la sesión.
+
+    Args:
+        tabla: "lecturas" o "alertas"
+        formato: "parquet" o "arrow"
+
+    Returns:
+        Ruta del archivo, o None si el producto monitoreado no existe
+
+    Raises:
+        ExportacionNoDisponible: Si pyarrow no está instalado
+    """
+    pa = _pyarrow()
+
+    with Session(engine) as session:
+        producto = session.get(ProductoMonitoreado, id_producto_monitoreado)
+        if producto is None:
+            return None
+        cerrada = producto.fecha_finalizacion_monitoreo is not None
+        desde, hasta = rango_de_producto(session, id_producto_monitoreado)
+        if tabla == "lecturas":
+            version = (desde, hasta, *get_version_lecturas(session, id_producto_monitoreado, hasta))
+        else:
+            version = get_version_alertas(session, id_producto_monitoreado)
+
+    extension = EXTENSIONES[formato]
+    prefijo = os.path.join(Config.EXPORTACION_CACHE_DIR, f"pm{id_producto_monitoreado}_{tabla}_")
+    ruta = f"{prefijo}{_clave(version)}{'_cerrada' if cerrada else ''}.{extension}"
+    if os.path.exists(ruta):
+        return ruta
+
+    if tabla == "lecturas":
+        lotes = iterar_datos_sesion(engine, id_producto_monitoreado, desde, hasta) if desde else iter(())
+    else:
+        lotes = iterar_alertas_sesion(engine, id_producto_monitoreado)
+
+    esquema = _esquema(pa, tabla)
+    escribir = _escribir_parquet if formato == "parquet" else _escribir_arrow
+    os.makedirs(Config.EXPORTACION_CACHE_DIR, exist_ok=True)
+    temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+    try:
+        escribir(pa, temporal, esquema, _record_batches(pa, esquema, lotes))
+        os.replace(temporal, ruta)  # Atómico: nunca se sirve un archivo a medio escribir
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+    _podar_exportaciones(prefijo, extension, actual=ruta)
+
+    logger.info("📦 Exportación %s de %s del producto monitoreado %s: %s",
+                formato, tabla, id_producto_monitoreado, ruta)
+    return ruta
+
+
+def _podar_exportaciones(prefijo: str, extension: str, actual: str) -> None:
+    """
+    Borra las versiones anteriores de una exportación salvo la más reciente:
+    una petición que recibió su ruta justo antes puede estar por abrirla.
+    """
+    anteriores = [ruta for ruta in glob.glob(f"{glob.escape(prefijo)}*.{extension}") if ruta != actual]
+    anteriores.sort(key=_modificado, reverse=True)
+    for anterior in anteriores[1:]:
+        try:
+            os.remove(anterior)
+        except FileNotFoundError:
+            pass
+
+
+def _modificado(ruta: str) -> float:
+    try:
+        return os.path.getmtime(ruta)
+    except FileNotFoundError:
+        return 0.0
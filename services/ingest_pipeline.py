@@ -0,0 +1,219 @@
+"""
+Pipeline asíncrono de ingesta para POST /nodemcu/data (INGEST_MODE=async).
+
+Flujo:
+- El endpoint valida la lectura, actualiza el estado de sensores en memoria,
+  la encola en una asyncio.Queue acotada y responde el color del LED con el
+  estado que el pipeline mantiene en memoria (sin tocar la BD).
+- Una tarea escritora en segundo plano agrupa las lecturas encoladas y las
+  guarda con group-commit (un INSERT multi-fila + alertas + un commit) cada
+  INGEST_FLUSH_MS milisegundos o INGEST_FLUSH_ROWS lecturas, lo que ocurra
+  primero.
+- Al apagar la aplicación se vacía la cola antes de terminar.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+from sqlmodel import Session
+from config import Config
+from adapters.db.sqlmodel_database import engine
+from core.repositories.contexto_monitoreo_repository import ContextoMonitoreo, obtener_contexto_activo
+from adapters.arduino_adapter import SensorDataManager
+from services.data_service import guardar_lote, SENSORES
+from core.utils.logging_utils import campos
+from core.utils.reglas_utils import valores_lectura
+from services.led_service import calcular_color_led, contar_alertas_pendientes
+
+logger = logging.getLogger(__name__)
+
+
+class IngestPipeline:
+    def __init__(self, max_cola: int, flush_ms: int, flush_filas: int):
+        self.max_cola = max_cola
+        self.flush_ms = flush_ms
+        self.flush_filas = flush_filas
+        self.cola: Optional[asyncio.Queue] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+        # Contexto activo usado para responder el LED sin consultar la BD.
+        # Se refresca después de cada group-commit (las alertas pendientes
+        # salen del índice en memoria, que se actualiza en cada commit).
+        self.contexto: Optional[ContextoMonitoreo] = None
+
+        self._metricas = {
+            "encoladas": 0,
+            "rechazadas_cola_llena": 0,
+            "escritas": 0,                   # Lecturas guardadas en BD
+            "descartadas_sin_producto": 0,   # Sin monitoreo activo asociado al dispositivo
+            "perdidas_por_error": 0,
+            "lotes": 0,
+            "errores": 0,
+            "ultimo_lote_filas": 0,
+            "ultimo_lote_ms": 0.0,
+        }
+
+    @property
+    def activo(self) -> bool:
+        """True si el escritor en segundo plano está corriendo"""
+        return self._tarea is not None and not self._tarea.done()
+
+    async def start(self) -> None:
+        """Crea la cola, carga el estado inicial y lanza el escritor"""
+        self.cola = asyncio.Queue(maxsize=self.max_cola)
+        await asyncio.to_thread(self._refrescar_estado)
+        self._tarea = asyncio.create_task(self._escritor())
+        logger.info(
+            f"🚀 Pipeline de ingesta asíncrono iniciado "
+            f"(cola={self.max_cola}, flush={self.flush_ms} ms / {self.flush_filas} filas)"
+        )
+
+    async def stop(self) -> None:
+        """Detiene el escritor después de guardar todo lo que quede en la cola"""
+        if not self.activo:
+            return
+        await self.cola.put(None)  # Centinela de apagado
+        await self._tarea
+        logger.info(f"🛑 Pipeline de ingesta detenido - {self._metricas['escritas']} lectura(s) escritas")
+
+    def enqueue(self, lectura: dict, sensores_fallados: list[str], dispositivo: SensorDataManager) -> bool:
+        """
+        Encola una lectura de un dispositivo para el próximo group-commit.
+
+        Returns:
+            False si la cola está llena (el llamador debe responder 503)
+        """
+        try:
+            self.cola.put_nowait((lectura, sensores_fallados, dispositivo))
+        except asyncio.QueueFull:
+            self._metricas["rechazadas_cola_llena"] += 1
+            return False
+        self._metricas["encoladas"] += 1
+        return True
+
+    def color_led(self, lectura: dict, dispositivo: SensorDataManager) -> str:
+        """
+        Calcula el color del LED del dispositivo con el estado en memoria.
+
+        Una lectura fuera de rango va a abrir una alerta en el próximo
+        group-commit, así que se cuenta como pendiente desde ya para no
+        responder verde/amarillo mientras la alerta espera en la cola.
+        """
+        contexto = self.contexto
+        if contexto and not self._reporta_a(dispositivo, contexto):
+            contexto = None
+        contextos = [contexto] if contexto else []
+
+        valores = valores_lectura(lectura)
+        fuera_de_rango = any(contexto.reglas.excursiones(valores).any() for contexto in contextos)
+        id_producto_monitoreado = contexto.id_producto_monitoreado if contexto else dispositivo.id_producto_monitoreado
+        pendientes = contar_alertas_pendientes(id_producto_monitoreado) + (1 if fuera_de_rango else 0)
+        return calcular_color_led(pendientes, contextos, lectura, dispositivo)
+
+    @staticmethod
+    def _reporta_a(dispositivo: SensorDataManager, contexto: ContextoMonitoreo) -> bool:
+        """True si las lecturas del dispositivo van al producto del contexto"""
+        return dispositivo.id_producto_monitoreado in (None, contexto.id_producto_monitoreado)
+
+    def metrics(self) -> dict:
+        """Métricas del pipeline para GET /nodemcu/ingest/metrics"""
+        return {
+            "modo": "async" if self.activo else "sync",
+            "profundidad_cola": self.cola.qsize() if self.cola else 0,
+            "capacidad_cola": self.max_cola,
+            **self._metricas,
+        }
+
+    async def _escritor(self) -> None:
+        """Agrupa lecturas de la cola y las escribe por lotes hasta recibir el centinela"""
+        detener = False
+        while not detener:
+            item = await self.cola.get()
+            if item is None:
+                break
+
+            lote = [item]
+            limite = time.monotonic() + self.flush_ms / 1000
+            while len(lote) < self.flush_filas:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.cola.get(), timeout=restante)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    detener = True
+                    break
+                lote.append(item)
+
+            await asyncio.to_thread(self._escribir_lote, lote)
+
+        # Vaciar lo que haya quedado detrás del centinela
+        restantes = []
+        while not self.cola.empty():
+            item = self.cola.get_nowait()
+            if item is not None:
+                restantes.append(item)
+        for inicio in range(0, len(restantes), self.flush_filas):
+            await asyncio.to_thread(self._escribir_lote, restantes[inicio:inicio + self.flush_filas])
+
+    def _escribir_lote(self, lote: list[tuple[dict, list[str], SensorDataManager]]) -> None:
+        """
+        Group-commit de un lote (se ejecuta en un hilo para no bloquear el event loop).
+
+        El lote mezcla lecturas de varios dispositivos: se guardan juntas las
+        de los que reportan al monitoreo activo y los sensores fallados son
+        la unión del último estado de cada uno de esos dispositivos.
+        """
+        inicio = time.perf_counter()
+
+        try:
+            with Session(engine) as session:
+                contexto = obtener_contexto_activo(session)
+                lote_activo = [item for item in lote if contexto and self._reporta_a(item[2], contexto)]
+                descartadas = len(lote) - len(lote_activo)
+                guardadas = []
+
+                if lote_activo:
+                    lecturas = [lectura for lectura, _, _ in lote_activo]
+                    ultimos_fallos = {dispositivo.device_id: fallados for _, fallados, dispositivo in lote_activo}
+                    sensores_fallados = [
+                        sensor for sensor in SENSORES
+                        if any(sensor in fallados for fallados in ultimos_fallos.values())
+                    ]
+                    # Sin las lecturas incompletas ni los reintentos ya guardados
+                    guardadas = guardar_lote(lecturas, sensores_fallados, session=session)
+                if descartadas:
+                    logger.warning(
+                        "⚠️ %s lectura(s) sin monitoreo activo asociado - No se guardan", descartadas,
+                        extra=campos("sin_producto_activo")
+                    )
+                self._refrescar_estado(session)
+            self._metricas["escritas"] += len(guardadas)
+            self._metricas["descartadas_sin_producto"] += descartadas
+        except Exception as e:
+            self._metricas["errores"] += 1
+            self._metricas["perdidas_por_error"] += len(lote)
+            logger.error(f"❌ Error en group-commit de {len(lote)} lectura(s): {str(e)}")
+
+        self._metricas["lotes"] += 1
+        self._metricas["ultimo_lote_filas"] = len(lote)
+        self._metricas["ultimo_lote_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+
+    def _refrescar_estado(self, session: Session = None) -> None:
+        """Recarga el contexto activo (una vez por lote)"""
+        if session is None:
+            with Session(engine) as session:
+                return self._refrescar_estado(session)
+
+        # Contexto activo desde la caché (solo consulta la BD tras una invalidación)
+        self.contexto = obtener_contexto_activo(session)
+
+
+# Instancia global del pipeline (solo se inicia con INGEST_MODE=async)
+ingest_pipeline = IngestPipeline(
+    max_cola=Config.INGEST_QUEUE_MAX,
+    flush_ms=Config.INGEST_FLUSH_MS,
+    flush_filas=Config.INGEST_FLUSH_ROWS,
+)
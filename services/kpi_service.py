@@ -0,0 +1,57 @@
+"""
+Reconstrucción de los indicadores de cumplimiento (kpimonitoreo) fuera del
+camino de ingesta.
+
+Al iniciar, una tarea de fondo reconstruye las sesiones sin indicadores
+(previas a kpimonitoreo), pendientes (reconstrucción interrumpida o fila
+creada por la ingesta) o acumuladas con otra KPI_ENERGIA_ACTIVACION. Con
+varios workers en PostgreSQL, un advisory lock (CLAVE_LOCK_KPIS) deja que
+solo uno la haga.
+"""
+import logging
+from sqlalchemy import Engine, text
+from sqlmodel import Session
+from core.repositories.kpi_monitoreo_repository import kpis_por_reconstruir, reconstruir_kpis
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock de la reconstrucción (727001: particiones, 727002: migraciones, 727003: archivado)
+CLAVE_LOCK_KPIS = 727004
+
+
+def reconstruir_pendientes(engine: Engine) -> int:
+    """
+    Reconstruye los indicadores de todas las sesiones que lo necesitan,
+    cada una con su propia sesión. En PostgreSQL, si otro proceso ya los
+    está reconstruyendo, no hace nada.
+    """
+    if engine.dialect.name != "postgresql":
+        return _reconstruir_pendientes(engine)
+
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:clave)"), {"clave": CLAVE_LOCK_KPIS}).scalar():
+            logger.info("🧮 Otro proceso está reconstruyendo indicadores - Se omite")
+            return 0
+        try:
+            return _reconstruir_pendientes(engine)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": CLAVE_LOCK_KPIS})
+            conn.commit()
+
+
+def _reconstruir_pendientes(engine: Engine) -> int:
+    with Session(engine) as session:
+        pendientes = kpis_por_reconstruir(session)
+
+    reconstruidas = 0
+    for id_producto_monitoreado in pendientes:
+        with Session(engine) as session:
+            try:
+                if reconstruir_kpis(session, id_producto_monitoreado) is not None:
+                    reconstruidas += 1
+            except Exception as e:
+                session.rollback()
+                logger.error(f"❌ Error reconstruyendo los indicadores de la sesión {id_producto_monitoreado}: {str(e)}")
+    if reconstruidas:
+        logger.info("🧮 Indicadores reconstruidos de %s sesión(es)", reconstruidas)
+    return reconstruidas
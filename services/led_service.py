@@ -6,19 +6,35 @@ Arquitectura actual:
 - Backend determina color del LED y lo retorna en la respuesta
 - NodeMCU actualiza el LED según el color recibido
 """
-from sqlmodel import Session, select
-from core.models.alerta import Alerta
-from core.models.condicionalmacenamiento import CondicionAlmacenamiento
-from core.models.productofarmaceutico import ProductoFarmaceutico
-from core.models.productomonitoreado import ProductoMonitoreado
-
-
-# Variable global para recordar el último estado del LED
-ultimo_color_led = "verde"
-modo_alerta_activo = False  # Bloquea cambios si hay alerta activa
-
-
-def determinar_color_led_solo(session: Session, sensor_data: dict = None) -> str:
+import logging
+from typing import Optional
+import numpy as np
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from core.repositories.contexto_monitoreo_repository import (
+    ContextoMonitoreo,
+    obtener_contexto_de_producto,
+    obtener_contexto_de_producto_async,
+    PARAMETROS,
+    WARNING_THRESHOLD_ON,
+    WARNING_THRESHOLD_OFF
+)
+from core.repositories.indice_alertas_pendientes import indice_alertas
+from core.utils.reglas_utils import valores_lectura
+from adapters.arduino_adapter import SensorDataManager, sensor_manager
+from core.utils.logging_utils import campos
+
+logger = logging.getLogger(__name__)
+
+# El último color y el modo alerta (histéresis) se guardan por dispositivo
+# en su SensorDataManager (ver adapters.arduino_adapter.device_registry).
+
+
+def determinar_color_led_solo(
+    session: Session,
+    sensor_data: dict = None,
+    dispositivo: SensorDataManager = None
+) -> str:
     """
     Determina el color del LED SIN enviar instrucciones HTTP.
 
@@ -36,137 +52,177 @@ def determinar_color_led_solo(session: Session, sensor_data: dict = None) -> str
         sensor_data: Diccionario opcional con datos de sensores {temperatura, humedad, lux, presion}
                     IMPORTANTE: En la nueva arquitectura, este parámetro SIEMPRE debe ser proporcionado
                     desde el endpoint POST /nodemcu/data
+        dispositivo: Estado del NodeMCU que envió los datos (por defecto sensor_manager)
+
+    Returns:
+        Color del LED: "verde", "amarillo", "rojo"
+    """
+    dispositivo = dispositivo or sensor_manager
+    contexto = obtener_contexto_de_producto(session, dispositivo.id_producto_monitoreado)
+    return _color_led_para_contexto(contexto, sensor_data, dispositivo)
+
+
+async def determinar_color_led_async(
+    session: AsyncSession,
+    sensor_data: dict = None,
+    dispositivo: SensorDataManager = None
+) -> str:
+    """Versión async de determinar_color_led_solo (misma lógica de prioridades)"""
+    dispositivo = dispositivo or sensor_manager
+    contexto = await obtener_contexto_de_producto_async(session, dispositivo.id_producto_monitoreado)
+    return _color_led_para_contexto(contexto, sensor_data, dispositivo)
+
+
+def _color_led_para_contexto(
+    contexto: Optional[ContextoMonitoreo],
+    sensor_data: dict,
+    dispositivo: SensorDataManager
+) -> str:
+    contextos = [contexto] if contexto else []
+    id_producto_monitoreado = contexto.id_producto_monitoreado if contexto else dispositivo.id_producto_monitoreado
+
+    return calcular_color_led(
+        contar_alertas_pendientes(id_producto_monitoreado), contextos, sensor_data, dispositivo
+    )
+
+
+def contar_alertas_pendientes(id_producto_monitoreado: int = None) -> int:
+    """
+    Alertas PENDIENTES que bloquean el LED (índice en memoria, sin consultar la BD).
+
+    Con id_producto_monitoreado se cuentan solo las del producto que monitorea
+    el dispositivo; sin él se cuentan todas.
+    """
+    if id_producto_monitoreado is None:
+        return indice_alertas.total()
+    return len(indice_alertas.pendientes_de(id_producto_monitoreado))
+
+
+def calcular_color_led(
+    alertas_pendientes: int,
+    contextos: list[ContextoMonitoreo],
+    sensor_data: dict = None,
+    dispositivo: SensorDataManager = None
+) -> str:
+    """
+    Decide el color del LED a partir de estado ya conocido, sin acceder a la BD.
+
+    Contiene la lógica de prioridades e histéresis de determinar_color_led_solo
+    y también la usa el pipeline asíncrono de ingesta, que responde al NodeMCU
+    con el estado en memoria.
+
+    Args:
+        alertas_pendientes: Número de alertas PENDIENTES (0 si no hay)
+        contextos: Contextos de monitoreo activos (con bandas de advertencia ya calculadas)
+        sensor_data: Diccionario con datos de sensores {temperatura, humedad, lux, presion}
+        dispositivo: Estado del NodeMCU (sensores e histéresis); por defecto sensor_manager
 
     Returns:
         Color del LED: "verde", "amarillo", "rojo"
     """
-    global ultimo_color_led, modo_alerta_activo
+    dispositivo = dispositivo or sensor_manager
+    with dispositivo.lock:
+        return _decidir_color(dispositivo, alertas_pendientes, contextos, sensor_data)
 
+
+def _decidir_color(
+    dispositivo: SensorDataManager,
+    alertas_pendientes: int,
+    contextos: list[ContextoMonitoreo],
+    sensor_data: dict = None
+) -> str:
     # ============================================================
     # PRIORIDAD 1: VERIFICAR ALERTAS PENDIENTES (BLOQUEO TOTAL)
     # ============================================================
-    stmt_alertas = select(Alerta).where(Alerta.estado == "PENDIENTE")
-    alertas_pendientes = session.exec(stmt_alertas).all()
-
     if alertas_pendientes:
         # Hay alertas activas → ROJO ABSOLUTO (sin importar nada más)
-        if not modo_alerta_activo:
-            print(f"⚠️ ALERTA ACTIVA detectada - {len(alertas_pendientes)} alertas pendientes")
-            print("🔴 LED BLOQUEADO en ROJO hasta resolución manual")
-        modo_alerta_activo = True
-        ultimo_color_led = "rojo"
+        if not dispositivo.modo_alerta_activo:
+            logger.warning(
+                "⚠️ ALERTA ACTIVA detectada - %s alertas pendientes. 🔴 LED BLOQUEADO en ROJO hasta resolución manual",
+                alertas_pendientes,
+                extra=campos(f"led.alerta:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+            )
+        dispositivo.modo_alerta_activo = True
+        dispositivo.ultimo_color_led = "rojo"
         return "rojo"
 
     # Si llegamos aquí, NO hay alertas pendientes
     # Resetear estado de alerta
-    if modo_alerta_activo:
-        print("✅ ALERTA resuelta - Liberando bloqueo de LED")
-        modo_alerta_activo = False
-        # Resetear ultimo_color_led para evitar que la histéresis use "rojo"
-        ultimo_color_led = "verde"
+    if dispositivo.modo_alerta_activo:
+        logger.info(
+            "✅ ALERTA resuelta - Liberando bloqueo de LED",
+            extra=campos(f"led.alerta_resuelta:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+        )
+        dispositivo.modo_alerta_activo = False
+        # Resetear dispositivo.ultimo_color_led para evitar que la histéresis use "rojo"
+        dispositivo.ultimo_color_led = "verde"
 
     # ============================================================
     # PRIORIDAD 2: VERIFICAR SENSORES FALLADOS (BLOQUEO TOTAL)
     # ============================================================
-    from adapters.arduino_adapter import sensor_manager
-    sensor_status = sensor_manager.get_sensor_status()
+    sensor_status = dispositivo.get_sensor_status()
     sensores_fallados = sensor_status.get_failed_sensors()
 
     if sensores_fallados:
         # Hay sensores fallados → ROJO ABSOLUTO (sin importar umbrales)
-        if ultimo_color_led != "rojo":
-            print(f"⚠️ SENSORES FALLADOS detectados: {sensores_fallados}")
-            print("🔴 LED en ROJO por fallo de sensores")
-        ultimo_color_led = "rojo"
+        if dispositivo.ultimo_color_led != "rojo":
+            logger.warning(
+                "⚠️ SENSORES FALLADOS detectados: %s. 🔴 LED en ROJO por fallo de sensores",
+                sensores_fallados,
+                extra=campos(f"led.sensores:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+            )
+        dispositivo.ultimo_color_led = "rojo"
         return "rojo"
 
     # ============================================================
     # PRIORIDAD 3 y 4: SOLO SI NO HAY ALERTAS NI FALLOS
     # Aquí SI podemos evaluar amarillo o verde
     # ============================================================
-    stmt = (
-        select(ProductoMonitoreado, CondicionAlmacenamiento)
-        .join(ProductoFarmaceutico, ProductoMonitoreado.id_producto == ProductoFarmaceutico.id)
-        .join(CondicionAlmacenamiento, ProductoFarmaceutico.id_condicion == CondicionAlmacenamiento.id)
-        .where(ProductoMonitoreado.fecha_finalizacion_monitoreo == None)
-    )
-
     # NOTA: En la nueva arquitectura bidireccional, sensor_data SIEMPRE
     # debe ser proporcionado desde el endpoint POST /nodemcu/data
-    # Si es None, usar last_sensor_data del sensor_manager (fallback)
+    # Si es None, usar last_sensor_data del dispositivo (fallback)
     if sensor_data is None:
-        sensor_data = sensor_manager.last_sensor_data
+        sensor_data = dispositivo.last_sensor_data
 
     if sensor_data is None:
         # No hay datos del sensor → mantener verde por seguridad
-        if ultimo_color_led != "verde":
-            print("ℹ️ No hay datos de sensores - Manteniendo VERDE por seguridad")
+        if dispositivo.ultimo_color_led != "verde":
+            logger.info(
+                "ℹ️ No hay datos de sensores - Manteniendo VERDE por seguridad",
+                extra=campos(f"led.sin_datos:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+            )
         return "verde"
 
-    productos = session.exec(stmt).all()
-
-    # HISTÉRESIS: Umbrales diferentes para evitar parpadeo
-    WARNING_THRESHOLD_ON = 0.90  # 90% - Para encender amarillo
-    WARNING_THRESHOLD_OFF = 0.85  # 85% - Para apagar amarillo
-
-    # Usar umbral diferente según el estado actual
-    threshold = WARNING_THRESHOLD_OFF if ultimo_color_led == "amarillo" else WARNING_THRESHOLD_ON
+    # HISTÉRESIS: usar umbral diferente según el estado actual
+    # (las bandas de cada umbral vienen compiladas en las reglas del contexto)
+    threshold = WARNING_THRESHOLD_OFF if dispositivo.ultimo_color_led == "amarillo" else WARNING_THRESHOLD_ON
 
-    algun_sensor_en_umbral = False
+    # Los sensores que no reportan bien no cuentan (NaN nunca está en umbral)
+    valores = valores_lectura(sensor_data)
+    valores[[not getattr(sensor_status, f"{parametro}_ok") for parametro in PARAMETROS]] = np.nan
 
-    for pm, condicion in productos:
-        # Verificar temperatura
-        if sensor_status.temperatura_ok and sensor_data.get('temperatura') is not None:
-            temp = sensor_data['temperatura']
-            temp_range = condicion.temperatura_max - condicion.temperatura_min
-            temp_max_warning = condicion.temperatura_min + temp_range * threshold
-            temp_min_warning = condicion.temperatura_max - temp_range * threshold
-
-            if temp >= temp_max_warning or temp <= temp_min_warning:
-                algun_sensor_en_umbral = True
-
-        # Verificar humedad
-        if sensor_status.humedad_ok and sensor_data.get('humedad') is not None:
-            hum = sensor_data['humedad']
-            hum_range = condicion.humedad_max - condicion.humedad_min
-            hum_max_warning = condicion.humedad_min + hum_range * threshold
-            hum_min_warning = condicion.humedad_max - hum_range * threshold
-
-            if hum >= hum_max_warning or hum <= hum_min_warning:
-                algun_sensor_en_umbral = True
-
-        # Verificar lux
-        if sensor_status.lux_ok and sensor_data.get('lux') is not None:
-            lux = sensor_data['lux']
-            lux_range = condicion.lux_max - condicion.lux_min
-            lux_max_warning = condicion.lux_min + lux_range * threshold
-            lux_min_warning = condicion.lux_max - lux_range * threshold
-
-            if lux >= lux_max_warning or lux <= lux_min_warning:
-                algun_sensor_en_umbral = True
-
-        # Verificar presión
-        if sensor_status.presion_ok and sensor_data.get('presion') is not None:
-            presion = sensor_data['presion']
-            presion_range = condicion.presion_max - condicion.presion_min
-            presion_max_warning = condicion.presion_min + presion_range * threshold
-            presion_min_warning = condicion.presion_max - presion_range * threshold
-
-            if presion >= presion_max_warning or presion <= presion_min_warning:
-                algun_sensor_en_umbral = True
+    algun_sensor_en_umbral = any(
+        contexto.reglas.advertencias(valores, threshold).any() for contexto in contextos
+    )
 
     # Decidir color final con histéresis
     if algun_sensor_en_umbral:
         # Sensores cerca de los límites → AMARILLO
         # (SOLO llegamos aquí si NO hay alertas NI fallos)
-        if ultimo_color_led != "amarillo":
-            print("⚠️ Sensor en umbral de advertencia - LED en AMARILLO")
-        ultimo_color_led = "amarillo"
+        if dispositivo.ultimo_color_led != "amarillo":
+            logger.info(
+                "⚠️ Sensor en umbral de advertencia - LED en AMARILLO",
+                extra=campos(f"led.amarillo:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+            )
+        dispositivo.ultimo_color_led = "amarillo"
         return "amarillo"
     else:
         # Todo normal → VERDE
         # (SOLO llegamos aquí si NO hay alertas NI fallos NI umbrales)
-        if ultimo_color_led != "verde":
-            print("✅ Todos los sensores normales - LED en VERDE")
-        ultimo_color_led = "verde"
+        if dispositivo.ultimo_color_led != "verde":
+            logger.info(
+                "✅ Todos los sensores normales - LED en VERDE",
+                extra=campos(f"led.verde:{dispositivo.device_id}", dispositivo=dispositivo.device_id)
+            )
+        dispositivo.ultimo_color_led = "verde"
         return "verde"
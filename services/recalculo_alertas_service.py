@@ -0,0 +1,311 @@
+"""
+Recálculo del historial de alertas de una sesión de monitoreo.
+
+update_condicion cambia los límites hacia adelante, pero las alertas ya
+registradas quedan con los anteriores. El recálculo vuelve a evaluar las
+lecturas guardadas de la sesión con la condición actual y reconstruye cada
+excursión (tramo de lecturas fuera de rango de un parámetro) como una
+alerta con su fecha_generacion (primera lectura fuera de rango),
+fecha_resolucion (primera lectura de nuevo en rango) y duracion_minutos,
+igual que la ingesta en vivo.
+
+- Las lecturas se recorren en lotes de RECALCULO_LOTE por keyset (fecha,
+  id) y cada lote se evalúa vectorizado (tramos_excursion): la memoria
+  depende del lote, no de la sesión.
+- Cada lote confirma sus alertas junto con el avance (recalculoalertas):
+  si el proceso se corta, el próximo recalcular_alertas sigue desde ahí.
+- Cubre hasta la última lectura al iniciar (`hasta`). Las alertas
+  PENDIENTES no se tocan (las lleva la ingesta en vivo); una excursión que
+  sigue abierta al final solo se registra, como PENDIENTE, si la sesión
+  está finalizada y no hay ya una pendiente de ese parámetro.
+- Un solo ejecutor por sesión, reservado con un UPDATE condicional; una
+  reserva sin avance durante RECALCULO_ABANDONO_MINUTOS se puede retomar.
+- Al completar reconstruye los indicadores de la sesión (kpimonitoreo):
+  sus minutos fuera de rango pasan a usar la misma condición.
+
+Se ejecuta con `python manage.py recalcular-alertas --producto N` o con
+POST /alertas/recalculos/{id} (administradores).
+"""
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+import numpy as np
+from sqlalchemy import Engine, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+from config import Config
+from core.models.condicionalmacenamiento import CondicionAlmacenamiento
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.models.recalculoalertas import EstadoRecalculo, RecalculoAlertas
+from core.models.recalculoalertas_read import RecalculoAlertasRead
+from core.repositories import alerta_repository
+from core.repositories.dato_monitoreo_repository import contar_lecturas, iterar_lotes_sesion, rango_de_producto
+from core.repositories.indice_alertas_pendientes import indice_alertas
+from core.repositories.kpi_monitoreo_repository import reconstruir_kpis
+from core.utils.datetime_utils import get_caracas_now
+from core.utils.reglas_utils import PARAMETROS, ReglasCondicion, compilar_reglas, tramos_excursion
+
+logger = logging.getLogger(__name__)
+
+# parametro → (id_dato_monitoreo, valor_medido, fecha_generacion) de la excursión abierta
+Abiertas = dict[str, tuple[int, float, datetime]]
+
+
+class RecalculoEnCurso(Exception):
+    """Otro proceso está recalculando las alertas de la sesión"""
+
+
+def preparar_recalculo(
+    session: Session,
+    id_producto_monitoreado: int,
+    reiniciar: bool = False
+) -> Optional[RecalculoAlertas]:
+    """
+    Reserva el recálculo de la sesión para este proceso (hace commit).
+
+    Reanuda el que haya quedado interrumpido, salvo con reiniciar=True o si
+    la condición cambió desde que empezó. Si no, lo empieza de cero: fija
+    `hasta` y borra las alertas RESUELTAS que se van a recalcular.
+
+    Returns:
+        El recálculo reservado (con su ejecutor), o None si el producto
+        monitoreado no existe
+
+    Raises:
+        RecalculoEnCurso: Si otro proceso lo tiene reservado
+    """
+    producto = session.get(ProductoMonitoreado, id_producto_monitoreado)
+    if producto is None:
+        return None
+    condicion = producto.producto.condicion
+    ejecutor = secrets.token_hex(8)
+    ahora = get_caracas_now()
+
+    recalculo = session.get(RecalculoAlertas, id_producto_monitoreado)
+    if recalculo is None:
+        recalculo = RecalculoAlertas(
+            id_producto_monitoreado=id_producto_monitoreado, id_condicion=condicion.id, ejecutor=ejecutor
+        )
+        session.add(recalculo)
+        try:
+            session.flush()
+        except IntegrityError:
+            session.rollback()
+            raise RecalculoEnCurso(f"El producto monitoreado {id_producto_monitoreado} ya se está recalculando")
+        reanudar = False
+    else:
+        reservado = session.execute(
+            update(RecalculoAlertas)
+            .where(RecalculoAlertas.id_producto_monitoreado == id_producto_monitoreado)
+            .where(or_(
+                RecalculoAlertas.ejecutor == None,
+                RecalculoAlertas.actualizado < ahora - timedelta(minutes=Config.RECALCULO_ABANDONO_MINUTOS)
+            ))
+            .values(ejecutor=ejecutor, actualizado=ahora)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not reservado:
+            session.rollback()
+            raise RecalculoEnCurso(f"El producto monitoreado {id_producto_monitoreado} ya se está recalculando")
+        session.refresh(recalculo)
+        reanudar = (
+            not reiniciar
+            and recalculo.estado == EstadoRecalculo.EN_CURSO
+            and recalculo.id_condicion == condicion.id
+            and not (condicion.fecha_actualizacion and condicion.fecha_actualizacion > recalculo.fecha_inicio)
+        )
+
+    if reanudar:
+        logger.info(
+            "🔁 Reanudando recálculo de alertas del producto monitoreado %s (%s/%s lecturas)",
+            id_producto_monitoreado, recalculo.lecturas_procesadas, recalculo.lecturas_totales
+        )
+    else:
+        _, hasta = rango_de_producto(session, id_producto_monitoreado)
+        borradas = alerta_repository.eliminar_alertas_resueltas(session, id_producto_monitoreado, hasta) if hasta else 0
+        recalculo.estado = EstadoRecalculo.EN_CURSO
+        recalculo.id_condicion = condicion.id
+        recalculo.hasta = hasta
+        recalculo.fecha_cursor = recalculo.id_cursor = None
+        recalculo.abiertas = {}
+        recalculo.lecturas_procesadas = recalculo.alertas_creadas = 0
+        recalculo.lecturas_totales = contar_lecturas(session, id_producto_monitoreado, hasta) if hasta else 0
+        recalculo.error = None
+        recalculo.fecha_inicio = ahora
+        logger.info(
+            "🧮 Recálculo de alertas del producto monitoreado %s: %s lecturas, %s alerta(s) resuelta(s) a reemplazar",
+            id_producto_monitoreado, recalculo.lecturas_totales, borradas
+        )
+    recalculo.actualizado = ahora
+    session.commit()
+    return recalculo
+
+
+def ejecutar_recalculo(
+    engine: Engine,
+    id_producto_monitoreado: int,
+    ejecutor: str,
+    progreso: Optional[Callable[[RecalculoAlertasRead], None]] = None
+) -> RecalculoAlertasRead:
+    """
+    Recorre las lecturas pendientes de un recálculo ya reservado
+    (preparar_recalculo), un lote por transacción.
+
+    Args:
+        progreso: Se llama después de confirmar cada lote
+
+    Raises:
+        RecalculoEnCurso: Si otro proceso retomó la reserva (la reserva se
+            consideró abandonada)
+    """
+    with Session(engine) as session:
+        recalculo = session.get(RecalculoAlertas, id_producto_monitoreado)
+        finalizada = session.get(ProductoMonitoreado, id_producto_monitoreado).fecha_finalizacion_monitoreo is not None
+        reglas = compilar_reglas(session.get(CondicionAlmacenamiento, recalculo.id_condicion))
+        hasta = recalculo.hasta
+        cursor = (recalculo.fecha_cursor, recalculo.id_cursor) if recalculo.fecha_cursor else None
+        abiertas: Abiertas = {
+            parametro: (id_dato, valor, datetime.fromisoformat(fecha))
+            for parametro, (id_dato, valor, fecha) in recalculo.abiertas.items()
+        }
+
+        try:
+            lotes = iterar_lotes_sesion(session, id_producto_monitoreado, cursor, hasta, Config.RECALCULO_LOTE) if hasta else ()
+            for lote in lotes:
+                excursiones = _excursiones_del_lote(reglas, lote, abiertas)
+                alerta_repository.registrar_excursiones(session, id_producto_monitoreado, reglas, excursiones)
+                cursor = (lote[-1][1], lote[-1][0])
+                _avanzar(
+                    session, id_producto_monitoreado, ejecutor,
+                    fecha_cursor=cursor[0],
+                    id_cursor=cursor[1],
+                    abiertas={p: [id_dato, valor, fecha.isoformat()] for p, (id_dato, valor, fecha) in abiertas.items()},
+                    lecturas_procesadas=RecalculoAlertas.lecturas_procesadas + len(lote),
+                    alertas_creadas=RecalculoAlertas.alertas_creadas + len(excursiones),
+                )
+                session.commit()
+                if progreso:
+                    progreso(a_recalculo_read(recalculo))
+
+            # Excursiones abiertas al final: en una sesión activa las sigue la ingesta en vivo
+            pendientes = [
+                (parametro, id_dato, valor, fecha, None)
+                for parametro, (id_dato, valor, fecha) in abiertas.items()
+                if finalizada and not indice_alertas.obtener(id_producto_monitoreado, parametro)
+            ]
+            alerta_repository.registrar_excursiones(session, id_producto_monitoreado, reglas, pendientes)
+            _avanzar(
+                session, id_producto_monitoreado, ejecutor,
+                estado=EstadoRecalculo.COMPLETADO,
+                ejecutor=None,
+                abiertas={},
+                alertas_creadas=RecalculoAlertas.alertas_creadas + len(pendientes),
+            )
+            session.commit()
+        except RecalculoEnCurso:
+            session.rollback()
+            raise
+        except BaseException as e:
+            # Error: queda en "error" y se puede reanudar. Interrupción (Ctrl+C): sigue "en_curso"
+            session.rollback()
+            valores = {"estado": EstadoRecalculo.ERROR, "error": str(e)} if isinstance(e, Exception) else {}
+            _avanzar(session, id_producto_monitoreado, ejecutor, ejecutor=None, **valores)
+            session.commit()
+            if isinstance(e, Exception):
+                logger.error(f"❌ Error recalculando alertas del producto monitoreado {id_producto_monitoreado}: {str(e)}")
+            raise
+
+        resultado = a_recalculo_read(recalculo)
+
+        # Los minutos fuera de rango de los indicadores, con la misma condición
+        try:
+            reconstruir_kpis(session, id_producto_monitoreado)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"❌ Error reconstruyendo los indicadores del producto monitoreado {id_producto_monitoreado}: {str(e)}")
+
+    logger.info(
+        "✅ Recálculo de alertas del producto monitoreado %s completado: %s lecturas, %s alerta(s)",
+        id_producto_monitoreado, resultado.lecturas_procesadas, resultado.alertas_creadas
+    )
+    return resultado
+
+
+def recalcular_alertas(
+    engine: Engine,
+    id_producto_monitoreado: int,
+    reiniciar: bool = False,
+    progreso: Optional[Callable[[RecalculoAlertasRead], None]] = None
+) -> Optional[RecalculoAlertasRead]:
+    """
+    Recalcula (o reanuda) el historial de alertas de una sesión con la
+    condición actual de su producto.
+
+    Returns:
+        El estado final, o None si el producto monitoreado no existe
+
+    Raises:
+        RecalculoEnCurso: Si otro proceso lo está ejecutando
+    """
+    with Session(engine) as session:
+        recalculo = preparar_recalculo(session, id_producto_monitoreado, reiniciar)
+        if recalculo is None:
+            return None
+        ejecutor = recalculo.ejecutor
+    return ejecutar_recalculo(engine, id_producto_monitoreado, ejecutor, progreso)
+
+
+def obtener_recalculo(session: Session, id_producto_monitoreado: int) -> Optional[RecalculoAlertasRead]:
+    recalculo = session.get(RecalculoAlertas, id_producto_monitoreado)
+    return a_recalculo_read(recalculo) if recalculo else None
+
+
+def a_recalculo_read(recalculo: RecalculoAlertas) -> RecalculoAlertasRead:
+    abandono = get_caracas_now() - timedelta(minutes=Config.RECALCULO_ABANDONO_MINUTOS)
+    if recalculo.lecturas_totales:
+        porcentaje = round(100 * recalculo.lecturas_procesadas / recalculo.lecturas_totales, 1)
+    else:
+        porcentaje = 100.0 if recalculo.estado == EstadoRecalculo.COMPLETADO else 0.0
+    return RecalculoAlertasRead(
+        **recalculo.model_dump(include=set(RecalculoAlertasRead.model_fields) - {"porcentaje", "en_ejecucion"}),
+        porcentaje=porcentaje,
+        en_ejecucion=recalculo.ejecutor is not None and recalculo.actualizado >= abandono,
+    )
+
+
+def _excursiones_del_lote(reglas: ReglasCondicion, lote: list[tuple], abiertas: Abiertas) -> list[tuple]:
+    """
+    Excursiones que se cierran dentro del lote (tuplas para
+    registrar_excursiones). Actualiza `abiertas` con las que siguen abiertas
+    al terminar el lote.
+    """
+    valores = np.array([fila[2:] for fila in lote], dtype=object).astype(np.float64)  # None → NaN
+    previas = np.array([parametro in abiertas for parametro in PARAMETROS])
+
+    cerradas = []
+    for j, (inicios, fines) in enumerate(tramos_excursion(reglas.excursiones(valores), previas)):
+        parametro = PARAMETROS[j]
+        fines = fines.tolist()
+        if parametro in abiertas and fines:
+            cerradas.append((parametro, *abiertas.pop(parametro), lote[fines.pop(0)][1]))
+        for k, inicio in enumerate(inicios.tolist()):
+            apertura = (lote[inicio][0], lote[inicio][2 + j], lote[inicio][1])
+            if k < len(fines):
+                cerradas.append((parametro, *apertura, lote[fines[k]][1]))
+            else:
+                abiertas[parametro] = apertura
+    return cerradas
+
+
+def _avanzar(session: Session, id_producto_monitoreado: int, reserva: str, **valores) -> None:
+    """Actualiza el avance (sin commit) solo si este proceso (`reserva`) sigue siendo el ejecutor"""
+    actualizados = session.execute(
+        update(RecalculoAlertas)
+        .where(RecalculoAlertas.id_producto_monitoreado == id_producto_monitoreado)
+        .where(RecalculoAlertas.ejecutor == reserva)
+        .values(actualizado=get_caracas_now(), **valores)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not actualizados:
+        raise RecalculoEnCurso(f"Otro proceso retomó el recálculo del producto monitoreado {id_producto_monitoreado}")
@@ -40,6 +40,10 @@ from core.models.productofarmaceutico import ProductoFarmaceutico
 from core.models.productomonitoreado import ProductoMonitoreado
 from core.models.datomonitoreo import DatoMonitoreo
 from core.models.alerta import Alerta, EstadoAlerta
+from core.models.agregadomonitoreo import AgregadoMonitoreo
+from core.models.kpimonitoreo import KpiMonitoreo
+from core.models.archivomonitoreo import ArchivoMonitoreo
+from core.repositories import agregado_monitoreo_repository
 
 VENEZUELA_TZ = timezone(timedelta(hours=-4), name="America/Caracas")
 
@@ -60,6 +64,24 @@ def limpiar_datos(session: Session):
         session.delete(dato)
     print(f"   - Eliminados {len(datos)} datos de monitoreo")
 
+    # Eliminar agregados de los datos de monitoreo
+    agregados = session.exec(select(AgregadoMonitoreo)).all()
+    for agregado in agregados:
+        session.delete(agregado)
+    print(f"   - Eliminados {len(agregados)} agregados de monitoreo")
+
+    # Eliminar indicadores de cumplimiento de las sesiones
+    kpis = session.exec(select(KpiMonitoreo)).all()
+    for kpi in kpis:
+        session.delete(kpi)
+    print(f"   - Eliminados {len(kpis)} indicadores de sesiones")
+
+    # Eliminar sesiones archivadas
+    archivos = session.exec(select(ArchivoMonitoreo)).all()
+    for archivo in archivos:
+        session.delete(archivo)
+    print(f"   - Eliminadas {len(archivos)} sesiones archivadas")
+
     # Eliminar productos monitoreados
     productos_monitoreados = session.exec(select(ProductoMonitoreado)).all()
     for pm in productos_monitoreados:
@@ -208,6 +230,7 @@ def generar_datos_monitoreo(session: Session, producto_monitoreado: ProductoMoni
 
     # Contador de registros
     num_registros = 0
+    datos = []
     registro_actual = fecha_inicio
 
     # Presión base para cámara frigorífica (870 hPa, no nivel del mar)
@@ -318,6 +341,7 @@ def generar_datos_monitoreo(session: Session, producto_monitoreado: ProductoMoni
         )
 
         session.add(dato)
+        datos.append(dato)
         num_registros += 1
 
         # Mostrar progreso cada 100 registros
@@ -327,6 +351,8 @@ def generar_datos_monitoreo(session: Session, producto_monitoreado: ProductoMoni
         # Siguiente registro: exactamente 10 minutos después
         registro_actual += timedelta(minutes=10)
 
+    # Agregados por minuto/hora/día para los gráficos
+    agregado_monitoreo_repository.actualizar_agregados(session, datos)
     session.commit()
     print(f"   - Total de registros generados: {num_registros}\n")
 
@@ -0,0 +1,34 @@
+"""Rutas de alertas (adapters/api/alerta.py)"""
+from sqlmodel import Session, select
+from adapters.db.sqlmodel_database import engine
+from core.models.alerta import Alerta
+from core.models.datomonitoreo import DatoMonitoreo
+
+
+def _lectura(id_producto_monitoreado: int, temperatura: float) -> int:
+    with Session(engine) as session:
+        dato = DatoMonitoreo(
+            id_producto_monitoreado=id_producto_monitoreado, temperatura=temperatura, humedad=45.0, lux=10.0, presion=870.0
+        )
+        session.add(dato)
+        session.commit()
+        return dato.id
+
+
+def test_crear_alerta_desde_una_lectura_guardada(cliente, producto_monitoreado):
+    id_dato = _lectura(producto_monitoreado, 9.5)
+
+    respuesta = cliente.post("/alertas/", params={"dato_monitoreo_id": id_dato})
+
+    assert respuesta.status_code == 200
+    assert [(a["parametro_afectado"], a["id_dato_monitoreo"]) for a in respuesta.json()] == [("temperatura", id_dato)]
+    with Session(engine) as session:
+        assert len(session.exec(select(Alerta)).all()) == 1
+
+
+def test_crear_alerta_con_lectura_en_rango_o_inexistente(cliente, producto_monitoreado):
+    en_rango = cliente.post("/alertas/", params={"dato_monitoreo_id": _lectura(producto_monitoreado, 5.0)})
+    inexistente = cliente.post("/alertas/", params={"dato_monitoreo_id": 9999})
+
+    assert en_rango.status_code == 200 and en_rango.json() == []
+    assert inexistente.status_code == 404
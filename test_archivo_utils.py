@@ -0,0 +1,49 @@
+"""Codificación compacta de sesiones archivadas (core/utils/archivo_utils.py)"""
+from datetime import datetime, timedelta
+import pytest
+from core.utils.archivo_utils import Empaquetador, desempaquetar, empaquetar
+
+INICIO = datetime(2026, 3, 1, 8, 0, 0, 123456)
+
+
+def _filas(cantidad: int) -> list[tuple]:
+    return [
+        (
+            1000 + i * 3,
+            INICIO + timedelta(seconds=30 * i),
+            round(4.0 + (i % 7) * 0.25, 2),
+            45.5,
+            0.1 + i / 3,  # Sin representación decimal exacta: columna en float64 crudo
+            870.0,
+            None if i % 4 == 0 else f"nodemcu-{i % 2}",
+            None if i % 5 == 0 else i,
+        )
+        for i in range(cantidad)
+    ]
+
+
+def test_ida_y_vuelta_exacta():
+    filas = _filas(200)
+    assert desempaquetar(empaquetar(filas)) == filas
+
+
+def test_empaquetar_por_lotes_da_el_mismo_blob():
+    filas = _filas(120)
+    empaquetador = Empaquetador()
+    for inicio in range(0, len(filas), 50):
+        empaquetador.agregar(filas[inicio:inicio + 50])
+
+    assert empaquetador.empaquetar() == empaquetar(filas)
+    assert len(empaquetador) == 120
+    assert empaquetador.primera_fecha == filas[0][1]
+    assert empaquetador.ultima_fecha == filas[-1][1]
+
+
+def test_sesion_vacia():
+    assert desempaquetar(empaquetar([])) == []
+
+
+def test_version_desconocida():
+    import zlib
+    with pytest.raises(ValueError):
+        desempaquetar(zlib.compress(bytes([99, 0])))
@@ -0,0 +1,109 @@
+"""Lecturas por rango de fechas (adapters/api/datomonitoreo.py)"""
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+from sqlmodel import Session, select
+from adapters.db.sqlmodel_database import engine
+from core.models.archivomonitoreo import ArchivoMonitoreo
+from core.models.datomonitoreo import DatoMonitoreo
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.repositories.archivo_monitoreo_repository import lecturas_de_archivo
+from services import archivo_service
+
+# Hora de Caracas (UTC-4), como se guardan las fechas: 08:00 local = 12:00Z
+INICIO = datetime(2026, 3, 1, 8, 0)
+
+
+def _guardar_lecturas(id_producto_monitoreado: int, cantidad: int = 6) -> None:
+    with Session(engine) as session:
+        session.execute(insert(DatoMonitoreo), [
+            dict(id_producto_monitoreado=id_producto_monitoreado, fecha=INICIO + timedelta(minutes=10 * i),
+                 temperatura=5.0, humedad=45.0, lux=10.0, presion=870.0)
+            for i in range(cantidad)
+        ])
+        session.commit()
+
+
+def _fechas(respuesta) -> list[str]:
+    assert respuesta.status_code == 200, respuesta.text
+    return [dato["fecha"] for dato in respuesta.json()]
+
+
+def test_limites_con_zona_horaria_se_convierten_a_hora_de_caracas(cliente, producto_monitoreado):
+    _guardar_lecturas(producto_monitoreado)
+    # 12:15Z..12:35Z = 08:15..08:35 en Caracas: las lecturas de 08:20 y 08:30
+    rango = {"desde": "2026-03-01T12:15:00Z", "hasta": "2026-03-01T12:35:00Z"}
+    esperadas = ["2026-03-01T08:30:00", "2026-03-01T08:20:00"]
+
+    assert _fechas(cliente.get(f"/datosmonitoreo/{producto_monitoreado}", params=rango)) == esperadas
+    assert _fechas(cliente.get("/datosmonitoreo/", params=rango)) == esperadas
+    # Sin zona se asume hora de Caracas
+    assert _fechas(cliente.get("/datosmonitoreo/", params={"desde": "2026-03-01T08:15:00", "hasta": "2026-03-01T08:35:00"})) == esperadas
+
+
+def _archivar(id_producto_monitoreado: int) -> ArchivoMonitoreo:
+    with Session(engine) as session:
+        monitoreado = session.get(ProductoMonitoreado, id_producto_monitoreado)
+        monitoreado.fecha_finalizacion_monitoreo = INICIO + timedelta(hours=1)
+        session.add(monitoreado)
+        session.commit()
+        archivo = archivo_service.archivar_sesion(session, id_producto_monitoreado)
+        session.refresh(archivo)
+        session.expunge(archivo)
+        return archivo
+
+
+def test_limites_con_zona_horaria_sobre_sesion_archivada(cliente, producto_monitoreado):
+    _guardar_lecturas(producto_monitoreado)
+    archivo = _archivar(producto_monitoreado)
+    # El repositorio también acepta límites con zona (servicios, scripts)
+    filas = lecturas_de_archivo(archivo, datetime(2026, 3, 1, 12, 15, tzinfo=timezone.utc))
+    assert filas[-1][1] == INICIO + timedelta(minutes=20)
+    rango = {"desde": "2026-03-01T12:15:00Z", "hasta": "2026-03-01T12:35:00Z"}
+
+    assert _fechas(cliente.get(f"/datosmonitoreo/{producto_monitoreado}", params=rango)) == [
+        "2026-03-01T08:30:00", "2026-03-01T08:20:00"
+    ]
+    assert len(_fechas(cliente.get("/datosmonitoreo/", params={"desde": "2026-03-01T00:00:00Z", "hasta": "2026-03-02T00:00:00Z"}))) == 6
+
+
+def test_agregados_con_limites_con_zona_horaria(cliente, producto_monitoreado):
+    # Los agregados los mantiene la ingesta: lecturas con la hora actual de Caracas
+    for _ in range(3):
+        lectura = {"temperatura": 5.0, "humedad": 45.0, "lux": 10.0, "presion": 870.0, "device_id": "agregados-1"}
+        assert cliente.post("/nodemcu/data", json=lectura).status_code == 200
+    with Session(engine) as session:
+        fecha = session.exec(select(DatoMonitoreo.fecha)).first()
+    # Una hora antes y una después, expresadas en UTC (Caracas = UTC-4)
+    rango = {"desde": f"{(fecha + timedelta(hours=3)).isoformat()}Z", "hasta": f"{(fecha + timedelta(hours=5)).isoformat()}Z"}
+
+    respuesta = cliente.get(f"/datosmonitoreo/{producto_monitoreado}/agregados", params={"bucket": "1h", **rango})
+
+    assert respuesta.status_code == 200
+    assert sum(agregado["cantidad"] for agregado in respuesta.json()) == 3
+
+
+def test_exportacion_de_sesion_archivada_con_limites_con_zona_horaria(cliente, producto_monitoreado):
+    _guardar_lecturas(producto_monitoreado)
+    _archivar(producto_monitoreado)
+
+    respuesta = cliente.get(
+        f"/datosmonitoreo/{producto_monitoreado}/export",
+        params={"format": "ndjson", "desde": "2026-03-01T12:15:00Z", "hasta": "2026-03-01T12:35:00Z"}
+    )
+
+    assert respuesta.status_code == 200
+    assert [json.loads(linea)["fecha"] for linea in respuesta.text.splitlines()] == ["2026-03-01T08:20:00", "2026-03-01T08:30:00"]
+
+
+def test_serie_con_limites_con_zona_horaria(cliente, producto_monitoreado):
+    _guardar_lecturas(producto_monitoreado)
+
+    respuesta = cliente.get(
+        f"/datosmonitoreo/{producto_monitoreado}/serie",
+        params={"parametro": "temperatura", "desde": "2026-03-01T12:15:00Z", "hasta": "2026-03-01T12:35:00Z"}
+    )
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["total"] == 2
+    assert respuesta.json()["fechas"] == ["2026-03-01T08:20:00", "2026-03-01T08:30:00"]
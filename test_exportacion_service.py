@@ -0,0 +1,35 @@
+"""Caché de exportaciones Parquet / Arrow (services/exportacion_service.py)"""
+import pytest
+from adapters.db.sqlmodel_database import engine
+from services.exportacion_service import exportar_sesion
+
+pa = pytest.importorskip("pyarrow")
+
+TIMESTAMP = 1772352000  # 2026-03-01 08:00 UTC
+EN_RANGO = {"temperatura": 5.0, "humedad": 45.0, "lux": 10.0, "presion": 870.0}
+
+
+def _enviar(cliente, device_id: str, minutos: list[int], secuencia_inicial: int) -> None:
+    lote = [
+        {**EN_RANGO, "timestamp": TIMESTAMP + 60 * minuto, "secuencia": secuencia_inicial + i}
+        for i, minuto in enumerate(minutos)
+    ]
+    assert cliente.post("/nodemcu/data/batch", json={"device_id": device_id, "lecturas": lote}).status_code == 200
+
+
+def test_version_cambia_con_lecturas_nuevas_y_atrasadas(cliente, producto_monitoreado):
+    _enviar(cliente, "exportacion-1", [0, 10, 20], 0)
+    primera = exportar_sesion(engine, producto_monitoreado, "lecturas", "arrow")
+
+    assert exportar_sesion(engine, producto_monitoreado, "lecturas", "arrow") == primera
+
+    # Atrasada: no cambia el rango ni la lectura más reciente, sí la cantidad
+    _enviar(cliente, "exportacion-1", [5], 3)
+    atrasada = exportar_sesion(engine, producto_monitoreado, "lecturas", "arrow")
+    assert atrasada != primera
+    assert pa.ipc.open_stream(atrasada).read_all().num_rows == 4
+
+    _enviar(cliente, "exportacion-1", [30], 4)
+    nueva = exportar_sesion(engine, producto_monitoreado, "lecturas", "arrow")
+    assert nueva != atrasada
+    assert pa.ipc.open_stream(nueva).read_all().num_rows == 5
@@ -0,0 +1,97 @@
+"""Ingesta del NodeMCU: lotes y deduplicación por secuencia (adapters/api/nodemcu.py)"""
+from datetime import datetime
+from sqlmodel import Session, select
+from adapters.arduino_adapter import device_registry
+from adapters.db.sqlmodel_database import engine
+from core.models.alerta import Alerta
+from core.models.datomonitoreo import DatoMonitoreo
+from core.repositories import kpi_monitoreo_repository
+
+TIMESTAMP = 1772352000  # 2026-03-01 08:00 UTC
+EN_RANGO = {"temperatura": 5.0, "humedad": 45.0, "lux": 10.0, "presion": 870.0}
+
+
+def _lecturas(session: Session, id_producto_monitoreado: int) -> list[DatoMonitoreo]:
+    return session.exec(
+        select(DatoMonitoreo)
+        .where(DatoMonitoreo.id_producto_monitoreado == id_producto_monitoreado)
+        .order_by(DatoMonitoreo.fecha, DatoMonitoreo.id)
+    ).all()
+
+
+def test_lote_guarda_lecturas_alertas_e_indicadores(cliente, producto_monitoreado):
+    temperaturas = [5.0, 5.5, 9.5, 10.0, 6.0]  # Una excursión de temperatura que se cierra
+    lote = [
+        {**EN_RANGO, "temperatura": t, "timestamp": TIMESTAMP + 60 * i, "secuencia": i}
+        for i, t in enumerate(temperaturas)
+    ]
+
+    respuesta = cliente.post("/nodemcu/data/batch", json={"device_id": "lote-1", "lecturas": lote})
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["status"].endswith("5/5 dato(s) procesado(s)")
+    with Session(engine) as session:
+        lecturas = _lecturas(session, producto_monitoreado)
+        assert [d.temperatura for d in lecturas] == temperaturas
+        assert [d.secuencia for d in lecturas] == list(range(5))
+        assert {d.id_dispositivo for d in lecturas} == {"lote-1"}
+
+        alertas = session.exec(select(Alerta).where(Alerta.id_producto_monitoreado == producto_monitoreado)).all()
+        assert [(a.parametro_afectado, a.id_dato_monitoreo) for a in alertas] == [("temperatura", lecturas[2].id)]
+        assert alertas[0].fecha_resolucion == lecturas[4].fecha
+        assert alertas[0].duracion_minutos == 2
+
+        kpis = kpi_monitoreo_repository.get_kpis(session, producto_monitoreado)
+        assert kpis.cantidad == 5
+        assert kpis.temperatura_max == 10.0
+        assert kpis.temperatura_minutos_fuera_rango == 2
+
+
+def test_lote_reenviado_no_duplica(cliente, producto_monitoreado):
+    lote = [{**EN_RANGO, "timestamp": TIMESTAMP + 10 * i, "secuencia": i} for i in range(5)]
+
+    primera = cliente.post("/nodemcu/data/batch", json={"device_id": "lote-2", "lecturas": lote})
+    reintento = cliente.post("/nodemcu/data/batch", json={"device_id": "lote-2", "lecturas": lote})
+
+    assert primera.json()["status"].endswith("5/5 dato(s) procesado(s)")
+    assert reintento.json()["status"].endswith("0/5 dato(s) procesado(s)")
+    with Session(engine) as session:
+        assert len(_lecturas(session, producto_monitoreado)) == 5
+        assert kpi_monitoreo_repository.get_kpis(session, producto_monitoreado).cantidad == 5
+
+
+def test_reintento_de_lectura_individual_devuelve_la_respuesta_guardada(cliente, producto_monitoreado):
+    lectura = {**EN_RANGO, "device_id": "dedup-1", "secuencia": 1}
+
+    primera = cliente.post("/nodemcu/data", json=lectura)
+    reintento = cliente.post("/nodemcu/data", json=lectura)
+    # Misma secuencia con otros valores: el contador del NodeMCU se reinició, es una lectura nueva
+    reiniciado = cliente.post("/nodemcu/data", json={**lectura, "temperatura": 5.5})
+
+    assert reintento.json() == primera.json()
+    assert reiniciado.status_code == 200
+    with Session(engine) as session:
+        assert [(d.secuencia, d.temperatura) for d in _lecturas(session, producto_monitoreado)] == [(1, 5.0), (1, 5.5)]
+
+
+def test_dispositivo_por_defecto_no_deduplica(cliente, producto_monitoreado):
+    # Sin device_id todos los NodeMCU comparten "default": una secuencia repetida no es un reintento
+    for _ in range(2):
+        assert cliente.post("/nodemcu/data", json={**EN_RANGO, "secuencia": 7}).status_code == 200
+
+    with Session(engine) as session:
+        assert len(_lecturas(session, producto_monitoreado)) == 2
+
+
+def test_reintento_con_timestamp_fuera_de_la_ventana_lo_rechaza_la_bd(cliente, producto_monitoreado):
+    lectura = {**EN_RANGO, "device_id": "dedup-2", "secuencia": 3, "timestamp": "2026-03-01T08:00:00-04:00"}
+    assert cliente.post("/nodemcu/data", json=lectura).status_code == 200
+    # La ventana en memoria ya no lo recuerda (reintento tardío u otro worker)
+    device_registry.get("dedup-2").segundos_ventana_dedup = 0
+
+    reintento = cliente.post("/nodemcu/data", json=lectura)
+
+    assert reintento.status_code == 200
+    with Session(engine) as session:
+        lecturas = _lecturas(session, producto_monitoreado)
+        assert [(d.secuencia, d.fecha) for d in lecturas] == [(3, datetime(2026, 3, 1, 8, 0))]
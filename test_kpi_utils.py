@@ -0,0 +1,71 @@
+"""Acumulación incremental de indicadores de cumplimiento (core/utils/kpi_utils.py)"""
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from core.utils.kpi_utils import AcumuladorKpis, TEMPERATURA
+from core.utils.reglas_utils import PARAMETROS
+
+INICIO = datetime(2026, 3, 1, 8, 0)
+HUECO_MAXIMO = 15.0
+
+
+def _lote(minutos: list[float], temperaturas: list[float]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    fechas = np.array([INICIO + timedelta(minutes=m) for m in minutos], dtype="datetime64[us]")
+    valores = np.full((len(minutos), len(PARAMETROS)), 50.0)
+    valores[:, TEMPERATURA] = temperaturas
+    excursiones = np.zeros_like(valores, dtype=bool)
+    excursiones[:, TEMPERATURA] = np.array(temperaturas) > 8
+    return fechas, valores, excursiones
+
+
+def test_promedio_ponderado_por_tiempo_y_minutos_en_excursion():
+    acumulador = AcumuladorKpis(energia_activacion=83.144)
+    # 5 °C durante 10 minutos y 10 °C (excursión) durante 5
+    acumulador.agregar(*_lote([0, 10, 15], [5, 10, 5]), HUECO_MAXIMO)
+
+    assert acumulador.cantidad == 3
+    assert acumulador.minutos_con_datos == pytest.approx(15)
+    assert acumulador.promedios()[TEMPERATURA] == pytest.approx((5 * 10 + 10 * 5) / 15)
+    assert acumulador.minutos_excursion[TEMPERATURA] == pytest.approx(5)
+    assert acumulador.minimos[TEMPERATURA] == 5 and acumulador.maximos[TEMPERATURA] == 10
+
+
+def test_acumular_por_lotes_equivale_a_acumular_todo_junto():
+    minutos = [0, 3, 7, 40, 41, 50, 52]  # 7 → 40 supera el hueco máximo
+    temperaturas = [4, 5, 9, 9, 6, 5, 3]
+    completo = AcumuladorKpis(energia_activacion=83.144)
+    completo.agregar(*_lote(minutos, temperaturas), HUECO_MAXIMO)
+    por_lotes = AcumuladorKpis(energia_activacion=83.144)
+    por_lotes.agregar(*_lote(minutos[:3], temperaturas[:3]), HUECO_MAXIMO)
+    por_lotes.agregar(*_lote(minutos[3:], temperaturas[3:]), HUECO_MAXIMO)
+
+    assert por_lotes.cantidad == completo.cantidad
+    assert por_lotes.minutos_sin_datos == pytest.approx(33)
+    assert por_lotes.minutos_con_datos == pytest.approx(completo.minutos_con_datos)
+    np.testing.assert_allclose(por_lotes.integrales, completo.integrales)
+    np.testing.assert_allclose(por_lotes.minutos_excursion, completo.minutos_excursion)
+    assert por_lotes.temperatura_cinetica_media() == pytest.approx(completo.temperatura_cinetica_media())
+
+
+def test_lectura_atrasada_solo_cuenta_para_cantidad_y_extremos():
+    acumulador = AcumuladorKpis(energia_activacion=83.144)
+    acumulador.agregar(*_lote([0, 10], [5, 5]), HUECO_MAXIMO)
+    antes = acumulador.minutos_con_datos
+
+    acumulador.agregar(*_lote([5], [1]), HUECO_MAXIMO)
+
+    assert acumulador.cantidad == 3
+    assert acumulador.minimos[TEMPERATURA] == 1
+    assert acumulador.minutos_con_datos == antes
+    assert acumulador.ultima_fecha == INICIO + timedelta(minutes=10)
+
+
+def test_temperatura_cinetica_media_de_temperatura_constante():
+    acumulador = AcumuladorKpis(energia_activacion=83.144)
+    assert acumulador.temperatura_cinetica_media() is None
+
+    acumulador.agregar(*_lote([0], [6]), HUECO_MAXIMO)
+    assert acumulador.temperatura_cinetica_media() == pytest.approx(6)  # Un solo instante: su temperatura
+
+    acumulador.agregar(*_lote([5, 10], [6, 6]), HUECO_MAXIMO)
+    assert acumulador.temperatura_cinetica_media() == pytest.approx(6)
@@ -0,0 +1,32 @@
+"""Cursor opaco de la paginación por keyset (core/utils/paginacion_utils.py)"""
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from core.utils.paginacion_utils import codificar_cursor, decodificar_cursor, dividir_pagina
+
+
+def test_cursor_ida_y_vuelta():
+    fecha = datetime(2026, 3, 1, 8, 30, 15, 250)
+    cursor = codificar_cursor(fecha, 42)
+
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor) == (fecha, 42)
+    assert decodificar_cursor(None) is None
+    assert decodificar_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", ["no-es-un-cursor", codificar_cursor(datetime(2026, 3, 1), 1)[:-3], "e30"])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+def test_dividir_pagina():
+    filas = [SimpleNamespace(fecha=datetime(2026, 3, 1, 8, 10 - i), id=10 - i) for i in range(4)]
+
+    pagina, siguiente = dividir_pagina(filas, 3)
+    assert pagina == filas[:3]
+    assert decodificar_cursor(siguiente) == (filas[2].fecha, filas[2].id)
+
+    pagina, siguiente = dividir_pagina(filas[:3], 3)
+    assert pagina == filas[:3] and siguiente is None
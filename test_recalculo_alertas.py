@@ -0,0 +1,82 @@
+"""Recálculo de alertas e indicadores sobre lecturas guardadas y archivadas (services/recalculo_alertas_service.py)"""
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlmodel import Session, select
+from adapters.db.sqlmodel_database import engine
+from config import Config
+from core.models.alerta import Alerta
+from core.models.condicionalmacenamiento import CondicionAlmacenamiento
+from core.models.datomonitoreo import DatoMonitoreo
+from core.models.productomonitoreado import ProductoMonitoreado
+from core.repositories import kpi_monitoreo_repository
+from core.repositories.contexto_monitoreo_repository import invalidar_contexto
+from services import archivo_service
+from services.recalculo_alertas_service import recalcular_alertas
+
+INICIO = datetime(2026, 3, 1, 8, 0)
+# Dientes de sierra de 3 a 7 °C cada 9 minutos: con límites 4-6, la excursión que
+# empieza en 6.5 sigue al caer a 3.0 y se cierra al volver a 4.0 en el ciclo siguiente
+TEMPERATURAS = [3.0 + (i % 9) * 0.5 for i in range(1000)]
+
+
+def _sesion_finalizada(id_producto_monitoreado: int) -> None:
+    filas = [
+        dict(id_producto_monitoreado=id_producto_monitoreado, fecha=INICIO + timedelta(minutes=i),
+             temperatura=t, humedad=45.0, lux=10.0, presion=870.0)
+        for i, t in enumerate(TEMPERATURAS)
+    ]
+    with Session(engine) as session:
+        session.execute(insert(DatoMonitoreo), filas)
+        monitoreado = session.get(ProductoMonitoreado, id_producto_monitoreado)
+        monitoreado.fecha_finalizacion_monitoreo = INICIO + timedelta(days=1)
+        condicion = session.get(CondicionAlmacenamiento, monitoreado.producto.id_condicion)
+        condicion.temperatura_min, condicion.temperatura_max = 4, 6
+        session.commit()
+    invalidar_contexto()
+
+
+def _alertas(id_producto_monitoreado: int) -> list[tuple]:
+    with Session(engine) as session:
+        alertas = session.exec(
+            select(Alerta).where(Alerta.id_producto_monitoreado == id_producto_monitoreado).order_by(Alerta.fecha_generacion)
+        ).all()
+        return [(a.parametro_afectado, a.valor_medido, a.fecha_generacion, a.fecha_resolucion) for a in alertas]
+
+
+def test_recalculo_por_lotes_genera_las_alertas_de_la_condicion_actual(cliente, producto_monitoreado, monkeypatch):
+    monkeypatch.setattr(Config, "RECALCULO_LOTE", 70)  # Excursiones que cruzan el borde entre lotes
+    _sesion_finalizada(producto_monitoreado)
+
+    resultado = recalcular_alertas(engine, producto_monitoreado, reiniciar=True)
+
+    assert resultado.lecturas_totales == resultado.lecturas_procesadas == len(TEMPERATURAS)
+    alertas = _alertas(producto_monitoreado)
+    ciclos = len(TEMPERATURAS) // 9
+    assert len(alertas) == 1 + ciclos  # La primera (3.0 y 3.5) más una por ciclo desde 6.5
+    assert alertas[0] == ("temperatura", 3.0, INICIO, INICIO + timedelta(minutes=2))
+    assert alertas[1] == ("temperatura", 6.5, INICIO + timedelta(minutes=7), INICIO + timedelta(minutes=11))
+    assert alertas[-1][3] is None  # La sesión termina en 3.0: la última queda abierta
+
+    with Session(engine) as session:
+        kpis = kpi_monitoreo_repository.get_kpis(session, producto_monitoreado)
+    assert kpis.cantidad == len(TEMPERATURAS)
+    assert kpis.temperatura_minutos_fuera_rango > 0
+
+
+def test_recalculo_sobre_sesion_archivada_da_el_mismo_resultado(cliente, producto_monitoreado, monkeypatch):
+    monkeypatch.setattr(Config, "RECALCULO_LOTE", 70)
+    _sesion_finalizada(producto_monitoreado)
+    recalcular_alertas(engine, producto_monitoreado, reiniciar=True)
+    desde_tabla = _alertas(producto_monitoreado)
+    with Session(engine) as session:
+        kpis_tabla = kpi_monitoreo_repository.get_kpis(session, producto_monitoreado)
+        assert archivo_service.archivar_sesion(session, producto_monitoreado) is not None
+        assert not session.exec(select(DatoMonitoreo).where(DatoMonitoreo.id_producto_monitoreado == producto_monitoreado)).first()
+
+    resultado = recalcular_alertas(engine, producto_monitoreado, reiniciar=True)
+
+    assert resultado.lecturas_procesadas == len(TEMPERATURAS)
+    assert _alertas(producto_monitoreado) == desde_tabla
+    with Session(engine) as session:
+        kpis_archivo = kpi_monitoreo_repository.get_kpis(session, producto_monitoreado)
+    assert kpis_archivo.model_dump(exclude={"actualizado"}) == kpis_tabla.model_dump(exclude={"actualizado"})
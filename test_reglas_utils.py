@@ -0,0 +1,59 @@
+"""Motor de reglas vectorizado y tramos de excursión (core/utils/reglas_utils.py)"""
+from types import SimpleNamespace
+import numpy as np
+from core.utils.reglas_utils import PARAMETROS, compilar_reglas, matriz_lecturas, tramos_excursion, valores_lectura
+
+CONDICION = SimpleNamespace(
+    id=1, temperatura_min=2, temperatura_max=8, humedad_min=30, humedad_max=60,
+    lux_min=0, lux_max=300, presion_min=865, presion_max=875
+)
+
+
+def _lectura(temperatura=5.0, humedad=45.0, lux=10.0, presion=870.0) -> dict:
+    return {'temperatura': temperatura, 'humedad': humedad, 'lux': lux, 'presion': presion}
+
+
+def test_excursiones_respeta_limites_inclusivos_y_ignora_nan():
+    reglas = compilar_reglas(CONDICION)
+    valores = matriz_lecturas([_lectura(), _lectura(temperatura=8), _lectura(temperatura=8.1), _lectura(temperatura=None, humedad=70)])
+
+    excursiones = reglas.excursiones(valores)
+
+    assert excursiones[:, 0].tolist() == [False, False, True, False]  # NaN nunca es excursión
+    assert excursiones[:, 1].tolist() == [False, False, False, True]
+    assert reglas.parametros_fuera_rango(valores_lectura(_lectura(temperatura=1, presion=880))) == ['temperatura', 'presion']
+
+
+def test_advertencias_usan_la_banda_del_umbral():
+    reglas = compilar_reglas(CONDICION, umbrales=[0.9])
+    # Rango de temperatura 2-8: con umbral 0.9 (90 % del rango) las bandas son ≈ <= 2.6 y >= 7.4
+    valores = matriz_lecturas([_lectura(temperatura=t) for t in (2.5, 2.7, 7.3, 7.5, 9.0)])
+
+    excursiones, advertencias = reglas.evaluar(valores, 0.9)
+
+    assert advertencias[:, 0].tolist() == [True, False, False, True, True]
+    assert excursiones[:, 0].tolist() == [False, False, False, False, True]
+
+
+def test_tramos_excursion_alterna_inicios_y_fines():
+    excursiones = np.zeros((6, len(PARAMETROS)), dtype=bool)
+    excursiones[[1, 2, 4, 5], 0] = True  # Temperatura: entra en 1, sale en 3, entra en 4 y sigue abierta
+
+    tramos = tramos_excursion(excursiones, np.zeros(len(PARAMETROS), dtype=bool))
+
+    inicios, fines = tramos[0]
+    assert inicios.tolist() == [1, 4]
+    assert fines.tolist() == [3]
+    assert all(len(i) == 0 and len(f) == 0 for i, f in tramos[1:])
+
+
+def test_tramos_excursion_continua_el_estado_previo():
+    excursiones = np.zeros((3, len(PARAMETROS)), dtype=bool)
+    excursiones[0, 1] = True  # Humedad sigue fuera de rango en la primera fila y vuelve en la segunda
+    previas = np.zeros(len(PARAMETROS), dtype=bool)
+    previas[1] = True
+
+    inicios, fines = tramos_excursion(excursiones, previas)[1]
+
+    assert inicios.tolist() == []  # La excursión venía abierta: no hay inicio nuevo
+    assert fines.tolist() == [1]
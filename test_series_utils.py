@@ -0,0 +1,35 @@
+"""Submuestreo LTTB de series para gráficos (core/utils/series_utils.py)"""
+from datetime import datetime, timedelta
+import numpy as np
+from core.utils.series_utils import lttb, submuestrear
+
+
+def test_lttb_devuelve_la_serie_completa_si_no_hace_falta_reducir():
+    x = np.arange(10, dtype=np.float64)
+    assert lttb(x, x, 10).tolist() == list(range(10))
+    assert lttb(x, x, 2).tolist() == list(range(10))
+
+
+def test_lttb_conserva_extremos_y_picos():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[500] = 100.0  # Un pico aislado debe sobrevivir al submuestreo
+
+    indices = lttb(x, y, 50)
+
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert 500 in indices
+
+
+def test_submuestrear_agrega_los_puntos_fuera_de_limites():
+    inicio = datetime(2026, 3, 1)
+    fechas = np.array([inicio + timedelta(minutes=i) for i in range(500)], dtype="datetime64[us]")
+    valores = np.full(500, 5.0)
+    valores[[100, 101, 102]] = 9.0
+
+    indices = submuestrear(fechas, valores, 20, limite_min=2, limite_max=8)
+
+    assert {100, 101, 102} <= set(indices.tolist())
+    assert len(indices) <= 23
@@ -0,0 +1,30 @@
+"""Sondeo condicional de GET /nodemcu/latest (adapters/api/nodemcu.py)"""
+
+LECTURA = {"temperatura": 5.0, "humedad": 45.0, "lux": 10.0, "presion": 870.0}
+
+
+def test_etag_cambia_con_cada_lectura(cliente, producto_monitoreado):
+    cliente.post("/nodemcu/data", json={**LECTURA, "device_id": "latest-1"})
+    primera = cliente.get("/nodemcu/latest", params={"device_id": "latest-1"})
+    etag = primera.headers["ETag"]
+
+    assert cliente.get("/nodemcu/latest", params={"device_id": "latest-1"}, headers={"If-None-Match": etag}).status_code == 304
+
+    cliente.post("/nodemcu/data", json={**LECTURA, "temperatura": 5.5, "device_id": "latest-1"})
+    nueva = cliente.get("/nodemcu/latest", params={"device_id": "latest-1"}, headers={"If-None-Match": etag})
+    assert nueva.status_code == 200
+    assert nueva.json()["temperatura"] == 5.5
+
+
+def test_etag_cambia_al_asignar_otro_producto(cliente_autenticado, producto_monitoreado):
+    cliente = cliente_autenticado
+    cliente.post("/nodemcu/data", json={**LECTURA, "device_id": "latest-2"})
+    antes = cliente.get("/nodemcu/latest", params={"device_id": "latest-2"})
+    assert antes.json()["id_producto_monitoreado"] is None
+
+    asignacion = cliente.put("/nodemcu/dispositivos/latest-2/producto", json={"id_producto_monitoreado": producto_monitoreado})
+    assert asignacion.status_code == 200
+
+    despues = cliente.get("/nodemcu/latest", params={"device_id": "latest-2"}, headers={"If-None-Match": antes.headers["ETag"]})
+    assert despues.status_code == 200
+    assert despues.json()["id_producto_monitoreado"] == producto_monitoreado